@@ -6,7 +6,9 @@ from logging.config import fileConfig
 
 # Import models to ensure they are registered with Base
 from malscan.models.base import Base
+from malscan.models.checkpoint import JobCheckpoint  # noqa: F401
 from malscan.models.file import File  # noqa: F401
+from malscan.models.ioc import Ioc, JobIoc  # noqa: F401
 from malscan.models.job import Job  # noqa: F401
 from sqlalchemy import pool
 from sqlalchemy.engine import Connection
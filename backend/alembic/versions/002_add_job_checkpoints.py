@@ -0,0 +1,44 @@
+"""Add job_checkpoints table for resumable pipelines
+
+Revision ID: 002_add_job_checkpoints
+Revises: 001_add_job_result
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "002_add_job_checkpoints"
+down_revision: Union[str, None] = "001_add_job_result"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create job_checkpoints table."""
+    # The API creates missing tables on startup, so the table may already exist
+    if sa.inspect(op.get_bind()).has_table("job_checkpoints"):
+        return
+
+    op.create_table(
+        "job_checkpoints",
+        sa.Column(
+            "job_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("jobs.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("stage_name", sa.String(50), primary_key=True),
+        sa.Column("stage_version", sa.String(100), nullable=False),
+        sa.Column("result", JSONB, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Drop job_checkpoints table."""
+    op.drop_table("job_checkpoints")
@@ -0,0 +1,97 @@
+"""Add verdict/score columns and indexes for job listing
+
+Revision ID: 003_add_job_listing_indexes
+Revises: 002_add_job_checkpoints
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "003_add_job_listing_indexes"
+down_revision: Union[str, None] = "002_add_job_checkpoints"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns)
+_INDEXES = [
+    ("ix_jobs_created_at_id", "jobs", "created_at, id"),
+    ("ix_jobs_status_created_at_id", "jobs", "status, created_at, id"),
+    ("ix_jobs_verdict_created_at_id", "jobs", "verdict, created_at, id"),
+    ("ix_jobs_score_created_at_id", "jobs", "score, created_at, id"),
+    ("ix_files_sha256_pattern", "files", "sha256 varchar_pattern_ops"),
+]
+
+# Jobs updated per backfill transaction
+_BACKFILL_BATCH = 10_000
+
+
+def _backfill_verdicts() -> None:
+    """Copy verdict/score out of stored results, one id range at a time."""
+    bind = op.get_bind()
+    after = "00000000-0000-0000-0000-000000000000"
+    while True:
+        upper = bind.execute(
+            sa.text(
+                "SELECT max(id::text) FROM "
+                "(SELECT id FROM jobs WHERE id > CAST(:after AS uuid) ORDER BY id LIMIT :n) AS b"
+            ),
+            {"after": after, "n": _BACKFILL_BATCH},
+        ).scalar()
+        if upper is None:
+            return
+        # Offloaded reports keep verdict and score in their summary
+        bind.execute(
+            sa.text(
+                """
+                UPDATE jobs
+                SET verdict = COALESCE(result->>'verdict', result->'summary'->>'verdict'),
+                    score = COALESCE(result->>'score', result->'summary'->>'score')::smallint
+                WHERE id > CAST(:after AS uuid) AND id <= CAST(:upper AS uuid)
+                  AND result IS NOT NULL AND verdict IS NULL
+                """
+            ),
+            {"after": after, "upper": upper},
+        )
+        after = upper
+
+
+def upgrade() -> None:
+    """Add verdict/score, backfill them and build the listing indexes."""
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("jobs")}
+    if "verdict" not in columns:
+        op.add_column("jobs", sa.Column("verdict", sa.String(20), nullable=True))
+    if "score" not in columns:
+        op.add_column("jobs", sa.Column("score", sa.SmallInteger, nullable=True))
+
+    # Backfill in id ranges, each committed on its own, so no single
+    # transaction locks or rewrites the whole table
+    with op.get_context().autocommit_block():
+        _backfill_verdicts()
+
+    # Build indexes without blocking writes; CONCURRENTLY needs autocommit
+    with op.get_context().autocommit_block():
+        for name, table, columns_sql in _INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns_sql})")
+        # Substring search on filenames
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_files_filename_trgm "
+            "ON files USING gin (filename gin_trgm_ops)"
+        )
+        # Covered by ix_jobs_status_created_at_id
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_jobs_status")
+
+
+def downgrade() -> None:
+    """Drop the listing indexes and verdict/score columns."""
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_jobs_status ON jobs (status)")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_files_filename_trgm")
+        for name, _, _ in _INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.drop_column("jobs", "score")
+    op.drop_column("jobs", "verdict")
@@ -0,0 +1,70 @@
+"""Add iocs and job_iocs tables for indicator pivots
+
+Revision ID: 004_add_ioc_index
+Revises: 003_add_job_listing_indexes
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "004_add_ioc_index"
+down_revision: Union[str, None] = "003_add_job_listing_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create iocs and job_iocs tables."""
+    # The API creates missing tables on startup, so the tables may already exist
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("iocs"):
+        op.create_table(
+            "iocs",
+            sa.Column("id", sa.BigInteger, primary_key=True, autoincrement=True),
+            sa.Column("kind", sa.String(10), nullable=False),
+            sa.Column("value", sa.Text, nullable=False),
+            sa.Column("job_count", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("first_seen", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("last_seen", sa.DateTime(timezone=True), nullable=False),
+        )
+        op.create_index("ux_iocs_kind_value", "iocs", ["kind", "value"], unique=True)
+
+    if not inspector.has_table("job_iocs"):
+        op.create_table(
+            "job_iocs",
+            sa.Column(
+                "ioc_id",
+                sa.BigInteger,
+                sa.ForeignKey("iocs.id", ondelete="CASCADE"),
+                primary_key=True,
+            ),
+            sa.Column(
+                "job_id",
+                UUID(as_uuid=True),
+                sa.ForeignKey("jobs.id", ondelete="CASCADE"),
+                primary_key=True,
+            ),
+            sa.Column(
+                "file_id",
+                UUID(as_uuid=True),
+                sa.ForeignKey("files.id", ondelete="CASCADE"),
+                nullable=False,
+            ),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        )
+        op.create_index(
+            "ix_job_iocs_ioc_created_at_job", "job_iocs", ["ioc_id", "created_at", "job_id"]
+        )
+        op.create_index("ix_job_iocs_job_id", "job_iocs", ["job_id"])
+
+
+def downgrade() -> None:
+    """Drop iocs and job_iocs tables."""
+    op.drop_table("job_iocs")
+    op.drop_table("iocs")
@@ -0,0 +1,67 @@
+"""Add md5/sha1 and latest verdict columns to files for hash lookups
+
+Revision ID: 005_add_file_hash_lookup
+Revises: 004_add_ioc_index
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "005_add_file_hash_lookup"
+down_revision: Union[str, None] = "004_add_ioc_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_COLUMNS = [
+    sa.Column("md5", sa.String(32), nullable=True),
+    sa.Column("sha1", sa.String(40), nullable=True),
+    sa.Column("latest_job_id", UUID(as_uuid=True), nullable=True),
+    sa.Column("latest_verdict", sa.String(20), nullable=True),
+    sa.Column("latest_score", sa.SmallInteger, nullable=True),
+    sa.Column("latest_analyzed_at", sa.DateTime(timezone=True), nullable=True),
+]
+
+
+def upgrade() -> None:
+    """Add the columns, backfill them from completed jobs and index md5/sha1."""
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("files")}
+    for column in _COLUMNS:
+        if column.name not in existing:
+            op.add_column("files", column)
+
+    # Latest completed analysis per file (verdict/score come from migration 003)
+    op.execute(
+        """
+        UPDATE files f
+        SET latest_job_id = j.id,
+            latest_verdict = j.verdict,
+            latest_score = j.score,
+            latest_analyzed_at = j.updated_at,
+            md5 = COALESCE(f.md5, NULLIF(j.result #>> '{results,iocs,hashes,md5}', '')),
+            sha1 = COALESCE(f.sha1, NULLIF(j.result #>> '{results,iocs,hashes,sha1}', ''))
+        FROM (
+            SELECT DISTINCT ON (file_id) id, file_id, verdict, score, updated_at, result
+            FROM jobs
+            WHERE status = 'done' AND verdict IS NOT NULL
+            ORDER BY file_id, updated_at DESC
+        ) j
+        WHERE f.id = j.file_id
+        """
+    )
+
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_files_md5 ON files (md5)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_files_sha1 ON files (sha1)")
+
+
+def downgrade() -> None:
+    """Drop the hash lookup columns."""
+    op.drop_index("ix_files_sha1", table_name="files")
+    op.drop_index("ix_files_md5", table_name="files")
+    for column in reversed(_COLUMNS):
+        op.drop_column("files", column.name)
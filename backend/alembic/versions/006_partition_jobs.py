@@ -0,0 +1,149 @@
+"""Partition jobs by month of created_at
+
+Revision ID: 006_partition_jobs
+Revises: 005_add_file_hash_lookup
+Create Date: 2026-10-19
+
+Rewrites jobs into a table partitioned by RANGE (created_at) with one
+partition per month holding existing rows, the next few months, and a default
+partition. Rows are copied with one INSERT ... SELECT, so plan a maintenance
+window proportional to the table size. Foreign keys from job_checkpoints and
+job_iocs to jobs are dropped: a partitioned table can only be referenced
+through a unique key that includes the partition key.
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "006_partition_jobs"
+down_revision: Union[str, None] = "005_add_file_hash_lookup"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months created ahead of the current one (partition maintenance keeps this up)
+_PREMAKE_MONTHS = 3
+
+_COLUMNS = (
+    "id, file_id, status, current_stage, stages_done, stages_total, error_message, "
+    "result, verdict, score, created_at, updated_at"
+)
+
+_INDEXES = [
+    ("ix_jobs_file_id", ["file_id"]),
+    ("ix_jobs_created_at_id", ["created_at", "id"]),
+    ("ix_jobs_status_created_at_id", ["status", "created_at", "id"]),
+    ("ix_jobs_verdict_created_at_id", ["verdict", "created_at", "id"]),
+    ("ix_jobs_score_created_at_id", ["score", "created_at", "id"]),
+]
+
+_REFERENCING = [
+    ("job_checkpoints", "job_checkpoints_job_id_fkey"),
+    ("job_iocs", "job_iocs_job_id_fkey"),
+]
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _jobs_columns() -> list[sa.Column]:
+    return [
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("file_id", UUID(as_uuid=True), sa.ForeignKey("files.id"), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("current_stage", sa.String(50), nullable=True),
+        sa.Column("stages_done", sa.Integer, nullable=False),
+        sa.Column("stages_total", sa.Integer, nullable=False),
+        sa.Column("error_message", sa.Text, nullable=True),
+        sa.Column("result", JSONB, nullable=True),
+        sa.Column("verdict", sa.String(20), nullable=True),
+        sa.Column("score", sa.SmallInteger, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), primary_key=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    ]
+
+
+def _is_partitioned() -> bool:
+    return (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'jobs'"
+            )
+        )
+        .first()
+        is not None
+    )
+
+
+def _retire_old_table(name: str) -> None:
+    """Rename jobs out of the way, freeing its index and constraint names."""
+    for table, constraint in _REFERENCING:
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}")
+    op.execute(f"ALTER TABLE jobs RENAME TO {name}")
+    op.execute(f"ALTER TABLE {name} RENAME CONSTRAINT jobs_pkey TO {name}_pkey")
+    for index, _ in _INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    op.execute("DROP INDEX IF EXISTS ix_jobs_status")
+
+
+def upgrade() -> None:
+    """Move jobs into a monthly partitioned table."""
+    if _is_partitioned():
+        return
+
+    _retire_old_table("jobs_unpartitioned")
+    op.create_table("jobs", *_jobs_columns(), postgresql_partition_by="RANGE (created_at)")
+
+    oldest = op.get_bind().execute(sa.text("SELECT min(created_at) FROM jobs_unpartitioned"))
+    oldest_at = oldest.scalar() or datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc)
+    month = date(oldest_at.year, oldest_at.month, 1)
+    last = _add_months(date(now.year, now.month, 1), _PREMAKE_MONTHS)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE jobs_y{month.year:04d}m{month.month:02d} PARTITION OF jobs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+    op.execute("CREATE TABLE jobs_default PARTITION OF jobs DEFAULT")
+
+    op.execute(f"INSERT INTO jobs ({_COLUMNS}) SELECT {_COLUMNS} FROM jobs_unpartitioned")
+    op.drop_table("jobs_unpartitioned")
+
+    for index, columns in _INDEXES:
+        op.create_index(index, "jobs", columns)
+
+
+def downgrade() -> None:
+    """Move jobs back into a single table."""
+    if not _is_partitioned():
+        return
+
+    op.execute("ALTER TABLE jobs RENAME TO jobs_partitioned")
+    op.execute("ALTER TABLE jobs_partitioned RENAME CONSTRAINT jobs_pkey TO jobs_partitioned_pkey")
+    for index, _ in _INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    columns = [c for c in _jobs_columns() if c.name != "created_at"]
+    columns.append(sa.Column("created_at", sa.DateTime(timezone=True), nullable=False))
+    op.create_table("jobs", *columns)
+    op.execute(f"INSERT INTO jobs ({_COLUMNS}) SELECT {_COLUMNS} FROM jobs_partitioned")
+    op.drop_table("jobs_partitioned")
+
+    for index, index_columns in _INDEXES:
+        op.create_index(index, "jobs", index_columns)
+    op.create_index("ix_jobs_status", "jobs", ["status"])
+    for table, constraint in _REFERENCING:
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {constraint} "
+            "FOREIGN KEY (job_id) REFERENCES jobs (id) ON DELETE CASCADE NOT VALID"
+        )
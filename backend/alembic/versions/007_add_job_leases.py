@@ -0,0 +1,49 @@
+"""Add worker lease columns to jobs
+
+Revision ID: 007_add_job_leases
+Revises: 006_partition_jobs
+Create Date: 2026-10-19
+
+Workers take a lease (lease_owner, lease_expires_at) on the jobs they run and
+renew it while the pipeline is running; the reaper finds expired leases
+through a partial index on scanning jobs. attempts counts deliveries.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "007_add_job_leases"
+down_revision: Union[str, None] = "006_partition_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_COLUMNS = [
+    sa.Column("lease_owner", sa.String(255), nullable=True),
+    sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+    sa.Column("attempts", sa.SmallInteger, nullable=False, server_default="0"),
+]
+
+
+def upgrade() -> None:
+    """Add the lease columns and the expired-lease index."""
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("jobs")}
+    for column in _COLUMNS:
+        if column.name not in existing:
+            op.add_column("jobs", column)
+
+    # Partitioned tables cannot be indexed CONCURRENTLY; the partial index
+    # only covers scanning jobs, so it builds quickly
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_jobs_lease_expires_at ON jobs (lease_expires_at) "
+        "WHERE status = 'scanning'"
+    )
+
+
+def downgrade() -> None:
+    """Drop the lease index and columns."""
+    op.execute("DROP INDEX IF EXISTS ix_jobs_lease_expires_at")
+    for column in reversed(_COLUMNS):
+        op.drop_column("jobs", column.name)
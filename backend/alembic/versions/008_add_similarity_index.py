@@ -0,0 +1,59 @@
+"""Add sample_similarity and similarity_buckets tables for near-duplicate lookup
+
+Revision ID: 008_add_similarity_index
+Revises: 007_add_job_leases
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "008_add_similarity_index"
+down_revision: Union[str, None] = "007_add_job_leases"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create sample_similarity and similarity_buckets tables."""
+    # The API creates missing tables on startup, so the tables may already exist
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("sample_similarity"):
+        op.create_table(
+            "sample_similarity",
+            sa.Column(
+                "file_id",
+                UUID(as_uuid=True),
+                sa.ForeignKey("files.id", ondelete="CASCADE"),
+                primary_key=True,
+            ),
+            sa.Column("sha256", sa.String(64), nullable=False),
+            sa.Column("signature", sa.LargeBinary, nullable=False),
+            sa.Column("feature_count", sa.Integer, nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        )
+
+    if not inspector.has_table("similarity_buckets"):
+        op.create_table(
+            "similarity_buckets",
+            sa.Column("band", sa.SmallInteger, primary_key=True),
+            sa.Column("bucket", sa.BigInteger, primary_key=True),
+            sa.Column(
+                "file_id",
+                UUID(as_uuid=True),
+                sa.ForeignKey("files.id", ondelete="CASCADE"),
+                primary_key=True,
+            ),
+        )
+        op.create_index("ix_similarity_buckets_file_id", "similarity_buckets", ["file_id"])
+
+
+def downgrade() -> None:
+    """Drop sample_similarity and similarity_buckets tables."""
+    op.drop_table("similarity_buckets")
+    op.drop_table("sample_similarity")
@@ -0,0 +1,157 @@
+"""Dataset generator and latency benchmark for GET /api/v1/jobs.
+
+Usage:
+    python benchmarks/job_listing.py generate --jobs 20000000 [--files-per-job 0.5]
+    python benchmarks/job_listing.py run [--repeat 20] [--pages 50]
+
+``generate`` fills the database from DATABASE_URL (run the migrations first)
+with synthetic files and jobs spread over a year, server-side with
+generate_series, in batches, then ANALYZEs. ``run`` calls the endpoint
+in-process (no HTTP server) for each filter scenario and prints p50/p95
+latency, plus the latency of page 1 vs page N when following cursors. Run it
+at several dataset sizes; latency should stay flat.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import asyncpg
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from malscan.api.routes import router
+from malscan.config import get_settings
+
+BATCH_SIZE = 1_000_000
+
+_FILES_SQL = """
+INSERT INTO files (id, sha256, size, filename, content_type, created_at)
+SELECT md5('f' || g)::uuid,
+       encode(sha256(('f' || g)::bytea), 'hex'),
+       (random() * 10000000)::int,
+       (ARRAY['invoice', 'setup', 'report', 'update', 'photo'])[1 + g % 5] || '_' || g
+           || (ARRAY['.exe', '.pdf', '.docx', '.zip', '.js'])[1 + (g / 5) % 5],
+       'application/octet-stream',
+       now() - random() * interval '365 days'
+FROM generate_series($1::bigint, $2::bigint) g
+ON CONFLICT DO NOTHING
+"""
+
+_JOBS_SQL = """
+INSERT INTO jobs (id, file_id, status, current_stage, stages_done, stages_total,
+                  verdict, score, created_at, updated_at)
+SELECT gen_random_uuid(), md5('f' || (g % $3))::uuid, s.status, NULL,
+       CASE WHEN s.status = 'done' THEN 5 ELSE 0 END, 5,
+       s.verdict,
+       CASE s.verdict WHEN 'malicious' THEN 90 + (r2 * 10)::int
+                      WHEN 'suspicious' THEN 50 + (r2 * 40)::int
+                      WHEN 'clean' THEN 0 END,
+       s.ts, s.ts
+FROM generate_series($1::bigint, $2::bigint) g
+CROSS JOIN LATERAL (SELECT random() AS r1, random() AS r2, g AS k) r
+CROSS JOIN LATERAL (
+    SELECT CASE WHEN r.r1 < 0.90 THEN 'done' WHEN r.r1 < 0.95 THEN 'failed'
+                WHEN r.r1 < 0.98 THEN 'scanning' ELSE 'queued' END AS status,
+           CASE WHEN r.r1 >= 0.90 THEN NULL WHEN r.r2 < 0.7 THEN 'clean'
+                WHEN r.r2 < 0.9 THEN 'suspicious' ELSE 'malicious' END AS verdict,
+           now() - (g::float / $4) * interval '365 days' AS ts
+) s
+"""
+
+SCENARIOS = {
+    "all": "",
+    "status": "status=failed",
+    "verdict": "verdict=malicious",
+    "score_range": "min_score=95&max_score=100",
+    "verdict_window": "verdict=suspicious&created_after=2025-06-01T00:00:00Z"
+    "&created_before=2025-06-02T00:00:00Z",
+    "sha256_prefix": "sha256=abc1",
+    "filename": "filename=invoice_12345",
+}
+
+
+def _dsn() -> str:
+    return get_settings().database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def generate(jobs: int, files_per_job: float) -> None:
+    files = max(1, int(jobs * files_per_job))
+    conn = await asyncpg.connect(_dsn())
+    try:
+        for start in range(0, files, BATCH_SIZE):
+            end = min(start + BATCH_SIZE, files) - 1
+            await conn.execute(_FILES_SQL, start, end)
+            print(f"files {end + 1}/{files}")
+        for start in range(0, jobs, BATCH_SIZE):
+            end = min(start + BATCH_SIZE, jobs) - 1
+            await conn.execute(_JOBS_SQL, start, end, files, float(jobs))
+            print(f"jobs {end + 1}/{jobs}")
+        await conn.execute("ANALYZE files")
+        await conn.execute("ANALYZE jobs")
+        count = await conn.fetchval("SELECT count(*) FROM jobs")
+        print(f"jobs table has {count} rows")
+    finally:
+        await conn.close()
+
+
+def _percentiles(samples: list[float]) -> str:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return f"p50={statistics.median(samples) * 1000:8.2f}ms p95={p95 * 1000:8.2f}ms"
+
+
+async def run(repeat: int, pages: int) -> None:
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        for name, query in SCENARIOS.items():
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = await client.get(f"/api/v1/jobs?limit=50&{query}")
+                samples.append(time.perf_counter() - start)
+                response.raise_for_status()
+            print(f"{name:<16}{_percentiles(samples)}")
+
+        # Page latency must not grow with depth (keyset, not OFFSET)
+        cursor = None
+        page_times = []
+        for _ in range(pages):
+            url = "/api/v1/jobs?limit=50&status=done"
+            if cursor:
+                url += f"&cursor={cursor}"
+            start = time.perf_counter()
+            response = await client.get(url)
+            page_times.append(time.perf_counter() - start)
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                break
+        print(
+            f"{'paging':<16}page 1={page_times[0] * 1000:.2f}ms "
+            f"page {len(page_times)}={page_times[-1] * 1000:.2f}ms "
+            f"median={statistics.median(page_times) * 1000:.2f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Job listing dataset and benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Insert synthetic jobs")
+    generate_parser.add_argument("--jobs", type=int, default=1_000_000)
+    generate_parser.add_argument("--files-per-job", type=float, default=0.5)
+
+    run_parser = subparsers.add_parser("run", help="Measure listing latency")
+    run_parser.add_argument("--repeat", type=int, default=20)
+    run_parser.add_argument("--pages", type=int, default=50)
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        asyncio.run(generate(args.jobs, args.files_per_job))
+    else:
+        asyncio.run(run(args.repeat, args.pages))
+
+
+if __name__ == "__main__":
+    main()
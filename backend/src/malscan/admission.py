@@ -0,0 +1,202 @@
+"""Queue-aware admission control for uploads.
+
+Uploads are rejected with 429 and a ``Retry-After`` while the main queue is
+deeper than the limit that applies to them: the client's limit
+(``X-Client-Id`` header, ``admission_client_max_queue_depth``) or else
+their priority's (``X-Priority`` header, ``admission_max_queue_depth``).
+``Retry-After`` is the time the workers need, at their current drain rate,
+to bring the queue back under that limit.
+
+Queue depth and drain rate are cached for ``admission_refresh_seconds`` and
+refreshed by one request at a time. They come from the RabbitMQ management
+API (ready messages, ack rate) when ``rabbitmq_management_url`` is set,
+otherwise from a passive queue declare, with the drain rate estimated from
+the consumer count. The management API is called with the credentials of
+``rabbitmq_management_url``, or else those of ``rabbitmq_url``. When no
+signals are available uploads are admitted, and every failed read counts in
+``malscan_api_admission_refresh_failures_total``.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from urllib.parse import quote, unquote, urlparse
+
+import aio_pika
+import httpx
+import structlog
+
+from malscan.config import get_settings
+from malscan.metrics import (
+    admission_open,
+    admission_queue_depth,
+    admission_refresh_failures,
+    admission_rejections,
+    admission_throughput,
+)
+
+log = structlog.get_logger()
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class QueueSignals:
+    """Backlog of the main queue at one point in time."""
+
+    depth: int
+    consumers: int
+    throughput: float  # jobs drained per second
+    sampled_at: float  # time.monotonic()
+
+
+@dataclass(frozen=True)
+class AdmissionDecision:
+    """Outcome of an admission check."""
+
+    admitted: bool
+    priority: str
+    limit: int
+    depth: int | None = None
+    retry_after: int | None = None
+
+
+def retry_after_seconds(depth: int, limit: int, throughput: float) -> int:
+    """Seconds until the queue drains from depth to below limit."""
+    if throughput <= 0:
+        return settings.admission_retry_after_max_seconds
+    seconds = math.ceil((depth - limit + 1) / throughput)
+    return max(
+        settings.admission_retry_after_min_seconds,
+        min(settings.admission_retry_after_max_seconds, seconds),
+    )
+
+
+def management_auth() -> httpx.BasicAuth | None:
+    """Credentials for the management API: its URL's, else the AMQP URL's."""
+    for raw in (settings.rabbitmq_management_url, settings.rabbitmq_url):
+        url = urlparse(raw or "")
+        if url.username:
+            return httpx.BasicAuth(unquote(url.username), unquote(url.password or ""))
+    return None
+
+
+class AdmissionController:
+    """Admits uploads based on cached queue signals."""
+
+    def __init__(self) -> None:
+        self._signals: QueueSignals | None = None
+        self._next_refresh = 0.0
+        self._lock = asyncio.Lock()
+        self._connection: aio_pika.abc.AbstractRobustConnection | None = None
+
+    def priority_of(self, priority: str | None) -> str:
+        """Configured priority class for a header value."""
+        if priority in settings.admission_max_queue_depth:
+            return priority
+        return settings.admission_default_priority
+
+    def limit_for(self, priority: str, client_id: str | None) -> int:
+        """Queue depth above which uploads of a client or priority are rejected."""
+        if client_id is not None and client_id in settings.admission_client_max_queue_depth:
+            return settings.admission_client_max_queue_depth[client_id]
+        return settings.admission_max_queue_depth.get(priority, 0)
+
+    async def _read_management(self) -> tuple[int, int, float]:
+        url = urlparse(settings.rabbitmq_url)
+        vhost = url.path.lstrip("/") or "/"
+        api_url = (
+            f"{settings.rabbitmq_management_url.rstrip('/')}"
+            f"/api/queues/{quote(vhost, safe='')}/{quote(settings.rabbitmq_queue, safe='')}"
+        )
+        async with httpx.AsyncClient(auth=management_auth(), timeout=5.0) as client:
+            response = await client.get(api_url)
+            response.raise_for_status()
+            data = response.json()
+
+        ack_rate = (data.get("message_stats") or {}).get("ack_details", {}).get("rate", 0.0)
+        return data.get("messages_ready", 0), data.get("consumers", 0), float(ack_rate)
+
+    async def _read_amqp(self) -> tuple[int, int, float]:
+        if self._connection is None or self._connection.is_closed:
+            self._connection = await aio_pika.connect_robust(settings.rabbitmq_url)
+        channel = await self._connection.channel()
+        try:
+            queue = await channel.declare_queue(settings.rabbitmq_queue, passive=True)
+            declared = queue.declaration_result
+            depth = declared.message_count or 0
+            consumers = declared.consumer_count or 0
+        finally:
+            await channel.close()
+        return depth, consumers, consumers * settings.admission_consumer_jobs_per_second
+
+    async def _refresh(self) -> None:
+        source = "management" if settings.rabbitmq_management_url else "amqp"
+        try:
+            if source == "management":
+                depth, consumers, throughput = await self._read_management()
+            else:
+                depth, consumers, throughput = await self._read_amqp()
+        except Exception:
+            admission_refresh_failures.labels(source=source).inc()
+            raise
+
+        self._signals = QueueSignals(depth, consumers, throughput, time.monotonic())
+        admission_queue_depth.set(depth)
+        admission_throughput.set(throughput)
+        for priority in settings.admission_max_queue_depth:
+            admission_open.labels(priority=priority).set(
+                1 if depth <= self.limit_for(priority, None) else 0
+            )
+
+    async def signals(self) -> QueueSignals | None:
+        """Cached queue signals, refreshed at most every refresh interval.
+
+        Returns:
+            The signals, or None if they could not be read recently.
+        """
+        refresh = settings.admission_refresh_seconds
+        if time.monotonic() >= self._next_refresh:
+            async with self._lock:
+                # Another request may have refreshed while this one waited
+                if time.monotonic() >= self._next_refresh:
+                    self._next_refresh = time.monotonic() + refresh
+                    try:
+                        await self._refresh()
+                    except Exception as e:
+                        log.warning("admission_signals_refresh_failed", error=str(e))
+
+        # Signals that could not be refreshed for a while are not trusted
+        signals = self._signals
+        if signals is None or time.monotonic() - signals.sampled_at > refresh * 3:
+            return None
+        return signals
+
+    async def check(self, priority: str | None, client_id: str | None) -> AdmissionDecision:
+        """Decide whether an upload is admitted."""
+        priority = self.priority_of(priority)
+        limit = self.limit_for(priority, client_id)
+        signals = await self.signals() if settings.admission_enabled else None
+        if signals is None or signals.depth <= limit:
+            return AdmissionDecision(
+                True, priority, limit, signals.depth if signals is not None else None
+            )
+
+        client = client_id if client_id in settings.admission_client_max_queue_depth else "-"
+        admission_rejections.labels(priority=priority, client=client).inc()
+        return AdmissionDecision(
+            False,
+            priority,
+            limit,
+            signals.depth,
+            retry_after_seconds(signals.depth, limit, signals.throughput),
+        )
+
+    async def close(self) -> None:
+        """Close the broker connection used for queue signals."""
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+admission = AdmissionController()
@@ -0,0 +1,35 @@
+"""Opaque keyset cursors for listing endpoints.
+
+A cursor encodes the sort key of the last item of a page; the next page
+starts strictly after it, so paging cost does not grow with depth the way
+OFFSET does.
+"""
+
+import base64
+import json
+import uuid
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, item_id: uuid.UUID) -> str:
+    """Cursor pointing after an item sorted by (created_at, id)."""
+    payload = json.dumps({"c": created_at.isoformat(), "i": str(item_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    """Sort key encoded in a cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload["c"])
+        item_id = uuid.UUID(payload["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if created_at.tzinfo is None:
+        raise ValueError("Invalid cursor")
+    return created_at, item_id
@@ -0,0 +1,129 @@
+"""Report field projection and summary evaluated in SQL.
+
+``fields=verdict,score,results.av_result`` selects JSONB paths of the stored
+report with ``#>`` so only those values leave the database. Reports offloaded
+to object storage keep a ``summary`` in the row (verdict, score, file); only
+verdict and score are served from it, since its ``file`` holds just the
+file's identity. Anything else falls back to the object.
+"""
+
+import re
+from typing import Any
+
+from sqlalchemy import ColumnElement, func, literal_column
+
+from malscan.models import Job
+
+# Top-level keys of a stored report that can be selected
+REPORT_FIELDS = frozenset(
+    {"job_id", "file", "verdict", "score", "results", "timings", "created_at"}
+)
+
+# Paths an offloaded report's summary holds in full
+SUMMARY_PATHS = frozenset({("verdict",), ("score",)})
+
+MAX_FIELDS = 20
+MAX_DEPTH = 6
+
+_SEGMENT = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_EMPTY_ARRAY = literal_column("'[]'::jsonb")
+
+
+def parse_fields(fields: str) -> list[tuple[str, ...]]:
+    """Parse a comma-separated list of dotted report paths.
+
+    Paths nested under another requested path are dropped, so
+    ``results,results.iocs`` selects ``results`` once.
+
+    Raises:
+        ValueError: If a path is malformed or not part of a report.
+    """
+    paths: list[tuple[str, ...]] = []
+    for raw in fields.split(","):
+        raw = raw.strip()
+        if not raw:
+            continue
+        path = tuple(raw.split("."))
+        if len(path) > MAX_DEPTH or not all(_SEGMENT.match(segment) for segment in path):
+            raise ValueError(f"Invalid field: {raw}")
+        if path[0] not in REPORT_FIELDS:
+            raise ValueError(f"Unknown field: {path[0]}")
+        if path not in paths:
+            paths.append(path)
+
+    if not paths:
+        raise ValueError("No fields requested")
+    if len(paths) > MAX_FIELDS:
+        raise ValueError(f"At most {MAX_FIELDS} fields can be requested")
+
+    return [
+        path
+        for path in paths
+        if not any(other != path and path[: len(other)] == other for other in paths)
+    ]
+
+
+def field_expression(path: tuple[str, ...]) -> ColumnElement[Any]:
+    """JSONB value at path, falling back to the summary for SUMMARY_PATHS."""
+    if path not in SUMMARY_PATHS:
+        return Job.result[path]
+    return func.coalesce(Job.result[path], Job.result[("summary", *path)])
+
+
+def _array_length(path: tuple[str, ...]) -> ColumnElement[Any]:
+    return func.jsonb_array_length(func.coalesce(Job.result[path], _EMPTY_ARRAY))
+
+
+def _object(**values: ColumnElement[Any]) -> ColumnElement[Any]:
+    # Keys are rendered as literals: asyncpg cannot infer types of
+    # jsonb_build_object's variadic arguments
+    args: list[ColumnElement[Any]] = []
+    for key, value in values.items():
+        args += [literal_column(f"'{key}'"), value]
+    return func.jsonb_build_object(*args)
+
+
+def summary_expression() -> ColumnElement[Any]:
+    """The stored summary, or one built from the report for older rows."""
+    return func.coalesce(
+        Job.result["summary"],
+        _object(
+            verdict=Job.result["verdict"],
+            score=Job.result["score"],
+            file=_object(
+                sha256=Job.result[("file", "sha256")],
+                mime=Job.result[("file", "mime")],
+                size=Job.result[("file", "size")],
+            ),
+            av=_object(
+                infected=Job.result[("results", "av_result", "infected")],
+                threat_name=Job.result[("results", "av_result", "threat_name")],
+            ),
+            counts=_object(
+                yara_hits=_array_length(("results", "yara_hits")),
+                urls=_array_length(("results", "iocs", "urls")),
+                domains=_array_length(("results", "iocs", "domains")),
+                ips=_array_length(("results", "iocs", "ips")),
+                sandbox_behaviors=_array_length(("results", "sandbox", "behaviors")),
+                network_connections=_array_length(("results", "sandbox", "network_connections")),
+            ),
+        ),
+    )
+
+
+def get_path(report: dict[str, Any], path: tuple[str, ...]) -> Any:
+    """Value at path in a report dict, or None if absent."""
+    value: Any = report
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def set_path(target: dict[str, Any], path: tuple[str, ...], value: Any) -> None:
+    """Set a value at path, creating intermediate objects."""
+    for key in path[:-1]:
+        target = target.setdefault(key, {})
+    target[path[-1]] = value
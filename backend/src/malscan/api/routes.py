@@ -1,30 +1,128 @@
 """API routes for file upload, job status, and reports."""
 
 import hashlib
+import json
+import time
 import uuid
-from typing import Any
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Literal
 
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from minio.error import S3Error
+from opentelemetry import trace
+from opentelemetry.trace import Span
+from sqlalchemy import String, any_, func, literal, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
-
+from sqlalchemy.orm import aliased
+
+from malscan.admission import admission
+from malscan.api.pagination import decode_cursor, encode_cursor
+from malscan.api.projection import (
+    field_expression,
+    get_path,
+    parse_fields,
+    set_path,
+    summary_expression,
+)
+from malscan.api.similarity import estimate_similarity
 from malscan.config import get_settings
 from malscan.db import get_db
-from malscan.models import File, Job, JobStatus
+from malscan.metrics import mime_family, size_bucket, upload_step_latency
+from malscan.models import (
+    File,
+    Ioc,
+    Job,
+    JobIoc,
+    JobStatus,
+    SampleSimilarity,
+    SimilarityBucket,
+)
 from malscan.queue import publish_job
-from malscan.schemas.requests import JobStatusResponse, ReportResponse, UploadResponse
+from malscan.schemas.requests import (
+    IocInfo,
+    IocJobItem,
+    IocPivotResponse,
+    JobListItem,
+    JobListResponse,
+    JobStatusResponse,
+    LookupRequest,
+    ReportResponse,
+    ReportSummaryResponse,
+    SimilarSample,
+    SimilarSamplesResponse,
+    UploadResponse,
+)
+from malscan.storage import open_report, read_report
 from malscan.storage import upload_file as upload_to_minio
+from malscan.tracing import tracer
 
 router = APIRouter()
 settings = get_settings()
 log = structlog.get_logger()
 
 
+@contextmanager
+def _upload_step(
+    step: str,
+    span_name: str,
+    labels: dict[str, str],
+    attributes: dict[str, Any] | None = None,
+) -> Iterator[Span]:
+    """Trace one upload step and record its duration in upload_step_latency."""
+    start = time.perf_counter()
+    try:
+        with tracer.start_as_current_span(span_name, attributes=attributes) as span:
+            yield span
+    finally:
+        upload_step_latency.labels(step=step, **labels).observe(time.perf_counter() - start)
+
+
+async def admit_upload(
+    x_priority: str | None = Header(None),
+    x_client_id: str | None = Header(None),
+) -> None:
+    """Reject uploads with 429 while the queue backlog exceeds their limit."""
+    decision = await admission.check(x_priority, x_client_id)
+    if decision.admitted:
+        return
+
+    log.warning(
+        "upload_rejected_backlog",
+        priority=decision.priority,
+        client_id=x_client_id,
+        queue_depth=decision.depth,
+        limit=decision.limit,
+        retry_after=decision.retry_after,
+    )
+    raise HTTPException(
+        status_code=429,
+        detail={
+            "error": {
+                "code": "QUEUE_BACKLOG",
+                "message": "Analysis queue is backlogged, retry later",
+                "details": {
+                    "queue_depth": decision.depth,
+                    "limit": decision.limit,
+                    "priority": decision.priority,
+                    "retry_after_seconds": decision.retry_after,
+                },
+            }
+        },
+        headers={"Retry-After": str(decision.retry_after)},
+    )
+
+
 @router.post(
     "/files",
     response_model=UploadResponse,
     status_code=201,
+    dependencies=[Depends(admit_upload)],
+    responses={429: {"description": "Queue backlogged; retry after Retry-After seconds"}},
     openapi_extra={
         "requestBody": {
             "content": {
@@ -55,22 +153,29 @@ async def upload_file(request: Request, db: AsyncSession = Depends(get_db)) -> U
     - Publishes job to RabbitMQ
     - Returns job_id immediately (async processing)
     """
+    request_span = trace.get_current_span()
+    # Metric labels, filled in once the body has been read
+    labels = {"size_bucket": "unknown", "mime_family": "unknown"}
     try:
-        # Parse multipart form manually to handle large files
-        form = await request.form()
-        file = form.get("file")
-
-        if file is None:
-            raise HTTPException(
-                status_code=422,
-                detail="No file field in form data",
-            )
-
-        # Read file content
-        content = await file.read()
-        file_size = len(content)
-        filename = getattr(file, "filename", "unknown")
-        content_type = getattr(file, "content_type", "application/octet-stream")
+        with _upload_step("read_body", "upload.read_body", labels) as span:
+            # Parse multipart form manually to handle large files
+            form = await request.form()
+            file = form.get("file")
+
+            if file is None:
+                raise HTTPException(
+                    status_code=422,
+                    detail="No file field in form data",
+                )
+
+            # Read file content
+            content = await file.read()
+            file_size = len(content)
+            filename = getattr(file, "filename", "unknown")
+            content_type = getattr(file, "content_type", "application/octet-stream")
+            span.set_attribute("file.size", file_size)
+            labels.update(size_bucket=size_bucket(file_size), mime_family=mime_family(content_type))
+        request_span.set_attributes({"file.size": file_size, "file.mime": content_type})
 
         log.info(
             "file_upload_started",
@@ -96,11 +201,18 @@ async def upload_file(request: Request, db: AsyncSession = Depends(get_db)) -> U
             )
 
         # Calculate hash
-        sha256_hash = hashlib.sha256(content).hexdigest()
+        with _upload_step("hash", "upload.hash", labels, {"file.size": file_size}):
+            sha256_hash = hashlib.sha256(content).hexdigest()
 
         # Store file in MinIO (use SHA256 as storage key)
         try:
-            await upload_to_minio(content, sha256_hash, content_type)
+            with _upload_step(
+                "storage_put",
+                "storage.put",
+                labels,
+                {"file.size": file_size, "file.mime": content_type},
+            ):
+                await upload_to_minio(content, sha256_hash, content_type)
         except Exception as e:
             log.error("minio_upload_failed", sha256=sha256_hash, error=str(e))
             raise HTTPException(
@@ -113,34 +225,37 @@ async def upload_file(request: Request, db: AsyncSession = Depends(get_db)) -> U
                 },
             ) from e
 
-        # Check for existing file by SHA256 (deduplication)
-        stmt = select(File).where(File.sha256 == sha256_hash)
-        result = await db.execute(stmt)
-        existing_file = result.scalar_one_or_none()
-
-        if existing_file:
-            file_record = existing_file
-            log.info("file_exists", file_id=str(file_record.id), sha256=sha256_hash)
-        else:
-            # Create new file record
-            file_record = File(
-                sha256=sha256_hash,
-                size=file_size,
-                filename=filename,
-                content_type=content_type,
+        with _upload_step("db", "db.create_job", labels) as span:
+            # Check for existing file by SHA256 (deduplication)
+            stmt = select(File).where(File.sha256 == sha256_hash)
+            result = await db.execute(stmt)
+            existing_file = result.scalar_one_or_none()
+
+            if existing_file:
+                file_record = existing_file
+                log.info("file_exists", file_id=str(file_record.id), sha256=sha256_hash)
+            else:
+                # Create new file record
+                file_record = File(
+                    sha256=sha256_hash,
+                    size=file_size,
+                    filename=filename,
+                    content_type=content_type,
+                )
+                db.add(file_record)
+                await db.flush()  # Get the file ID
+                log.info("file_created", file_id=str(file_record.id), sha256=sha256_hash)
+
+            # Create job record
+            job_record = Job(
+                file_id=file_record.id,
+                status=JobStatus.QUEUED.value,
+                stages_total=settings.stages_total,
             )
-            db.add(file_record)
-            await db.flush()  # Get the file ID
-            log.info("file_created", file_id=str(file_record.id), sha256=sha256_hash)
-
-        # Create job record
-        job_record = Job(
-            file_id=file_record.id,
-            status=JobStatus.QUEUED.value,
-            stages_total=settings.stages_total,
-        )
-        db.add(job_record)
-        await db.commit()
+            db.add(job_record)
+            await db.commit()
+            span.set_attribute("file.deduplicated", existing_file is not None)
+        request_span.set_attribute("job.id", str(job_record.id))
 
         log.info(
             "job_created",
@@ -158,9 +273,12 @@ async def upload_file(request: Request, db: AsyncSession = Depends(get_db)) -> U
             "storage_key": sha256_hash,
             "sha256": sha256_hash,
             "original_filename": filename,
+            "size": file_size,
+            "content_type": content_type,
         }
         try:
-            await publish_job(job_message)
+            with _upload_step("publish", "upload.publish", labels):
+                await publish_job(job_message)
         except Exception as e:
             log.error("rabbitmq_publish_failed", job_id=str(job_record.id), error=str(e))
             # Note: Job is already in DB, so we don't rollback. Worker can be triggered manually.
@@ -189,6 +307,381 @@ async def upload_file(request: Request, db: AsyncSession = Depends(get_db)) -> U
         ) from e
 
 
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@router.get("/jobs", response_model=JobListResponse)
+async def list_jobs(
+    status: Literal["queued", "scanning", "done", "failed"] | None = None,
+    verdict: Literal["clean", "suspicious", "malicious"] | None = None,
+    min_score: int | None = Query(None, ge=0, le=100),
+    max_score: int | None = Query(None, ge=0, le=100),
+    sha256: str | None = Query(
+        None, pattern="^[0-9a-fA-F]{4,64}$", description="SHA256 or a prefix of it"
+    ),
+    filename: str | None = Query(
+        None, min_length=3, max_length=255, description="Substring of the filename"
+    ),
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_db),
+) -> JobListResponse:
+    """
+    List jobs, newest first, with filters.
+
+    Pages are keyset paginated on (created_at, id): pass ``next_cursor`` back
+    as ``cursor`` to get the next page. Verdict and score are filtered on
+    their columns, not the report.
+    """
+    stmt = select(
+        Job.id,
+        Job.file_id,
+        Job.status,
+        Job.verdict,
+        Job.score,
+        Job.created_at,
+        Job.updated_at,
+        File.sha256,
+        File.filename,
+    ).join(File, File.id == Job.file_id)
+
+    if status is not None:
+        stmt = stmt.where(Job.status == status)
+    if verdict is not None:
+        stmt = stmt.where(Job.verdict == verdict)
+    if min_score is not None:
+        stmt = stmt.where(Job.score >= min_score)
+    if max_score is not None:
+        stmt = stmt.where(Job.score <= max_score)
+    if sha256 is not None:
+        stmt = stmt.where(File.sha256.like(f"{sha256.lower()}%"))
+    if filename is not None:
+        stmt = stmt.where(File.filename.ilike(f"%{_escape_like(filename)}%", escape="\\"))
+    if created_after is not None:
+        stmt = stmt.where(Job.created_at >= created_after)
+    if created_before is not None:
+        stmt = stmt.where(Job.created_at < created_before)
+    if cursor is not None:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from None
+        # The plain created_at bound lets the planner prune newer partitions;
+        # row comparisons are not used for partition pruning
+        stmt = stmt.where(
+            Job.created_at <= cursor_created_at,
+            tuple_(Job.created_at, Job.id)
+            < tuple_(
+                literal(cursor_created_at, Job.created_at.type), literal(cursor_id, Job.id.type)
+            ),
+        )
+
+    # One extra row tells whether there is a next page
+    stmt = stmt.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1)
+    rows = (await db.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return JobListResponse(
+        items=[
+            JobListItem(
+                job_id=str(row.id),
+                file_id=str(row.file_id),
+                sha256=row.sha256,
+                filename=row.filename,
+                status=row.status,
+                verdict=row.verdict,
+                score=row.score,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/iocs", response_model=IocPivotResponse)
+async def pivot_ioc(
+    kind: Literal["url", "domain", "ip"],
+    value: str = Query(..., min_length=1, max_length=2048),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_db),
+) -> IocPivotResponse:
+    """
+    List the jobs whose sample contained an indicator, newest first.
+
+    Served from the IOC index written by the worker; pages are keyset
+    paginated like GET /jobs.
+    """
+    value = value.strip()
+    if kind == "domain":
+        value = value.lower().rstrip(".")
+
+    ioc = (
+        await db.execute(select(Ioc).where(Ioc.kind == kind, Ioc.value == value))
+    ).scalar_one_or_none()
+    if ioc is None:
+        raise HTTPException(status_code=404, detail="Indicator not found")
+
+    stmt = (
+        select(
+            JobIoc.job_id,
+            JobIoc.file_id,
+            JobIoc.created_at,
+            Job.status,
+            Job.verdict,
+            Job.score,
+            File.sha256,
+            File.filename,
+        )
+        # A job is always created before it is linked: bounds the partitions probed
+        .join(Job, (Job.id == JobIoc.job_id) & (Job.created_at <= JobIoc.created_at))
+        .join(File, File.id == JobIoc.file_id)
+        .where(JobIoc.ioc_id == ioc.id)
+    )
+    if cursor is not None:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from None
+        stmt = stmt.where(
+            tuple_(JobIoc.created_at, JobIoc.job_id)
+            < tuple_(
+                literal(cursor_created_at, JobIoc.created_at.type),
+                literal(cursor_id, JobIoc.job_id.type),
+            )
+        )
+
+    stmt = stmt.order_by(JobIoc.created_at.desc(), JobIoc.job_id.desc()).limit(limit + 1)
+    rows = (await db.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].job_id)
+
+    return IocPivotResponse(
+        indicator=IocInfo(
+            kind=ioc.kind,
+            value=ioc.value,
+            job_count=ioc.job_count,
+            first_seen=ioc.first_seen,
+            last_seen=ioc.last_seen,
+        ),
+        jobs=[
+            IocJobItem(
+                job_id=str(row.job_id),
+                file_id=str(row.file_id),
+                sha256=row.sha256,
+                filename=row.filename,
+                status=row.status,
+                verdict=row.verdict,
+                score=row.score,
+                seen_at=row.created_at,
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/files/{sha256}/similar", response_model=SimilarSamplesResponse)
+async def get_similar_files(
+    sha256: str = Path(..., pattern=r"^[0-9a-fA-F]{64}$"),
+    limit: int = Query(10, ge=1, le=100),
+    min_similarity: float = Query(0.3, ge=0.0, le=1.0),
+    db: AsyncSession = Depends(get_db),
+) -> SimilarSamplesResponse:
+    """
+    List the analyzed samples most similar to a sample, most similar first.
+
+    Candidates are the samples sharing an LSH bucket with the sample's
+    similarity digest (read from the similarity_buckets primary key, most
+    shared bands first, at most similarity_max_candidates); they are ranked
+    by the similarity estimated from their signatures.
+    """
+    sha256 = sha256.lower()
+    sample = (
+        await db.execute(
+            select(
+                SampleSimilarity.file_id,
+                SampleSimilarity.signature,
+                SampleSimilarity.feature_count,
+            )
+            .join(File, File.id == SampleSimilarity.file_id)
+            .where(File.sha256 == sha256)
+        )
+    ).first()
+    if sample is None:
+        raise HTTPException(status_code=404, detail="No similarity digest for this file")
+
+    mine = aliased(SimilarityBucket)
+    other = aliased(SimilarityBucket)
+    bands = func.count().label("bands")
+    candidates = (
+        select(other.file_id, bands)
+        .select_from(mine)
+        .join(other, (other.band == mine.band) & (other.bucket == mine.bucket))
+        .where(mine.file_id == sample.file_id, other.file_id != sample.file_id)
+        .group_by(other.file_id)
+        .order_by(bands.desc())
+        .limit(settings.similarity_max_candidates)
+        .subquery()
+    )
+    rows = (
+        await db.execute(
+            select(
+                File.id,
+                File.sha256,
+                File.filename,
+                File.latest_job_id,
+                File.latest_verdict,
+                File.latest_score,
+                SampleSimilarity.signature,
+            )
+            .select_from(candidates)
+            .join(SampleSimilarity, SampleSimilarity.file_id == candidates.c.file_id)
+            .join(File, File.id == candidates.c.file_id)
+        )
+    ).all()
+
+    scored = [(estimate_similarity(sample.signature, row.signature), row) for row in rows]
+    scored = [(score, row) for score, row in scored if score >= min_similarity]
+    scored.sort(key=lambda item: (-item[0], item[1].sha256))
+
+    return SimilarSamplesResponse(
+        sha256=sha256,
+        features=sample.feature_count,
+        similar=[
+            SimilarSample(
+                file_id=str(row.id),
+                sha256=row.sha256,
+                filename=row.filename,
+                similarity=round(score, 3),
+                job_id=str(row.latest_job_id) if row.latest_job_id else None,
+                verdict=row.latest_verdict,
+                score=row.latest_score,
+            )
+            for score, row in scored[:limit]
+        ],
+    )
+
+
+# Hash length -> files column
+_HASH_TYPES = {32: "md5", 40: "sha1", 64: "sha256"}
+
+_HASH_COLUMNS = {"md5": File.md5, "sha1": File.sha1, "sha256": File.sha256}
+
+_NEVER = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _analyzed_at(row: Any) -> datetime:
+    return row.latest_analyzed_at or _NEVER
+
+
+@router.post(
+    "/lookup",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {"application/x-ndjson": {}},
+            "description": "One JSON object per line for each distinct hash, in request order",
+        }
+    },
+)
+async def lookup_hashes(
+    body: LookupRequest, db: AsyncSession = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Look up the latest verdict of many samples by SHA-256, SHA-1 or MD5.
+
+    Each line holds the hash, its type, whether the sample is known and, if
+    it has been analyzed, the latest job ID, verdict, score and analysis time.
+    Hashes are resolved in batches with one indexed query per batch against
+    the files table; reports are never read.
+    """
+    hashes = list(dict.fromkeys(body.hashes))
+    if len(hashes) > settings.lookup_max_hashes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.lookup_max_hashes} hashes per request",
+        )
+    log.info("hash_lookup_requested", count=len(hashes))
+    return StreamingResponse(_lookup_lines(db, hashes), media_type="application/x-ndjson")
+
+
+async def _lookup_batch(db: AsyncSession, batch: list[str]) -> dict[str, Any]:
+    """Files matching a batch of hashes, keyed by the requested hash."""
+    by_type: dict[str, list[str]] = {}
+    for value in batch:
+        by_type.setdefault(_HASH_TYPES[len(value)], []).append(value)
+
+    stmt = select(
+        File.sha256,
+        File.md5,
+        File.sha1,
+        File.latest_job_id,
+        File.latest_verdict,
+        File.latest_score,
+        File.latest_analyzed_at,
+    ).where(
+        or_(
+            *[
+                _HASH_COLUMNS[hash_type] == any_(literal(values, ARRAY(String)))
+                for hash_type, values in by_type.items()
+            ]
+        )
+    )
+    rows = (await db.execute(stmt)).all()
+
+    wanted = set(batch)
+    found: dict[str, Any] = {}
+    for row in rows:
+        for value in (row.sha256, row.md5, row.sha1):
+            if value not in wanted:
+                continue
+            # MD5/SHA-1 are not unique: keep the most recently analyzed sample
+            current = found.get(value)
+            if current is None or _analyzed_at(row) > _analyzed_at(current):
+                found[value] = row
+    return found
+
+
+async def _lookup_lines(db: AsyncSession, hashes: list[str]) -> AsyncIterator[bytes]:
+    """NDJSON lines for a hash lookup, one chunk per batch."""
+    for start in range(0, len(hashes), settings.lookup_batch_size):
+        batch = hashes[start : start + settings.lookup_batch_size]
+        found = await _lookup_batch(db, batch)
+        lines = []
+        for value in batch:
+            row = found.get(value)
+            item: dict[str, Any] = {
+                "hash": value,
+                "type": _HASH_TYPES[len(value)],
+                "found": row is not None,
+            }
+            if row is not None:
+                item.update(
+                    sha256=row.sha256,
+                    job_id=str(row.latest_job_id) if row.latest_job_id else None,
+                    verdict=row.latest_verdict,
+                    score=row.latest_score,
+                    analyzed_at=(
+                        row.latest_analyzed_at.isoformat() if row.latest_analyzed_at else None
+                    ),
+                )
+            lines.append(json.dumps(item))
+        yield ("\n".join(lines) + "\n").encode()
+
+
 @router.get("/jobs/{job_id}", response_model=JobStatusResponse)
 async def get_job_status(job_id: str, db: AsyncSession = Depends(get_db)) -> JobStatusResponse:
     """
@@ -229,14 +722,30 @@ async def get_job_status(job_id: str, db: AsyncSession = Depends(get_db)) -> Job
     )
 
 
-@router.get("/reports/{job_id}", response_model=ReportResponse)
-async def get_report(job_id: str, db: AsyncSession = Depends(get_db)) -> dict[str, Any]:
+@router.get(
+    "/reports/{job_id}",
+    response_model=ReportResponse,
+    responses={200: {"description": "Full report, summary (view=summary) or selected fields"}},
+)
+async def get_report(
+    job_id: str,
+    fields: str | None = Query(
+        None,
+        description="Comma-separated report paths to return, e.g. verdict,score,results.av_result",
+    ),
+    view: Literal["full", "summary"] = Query("full", description="summary: verdict, score, counts"),
+    db: AsyncSession = Depends(get_db),
+) -> Any:
     """
     Get the analysis report for a completed job.
 
     Returns full report including AV results, YARA hits, IOCs, and timings.
+    Large reports are stored compressed in object storage and streamed back
+    as is. With ``fields`` only the selected paths are extracted (in SQL);
+    with ``view=summary`` only verdict, score, file identity and finding
+    counts are returned.
     """
-    log.info("report_requested", job_id=job_id)
+    log.info("report_requested", job_id=job_id, view=view, fields=fields)
 
     # Parse job_id to UUID
     try:
@@ -244,6 +753,18 @@ async def get_report(job_id: str, db: AsyncSession = Depends(get_db)) -> dict[st
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid job_id format") from None
 
+    if fields is not None:
+        if view != "full":
+            raise HTTPException(status_code=400, detail="fields cannot be combined with view")
+        try:
+            paths = parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from None
+        return await _get_report_fields(db, job_uuid, paths)
+
+    if view == "summary":
+        return await _get_report_summary(db, job_uuid)
+
     # Query job from database
     stmt = select(Job).where(Job.id == job_uuid)
     result = await db.execute(stmt)
@@ -263,7 +784,84 @@ async def get_report(job_id: str, db: AsyncSession = Depends(get_db)) -> dict[st
     if job.result is None:
         raise HTTPException(status_code=404, detail="Report not available yet")
 
+    # Offloaded report: stream it from object storage
+    ref = job.result.get("report_ref")
+    if ref:
+        try:
+            with tracer.start_as_current_span(
+                "storage.get_report", attributes={"report.size": ref.get("size", 0)}
+            ):
+                chunks = await open_report(ref, job.created_at.isoformat())
+        except S3Error as e:
+            log.error("report_object_missing", job_id=job_id, key=ref.get("key"), error=str(e))
+            raise HTTPException(status_code=404, detail="Report not available") from None
+        return StreamingResponse(chunks, media_type="application/json")
+
     # Return stored result with created_at
     report = dict(job.result)
     report["created_at"] = job.created_at.isoformat()
     return report
+
+
+def _check_report_available(row: Any) -> None:
+    """Raise the same errors as the full report for a projected row."""
+    if row is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if row.status != JobStatus.DONE.value:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Job not completed. Current status: {row.status}",
+        )
+    if not row.has_result:
+        raise HTTPException(status_code=404, detail="Report not available yet")
+
+
+async def _get_report_summary(db: AsyncSession, job_uuid: uuid.UUID) -> JSONResponse:
+    """Summary view of a report, extracted in SQL."""
+    stmt = select(
+        Job.status,
+        Job.created_at,
+        Job.result.isnot(None).label("has_result"),
+        summary_expression().label("summary"),
+    ).where(Job.id == job_uuid)
+    row = (await db.execute(stmt)).one_or_none()
+    _check_report_available(row)
+
+    summary = ReportSummaryResponse(job_id=str(job_uuid), created_at=row.created_at, **row.summary)
+    return JSONResponse(summary.model_dump(mode="json"))
+
+
+async def _get_report_fields(
+    db: AsyncSession, job_uuid: uuid.UUID, paths: list[tuple[str, ...]]
+) -> JSONResponse:
+    """Selected report paths, extracted in SQL.
+
+    Offloaded reports only keep their summary in the row; paths that are not
+    in it are read from the report object.
+    """
+    report_paths = [path for path in paths if path != ("created_at",)]
+    stmt = select(
+        Job.status,
+        Job.created_at,
+        Job.result.isnot(None).label("has_result"),
+        Job.result["report_ref"].label("report_ref"),
+        *[field_expression(path).label(f"f{i}") for i, path in enumerate(report_paths)],
+    ).where(Job.id == job_uuid)
+    row = (await db.execute(stmt)).one_or_none()
+    _check_report_available(row)
+
+    values = [getattr(row, f"f{i}") for i in range(len(report_paths))]
+    if row.report_ref and any(value is None for value in values):
+        try:
+            report = await read_report(row.report_ref)
+        except S3Error as e:
+            log.error("report_object_missing", job_id=str(job_uuid), error=str(e))
+            raise HTTPException(status_code=404, detail="Report not available") from None
+        values = [get_path(report, path) for path in report_paths]
+
+    projected: dict[str, Any] = {"job_id": str(job_uuid)}
+    for path, value in zip(report_paths, values, strict=True):
+        set_path(projected, path, value)
+    if ("created_at",) in paths:
+        projected["created_at"] = row.created_at.isoformat()
+    return JSONResponse(projected)
@@ -0,0 +1,16 @@
+"""Comparison of the similarity digests written by the worker.
+
+A digest is a MinHash signature stored as little-endian uint32 components;
+the fraction of equal components estimates the Jaccard similarity of the
+two samples' content-defined chunks. Only equality is tested, so components
+are compared in native byte order without decoding.
+"""
+
+
+def estimate_similarity(a: bytes, b: bytes) -> float:
+    """Estimated similarity (0.0 to 1.0) of the samples behind two signatures."""
+    if len(a) != len(b) or len(a) < 4 or len(a) % 4:
+        return 0.0
+    left = memoryview(a).cast("I")
+    right = memoryview(b).cast("I")
+    return sum(x == y for x, y in zip(left, right, strict=True)) / len(left)
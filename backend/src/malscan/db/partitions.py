@@ -0,0 +1,268 @@
+"""Monthly range partitions of the jobs table and their retention.
+
+``jobs`` is partitioned by ``created_at`` into ``jobs_yYYYYmMM`` partitions
+covering one calendar month, plus ``jobs_default`` for rows outside every
+range (it should stay empty). Maintenance:
+
+- ``ensure_partitions`` creates the partitions from last month through
+  ``jobs_partition_premake_months`` months ahead; it runs on API startup.
+- ``apply_retention`` detaches partitions older than
+  ``jobs_retention_months`` and drops them (``jobs_retention_action=drop``)
+  or moves them to the ``jobs_archive`` schema (``archive``) for offloading.
+  Checkpoints and IOC links of the detached jobs are deleted first, since
+  they cannot reference a partitioned table by foreign key, and files whose
+  latest analysis was detached point at their newest remaining one instead.
+
+Run both periodically with:
+
+    python -m malscan.db.partitions maintain [--dry-run]
+
+All maintenance takes a transaction-level advisory lock so concurrent API
+replicas and the CronJob do not race on DDL.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+from datetime import date, datetime, timezone
+from typing import Any
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from malscan.config import get_settings
+from malscan.db.engine import get_engine
+
+log = structlog.get_logger()
+settings = get_settings()
+
+ARCHIVE_SCHEMA = "jobs_archive"
+
+# Arbitrary constant identifying the partition maintenance advisory lock
+_LOCK_KEY = 0x6A6F6273
+
+_PARTITION_NAME = re.compile(r"^jobs_y(\d{4})m(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month ``months`` after ``month``."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(moment: datetime) -> date:
+    """First day of the month containing moment."""
+    return date(moment.year, moment.month, 1)
+
+
+def partition_name(month: date) -> str:
+    """Name of the partition holding a month."""
+    return f"jobs_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> date | None:
+    """Month held by a partition, or None if name is not a monthly partition."""
+    match = _PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+async def _lock(conn: AsyncConnection) -> None:
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+
+
+async def list_partitions(conn: AsyncConnection) -> list[str]:
+    """Names of the partitions currently attached to jobs."""
+    rows = await conn.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'jobs'
+            ORDER BY c.relname
+            """
+        )
+    )
+    return [row.relname for row in rows]
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    """Whether the jobs table is partitioned (migration applied)."""
+    result = await conn.execute(
+        text(
+            """
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = 'jobs'
+            """
+        )
+    )
+    return result.first() is not None
+
+
+async def ensure_partitions(conn: AsyncConnection, now: datetime | None = None) -> list[str]:
+    """Create missing monthly partitions and the default partition.
+
+    Returns:
+        Names of the partitions created.
+    """
+    await _lock(conn)
+    current = month_start(now or datetime.now(timezone.utc))
+    existing = set(await list_partitions(conn))
+    created = []
+
+    for offset in range(-1, settings.jobs_partition_premake_months + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        upper = add_months(month, 1)
+        await conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF jobs "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+        created.append(name)
+
+    if "jobs_default" not in existing:
+        await conn.execute(
+            text("CREATE TABLE IF NOT EXISTS jobs_default PARTITION OF jobs DEFAULT")
+        )
+        created.append("jobs_default")
+
+    if created:
+        log.info("job_partitions_created", partitions=created)
+    return created
+
+
+async def expired_partitions(conn: AsyncConnection, now: datetime | None = None) -> list[str]:
+    """Attached monthly partitions entirely older than the retention period."""
+    if settings.jobs_retention_months <= 0:
+        return []
+    cutoff = add_months(
+        month_start(now or datetime.now(timezone.utc)), -settings.jobs_retention_months
+    )
+    expired = []
+    for name in await list_partitions(conn):
+        month = partition_month(name)
+        if month is not None and add_months(month, 1) <= cutoff:
+            expired.append(name)
+    return expired
+
+
+async def _release_partition(conn: AsyncConnection, name: str) -> dict[str, int]:
+    """Detach a partition and delete or repoint the rows that reference its jobs."""
+    await conn.execute(text(f"ALTER TABLE jobs DETACH PARTITION {name}"))
+
+    # Newest completed job still in jobs, or NULLs if the file has none left
+    files = await conn.execute(
+        text(
+            f"""
+            UPDATE files f
+            SET latest_job_id = j.id,
+                latest_verdict = j.verdict,
+                latest_score = j.score,
+                latest_analyzed_at = j.updated_at
+            FROM files s
+            LEFT JOIN LATERAL (
+                SELECT id, verdict, score, updated_at
+                FROM jobs
+                WHERE file_id = s.id AND status = 'done' AND verdict IS NOT NULL
+                ORDER BY updated_at DESC
+                LIMIT 1
+            ) j ON true
+            WHERE f.id = s.id AND s.latest_job_id IN (SELECT id FROM {name})
+            """
+        )
+    )
+
+    await conn.execute(
+        text(
+            f"""
+            UPDATE iocs i
+            SET job_count = GREATEST(i.job_count - c.links, 0)
+            FROM (
+                SELECT ioc_id, count(*) AS links
+                FROM job_iocs
+                WHERE job_id IN (SELECT id FROM {name})
+                GROUP BY ioc_id
+            ) c
+            WHERE i.id = c.ioc_id
+            """
+        )
+    )
+    links = await conn.execute(
+        text(f"DELETE FROM job_iocs WHERE job_id IN (SELECT id FROM {name})")
+    )
+    checkpoints = await conn.execute(
+        text(f"DELETE FROM job_checkpoints WHERE job_id IN (SELECT id FROM {name})")
+    )
+    return {
+        "ioc_links": links.rowcount,
+        "checkpoints": checkpoints.rowcount,
+        "latest_files": files.rowcount,
+    }
+
+
+async def apply_retention(conn: AsyncConnection, now: datetime | None = None) -> list[str]:
+    """Detach expired partitions, then drop or archive them.
+
+    Returns:
+        Names of the partitions removed from jobs.
+    """
+    await _lock(conn)
+    action = settings.jobs_retention_action
+    expired = await expired_partitions(conn, now)
+
+    for name in expired:
+        deleted = await _release_partition(conn, name)
+        if action == "archive":
+            await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+            await conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        else:
+            await conn.execute(text(f"DROP TABLE {name}"))
+        log.info("job_partition_retired", partition=name, action=action, **deleted)
+
+    return expired
+
+
+async def run_maintenance(dry_run: bool = False) -> dict[str, Any]:
+    """Create upcoming partitions and retire expired ones."""
+    engine = get_engine()
+    async with engine.begin() as conn:
+        if not await is_partitioned(conn):
+            log.warning("jobs_table_not_partitioned")
+            return {"partitioned": False}
+        if dry_run:
+            return {
+                "partitioned": True,
+                "partitions": await list_partitions(conn),
+                "expired": await expired_partitions(conn),
+            }
+        created = await ensure_partitions(conn)
+        retired = await apply_retention(conn)
+    return {"partitioned": True, "created": created, "retired": retired}
+
+
+def main() -> None:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Maintain jobs table partitions")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    maintain_parser = subparsers.add_parser(
+        "maintain", help="Create upcoming partitions and apply retention"
+    )
+    maintain_parser.add_argument("--dry-run", action="store_true")
+
+    args = parser.parse_args()
+    result = asyncio.run(run_maintenance(args.dry_run))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
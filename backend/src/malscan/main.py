@@ -4,9 +4,12 @@ import structlog
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
+from sqlalchemy import text
 
+from malscan.admission import admission
 from malscan.api.routes import router
 from malscan.config import get_settings
+from malscan.tracing import configure_tracing, trace_requests
 
 # Configure structlog
 structlog.configure(
@@ -19,6 +22,7 @@ structlog.configure(
 
 settings = get_settings()
 log = structlog.get_logger()
+tracer_provider = configure_tracing("malscan-api")
 
 # Increase max request body size for file uploads (50MB)
 MAX_REQUEST_BODY_SIZE = 50 * 1024 * 1024  # 50MB
@@ -38,6 +42,9 @@ else:
 # Prometheus metrics (add BEFORE CORS so CORS middleware runs first)
 Instrumentator().instrument(app).expose(app, endpoint="/metrics")
 
+# Request spans (per-route sampling, trace context from incoming headers)
+app.middleware("http")(trace_requests)
+
 # CORS middleware (added last = runs first in middleware chain)
 app.add_middleware(
     CORSMiddleware,
@@ -73,15 +80,23 @@ async def startup_event() -> None:
 
     # Auto-create database tables if they don't exist
     from malscan.db.engine import get_engine
+    from malscan.db.partitions import ensure_partitions, is_partitioned
     from malscan.models import Base
 
     engine = get_engine()
     async with engine.begin() as conn:
+        # ix_files_filename_trgm uses the trigram operator class
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
+        if await is_partitioned(conn):
+            await ensure_partitions(conn)
     log.info("database_tables_ready")
 
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
     """Application shutdown."""
+    await admission.close()
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
     log.info("application_shutdown")
@@ -0,0 +1,101 @@
+"""Prometheus metrics for upload handling (beyond the generic HTTP metrics)."""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+upload_step_latency = Histogram(
+    "malscan_api_upload_step_seconds",
+    "Duration of each step of handling an upload",
+    ["step", "size_bucket", "mime_family"],  # read_body, hash, storage_put, db, publish
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30],
+)
+
+# Upload admission control (see malscan.admission)
+admission_rejections = Counter(
+    "malscan_api_admission_rejections_total",
+    "Uploads rejected with 429 because the queue backlog exceeded their limit",
+    ["priority", "client"],  # client is "-" unless it has its own limit
+)
+
+admission_open = Gauge(
+    "malscan_api_admission_open",
+    "Whether uploads of a priority are currently admitted (1) or shed (0)",
+    ["priority"],
+)
+
+admission_refresh_failures = Counter(
+    "malscan_api_admission_refresh_failures_total",
+    "Failed reads of the queue signals; uploads are admitted while they fail",
+    ["source"],  # management, amqp
+)
+
+admission_queue_depth = Gauge(
+    "malscan_api_admission_queue_depth",
+    "Main queue depth last seen by admission control",
+)
+
+admission_throughput = Gauge(
+    "malscan_api_admission_throughput_per_second",
+    "Queue drain rate last seen by admission control",
+)
+
+# Upper bounds (exclusive) of the file-size label buckets (same as the worker)
+_SIZE_BUCKETS = [
+    (64 * 1024, "lt_64k"),
+    (1024 * 1024, "lt_1m"),
+    (10 * 1024 * 1024, "lt_10m"),
+]
+
+# MIME family by exact type, then by prefix (same as the worker's filetype stage)
+_MIME_FAMILIES = {
+    "application/x-dosexec": "pe",
+    "application/vnd.microsoft.portable-executable": "pe",
+    "application/x-msdownload": "pe",
+    "application/x-executable": "elf",
+    "application/x-sharedlib": "elf",
+    "application/x-pie-executable": "elf",
+    "application/x-mach-binary": "macho",
+    "application/pdf": "document",
+    "application/msword": "document",
+    "application/rtf": "document",
+    "application/zip": "archive",
+    "application/x-rar": "archive",
+    "application/x-7z-compressed": "archive",
+    "application/gzip": "archive",
+    "application/x-tar": "archive",
+    "application/java-archive": "archive",
+    "application/javascript": "script",
+    "application/x-shellscript": "script",
+    "text/x-python": "script",
+    "text/x-shellscript": "script",
+    "text/x-msdos-batch": "script",
+}
+_MIME_PREFIX_FAMILIES = [
+    ("application/vnd.openxmlformats-officedocument", "document"),
+    ("application/vnd.ms-", "document"),
+    ("application/vnd.oasis.opendocument", "document"),
+    ("image/", "image"),
+    ("text/", "text"),
+]
+
+
+def size_bucket(size: int | None) -> str:
+    """File-size label for latency metrics."""
+    if size is None or size < 0:
+        return "unknown"
+    for bound, label in _SIZE_BUCKETS:
+        if size < bound:
+            return label
+    return "ge_10m"
+
+
+def mime_family(mime_type: str | None) -> str:
+    """Coarse file class of a client-supplied MIME type."""
+    if not mime_type:
+        return "unknown"
+    mime_type = mime_type.split(";", 1)[0].strip().lower()
+    if mime_type in _MIME_FAMILIES:
+        return _MIME_FAMILIES[mime_type]
+    for prefix, family in _MIME_PREFIX_FAMILIES:
+        if mime_type.startswith(prefix):
+            return family
+    return "other"
@@ -1,7 +1,20 @@
 """Models package."""
 
 from malscan.models.base import Base
+from malscan.models.checkpoint import JobCheckpoint
 from malscan.models.file import File
+from malscan.models.ioc import Ioc, JobIoc
 from malscan.models.job import Job, JobStatus
+from malscan.models.similarity import SampleSimilarity, SimilarityBucket
 
-__all__ = ["Base", "File", "Job", "JobStatus"]
+__all__ = [
+    "Base",
+    "File",
+    "Ioc",
+    "Job",
+    "JobCheckpoint",
+    "JobIoc",
+    "JobStatus",
+    "SampleSimilarity",
+    "SimilarityBucket",
+]
@@ -0,0 +1,30 @@
+"""Job checkpoint model for resuming pipelines from the last completed stage."""
+
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from malscan.models.base import Base
+
+
+class JobCheckpoint(Base):
+    """Result of a completed pipeline stage, written by the worker.
+
+    A retried job reuses checkpoints whose ``stage_version`` still matches the
+    worker's stage implementation and only re-runs the remaining stages.
+    """
+
+    __tablename__ = "job_checkpoints"
+
+    # No foreign key: jobs is partitioned and jobs.id alone is not unique;
+    # checkpoints of retired partitions are deleted by partition maintenance
+    job_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    stage_name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    stage_version: Mapped[str] = mapped_column(String(100), nullable=False)
+    result: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+    )
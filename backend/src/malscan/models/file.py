@@ -3,7 +3,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import DateTime, Integer, String
+from sqlalchemy import DateTime, Index, Integer, SmallInteger, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -14,15 +14,38 @@ class File(Base):
     """Represents an uploaded file, deduplicated by SHA256 hash."""
 
     __tablename__ = "files"
+    __table_args__ = (
+        # sha256 prefix search (LIKE 'abc%') regardless of the database collation
+        Index(
+            "ix_files_sha256_pattern", "sha256", postgresql_ops={"sha256": "varchar_pattern_ops"}
+        ),
+        # Filename substring search (ILIKE '%abc%'), needs the pg_trgm extension
+        Index(
+            "ix_files_filename_trgm",
+            "filename",
+            postgresql_using="gin",
+            postgresql_ops={"filename": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     sha256: Mapped[str] = mapped_column(String(64), unique=True, nullable=False, index=True)
+    # Filled in by the worker when the first analysis completes
+    md5: Mapped[str | None] = mapped_column(String(32), nullable=True, index=True)
+    sha1: Mapped[str | None] = mapped_column(String(40), nullable=True, index=True)
     size: Mapped[int] = mapped_column(Integer, nullable=False)
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
     content_type: Mapped[str] = mapped_column(String(100), nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
     )
+    # Most recent completed analysis, written with the job result (hash lookups)
+    latest_job_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
+    latest_verdict: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    latest_score: Mapped[int | None] = mapped_column(SmallInteger, nullable=True)
+    latest_analyzed_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
 
     # Relationship to jobs
     jobs: Mapped[list["Job"]] = relationship("Job", back_populates="file")  # noqa: F821
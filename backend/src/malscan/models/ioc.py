@@ -0,0 +1,55 @@
+"""IOC index models for pivoting from an indicator to the jobs that contain it."""
+
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from malscan.models.base import Base
+
+
+class Ioc(Base):
+    """A distinct indicator (URL, domain or IP), written by the worker.
+
+    ``job_count`` is maintained on insert of new job links so pivots can
+    report counts without counting rows.
+    """
+
+    __tablename__ = "iocs"
+    __table_args__ = (Index("ux_iocs_kind_value", "kind", "value", unique=True),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(10), nullable=False)  # url, domain, ip
+    value: Mapped[str] = mapped_column(Text, nullable=False)
+    job_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    first_seen: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+    )
+    last_seen: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+    )
+
+
+class JobIoc(Base):
+    """Association of an indicator with a job that contained it."""
+
+    __tablename__ = "job_iocs"
+    __table_args__ = (
+        # Pivot: jobs of an indicator, newest first, keyset paginated
+        Index("ix_job_iocs_ioc_created_at_job", "ioc_id", "created_at", "job_id"),
+        Index("ix_job_iocs_job_id", "job_id"),
+    )
+
+    ioc_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("iocs.id", ondelete="CASCADE"), primary_key=True
+    )
+    # No foreign key to the partitioned jobs table (see JobCheckpoint)
+    job_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    file_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+    )
@@ -4,7 +4,7 @@ import uuid
 from datetime import datetime, timezone
 from enum import Enum
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, SmallInteger, String, Text, text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -24,21 +24,49 @@ class Job(Base):
     """Represents a malware analysis job."""
 
     __tablename__ = "jobs"
+    __table_args__ = (
+        # Job listing: newest first, keyset paginated on (created_at, id)
+        Index("ix_jobs_created_at_id", "created_at", "id"),
+        Index("ix_jobs_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_jobs_verdict_created_at_id", "verdict", "created_at", "id"),
+        Index("ix_jobs_score_created_at_id", "score", "created_at", "id"),
+        # Lease reaper: expired leases of running jobs
+        Index(
+            "ix_jobs_lease_expires_at",
+            "lease_expires_at",
+            postgresql_where=text("status = 'scanning'"),
+        ),
+        # Monthly partitions, see malscan.db.partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     file_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), ForeignKey("files.id"), nullable=False, index=True
     )
-    status: Mapped[str] = mapped_column(
-        String(20), nullable=False, default=JobStatus.QUEUED.value, index=True
-    )
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default=JobStatus.QUEUED.value)
     current_stage: Mapped[str | None] = mapped_column(String(50), nullable=True)
     stages_done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
-    stages_total: Mapped[int] = mapped_column(Integer, nullable=False, default=5)
+    stages_total: Mapped[int] = mapped_column(Integer, nullable=False, default=7)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
     result: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    # Copied from the result by the worker so jobs can be filtered without JSONB
+    verdict: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    score: Mapped[int | None] = mapped_column(SmallInteger, nullable=True)
+    # Worker lease, renewed while the job runs (see the worker's lease reaper)
+    lease_owner: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    attempts: Mapped[int] = mapped_column(
+        SmallInteger, nullable=False, default=0, server_default="0"
+    )
+    # Partition key, so it is part of the primary key
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+        primary_key=True,
     )
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -0,0 +1,56 @@
+"""Similarity index models for near-duplicate lookup."""
+
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+    String,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from malscan.models.base import Base
+
+
+class SampleSimilarity(Base):
+    """Similarity digest of an analyzed sample, written by the worker.
+
+    ``signature`` is a MinHash signature (128 little-endian uint32) of the
+    sample's content-defined chunks; the fraction of equal components
+    estimates the similarity of two samples.
+    """
+
+    __tablename__ = "sample_similarity"
+
+    file_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), primary_key=True
+    )
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    signature: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    feature_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+    )
+
+
+class SimilarityBucket(Base):
+    """LSH bucket of one band of a sample's signature.
+
+    Samples sharing a (band, bucket) pair are near-duplicate candidates.
+    """
+
+    __tablename__ = "similarity_buckets"
+    __table_args__ = (Index("ix_similarity_buckets_file_id", "file_id"),)
+
+    band: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    bucket: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    file_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), primary_key=True
+    )
@@ -2,10 +2,13 @@
 
 import json
 import logging
+import time
+from datetime import datetime, timezone
 from typing import Any
 
 import aio_pika
 import structlog
+from opentelemetry.trace import SpanKind
 from tenacity import (
     before_sleep_log,
     retry,
@@ -15,6 +18,7 @@ from tenacity import (
 )
 
 from malscan.config import get_settings
+from malscan.tracing import inject_trace_headers, tracer
 
 log = structlog.get_logger()
 settings = get_settings()
@@ -54,6 +58,19 @@ async def publish_job(job_data: dict[str, Any]) -> None:
     Raises:
         Exception: If publishing fails after all retries.
     """
+    with tracer.start_as_current_span(
+        "queue.publish",
+        kind=SpanKind.PRODUCER,
+        attributes={
+            "messaging.system": "rabbitmq",
+            "messaging.destination.name": settings.rabbitmq_queue,
+            "job.id": str(job_data.get("job_id")),
+        },
+    ):
+        await _publish(job_data)
+
+
+async def _publish(job_data: dict[str, Any]) -> None:
     connection = await aio_pika.connect_robust(settings.rabbitmq_url)
 
     async with connection:
@@ -71,10 +88,15 @@ async def publish_job(job_data: dict[str, Any]) -> None:
 
         # Prepare message
         message_body = json.dumps(job_data).encode()
+        # Trace context (child of queue.publish) and precise publish time
+        headers = inject_trace_headers({"x-published-at": time.time()})
         message = aio_pika.Message(
             body=message_body,
+            headers=headers,
             delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
             content_type="application/json",
+            # Publish time, used by the worker's queue monitor for oldest-message age
+            timestamp=datetime.now(timezone.utc),
         )
 
         # Publish to default exchange with queue name as routing key
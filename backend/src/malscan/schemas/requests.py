@@ -1,9 +1,9 @@
 """Pydantic schemas for API requests and responses."""
 
 from datetime import datetime
-from typing import Literal
+from typing import Annotated, Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, StringConstraints
 
 
 class UploadResponse(BaseModel):
@@ -35,6 +35,94 @@ class JobStatusResponse(BaseModel):
     error_message: str | None
 
 
+class JobListItem(BaseModel):
+    """Job entry in GET /jobs."""
+
+    job_id: str
+    file_id: str
+    sha256: str
+    filename: str
+    status: Literal["queued", "scanning", "done", "failed"]
+    verdict: str | None
+    score: int | None
+    created_at: datetime
+    updated_at: datetime
+
+
+class JobListResponse(BaseModel):
+    """Response for GET /jobs."""
+
+    items: list[JobListItem]
+    next_cursor: str | None
+
+
+class IocInfo(BaseModel):
+    """Indicator in GET /iocs."""
+
+    kind: Literal["url", "domain", "ip"]
+    value: str
+    job_count: int
+    first_seen: datetime
+    last_seen: datetime
+
+
+class IocJobItem(BaseModel):
+    """Job containing an indicator."""
+
+    job_id: str
+    file_id: str
+    sha256: str
+    filename: str
+    status: Literal["queued", "scanning", "done", "failed"]
+    verdict: str | None
+    score: int | None
+    seen_at: datetime
+
+
+class IocPivotResponse(BaseModel):
+    """Response for GET /iocs."""
+
+    indicator: IocInfo
+    jobs: list[IocJobItem]
+    next_cursor: str | None
+
+
+HashValue = Annotated[
+    str,
+    StringConstraints(
+        strip_whitespace=True,
+        to_lower=True,
+        pattern=r"^(?:[0-9a-fA-F]{32}|[0-9a-fA-F]{40}|[0-9a-fA-F]{64})$",
+    ),
+]
+
+
+class LookupRequest(BaseModel):
+    """Request for POST /lookup: SHA-256, SHA-1 or MD5 hashes."""
+
+    hashes: list[HashValue]
+
+
+class SimilarSample(BaseModel):
+    """Previously analyzed sample similar to the requested one."""
+
+    file_id: str
+    sha256: str
+    filename: str
+    similarity: float
+    job_id: str | None
+    verdict: str | None
+    score: int | None
+
+
+class SimilarSamplesResponse(BaseModel):
+    """Response for GET /files/{sha256}/similar."""
+
+    sha256: str
+    features: int
+    similar: list[SimilarSample]
+
+
 class FileMetadata(BaseModel):
     """File metadata in report."""
 
@@ -107,12 +195,61 @@ class SandboxResult(BaseModel):
     is_mock: bool
 
 
+class HighEntropyRegion(BaseModel):
+    """Byte range of consecutive high-entropy windows."""
+
+    offset: int
+    length: int
+    mean_entropy: float
+    max_entropy: float
+
+
+class EntropyResult(BaseModel):
+    """Entropy and byte statistics of the sample."""
+
+    entropy: float
+    chi_square: float
+    unique_bytes: int
+    printable_ratio: float
+    null_ratio: float
+    byte_histogram: list[int]
+    window_bytes: int
+    min_window_entropy: float | None
+    max_window_entropy: float | None
+    high_entropy_ratio: float
+    high_entropy_regions_total: int
+    high_entropy_regions: list[HighEntropyRegion]
+    profile: list[float]
+
+
+class SimilarityMatch(BaseModel):
+    """Near-duplicate found when the sample was analyzed."""
+
+    file_id: str
+    sha256: str
+    similarity: float
+    verdict: str | None
+
+
+class SimilarityResult(BaseModel):
+    """Near-duplicate lookup result."""
+
+    features: int
+    similar: list[SimilarityMatch]
+
+
 class AnalysisResults(BaseModel):
     """All analysis results."""
 
     av_result: AvResult
     yara_hits: list[YaraHit]
+    yara_quarantined: list[str] = []
+    # Version of the YARA ruleset used; absent from older reports
+    yara_ruleset: str | None = None
     iocs: Iocs
+    # Absent from reports written before these stages existed
+    entropy: EntropyResult | None = None
+    similarity: SimilarityResult | None = None
     sandbox: SandboxResult
 
 
@@ -143,6 +280,46 @@ class ReportResponse(BaseModel):
     created_at: datetime
 
 
+class SummaryFile(BaseModel):
+    """File identity in a report summary."""
+
+    sha256: str | None = None
+    md5: str | None = None
+    sha1: str | None = None
+    mime: str | None = None
+    size: int | None = None
+
+
+class SummaryAv(BaseModel):
+    """AV outcome in a report summary."""
+
+    infected: bool | None = False
+    threat_name: str | None = None
+
+
+class ReportCounts(BaseModel):
+    """Finding counts in a report summary."""
+
+    yara_hits: int = 0
+    urls: int = 0
+    domains: int = 0
+    ips: int = 0
+    sandbox_behaviors: int = 0
+    network_connections: int = 0
+
+
+class ReportSummaryResponse(BaseModel):
+    """Response for GET /reports/{job_id}?view=summary."""
+
+    job_id: str
+    verdict: str
+    score: int
+    file: SummaryFile
+    av: SummaryAv
+    counts: ReportCounts
+    created_at: datetime
+
+
 class ApiError(BaseModel):
     """API error response."""
 
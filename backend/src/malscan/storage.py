@@ -1,11 +1,15 @@
-"""MinIO storage client for file upload operations."""
+"""MinIO storage client for file uploads and offloaded reports."""
 
 import asyncio
+import json
+from collections.abc import Iterator
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from io import BytesIO
+from typing import Any
 
 import structlog
+import zstandard
 from minio import Minio
 from minio.commonconfig import Filter
 from minio.error import S3Error
@@ -119,3 +123,108 @@ async def upload_file(
         _executor,
         partial(_upload_file_sync, content, key, content_type),
     )
+
+
+# Read size when streaming offloaded reports
+_REPORT_CHUNK_SIZE = 64 * 1024
+
+
+def _open_object_sync(bucket: str, key: str) -> Any:
+    """Open an object for streaming (caller closes and releases it)."""
+    client = _get_minio_client()
+    return client.get_object(bucket, key)
+
+
+def _stream_report(response: Any, encoding: str, created_at: str) -> Iterator[bytes]:
+    """Yield an offloaded report's JSON with created_at added as its first key.
+
+    The report is decompressed incrementally and never parsed, so memory use
+    is bounded by the chunk size regardless of the report size.
+    """
+    try:
+        if encoding == "zstd":
+            chunks = zstandard.ZstdDecompressor().read_to_iter(
+                response, read_size=_REPORT_CHUNK_SIZE
+            )
+        else:
+            chunks = response.stream(_REPORT_CHUNK_SIZE)
+
+        prefix = b'{"created_at":' + json.dumps(created_at).encode()
+        pending = b""
+        for chunk in chunks:
+            if prefix:
+                # Splice the prefix in after the opening brace of the report
+                pending += chunk
+                body = pending.lstrip()
+                if len(body) < 2:
+                    continue
+                if not body.startswith(b"{"):
+                    raise ValueError("offloaded report is not a JSON object")
+                rest = body[1:].lstrip()
+                yield prefix + (b"" if rest.startswith(b"}") else b",") + rest
+                prefix = b""
+                continue
+            yield chunk
+        if prefix:
+            raise ValueError("offloaded report is empty")
+    finally:
+        response.close()
+        response.release_conn()
+
+
+async def open_report(ref: dict[str, Any], created_at: str) -> Iterator[bytes]:
+    """Open an offloaded report for streaming.
+
+    The object is opened before returning so a missing object is reported to
+    the caller; the returned iterator is synchronous and should be consumed
+    off the event loop (StreamingResponse does this).
+
+    Args:
+        ref: The report_ref stored in the job result.
+        created_at: Job creation time to include in the report.
+
+    Returns:
+        Iterator over the report's JSON bytes.
+
+    Raises:
+        S3Error: If the object cannot be opened.
+    """
+    loop = asyncio.get_event_loop()
+    response = await loop.run_in_executor(
+        _executor,
+        partial(_open_object_sync, ref.get("bucket", settings.minio_bucket_artifacts), ref["key"]),
+    )
+    return _stream_report(response, ref.get("encoding", "zstd"), created_at)
+
+
+def _read_report_sync(ref: dict[str, Any]) -> dict[str, Any]:
+    """Download and decode a whole offloaded report."""
+    response = _open_object_sync(ref.get("bucket", settings.minio_bucket_artifacts), ref["key"])
+    try:
+        data = response.read()
+    finally:
+        response.close()
+        response.release_conn()
+    if ref.get("encoding", "zstd") == "zstd":
+        data = zstandard.ZstdDecompressor().decompress(data)
+    report: dict[str, Any] = json.loads(data)
+    return report
+
+
+async def read_report(ref: dict[str, Any]) -> dict[str, Any]:
+    """Load an offloaded report into memory.
+
+    Used when only some fields of a report are needed but they are not in the
+    row's summary; prefer open_report for returning a whole report.
+
+    Args:
+        ref: The report_ref stored in the job result.
+
+    Returns:
+        The decoded report.
+
+    Raises:
+        S3Error: If the object cannot be read.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(_executor, partial(_read_report_sync, ref))
@@ -0,0 +1,172 @@
+"""OpenTelemetry tracing setup, per-route sampling and request spans.
+
+Trace context is propagated to the worker in the RabbitMQ message headers
+(W3C ``traceparent``/``tracestate``), so an upload, the queue publish, the
+broker wait and every worker step end up in one trace.
+
+Tracing is off unless ``tracing_exporter`` is set:
+
+- ``file``: one JSON span per line appended to ``tracing_file_path``
+  (a local stand-in for a collector),
+- ``otlp``: OTLP/HTTP to ``otlp_endpoint``,
+- ``console``: spans printed to stdout.
+"""
+
+import json
+import threading
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import structlog
+from fastapi import Request, Response
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import (
+    ParentBased,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from opentelemetry.util.types import Attributes
+from starlette.routing import Match
+
+from malscan.config import get_settings
+
+log = structlog.get_logger()
+settings = get_settings()
+
+tracer = trace.get_tracer("malscan.api")
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = [json.dumps(json.loads(span.to_json())) + "\n" for span in spans]
+        try:
+            with self._lock, self.path.open("a", encoding="utf-8") as f:
+                f.writelines(lines)
+        except OSError as e:
+            log.error("trace_export_failed", path=str(self.path), error=str(e))
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+class RouteSampler(Sampler):
+    """Root sampler with a sampling ratio per HTTP route template.
+
+    Spans without an ``http.route`` attribute (or with an unlisted route) use
+    the default ratio.
+    """
+
+    def __init__(self, rates: Mapping[str, float], default: float) -> None:
+        self._default = TraceIdRatioBased(default)
+        self._samplers = {route: TraceIdRatioBased(rate) for route, rate in rates.items()}
+
+    def should_sample(
+        self,
+        parent_context: context.Context | None,
+        trace_id: int,
+        name: str,
+        kind: SpanKind | None = None,
+        attributes: Attributes = None,
+        links: Sequence[trace.Link] | None = None,
+        trace_state: trace.TraceState | None = None,
+    ) -> SamplingResult:
+        route = (attributes or {}).get("http.route")
+        sampler = self._samplers.get(str(route), self._default) if route else self._default
+        return sampler.should_sample(
+            parent_context, trace_id, name, kind, attributes, links, trace_state
+        )
+
+    def get_description(self) -> str:
+        return f"RouteSampler(routes={len(self._samplers)})"
+
+
+def _build_exporter() -> SpanExporter | None:
+    if settings.tracing_exporter == "file":
+        return JsonLinesSpanExporter(settings.tracing_file_path)
+    if settings.tracing_exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=settings.otlp_endpoint)
+    if settings.tracing_exporter == "console":
+        return ConsoleSpanExporter()
+    return None
+
+
+def configure_tracing(service_name: str) -> TracerProvider | None:
+    """Install the global tracer provider.
+
+    Returns:
+        The provider (to flush on shutdown), or None if tracing is disabled.
+    """
+    exporter = _build_exporter()
+    if exporter is None:
+        return None
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(
+            RouteSampler(settings.tracing_route_sample_rates, settings.tracing_sample_rate)
+        ),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    log.info(
+        "tracing_configured",
+        exporter=settings.tracing_exporter,
+        sample_rate=settings.tracing_sample_rate,
+    )
+    return provider
+
+
+def inject_trace_headers(headers: dict[str, Any]) -> dict[str, Any]:
+    """Add the current trace context to message headers."""
+    propagate.inject(headers)
+    return headers
+
+
+def _route_template(request: Request) -> str:
+    """Route template of a request (e.g. /api/v1/jobs/{job_id})."""
+    for route in request.app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return str(getattr(route, "path", request.url.path))
+    return "unmatched"
+
+
+async def trace_requests(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    """HTTP middleware creating a server span per request."""
+    route = _route_template(request)
+    parent = propagate.extract(dict(request.headers))
+
+    with tracer.start_as_current_span(
+        f"{request.method} {route}",
+        context=parent,
+        kind=SpanKind.SERVER,
+        attributes={"http.method": request.method, "http.route": route},
+    ) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status(Status(StatusCode.ERROR))
+        return response
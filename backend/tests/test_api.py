@@ -1,9 +1,16 @@
 """Integration tests for API endpoints."""
 
+import io
+import json
 import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
+import zstandard
 from fastapi.testclient import TestClient
+from malscan.admission import QueueSignals
+from malscan.api.pagination import decode_cursor
 from malscan.models import JobStatus
 
 
@@ -125,6 +132,43 @@ def test_get_report_success(client: TestClient, mock_db_session: AsyncMock):
     assert "created_at" in data
 
 
+def test_get_report_streams_offloaded_report(
+    client: TestClient, mock_db_session: AsyncMock, mocker
+):
+    """Test that an offloaded report is decompressed and returned with created_at."""
+    job_id = uuid.uuid4()
+    report = {
+        "job_id": str(job_id),
+        "verdict": "suspicious",
+        "score": 60,
+        "results": {"yara_hits": [{"rule": f"rule_{i}"} for i in range(5000)]},
+    }
+    compressed = zstandard.ZstdCompressor().compress(json.dumps(report).encode())
+
+    class FakeObject(io.BytesIO):
+        def release_conn(self) -> None:
+            pass
+
+    mocker.patch("malscan.storage._open_object_sync", return_value=FakeObject(compressed))
+
+    mock_job = MagicMock()
+    mock_job.status = JobStatus.DONE.value
+    mock_job.result = {
+        "job_id": str(job_id),
+        "summary": {"verdict": "suspicious", "score": 60},
+        "report_ref": {"bucket": "artifacts", "key": f"{job_id}/report.json.zst"},
+    }
+    mock_job.created_at.isoformat.return_value = "2023-01-01T00:00:00Z"
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = mock_job
+    mock_db_session.execute.return_value = mock_result
+
+    response = client.get(f"/api/v1/reports/{job_id}")
+
+    assert response.status_code == 200
+    assert response.json() == {**report, "created_at": "2023-01-01T00:00:00Z"}
+
+
 def test_get_report_not_completed(client: TestClient, mock_db_session: AsyncMock):
     """Test getting report for in-progress job."""
     job_id = uuid.uuid4()
@@ -142,3 +186,279 @@ def test_get_report_not_completed(client: TestClient, mock_db_session: AsyncMock
     response = client.get(f"/api/v1/reports/{job_id}")
 
     assert response.status_code == 400
+
+
+def test_get_report_summary_view(client: TestClient, mock_db_session: AsyncMock):
+    """Test that view=summary returns the summary extracted in SQL."""
+    job_id = uuid.uuid4()
+    mock_result = MagicMock()
+    mock_result.one_or_none.return_value = SimpleNamespace(
+        status=JobStatus.DONE.value,
+        created_at=datetime(2023, 1, 1, tzinfo=timezone.utc),
+        has_result=True,
+        summary={
+            "verdict": "malicious",
+            "score": 90,
+            "file": {"sha256": "abc", "mime": "application/x-dosexec", "size": 10},
+            "av": {"infected": True, "threat_name": "Eicar"},
+            "counts": {"yara_hits": 2},
+        },
+    )
+    mock_db_session.execute.return_value = mock_result
+
+    response = client.get(f"/api/v1/reports/{job_id}?view=summary")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["verdict"] == "malicious"
+    assert data["counts"]["yara_hits"] == 2
+    assert data["counts"]["urls"] == 0
+    assert "results" not in data
+
+
+def test_get_report_fields_projection(client: TestClient, mock_db_session: AsyncMock):
+    """Test that selected fields are returned as a nested object."""
+    job_id = uuid.uuid4()
+    mock_result = MagicMock()
+    mock_result.one_or_none.return_value = SimpleNamespace(
+        status=JobStatus.DONE.value,
+        created_at=datetime(2023, 1, 1, tzinfo=timezone.utc),
+        has_result=True,
+        report_ref=None,
+        f0="clean",
+        f1={"engine": "ClamAV", "infected": False, "threat_name": None},
+    )
+    mock_db_session.execute.return_value = mock_result
+
+    response = client.get(f"/api/v1/reports/{job_id}?fields=verdict,results.av_result,created_at")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "job_id": str(job_id),
+        "verdict": "clean",
+        "results": {"av_result": {"engine": "ClamAV", "infected": False, "threat_name": None}},
+        "created_at": "2023-01-01T00:00:00+00:00",
+    }
+
+
+def test_get_report_fields_reads_file_from_offloaded_report(
+    client: TestClient, mock_db_session: AsyncMock, mocker
+):
+    """Test that fields=file on an offloaded report comes from the object, not the summary."""
+    job_id = uuid.uuid4()
+    report = {
+        "job_id": str(job_id),
+        "verdict": "clean",
+        "file": {"sha256": "abc", "mime": "application/pdf", "size": 10, "filename": "a.pdf"},
+    }
+    read_report = mocker.patch("malscan.api.routes.read_report", return_value=report)
+    mock_result = MagicMock()
+    mock_result.one_or_none.return_value = SimpleNamespace(
+        status=JobStatus.DONE.value,
+        created_at=datetime(2023, 1, 1, tzinfo=timezone.utc),
+        has_result=True,
+        report_ref={"bucket": "artifacts", "key": f"{job_id}/report.json.zst"},
+        f0=None,
+    )
+    mock_db_session.execute.return_value = mock_result
+
+    response = client.get(f"/api/v1/reports/{job_id}?fields=file")
+
+    assert response.status_code == 200
+    assert response.json() == {"job_id": str(job_id), "file": report["file"]}
+    read_report.assert_awaited_once()
+
+
+def test_get_report_fields_rejects_unknown_field(client: TestClient):
+    """Test that fields outside the report are rejected."""
+    response = client.get(f"/api/v1/reports/{uuid.uuid4()}?fields=verdict,password")
+
+    assert response.status_code == 400
+
+
+def _job_row(created_at: datetime) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        file_id=uuid.uuid4(),
+        status=JobStatus.DONE.value,
+        verdict="malicious",
+        score=90,
+        created_at=created_at,
+        updated_at=created_at,
+        sha256="ab" * 32,
+        filename="invoice.exe",
+    )
+
+
+def test_list_jobs_returns_next_cursor(client: TestClient, mock_db_session: AsyncMock):
+    """Test that a full page returns a cursor pointing after its last item."""
+    rows = [_job_row(datetime(2024, 1, 3 - i, tzinfo=timezone.utc)) for i in range(3)]
+    mock_result = MagicMock()
+    mock_result.all.return_value = rows
+    mock_db_session.execute.return_value = mock_result
+
+    response = client.get("/api/v1/jobs?verdict=malicious&min_score=50&limit=2")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["job_id"] for item in data["items"]] == [str(rows[0].id), str(rows[1].id)]
+    assert decode_cursor(data["next_cursor"]) == (rows[1].created_at, rows[1].id)
+
+
+def test_list_jobs_last_page(client: TestClient, mock_db_session: AsyncMock):
+    """Test that the last page has no cursor."""
+    mock_result = MagicMock()
+    mock_result.all.return_value = [_job_row(datetime(2024, 1, 1, tzinfo=timezone.utc))]
+    mock_db_session.execute.return_value = mock_result
+
+    response = client.get("/api/v1/jobs?sha256=abab&limit=2")
+
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+
+
+def test_list_jobs_rejects_invalid_cursor(client: TestClient):
+    """Test that a malformed cursor is rejected."""
+    response = client.get("/api/v1/jobs?cursor=not-a-cursor")
+
+    assert response.status_code == 400
+
+
+def test_pivot_ioc_lists_jobs(client: TestClient, mock_db_session: AsyncMock):
+    """Test that an indicator pivot returns its jobs and counts."""
+    seen = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    ioc = SimpleNamespace(
+        id=1, kind="domain", value="evil.example", job_count=3, first_seen=seen, last_seen=seen
+    )
+    job = _job_row(seen)
+    ioc_result = MagicMock()
+    ioc_result.scalar_one_or_none.return_value = ioc
+    jobs_result = MagicMock()
+    jobs_result.all.return_value = [
+        SimpleNamespace(job_id=job.id, **{k: v for k, v in vars(job).items() if k != "id"})
+    ]
+    mock_db_session.execute.side_effect = [ioc_result, jobs_result]
+
+    response = client.get("/api/v1/iocs?kind=domain&value=Evil.Example.")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["indicator"]["job_count"] == 3
+    assert data["jobs"][0]["job_id"] == str(job.id)
+    assert data["next_cursor"] is None
+
+
+def test_pivot_ioc_not_found(client: TestClient, mock_db_session: AsyncMock):
+    """Test that an unknown indicator returns 404."""
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = None
+    mock_db_session.execute.return_value = mock_result
+
+    response = client.get("/api/v1/iocs?kind=ip&value=1.2.3.4")
+
+    assert response.status_code == 404
+
+
+def test_lookup_hashes_streams_ndjson(client: TestClient, mock_db_session: AsyncMock):
+    """Test that each distinct hash gets one NDJSON line in request order."""
+    sha256 = "ab" * 32
+    md5 = "cd" * 16
+    job_id = uuid.uuid4()
+    analyzed_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    mock_result = MagicMock()
+    mock_result.all.return_value = [
+        SimpleNamespace(
+            sha256=sha256,
+            md5=md5,
+            sha1=None,
+            latest_job_id=job_id,
+            latest_verdict="malicious",
+            latest_score=90,
+            latest_analyzed_at=analyzed_at,
+        )
+    ]
+    mock_db_session.execute.return_value = mock_result
+
+    response = client.post("/api/v1/lookup", json={"hashes": [md5.upper(), "ef" * 20, sha256, md5]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["hash"] for line in lines] == [md5, "ef" * 20, sha256]
+    assert lines[0]["type"] == "md5"
+    assert lines[0]["sha256"] == sha256
+    assert lines[0]["job_id"] == str(job_id)
+    assert lines[1] == {"hash": "ef" * 20, "type": "sha1", "found": False}
+    assert lines[2]["verdict"] == "malicious"
+
+
+def test_lookup_hashes_rejects_invalid_hash(client: TestClient):
+    """Test that values that are not MD5, SHA-1 or SHA-256 are rejected."""
+    response = client.post("/api/v1/lookup", json={"hashes": ["xyz"]})
+
+    assert response.status_code == 422
+
+
+def test_similar_files_ranked_by_similarity(client: TestClient, mock_db_session: AsyncMock):
+    """Test that bucket candidates are ranked by signature similarity and filtered."""
+    signature = bytes(range(128)) * 4
+    near = signature[:400] + bytes(112)  # 100 of 128 components equal
+    far = bytes(512)
+    sample_result = MagicMock()
+    sample_result.first.return_value = SimpleNamespace(
+        file_id=uuid.uuid4(), signature=signature, feature_count=42
+    )
+    candidates_result = MagicMock()
+    candidates_result.all.return_value = [
+        SimpleNamespace(
+            id=uuid.uuid4(),
+            sha256=sha256,
+            filename="sample.exe",
+            latest_job_id=None,
+            latest_verdict="malicious",
+            latest_score=90,
+            signature=candidate,
+        )
+        for sha256, candidate in (("aa" * 32, far), ("bb" * 32, near))
+    ]
+    mock_db_session.execute.side_effect = [sample_result, candidates_result]
+
+    response = client.get(f"/api/v1/files/{'CD' * 32}/similar")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["sha256"] == "cd" * 32
+    assert data["features"] == 42
+    assert [item["sha256"] for item in data["similar"]] == ["bb" * 32]
+    assert data["similar"][0]["similarity"] == round(100 / 128, 3)
+
+
+def test_similar_files_not_indexed(client: TestClient, mock_db_session: AsyncMock):
+    """Test that a file without a similarity digest returns 404."""
+    mock_result = MagicMock()
+    mock_result.first.return_value = None
+    mock_db_session.execute.return_value = mock_result
+
+    response = client.get(f"/api/v1/files/{'ab' * 32}/similar")
+
+    assert response.status_code == 404
+
+
+def test_upload_rejected_while_queue_backlogged(
+    client: TestClient, mocker, mock_minio, mock_rabbitmq
+):
+    """Test that uploads get 429 with Retry-After once the backlog exceeds their limit."""
+    mocker.patch(
+        "malscan.admission.admission.signals",
+        new_callable=AsyncMock,
+        return_value=QueueSignals(depth=2600, consumers=2, throughput=4.0, sampled_at=0.0),
+    )
+
+    files = {"file": ("test.txt", b"test content", "text/plain")}
+    response = client.post("/api/v1/files", files=files, headers={"X-Priority": "low"})
+
+    assert response.status_code == 429
+    # (2600 - 2000 + 1) jobs at 4 jobs/s
+    assert response.headers["Retry-After"] == "151"
+    assert response.json()["detail"]["error"]["code"] == "QUEUE_BACKLOG"
+    mock_minio.assert_not_awaited()
@@ -0,0 +1,41 @@
+"""Tests for the upload metric labels."""
+
+import ast
+from pathlib import Path
+
+import pytest
+from malscan import metrics
+from malscan.metrics import mime_family, size_bucket
+
+WORKER_SRC = Path(__file__).resolve().parents[2] / "worker" / "src" / "malscan_worker"
+
+
+def _worker_table(path: Path, name: str) -> object:
+    """Value of a module-level constant in the worker source, without importing it."""
+    if not path.exists():
+        pytest.skip("worker source not available")
+    for node in ast.parse(path.read_text()).body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == name for target in node.targets
+        ):
+            return eval(compile(ast.Expression(node.value), str(path), "eval"))  # noqa: S307
+    raise AssertionError(f"{name} not found in {path}")
+
+
+def test_labels_match_worker():
+    """Test that API and worker latency series label files the same way."""
+    assert metrics._SIZE_BUCKETS == _worker_table(WORKER_SRC / "metrics.py", "_SIZE_BUCKETS")
+    filetype = WORKER_SRC / "stages" / "filetype.py"
+    assert metrics._MIME_FAMILIES == _worker_table(filetype, "_MIME_FAMILIES")
+    assert metrics._MIME_PREFIX_FAMILIES == _worker_table(filetype, "_MIME_PREFIX_FAMILIES")
+
+
+def test_label_functions():
+    """Test size and MIME family labels."""
+    assert size_bucket(None) == "unknown"
+    assert size_bucket(1024) == "lt_64k"
+    assert size_bucket(64 * 1024 * 1024) == "ge_10m"
+    assert mime_family("application/x-pie-executable") == "elf"
+    assert mime_family("text/plain; charset=us-ascii") == "text"
+    assert mime_family("application/octet-stream") == "other"
+    assert mime_family(None) == "unknown"
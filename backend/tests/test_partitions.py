@@ -0,0 +1,65 @@
+"""Tests for jobs table partition maintenance."""
+
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from malscan.db.partitions import (
+    add_months,
+    apply_retention,
+    expired_partitions,
+    partition_month,
+    partition_name,
+)
+
+
+def test_add_months_crosses_years():
+    """Test month arithmetic across year boundaries."""
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -13) == date(2024, 12, 1)
+
+
+def test_partition_month_round_trip():
+    """Test that partition names map back to their month."""
+    assert partition_month(partition_name(date(2026, 3, 1))) == date(2026, 3, 1)
+    assert partition_month("jobs_default") is None
+
+
+@pytest.mark.asyncio
+async def test_expired_partitions_respects_retention(monkeypatch):
+    """Test that only months entirely before the retention window expire."""
+    monkeypatch.setattr("malscan.db.partitions.settings.jobs_retention_months", 12)
+    names = ["jobs_default", "jobs_y2025m09", "jobs_y2025m10", "jobs_y2025m11", "jobs_y2026m10"]
+    conn = AsyncMock()
+    conn.execute.return_value = [SimpleNamespace(relname=name) for name in names]
+
+    expired = await expired_partitions(conn, datetime(2026, 10, 19, tzinfo=timezone.utc))
+
+    assert expired == ["jobs_y2025m09"]
+
+
+@pytest.mark.asyncio
+async def test_apply_retention_repoints_latest_file_analysis(monkeypatch):
+    """Test that files pointing at dropped jobs are repointed before the drop."""
+    monkeypatch.setattr("malscan.db.partitions.settings.jobs_retention_months", 12)
+    monkeypatch.setattr("malscan.db.partitions.settings.jobs_retention_action", "drop")
+    statements: list[str] = []
+
+    async def execute(statement, params=None):
+        statements.append(str(statement))
+        if "pg_inherits" in str(statement):
+            return [SimpleNamespace(relname="jobs_y2025m09")]
+        return SimpleNamespace(rowcount=1)
+
+    conn = AsyncMock()
+    conn.execute.side_effect = execute
+
+    retired = await apply_retention(conn, datetime(2026, 10, 19, tzinfo=timezone.utc))
+
+    assert retired == ["jobs_y2025m09"]
+    repoint = next(i for i, sql in enumerate(statements) if "UPDATE files" in sql)
+    assert "latest_job_id IN (SELECT id FROM jobs_y2025m09)" in statements[repoint]
+    detach = next(i for i, sql in enumerate(statements) if "DETACH PARTITION" in sql)
+    drop = statements.index("DROP TABLE jobs_y2025m09")
+    assert detach < repoint < drop
@@ -0,0 +1,27 @@
+"""Tests for report field parsing."""
+
+import pytest
+from malscan.api.projection import field_expression, parse_fields
+from sqlalchemy.dialects import postgresql
+
+
+def test_parse_fields_drops_nested_paths():
+    """Test that paths under another requested path are selected once."""
+    assert parse_fields("results, results.iocs, verdict,verdict") == [("results",), ("verdict",)]
+
+
+@pytest.mark.parametrize("fields", ["", "secrets", "results.iocs'--", "a.b.c.d.e.f.g"])
+def test_parse_fields_rejects_invalid(fields):
+    """Test that empty, unknown and malformed paths are rejected."""
+    with pytest.raises(ValueError):
+        parse_fields(fields)
+
+
+@pytest.mark.parametrize(
+    ("path", "from_summary"),
+    [(("verdict",), True), (("score",), True), (("file",), False), (("file", "sha256"), False)],
+)
+def test_field_expression_summary_fallback(path, from_summary):
+    """Test that only paths the summary holds in full fall back to it."""
+    sql = str(field_expression(path).compile(dialect=postgresql.dialect()))
+    assert ("coalesce" in sql.lower()) is from_summary
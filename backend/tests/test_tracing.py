@@ -0,0 +1,38 @@
+"""Tests for tracing sampling and export."""
+
+import json
+
+from malscan.tracing import JsonLinesSpanExporter, RouteSampler
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.sampling import Decision
+
+
+def test_route_sampler_uses_per_route_rate():
+    """Test that listed routes use their own rate and others the default."""
+    sampler = RouteSampler({"/health": 0.0}, default=1.0)
+
+    health = sampler.should_sample(None, 1234, "GET /health", attributes={"http.route": "/health"})
+    upload = sampler.should_sample(
+        None, 1234, "POST /api/v1/files", attributes={"http.route": "/api/v1/files"}
+    )
+
+    assert health.decision == Decision.DROP
+    assert upload.decision == Decision.RECORD_AND_SAMPLE
+
+
+def test_json_lines_exporter_writes_spans(tmp_path):
+    """Test that finished spans are appended as JSON lines."""
+    path = tmp_path / "traces.jsonl"
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(JsonLinesSpanExporter(str(path))))
+    tracer = provider.get_tracer("test")
+
+    with tracer.start_as_current_span("parent"):
+        with tracer.start_as_current_span("child", attributes={"file.size": 42}):
+            pass
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["child", "parent"]
+    assert spans[0]["attributes"]["file.size"] == 42
+    assert spans[0]["parent_id"] == spans[1]["context"]["span_id"]
@@ -45,9 +45,11 @@ export default function JobStatusPage() {
 
     const stageLabels: Record<string, string> = {
         'file-type': 'FILE_TYPE_DETECT',
+        entropy: 'ENTROPY_PROFILE',
         clamav: 'CLAMAV_SCAN',
         yara: 'YARA_MATCH',
         'ioc-extract': 'IOC_EXTRACT',
+        similarity: 'SIMILARITY_LOOKUP',
         sandbox: 'SANDBOX_ANALYZE',
     }
 
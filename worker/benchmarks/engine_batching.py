@@ -0,0 +1,172 @@
+"""Benchmark engine micro-batching against per-file invocations.
+
+Samples arrive as a Poisson process at each of the given rates and are
+scanned through an ``EngineBatcher``, at most ``--concurrency`` at a time
+(the worker's job limit), once with batching and once with ``max_files=1``
+(one invocation per sample). Reports throughput, latency and the mean batch
+size per arrival rate.
+
+Engines:
+    fake   A stand-in clamscan that spends ``--startup-ms`` of CPU (signature
+           load) plus ``--per-file-ms`` per file; runs anywhere.
+    clamav clamscan at CLAMSCAN_PATH.
+    yara   yara with the first rule file in YARA_RULES_PATH.
+
+Usage:
+    python benchmarks/engine_batching.py [--engine fake|clamav|yara]
+        [--rates 2,10,40,200] [--samples N] [--concurrency N]
+        [--max-files N] [--window-ms N] [--startup-ms N] [--per-file-ms N]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import structlog
+from malscan_worker.batching import EngineBatcher
+from malscan_worker.config import get_settings
+from malscan_worker.stages import clamav
+from malscan_worker.stages.yara_scan import YaraStage, rule_files
+
+settings = get_settings()
+
+_FAKE_CLAMSCAN = """#!{python}
+import sys, time
+
+def burn(seconds):
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+burn({startup})
+for path in sys.argv[1:]:
+    if not path.startswith("-"):
+        burn({per_file})
+        print(path + ": OK")
+"""
+
+
+def fake_clamscan(directory: Path, startup_ms: float, per_file_ms: float) -> Path:
+    """Executable mimicking clamscan's output and fixed startup cost."""
+    path = directory / "fake-clamscan"
+    path.write_text(
+        _FAKE_CLAMSCAN.format(
+            python=sys.executable, startup=startup_ms / 1000, per_file=per_file_ms / 1000
+        )
+    )
+    path.chmod(0o755)
+    return path
+
+
+async def run_rate(
+    scan: Callable[[list[Path]], Awaitable[dict[Path, Any]]],
+    samples: list[Path],
+    rate: float,
+    concurrency: int,
+    max_files: int,
+    window_seconds: float,
+) -> dict[str, float]:
+    """Scan samples arriving at rate per second; throughput and latencies."""
+    sizes: list[int] = []
+
+    async def counted(paths: list[Path]) -> dict[Path, Any]:
+        sizes.append(len(paths))
+        return await scan(paths)
+
+    batcher = EngineBatcher("benchmark", counted, max_files, window_seconds)
+    limit = asyncio.Semaphore(concurrency)
+    rng = random.Random(0)
+    latencies: list[float] = []
+
+    async def job(path: Path) -> None:
+        arrived = time.perf_counter()
+        async with limit:
+            await batcher.submit(path)
+        latencies.append(time.perf_counter() - arrived)
+
+    started = time.perf_counter()
+    tasks = []
+    for path in samples:
+        tasks.append(asyncio.create_task(job(path)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput": len(samples) / elapsed,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "batch": statistics.mean(sizes),
+        "invocations": len(sizes),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark engine micro-batching")
+    parser.add_argument("--engine", choices=["fake", "clamav", "yara"], default="fake")
+    parser.add_argument("--rates", default="2,10,40,200", help="Arrivals per second")
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=settings.concurrency_max)
+    parser.add_argument("--max-files", type=int, default=16)
+    parser.add_argument("--window-ms", type=float, default=50)
+    parser.add_argument("--startup-ms", type=float, default=200)
+    parser.add_argument("--per-file-ms", type=float, default=2)
+    args = parser.parse_args()
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        samples = []
+        for i in range(args.samples):
+            path = Path(tmp) / f"sample-{i:04d}.bin"
+            path.write_bytes(os.urandom(64 * 1024))
+            samples.append(path)
+
+        scan: Callable[[list[Path]], Awaitable[dict[Path, Any]]]
+        if args.engine == "yara":
+            stage = YaraStage()
+            await stage.warm_up()
+            rule_file = sorted(rule_files(stage.rules_path))[0]
+
+            async def scan(paths: list[Path]) -> dict[Path, Any]:
+                return await stage._scan_rule_file(rule_file, paths)
+
+        else:
+            if args.engine == "fake":
+                settings.clamscan_path = str(
+                    fake_clamscan(Path(tmp), args.startup_ms, args.per_file_ms)
+                )
+            scan = clamav.scan_files
+
+        print(
+            f"{'rate/s':>7}{'mode':>9}{'files/s':>9}{'mean ms':>9}{'p95 ms':>9}"
+            f"{'batch':>7}{'calls':>7}"
+        )
+        for rate in (float(value) for value in args.rates.split(",")):
+            for mode, max_files in (("per-file", 1), ("batched", args.max_files)):
+                result = await run_rate(
+                    scan,
+                    samples,
+                    rate,
+                    args.concurrency,
+                    max_files,
+                    args.window_ms / 1000,
+                )
+                print(
+                    f"{rate:>7g}{mode:>9}{result['throughput']:>9.1f}{result['mean_ms']:>9.0f}"
+                    f"{result['p95_ms']:>9.0f}{result['batch']:>7.1f}"
+                    f"{result['invocations']:>7.0f}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
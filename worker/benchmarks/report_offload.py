@@ -0,0 +1,179 @@
+"""Benchmark inline vs offloaded report storage.
+
+Builds synthetic reports of increasing size and reports, per size:
+
+- the ``jobs.result`` payload stored inline and with offloading,
+- the zstd-compressed object size and compression time,
+- the time to serve the report: JSON parse + re-encode of the inline row (what
+  the API does today) vs streaming decompression of the object. Neither
+  includes the network round trip to Postgres or MinIO.
+
+With ``--database-url`` (asyncpg DSN) it also writes both forms to a temporary
+table and reports ``pg_column_size`` (after TOAST compression) and the time to
+fetch one row.
+
+Usage:
+    python benchmarks/report_offload.py [--iterations N] [--database-url DSN]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+import zstandard
+from malscan_worker.reports import build_summary, compress_report, encode_report
+
+# (label, yara hits, strings per hit, sandbox behaviors, urls)
+SIZES = [
+    ("small", 2, 4, 10, 5),
+    ("medium", 50, 20, 200, 100),
+    ("large", 400, 50, 2000, 1000),
+    ("huge", 2000, 100, 10000, 5000),
+]
+
+
+def synthetic_report(hits: int, strings: int, behaviors: int, urls: int) -> dict[str, Any]:
+    """A report shaped like the pipeline's output."""
+    return {
+        "job_id": "00000000-0000-0000-0000-000000000000",
+        "file": {"sha256": "ab" * 32, "mime": "application/x-dosexec", "size": 1 << 20},
+        "verdict": "suspicious",
+        "score": 80,
+        "results": {
+            "av_result": {"engine": "ClamAV", "infected": False, "threat_name": None},
+            "yara_hits": [
+                {
+                    "rule": f"Suspicious_Rule_{i}",
+                    "tags": ["packer", "loader"],
+                    "strings": [
+                        {"identifier": f"$s{j}", "offset": i * 997 + j, "data": f"{i:08x}{j:08x}"}
+                        for j in range(strings)
+                    ],
+                }
+                for i in range(hits)
+            ],
+            "iocs": {
+                "urls": [f"http://host{i}.example.test/path/{i}" for i in range(urls)],
+                "domains": [f"host{i}.example.test" for i in range(urls // 2)],
+                "ips": [f"10.{i // 256 % 256}.{i % 256}.1" for i in range(urls // 4)],
+            },
+            "sandbox": {
+                "executed": True,
+                "behaviors": [
+                    {"type": "file_write", "path": f"C:\\Users\\x\\AppData\\{i}.tmp"}
+                    for i in range(behaviors)
+                ],
+                "network_connections": [],
+            },
+        },
+        "timings": {"total_ms": 1234, "stages": []},
+    }
+
+
+def median_seconds(func: Callable[[], Any], iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def serve_inline(row_text: str) -> None:
+    report = json.loads(row_text)
+    report["created_at"] = "2024-01-01T00:00:00+00:00"
+    json.dumps(report).encode()
+
+
+def serve_offloaded(compressed: bytes) -> None:
+    decompressor = zstandard.ZstdDecompressor()
+    for _ in decompressor.read_to_iter(compressed, read_size=64 * 1024):
+        pass
+
+
+async def measure_postgres(dsn: str, rows: list[tuple[str, str, str]]) -> dict[str, Any]:
+    """pg_column_size and fetch latency of inline and offloaded rows."""
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute("CREATE TEMP TABLE bench_reports (label text, form text, result jsonb)")
+        for label, inline, offloaded in rows:
+            await conn.executemany(
+                "INSERT INTO bench_reports VALUES ($1, $2, $3::jsonb)",
+                [(label, "inline", inline), (label, "offloaded", offloaded)],
+            )
+        results: dict[str, Any] = {}
+        for label, _, _ in rows:
+            for form in ("inline", "offloaded"):
+                size = await conn.fetchval(
+                    "SELECT pg_column_size(result) FROM bench_reports "
+                    "WHERE label = $1 AND form = $2",
+                    label,
+                    form,
+                )
+                start = time.perf_counter()
+                for _ in range(20):
+                    await conn.fetchval(
+                        "SELECT result::text FROM bench_reports WHERE label = $1 AND form = $2",
+                        label,
+                        form,
+                    )
+                fetch_ms = (time.perf_counter() - start) / 20 * 1000
+                results[f"{label}.{form}"] = {
+                    "pg_column_size": size,
+                    "fetch_ms": round(fetch_ms, 3),
+                }
+        return results
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark report offloading")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--database-url", help="asyncpg DSN for row size measurements")
+    args = parser.parse_args()
+
+    header = (
+        f"{'size':<8}{'inline B':>12}{'offload B':>11}{'zstd B':>10}"
+        f"{'compress ms':>13}{'inline serve ms':>17}{'offload serve ms':>18}"
+    )
+    print(header)
+    rows = []
+    for label, hits, strings, behaviors, urls in SIZES:
+        report = synthetic_report(hits, strings, behaviors, urls)
+        encoded = encode_report(report)
+        compressed = compress_report(encoded)
+        inline_row = json.dumps({**report, "summary": build_summary(report)})
+        ref = {
+            "bucket": "artifacts",
+            "key": "x/report.json.zst",
+            "encoding": "zstd",
+            "size": len(encoded),
+            "compressed_size": len(compressed),
+            "sha256": "0" * 64,
+        }
+        offloaded_row = json.dumps(
+            {"job_id": report["job_id"], "summary": build_summary(report), "report_ref": ref}
+        )
+        rows.append((label, inline_row, offloaded_row))
+
+        compress_s = median_seconds(lambda e=encoded: compress_report(e), args.iterations)
+        inline_s = median_seconds(lambda r=inline_row: serve_inline(r), args.iterations)
+        offload_s = median_seconds(lambda c=compressed: serve_offloaded(c), args.iterations)
+        print(
+            f"{label:<8}{len(inline_row):>12}{len(offloaded_row):>11}{len(compressed):>10}"
+            f"{compress_s * 1000:>13.2f}{inline_s * 1000:>17.2f}{offload_s * 1000:>18.2f}"
+        )
+
+    if args.database_url:
+        print(json.dumps(asyncio.run(measure_postgres(args.database_url, rows)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
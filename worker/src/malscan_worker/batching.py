@@ -0,0 +1,137 @@
+"""Cross-job micro-batching of external engine invocations.
+
+Concurrent jobs each scan their own sample, so without batching every job
+pays an engine's process start (and, for clamscan, its signature database
+load). ``EngineBatcher`` collects the samples submitted within
+``window_seconds`` of the first one, or until ``max_files`` are waiting,
+and scans them with a single invocation; each caller gets back the result
+for its own path.
+
+A failed batch invocation (timeout, signal, unparsable output) is retried
+one file per invocation, so a sample that crashes or hangs the engine only
+fails its own job. Batches time out after ``batch_timeout`` rather than the
+whole stage timeout, otherwise the stage timeout would expire for every job
+of a hung batch before the per-file retry could run. With ``max_files`` of 1
+every submit scans immediately.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Generic, TypeVar
+
+import structlog
+
+from malscan_worker.config import get_settings
+from malscan_worker.metrics import engine_batch_fallbacks, engine_batch_size
+
+log = structlog.get_logger()
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+def batch_timeout(files: int) -> float:
+    """Timeout of an engine invocation scanning files samples."""
+    if files <= 1:
+        return settings.stage_timeout_seconds
+    return settings.stage_timeout_seconds * settings.engine_batch_timeout_share
+
+
+class EngineBatcher(Generic[T]):
+    """Coalesces concurrent scans of one engine into batch invocations."""
+
+    def __init__(
+        self,
+        engine: str,
+        scan: Callable[[list[Path]], Awaitable[dict[Path, T]]],
+        max_files: int,
+        window_seconds: float,
+    ) -> None:
+        """Initialize the batcher.
+
+        Args:
+            engine: Engine name used for metrics and logs.
+            scan: Scans a list of files in one invocation, returning the
+                result of every file. Called with a single file to scan
+                files one at a time.
+            max_files: Batch size at which a batch is dispatched at once.
+            window_seconds: Time a batch waits for more files after its first.
+        """
+        self.engine = engine
+        self.max_files = max_files
+        self.window_seconds = window_seconds
+        self._scan = scan
+        self._pending: list[tuple[Path, asyncio.Future[T]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(self, path: Path) -> T:
+        """Scan a file as part of the next batch.
+
+        Returns:
+            The scan result for path.
+
+        Raises:
+            Exception: Whatever scanning the file on its own raised.
+        """
+        if self.max_files <= 1:
+            engine_batch_size.labels(engine=self.engine).observe(1)
+            return (await self._scan([path]))[path]
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[T] = loop.create_future()
+        self._pending.append((path, future))
+        if len(self._pending) >= self.max_files:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._dispatch)
+        return await future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch))
+        # Keep a reference until done so the task is not garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[Path, asyncio.Future[T]]]) -> None:
+        # Callers cancelled while waiting (job timeout) are left out
+        batch = [(path, future) for path, future in batch if not future.done()]
+        if not batch:
+            return
+        engine_batch_size.labels(engine=self.engine).observe(len(batch))
+
+        if len(batch) > 1:
+            try:
+                results = await self._scan([path for path, _ in batch])
+                missing = [str(path) for path, _ in batch if path not in results]
+                if missing:
+                    raise RuntimeError(f"No {self.engine} result for {', '.join(missing)}")
+            except Exception as e:
+                engine_batch_fallbacks.labels(engine=self.engine).inc()
+                log.warning(
+                    "engine_batch_failed", engine=self.engine, files=len(batch), error=str(e)
+                )
+            else:
+                for path, future in batch:
+                    if not future.done():
+                        future.set_result(results[path])
+                return
+
+        await asyncio.gather(*(self._run_one(path, future) for path, future in batch))
+
+    async def _run_one(self, path: Path, future: asyncio.Future[T]) -> None:
+        try:
+            result = (await self._scan([path]))[path]
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,238 @@
+"""Node-local content-addressed sample cache.
+
+Samples are stored under ``{root}/objects/{sha256[:2]}/{sha256}`` and handed to
+jobs as hardlinks, so the link count of a cache object doubles as its refcount:
+an object with ``st_nlink > 1`` is currently in use by at least one job work
+directory and is skipped by eviction. Inserts copy the download (the job keeps
+a writable file of its own) to a temp file and ``os.replace`` it atomically, and
+eviction is serialized with ``flock``, which makes the cache safe to share
+between concurrent jobs and multiple worker processes on the same filesystem.
+
+The cache size is counted once at startup and then kept as a running total;
+the object tree is only walked again when the total goes over budget, and
+eviction then frees down to ``_EVICT_TO_RATIO`` of the budget so the next walk
+is many inserts away. The walk also corrects the total for objects stored or
+evicted by other processes.
+"""
+
+import errno
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import threading
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+import structlog
+
+from malscan_worker.config import get_settings
+from malscan_worker.metrics import (
+    sample_cache_bytes_saved,
+    sample_cache_evictions,
+    sample_cache_hit_ratio,
+    sample_cache_requests,
+    sample_cache_size_bytes,
+)
+
+log = structlog.get_logger()
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Read buffer used when verifying sample hashes
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# Share of max_bytes eviction frees down to
+_EVICT_TO_RATIO = 0.9
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """Hardlink src to dest, falling back to a copy across filesystems."""
+    try:
+        os.link(src, dest)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copyfile(src, dest)
+
+
+def _sha256_file(path: Path) -> str:
+    """Calculate SHA256 of a file without loading it into memory."""
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SampleCache:
+    """Size-bounded, LRU-evicted sample cache keyed by SHA256."""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._objects_dir = root / "objects"
+        self._tmp_dir = root / "tmp"
+        self._lock_path = root / ".lock"
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        self._objects_dir.mkdir(parents=True, exist_ok=True)
+        self._tmp_dir.mkdir(parents=True, exist_ok=True)
+        # Bytes of cached objects, guarded by _stats_lock
+        self._size = sum(size for _, size, _, _ in self._scan())
+        sample_cache_size_bytes.set(self._size)
+
+    def _object_path(self, sha256: str) -> Path:
+        return self._objects_dir / sha256[:2] / sha256
+
+    def _scan(self) -> list[tuple[float, int, int, Path]]:
+        """(mtime, size, link count, path) of every cache object."""
+        objects = []
+        for shard in os.scandir(self._objects_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                objects.append((st.st_mtime, st.st_size, st.st_nlink, Path(entry.path)))
+        return objects
+
+    def _record(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            sample_cache_hit_ratio.set(self._hits / (self._hits + self._misses))
+        sample_cache_requests.labels(result="hit" if hit else "miss").inc()
+
+    def fetch(self, sha256: str, dest: Path) -> bool:
+        """Link a cached sample into dest.
+
+        Args:
+            sha256: Sample SHA256 (lowercase hex).
+            dest: Destination file path inside the job work directory.
+
+        Returns:
+            True on cache hit, False if the sample is not cached.
+        """
+        obj = self._object_path(sha256)
+        try:
+            _link_or_copy(obj, dest)
+        except FileNotFoundError:
+            # Not cached, or evicted between lookup and link
+            self._record(hit=False)
+            return False
+
+        # Bump recency for LRU eviction
+        try:
+            os.utime(obj)
+        except OSError:
+            pass
+
+        size = dest.stat().st_size
+        self._record(hit=True)
+        sample_cache_bytes_saved.inc(size)
+        log.info("sample_cache_hit", sha256=sha256, size=size)
+        return True
+
+    def store(self, sha256: str, src: Path) -> bool:
+        """Insert a downloaded sample into the cache.
+
+        The sample is hash-verified before insertion so a mislabelled download
+        can never poison the cache.
+
+        Args:
+            sha256: Expected SHA256 of the sample.
+            src: Path of the downloaded sample.
+
+        Returns:
+            True if the sample was inserted (or already present).
+        """
+        actual = _sha256_file(src)
+        if actual != sha256:
+            log.warning("sample_cache_hash_mismatch", expected=sha256, actual=actual)
+            return False
+
+        obj = self._object_path(sha256)
+        if obj.exists():
+            return True
+
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_dir / f"{sha256}.{os.getpid()}.{uuid.uuid4().hex}"
+        try:
+            # A copy, not a link: the mode change must not reach the job's file
+            shutil.copyfile(src, tmp)
+            # Cache objects are shared between jobs - make them read-only
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, obj)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        size = obj.stat().st_size
+        with self._stats_lock:
+            self._size += size
+            total = self._size
+        sample_cache_size_bytes.set(total)
+        log.info("sample_cache_stored", sha256=sha256, size=size)
+        if total > self.max_bytes:
+            self.evict()
+        return True
+
+    def evict(self) -> int:
+        """Evict least recently used, unreferenced samples once over budget.
+
+        Walks the object tree, resynchronizing the running size total, and
+        frees down to ``_EVICT_TO_RATIO`` of the budget.
+
+        Returns:
+            Number of bytes freed.
+        """
+        with open(self._lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is already evicting
+                return 0
+
+            objects = self._scan()
+            total = sum(size for _, size, _, _ in objects)
+            target = int(self.max_bytes * _EVICT_TO_RATIO)
+
+            freed = 0
+            if total > self.max_bytes:
+                # Objects linked into a job work directory are in use
+                entries = sorted(
+                    (mtime, size, path) for mtime, size, links, path in objects if links == 1
+                )
+                for _, size, path in entries:
+                    if total - freed <= target:
+                        break
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        continue
+                    freed += size
+                    sample_cache_evictions.inc()
+
+            with self._stats_lock:
+                self._size = total - freed
+            sample_cache_size_bytes.set(total - freed)
+            if freed:
+                log.info("sample_cache_evicted", bytes_freed=freed, size=total - freed)
+            return freed
+
+
+@lru_cache
+def get_sample_cache() -> SampleCache | None:
+    """Get the process-wide sample cache, or None if disabled."""
+    settings = get_settings()
+    if not settings.sample_cache_enabled:
+        return None
+    return SampleCache(Path(settings.sample_cache_dir), settings.sample_cache_max_bytes)
@@ -0,0 +1,382 @@
+"""Adaptive per-worker job concurrency (AIMD).
+
+The consumer runs jobs concurrently up to the limit held by ``job_limiter``.
+``ConcurrencyController`` re-evaluates that limit every
+``concurrency_interval_seconds`` from four pressure signals:
+
+- latency: recent per-stage mean durations relative to a slowly adapting
+  per-stage baseline (stages slow down when jobs contend for CPU/IO),
+- loop_lag: how late the event loop wakes up from short sleeps,
+- memory: cgroup memory usage relative to the cgroup limit (falls back to
+  process RSS against ``concurrency_memory_limit_bytes``),
+- cpu: CPU time used relative to the cgroup CPU quota (falls back to the
+  process and its children against the host CPU count).
+
+Any signal over its threshold multiplies the limit by
+``concurrency_decrease_factor``; otherwise, if the limit was fully used during
+the interval, it grows by one. The new limit is applied to the channel QoS
+so the broker never pushes more messages than the worker is willing to run.
+"""
+
+import asyncio
+import os
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import structlog
+
+from malscan_worker.config import get_settings
+from malscan_worker.metrics import (
+    worker_concurrency_adjustments,
+    worker_concurrency_limit,
+    worker_concurrency_signal,
+)
+from malscan_worker.throughput import StageThroughput, stage_throughput
+
+log = structlog.get_logger()
+settings = get_settings()
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+# cgroup v1 reports "unlimited" as a huge page-aligned number
+_CGROUP_V1_UNLIMITED = 1 << 60
+
+
+class AdaptiveLimiter:
+    """Semaphore whose limit can be changed while permits are held.
+
+    Lowering the limit never interrupts running jobs; new acquisitions wait
+    until enough of them have finished.
+    """
+
+    def __init__(self, limit: int, min_limit: int = 1, max_limit: int | None = None) -> None:
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max_limit if max_limit is not None else max(limit, self.min_limit)
+        self._limit = self._clamp(limit)
+        self._in_flight = 0
+        self._peak = 0
+        self._cond = asyncio.Condition()
+
+    def _clamp(self, limit: int) -> int:
+        return max(self.min_limit, min(self.max_limit, limit))
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self) -> None:
+        """Wait for a free slot."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self._limit)
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+
+    async def release(self) -> None:
+        """Return a slot."""
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    async def set_limit(self, limit: int) -> int:
+        """Change the limit (clamped to the configured bounds).
+
+        Returns:
+            The limit now in effect.
+        """
+        async with self._cond:
+            self._limit = self._clamp(limit)
+            self._cond.notify_all()
+            return self._limit
+
+    def take_peak(self) -> int:
+        """Highest number of concurrent jobs since the previous call."""
+        peak, self._peak = self._peak, self._in_flight
+        return peak
+
+
+# Process-wide limiter shared by the consumer and the queue monitor
+job_limiter = AdaptiveLimiter(
+    settings.worker_concurrency,
+    min_limit=settings.concurrency_min,
+    max_limit=settings.concurrency_max,
+)
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag as the overshoot of short sleeps."""
+
+    def __init__(self, tick_seconds: float = 0.1) -> None:
+        self.tick_seconds = tick_seconds
+        self._max_lag = 0.0
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.tick_seconds)
+            lag = loop.time() - started - self.tick_seconds
+            self._max_lag = max(self._max_lag, lag)
+
+    def take_max(self) -> float:
+        """Largest lag seen since the previous call."""
+        lag, self._max_lag = self._max_lag, 0.0
+        return lag
+
+
+def _read_int(path: Path) -> int | None:
+    try:
+        value = path.read_text().strip()
+    except OSError:
+        return None
+    if value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+class ResourceProbe:
+    """Memory and CPU utilization of the worker's cgroup (or process)."""
+
+    def __init__(self, cgroup_root: Path = CGROUP_ROOT) -> None:
+        self.cgroup_root = cgroup_root
+        self._last_cpu: tuple[float, float] | None = None
+
+    def memory_fraction(self) -> float | None:
+        """Memory usage as a fraction of the limit, None if no limit is known."""
+        root = self.cgroup_root
+        usage = _read_int(root / "memory.current")
+        limit = _read_int(root / "memory.max")
+        if usage is None:
+            usage = _read_int(root / "memory" / "memory.usage_in_bytes")
+            limit = _read_int(root / "memory" / "memory.limit_in_bytes")
+            if limit is not None and limit >= _CGROUP_V1_UNLIMITED:
+                limit = None
+
+        if usage is None or limit is None:
+            usage = _process_rss()
+            limit = settings.concurrency_memory_limit_bytes
+        if usage is None or not limit:
+            return None
+        return usage / limit
+
+    def _cpu_seconds_and_capacity(self) -> tuple[float, float]:
+        root = self.cgroup_root
+        capacity = float(os.cpu_count() or 1)
+
+        # cgroup v2
+        try:
+            stat = dict(
+                line.split() for line in (root / "cpu.stat").read_text().splitlines() if line
+            )
+            used = int(stat["usage_usec"]) / 1_000_000
+            quota = (root / "cpu.max").read_text().split()
+            if quota and quota[0] != "max":
+                capacity = int(quota[0]) / int(quota[1])
+            return used, capacity
+        except (OSError, KeyError, ValueError, IndexError):
+            pass
+
+        # cgroup v1
+        usage_ns = _read_int(root / "cpuacct" / "cpuacct.usage")
+        if usage_ns is not None:
+            quota_us = _read_int(root / "cpu" / "cpu.cfs_quota_us")
+            period_us = _read_int(root / "cpu" / "cpu.cfs_period_us")
+            if quota_us and quota_us > 0 and period_us:
+                capacity = quota_us / period_us
+            return usage_ns / 1_000_000_000, capacity
+
+        # No cgroup: this process plus reaped engine subprocesses
+        times = os.times()
+        return (
+            times.user + times.system + times.children_user + times.children_system,
+            capacity,
+        )
+
+    def cpu_fraction(self, now: float | None = None) -> float | None:
+        """CPU utilization since the previous call, None on the first call."""
+        now = time.monotonic() if now is None else now
+        used, capacity = self._cpu_seconds_and_capacity()
+        previous, self._last_cpu = self._last_cpu, (now, used)
+        if previous is None or now <= previous[0]:
+            return None
+        return (used - previous[1]) / ((now - previous[0]) * capacity)
+
+
+def _process_rss() -> int | None:
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass
+class Signals:
+    """Pressure signals observed over one controller interval."""
+
+    latency_inflation: float | None = None
+    loop_lag: float | None = None
+    memory_fraction: float | None = None
+    cpu_fraction: float | None = None
+    saturated: bool = False
+
+
+class ConcurrencyController:
+    """AIMD controller for ``AdaptiveLimiter``.
+
+    Args:
+        limiter: Limiter to adjust.
+        apply_limit: Called with the new limit after every change (used to
+            update the channel prefetch count).
+        throughput: Stage duration tracker used for the latency signal.
+        probe: Memory and CPU probe.
+    """
+
+    def __init__(
+        self,
+        limiter: AdaptiveLimiter,
+        apply_limit: Callable[[int], Awaitable[None]],
+        throughput: StageThroughput = stage_throughput,
+        probe: ResourceProbe | None = None,
+    ) -> None:
+        self.limiter = limiter
+        self.apply_limit = apply_limit
+        self.throughput = throughput
+        self.probe = probe or ResourceProbe()
+        self.lag_monitor = LoopLagMonitor()
+        self._baselines: dict[str, float] = {}
+        self._last_decrease = float("-inf")
+
+    def latency_inflation(self, now: float | None = None) -> float | None:
+        """Recent stage latency relative to the per-stage baselines.
+
+        The baseline follows the fastest recent mean immediately and drifts
+        slowly towards slower ones, so a lasting change in workload mix is
+        eventually accepted as the new normal.
+        """
+        current_total = 0.0
+        baseline_total = 0.0
+        for stage in self.throughput.stages():
+            current = self.throughput.mean_seconds(
+                stage, now, window=settings.concurrency_latency_window_seconds
+            )
+            if current is None:
+                continue
+            baseline = self._baselines.get(stage)
+            if baseline is None or current < baseline:
+                baseline = current
+            else:
+                baseline += settings.concurrency_baseline_drift * (current - baseline)
+            self._baselines[stage] = baseline
+            current_total += current
+            baseline_total += baseline
+
+        if baseline_total <= 0:
+            return None
+        return current_total / baseline_total
+
+    def observe(self, now: float | None = None) -> Signals:
+        """Sample all signals for the interval that just ended."""
+        return Signals(
+            latency_inflation=self.latency_inflation(now),
+            loop_lag=self.lag_monitor.take_max(),
+            memory_fraction=self.probe.memory_fraction(),
+            cpu_fraction=self.probe.cpu_fraction(now),
+            saturated=self.limiter.take_peak() >= self.limiter.limit,
+        )
+
+    def decide(self, signals: Signals, now: float | None = None) -> tuple[int, str | None]:
+        """Next limit and the reason for changing it (None to keep the limit)."""
+        now = time.monotonic() if now is None else now
+        limit = self.limiter.limit
+
+        pressure = None
+        if (signals.memory_fraction or 0) > settings.concurrency_memory_threshold:
+            pressure = "memory"
+        elif (signals.cpu_fraction or 0) > settings.concurrency_cpu_threshold:
+            pressure = "cpu"
+        elif (signals.loop_lag or 0) > settings.concurrency_loop_lag_threshold_seconds:
+            pressure = "loop_lag"
+        elif (signals.latency_inflation or 0) > settings.concurrency_latency_inflation_threshold:
+            pressure = "latency"
+
+        if pressure is not None:
+            # Give the previous decrease time to show up in the signals,
+            # except for memory, which is never worth waiting out
+            cooling_down = now - self._last_decrease < settings.concurrency_cooldown_seconds
+            if cooling_down and pressure != "memory":
+                return limit, None
+            new_limit = max(
+                self.limiter.min_limit, int(limit * settings.concurrency_decrease_factor)
+            )
+            return new_limit, pressure if new_limit != limit else None
+
+        if signals.saturated and limit < self.limiter.max_limit:
+            return limit + 1, "headroom"
+        return limit, None
+
+    async def step(self, now: float | None = None) -> None:
+        """Observe signals and adjust the limit once."""
+        now = time.monotonic() if now is None else now
+        signals = self.observe(now)
+        for name in ("latency_inflation", "loop_lag", "memory_fraction", "cpu_fraction"):
+            value = getattr(signals, name)
+            if value is not None:
+                worker_concurrency_signal.labels(signal=name).set(value)
+
+        previous = self.limiter.limit
+        target, reason = self.decide(signals, now)
+        if reason is None:
+            return
+
+        new_limit = await self.limiter.set_limit(target)
+        direction = "up" if new_limit > previous else "down"
+        if direction == "down":
+            self._last_decrease = now
+        await self.apply_limit(new_limit)
+
+        worker_concurrency_limit.set(new_limit)
+        worker_concurrency_adjustments.labels(direction=direction, reason=reason).inc()
+        log.info(
+            "concurrency_adjusted",
+            previous=previous,
+            limit=new_limit,
+            direction=direction,
+            reason=reason,
+            latency_inflation=signals.latency_inflation,
+            loop_lag=signals.loop_lag,
+            memory_fraction=signals.memory_fraction,
+            cpu_fraction=signals.cpu_fraction,
+        )
+
+    async def run(self, shutdown_event: asyncio.Event) -> None:
+        """Adjust the limit every interval until shutdown."""
+        worker_concurrency_limit.set(self.limiter.limit)
+        lag_task = asyncio.create_task(self.lag_monitor.run())
+        self.probe.cpu_fraction()  # prime the CPU baseline
+        try:
+            while not shutdown_event.is_set():
+                try:
+                    await asyncio.wait_for(
+                        shutdown_event.wait(),
+                        timeout=settings.concurrency_interval_seconds,
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    break
+                try:
+                    await self.step()
+                except Exception as e:
+                    log.warning("concurrency_adjust_failed", error=str(e))
+        finally:
+            lag_task.cancel()
+            await asyncio.gather(lag_task, return_exceptions=True)
@@ -3,9 +3,13 @@
 import asyncio
 import json
 import logging
+import time
+from datetime import timezone
 
 import aio_pika
 import structlog
+from opentelemetry import context, trace
+from opentelemetry.trace import SpanKind
 from tenacity import (
     before_sleep_log,
     retry,
@@ -14,10 +18,29 @@ from tenacity import (
     wait_fixed,
 )
 
+from malscan_worker.concurrency import ConcurrencyController, job_limiter
 from malscan_worker.config import get_settings
 from malscan_worker.db import update_job_status
-from malscan_worker.metrics import job_total, worker_active_jobs
-from malscan_worker.pipeline import run_pipeline
+from malscan_worker.lease import JobLease, LeaseAttemptsExceededError
+from malscan_worker.metrics import (
+    job_end_to_end,
+    job_labels,
+    job_queue_wait,
+    job_total,
+    size_bucket,
+    worker_active_jobs,
+)
+from malscan_worker.pipeline import PipelineError, run_pipeline
+from malscan_worker.readiness import record_startup, worker_state
+from malscan_worker.retry import (
+    DLQ_QUEUE,
+    RETRY_COUNT_HEADER,
+    dead_letter,
+    declare_retry_topology,
+    schedule_retry,
+)
+from malscan_worker.stages.filetype import mime_family
+from malscan_worker.tracing import extract_trace_context, tracer
 
 log = structlog.get_logger()
 settings = get_settings()
@@ -30,15 +53,23 @@ MAX_CONNECTION_RETRIES = 90
 RETRY_DELAY = 10  # seconds
 
 # Message processing settings
-DLQ_QUEUE = "malscan-dlq"
 MAX_MESSAGE_RETRIES = 3
 
 
+def _failure_reason(error: Exception) -> str:
+    """Short failure category recorded on DLQ messages."""
+    if isinstance(error, PipelineError):
+        return f"stage:{error.stage}"
+    return type(error).__name__
+
+
 def _get_retry_count(message: aio_pika.abc.AbstractIncomingMessage) -> int:
-    """Extract retry count from message x-death header.
+    """Extract retry count from message headers.
 
     RabbitMQ adds x-death header when a message is dead-lettered.
     Each entry in the array represents a dead-letter event with a count.
+    The worker also stamps x-retry-count when scheduling a delayed retry;
+    the larger of the two is used.
 
     Args:
         message: The incoming RabbitMQ message.
@@ -48,9 +79,11 @@ def _get_retry_count(message: aio_pika.abc.AbstractIncomingMessage) -> int:
     """
     headers = message.headers or {}
     x_death = headers.get("x-death")
+    stamped = headers.get(RETRY_COUNT_HEADER)
+    stamped_count = stamped if isinstance(stamped, int) else 0
 
     if not x_death or not isinstance(x_death, list):
-        return 0
+        return stamped_count
 
     # x-death is a list of dicts, each with a 'count' field
     total_count = 0
@@ -60,16 +93,71 @@ def _get_retry_count(message: aio_pika.abc.AbstractIncomingMessage) -> int:
             if isinstance(count, int):
                 total_count += count
 
-    return total_count
-
-
-async def process_message(message: aio_pika.abc.AbstractIncomingMessage) -> None:
+    return max(total_count, stamped_count)
+
+
+def _published_at(message: aio_pika.abc.AbstractIncomingMessage) -> float | None:
+    """Original publish time of a job message (epoch seconds)."""
+    published_at = (message.headers or {}).get("x-published-at")
+    if isinstance(published_at, int | float):
+        return float(published_at)
+    if message.timestamp is not None:
+        # AMQP timestamps have one-second resolution
+        return message.timestamp.replace(tzinfo=timezone.utc).timestamp()
+    return None
+
+
+def _trace_queue_wait(
+    message: aio_pika.abc.AbstractIncomingMessage, parent: context.Context
+) -> None:
+    """Record the broker wait (publish to delivery) as a span."""
+    published_at = _published_at(message)
+    if published_at is None:
+        return
+
+    span = tracer.start_span(
+        "queue.wait",
+        context=parent,
+        start_time=int(published_at * 1e9),
+        attributes={"messaging.destination.name": settings.rabbitmq_queue},
+    )
+    span.end()
+
+
+async def process_message(
+    message: aio_pika.abc.AbstractIncomingMessage,
+    retry_exchange: aio_pika.abc.AbstractExchange,
+    dlq_exchange: aio_pika.abc.AbstractExchange,
+) -> None:
+    """Process a job message inside a consumer span continuing the upload's trace."""
+    parent = extract_trace_context(message.headers)
+    _trace_queue_wait(message, parent)
+    with tracer.start_as_current_span(
+        "job.process",
+        context=parent,
+        kind=SpanKind.CONSUMER,
+        attributes={
+            "messaging.system": "rabbitmq",
+            "messaging.destination.name": settings.rabbitmq_queue,
+            "job.retry_count": _get_retry_count(message),
+        },
+    ):
+        await _handle_message(message, retry_exchange, dlq_exchange)
+
+
+async def _handle_message(
+    message: aio_pika.abc.AbstractIncomingMessage,
+    retry_exchange: aio_pika.abc.AbstractExchange,
+    dlq_exchange: aio_pika.abc.AbstractExchange,
+) -> None:
     """Process a single job message with retry tracking.
 
     If processing fails and retry count < MAX_MESSAGE_RETRIES, the message
-    is rejected with requeue=True for another attempt.
-    If retry count >= MAX_MESSAGE_RETRIES, the message is rejected with
-    requeue=False, causing it to be routed to the DLQ.
+    is republished to a delay queue of the retry exchange and acked, so the
+    broker redelivers it after the backoff delay.
+    If retry count >= MAX_MESSAGE_RETRIES, the message is published to the
+    DLQ with its failure reason and acked (falling back to a reject with
+    requeue=False, which the main queue dead-letters to the DLQ as well).
     """
     job_id = None
     file_id = None
@@ -80,6 +168,18 @@ async def process_message(message: aio_pika.abc.AbstractIncomingMessage) -> None
         body = json.loads(message.body.decode())
         job_id = body.get("job_id")
         file_id = body.get("file_id")
+        trace.get_current_span().set_attribute("job.id", str(job_id))
+
+        # Labels for latency metrics, refined by the pipeline once the file is known
+        job_labels.set(
+            {
+                "size_bucket": size_bucket(body.get("size")),
+                "mime_family": mime_family(body.get("content_type")),
+            }
+        )
+        published_at = _published_at(message)
+        if published_at is not None and retry_count == 0:
+            job_queue_wait.labels(**job_labels.get()).observe(max(0.0, time.time() - published_at))
 
         log.info(
             "job_received",
@@ -91,14 +191,24 @@ async def process_message(message: aio_pika.abc.AbstractIncomingMessage) -> None
         worker_active_jobs.inc()
         job_total.labels(status="scanning").inc()
 
-        # Update job status to scanning
-        if job_id:
-            await update_job_status(job_id, "scanning")
+        # Mark the job scanning under a lease renewed while it runs
+        lease = JobLease(job_id) if job_id else None
+        attempts = await lease.acquire() if lease is not None else None
 
         try:
+            # Jobs that keep killing their worker are not redelivered forever
+            if attempts is not None and attempts > settings.job_lease_max_attempts:
+                raise LeaseAttemptsExceededError(
+                    f"Job delivered {attempts} times (max {settings.job_lease_max_attempts})"
+                )
+
             # Run the analysis pipeline
             await run_pipeline(body)
             job_total.labels(status="done").inc()
+            if published_at is not None:
+                job_end_to_end.labels(status="done", **job_labels.get()).observe(
+                    time.time() - published_at
+                )
 
             # Acknowledge successful processing
             await message.ack()
@@ -114,15 +224,30 @@ async def process_message(message: aio_pika.abc.AbstractIncomingMessage) -> None
             job_total.labels(status="failed").inc()
 
             # Check if we should retry or send to DLQ
-            if retry_count < MAX_MESSAGE_RETRIES:
-                log.warning(
-                    "job_retry_scheduled",
-                    job_id=job_id,
-                    retry_count=retry_count,
-                    max_retries=MAX_MESSAGE_RETRIES,
-                )
-                # Reject with requeue to try again
-                await message.reject(requeue=True)
+            if retry_count < MAX_MESSAGE_RETRIES and not isinstance(e, LeaseAttemptsExceededError):
+                try:
+                    delay = await schedule_retry(retry_exchange, message, retry_count)
+                except Exception as publish_error:
+                    log.error(
+                        "job_retry_publish_failed",
+                        job_id=job_id,
+                        error=str(publish_error),
+                    )
+                    # Fall back to an immediate requeue rather than losing the job
+                    await message.reject(requeue=True)
+                else:
+                    log.warning(
+                        "job_retry_scheduled",
+                        job_id=job_id,
+                        retry_count=retry_count,
+                        max_retries=MAX_MESSAGE_RETRIES,
+                        delay_seconds=delay,
+                    )
+                    # The delayed copy is confirmed by the broker - drop the original
+                    await message.ack()
+                # Back to queued, releasing the lease so the reaper leaves it alone
+                if job_id:
+                    await update_job_status(job_id, "queued", error_message=str(e))
             else:
                 log.warning(
                     "job_sent_to_dlq",
@@ -130,15 +255,31 @@ async def process_message(message: aio_pika.abc.AbstractIncomingMessage) -> None
                     retry_count=retry_count,
                     reason="max_retries_exceeded",
                 )
+                if published_at is not None:
+                    job_end_to_end.labels(status="failed", **job_labels.get()).observe(
+                        time.time() - published_at
+                    )
                 # Update job status to failed before sending to DLQ
                 if job_id:
                     await update_job_status(
                         job_id, "failed", error_message=f"Max retries exceeded: {e}"
                     )
-                # Reject without requeue - message goes to DLQ
-                await message.reject(requeue=False)
+                try:
+                    await dead_letter(dlq_exchange, message, _failure_reason(e), str(e))
+                except Exception as publish_error:
+                    log.error(
+                        "job_dlq_publish_failed",
+                        job_id=job_id,
+                        error=str(publish_error),
+                    )
+                    # Reject without requeue - message goes to DLQ without failure details
+                    await message.reject(requeue=False)
+                else:
+                    await message.ack()
 
         finally:
+            if lease is not None:
+                await lease.release()
             worker_active_jobs.dec()
 
     except json.JSONDecodeError as e:
@@ -165,13 +306,36 @@ async def connect_with_retry() -> aio_pika.abc.AbstractRobustConnection:
     return connection
 
 
+async def _process_and_release(
+    message: aio_pika.abc.AbstractIncomingMessage,
+    retry_exchange: aio_pika.abc.AbstractExchange,
+    dlq_exchange: aio_pika.abc.AbstractExchange,
+) -> None:
+    """Process a message and free its concurrency slot."""
+    try:
+        await process_message(message, retry_exchange, dlq_exchange)
+    except Exception as e:
+        log.error("job_processing_error", error=str(e))
+    finally:
+        await job_limiter.release()
+
+
 async def start_consumer(shutdown_event: asyncio.Event) -> None:
-    """Start consuming messages from RabbitMQ with DLQ support."""
+    """Start consuming messages from RabbitMQ with DLQ support.
+
+    Messages are processed concurrently up to ``job_limiter.limit``; the
+    channel prefetch count follows the limit so the broker only delivers
+    messages the worker can start.
+    """
+    connect_start = time.perf_counter()
     connection = await connect_with_retry()
+    record_startup("broker", time.perf_counter() - connect_start)
+    worker_state.connection = connection
+    record_startup("total", time.perf_counter() - worker_state.started_at)
 
     async with connection:
         channel = await connection.channel()
-        await channel.set_qos(prefetch_count=1)
+        await channel.set_qos(prefetch_count=job_limiter.limit)
 
         # Declare DLQ first (result unused but ensures queue exists)
         _ = await channel.declare_queue(
@@ -205,12 +369,43 @@ async def start_consumer(shutdown_event: asyncio.Event) -> None:
                 passive=True,  # Just get the existing queue
             )
 
-        log.info("consumer_started", queue=settings.rabbitmq_queue, dlq=DLQ_QUEUE)
+        retry_exchange = await declare_retry_topology(channel)
 
-        async with queue.iterator() as queue_iter:
-            async for message in queue_iter:
-                if shutdown_event.is_set():
-                    break
-                await process_message(message)
+        async def apply_limit(limit: int) -> None:
+            await channel.set_qos(prefetch_count=limit)
+
+        controller_task = None
+        if settings.concurrency_adaptive:
+            controller = ConcurrencyController(job_limiter, apply_limit)
+            controller_task = asyncio.create_task(controller.run(shutdown_event))
+
+        log.info(
+            "consumer_started",
+            queue=settings.rabbitmq_queue,
+            dlq=DLQ_QUEUE,
+            concurrency=job_limiter.limit,
+            adaptive=settings.concurrency_adaptive,
+        )
+
+        in_flight: set[asyncio.Task[None]] = set()
+        try:
+            async with queue.iterator() as queue_iter:
+                async for message in queue_iter:
+                    if shutdown_event.is_set():
+                        break
+                    await job_limiter.acquire()
+                    task = asyncio.create_task(
+                        _process_and_release(message, retry_exchange, channel.default_exchange)
+                    )
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+        finally:
+            # Let running jobs finish (and ack) before the channel closes
+            if in_flight:
+                log.info("consumer_draining", jobs=len(in_flight))
+                await asyncio.gather(*in_flight, return_exceptions=True)
+            if controller_task is not None:
+                controller_task.cancel()
+                await asyncio.gather(controller_task, return_exceptions=True)
 
     log.info("consumer_stopped")
@@ -1,13 +1,19 @@
 """Database operations for job status updates."""
 
+import contextlib
+import functools
+import time
+from collections.abc import Awaitable, Callable
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, ParamSpec, TypeVar
 from uuid import UUID
 
 import structlog
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
 from malscan_worker.config import get_settings
+from malscan_worker.metrics import db_update_latency, job_labels
+from malscan_worker.tracing import traced
 
 log = structlog.get_logger()
 settings = get_settings()
@@ -20,7 +26,49 @@ _engine = create_async_engine(
     max_overflow=10,
 )
 
+# Span attributes for database writes
+_DB_SPAN = {"db.system": "postgresql"}
 
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def _timed(operation: str) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    """Record the duration of a job row update in db_update_latency."""
+
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                db_update_latency.labels(operation=operation, **job_labels.get()).observe(
+                    time.perf_counter() - start
+                )
+
+        return wrapper
+
+    return decorator
+
+
+async def warm_up() -> None:
+    """Fill the connection pool before the first job.
+
+    Raises:
+        Exception: If the database is unreachable.
+    """
+    from sqlalchemy import text
+
+    # Hold every connection until all are open, so none is reused
+    async with contextlib.AsyncExitStack() as stack:
+        for _ in range(_engine.pool.size()):
+            conn = await stack.enter_async_context(_engine.connect())
+            await conn.execute(text("SELECT 1"))
+
+
+@traced("db.update_job_status", _DB_SPAN)
+@_timed("update_job_status")
 async def update_job_status(
     job_id: str,
     status: str,
@@ -54,7 +102,9 @@ async def update_job_status(
                 SET status = :status, updated_at = :updated_at,
                     error_message = :error_message,
                     current_stage = :current_stage,
-                    stages_done = :stages_done
+                    stages_done = :stages_done,
+                    lease_owner = CASE WHEN :keep_lease THEN lease_owner END,
+                    lease_expires_at = CASE WHEN :keep_lease THEN lease_expires_at END
                 WHERE id = :job_id
                 """
             )
@@ -68,6 +118,8 @@ async def update_job_status(
                     "error_message": error_message,
                     "current_stage": kwargs.get("current_stage"),
                     "stages_done": kwargs.get("stages_done", 0),
+                    # Finished jobs release their lease
+                    "keep_lease": status == "scanning",
                 },
             )
             await session.commit()
@@ -85,6 +137,153 @@ async def update_job_status(
             await session.rollback()
 
 
+@traced("db.acquire_job_lease", _DB_SPAN)
+@_timed("acquire_job_lease")
+async def acquire_job_lease(job_id: str, owner: str) -> int | None:
+    """Mark a job scanning under a lease held by this worker.
+
+    The lease expires ``job_lease_ttl_seconds`` from now (database clock)
+    unless renewed, and the job's delivery attempts are incremented.
+
+    Args:
+        job_id: Job UUID as string.
+        owner: Lease owner (worker ID).
+
+    Returns:
+        Number of attempts including this one, or None if the job row was not
+        found or the update failed.
+    """
+    async with AsyncSession(_engine) as session:
+        try:
+            from sqlalchemy import text
+
+            result = await session.execute(
+                text(
+                    """
+                    UPDATE jobs
+                    SET status = 'scanning', error_message = NULL,
+                        lease_owner = :owner,
+                        lease_expires_at = now() + make_interval(secs => :ttl),
+                        attempts = attempts + 1,
+                        updated_at = :updated_at
+                    WHERE id = :job_id
+                    RETURNING attempts
+                    """
+                ),
+                {
+                    "job_id": UUID(job_id),
+                    "owner": owner,
+                    "ttl": settings.job_lease_ttl_seconds,
+                    "updated_at": datetime.now(timezone.utc),
+                },
+            )
+            attempts = result.scalar_one_or_none()
+            await session.commit()
+
+            log.info("job_lease_acquired", job_id=job_id, owner=owner, attempts=attempts)
+            return attempts
+
+        except Exception as e:
+            log.error("job_lease_acquire_failed", job_id=job_id, error=str(e))
+            # Don't raise - the job still runs, unleased
+            await session.rollback()
+            return None
+
+
+@traced("db.renew_job_lease", _DB_SPAN)
+async def renew_job_lease(job_id: str, owner: str) -> bool | None:
+    """Extend a job's lease if this worker still holds it.
+
+    Args:
+        job_id: Job UUID as string.
+        owner: Lease owner (worker ID).
+
+    Returns:
+        Whether the lease is still held, or None if the renewal failed.
+    """
+    async with AsyncSession(_engine) as session:
+        try:
+            from sqlalchemy import text
+
+            result = await session.execute(
+                text(
+                    """
+                    UPDATE jobs
+                    SET lease_expires_at = now() + make_interval(secs => :ttl)
+                    WHERE id = :job_id AND lease_owner = :owner AND status = 'scanning'
+                    """
+                ),
+                {"job_id": UUID(job_id), "owner": owner, "ttl": settings.job_lease_ttl_seconds},
+            )
+            await session.commit()
+            return result.rowcount > 0
+
+        except Exception as e:
+            log.warning("job_lease_renew_failed", job_id=job_id, error=str(e))
+            await session.rollback()
+            return None
+
+
+@traced("db.reap_expired_leases", _DB_SPAN)
+async def reap_expired_leases(batch_size: int, max_attempts: int) -> list[tuple[str, str]]:
+    """Release one batch of scanning jobs whose lease expired.
+
+    Jobs delivered fewer than ``max_attempts`` times go back to ``queued``
+    (the broker redelivers the unacked message), the others are marked
+    ``failed``. Rows are locked with SKIP LOCKED so several reapers can run
+    at once.
+
+    Args:
+        batch_size: Maximum number of jobs released.
+        max_attempts: Attempts after which an expired job is failed.
+
+    Returns:
+        (job_id, new status) of the released jobs.
+    """
+    async with AsyncSession(_engine) as session:
+        try:
+            from sqlalchemy import text
+
+            result = await session.execute(
+                text(
+                    """
+                    WITH expired AS (
+                        SELECT id, created_at
+                        FROM jobs
+                        WHERE status = 'scanning' AND lease_expires_at < now()
+                        ORDER BY lease_expires_at
+                        LIMIT :batch_size
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE jobs j
+                    SET status = CASE WHEN j.attempts >= :max_attempts
+                                      THEN 'failed' ELSE 'queued' END,
+                        error_message = CASE
+                            WHEN j.attempts >= :max_attempts
+                            THEN 'Worker lease expired after ' || j.attempts || ' attempts'
+                            ELSE 'Worker lease expired, awaiting redelivery' END,
+                        lease_owner = NULL,
+                        lease_expires_at = NULL,
+                        updated_at = now()
+                    FROM expired e
+                    WHERE j.id = e.id AND j.created_at = e.created_at
+                    RETURNING j.id, j.status
+                    """
+                ),
+                {"batch_size": batch_size, "max_attempts": max_attempts},
+            )
+            released = [(str(row.id), row.status) for row in result]
+            await session.commit()
+            return released
+
+        except Exception as e:
+            log.error("job_lease_reap_failed", error=str(e))
+            await session.rollback()
+            return []
+
+
+@traced("db.update_job_stage", _DB_SPAN)
+@_timed("update_job_stage")
 async def update_job_stage(job_id: str, stage: str, stages_done: int) -> None:
     """Update job stage progress in the database.
 
@@ -129,8 +328,13 @@ async def update_job_stage(job_id: str, stage: str, stages_done: int) -> None:
             await session.rollback()
 
 
+@traced("db.update_job_result", _DB_SPAN)
+@_timed("update_job_result")
 async def update_job_result(job_id: str, result: dict[str, Any]) -> None:
-    """Store analysis result in job record.
+    """Store analysis result in job record, with its verdict and score.
+
+    The sample's latest verdict (files.latest_*) is updated in the same
+    transaction.
 
     Args:
         job_id: Job UUID as string.
@@ -145,17 +349,50 @@ async def update_job_result(job_id: str, result: dict[str, Any]) -> None:
             stmt = text(
                 """
                 UPDATE jobs
-                SET result = :result, updated_at = :updated_at
+                SET result = :result, verdict = :verdict, score = :score,
+                    updated_at = :updated_at
                 WHERE id = :job_id
                 """
             )
 
+            # Denormalized for job listing filters
+            summary = result.get("summary", result)
+            updated_at = datetime.now(timezone.utc)
             await session.execute(
                 stmt,
                 {
                     "job_id": UUID(job_id),
                     "result": json.dumps(result),
-                    "updated_at": datetime.now(timezone.utc),
+                    "verdict": summary.get("verdict"),
+                    "score": summary.get("score"),
+                    "updated_at": updated_at,
+                },
+            )
+
+            # Latest verdict of the sample and its other hashes, for hash lookups
+            file_info = summary.get("file") or {}
+            await session.execute(
+                text(
+                    """
+                    UPDATE files f
+                    SET latest_job_id = j.id,
+                        latest_verdict = :verdict,
+                        latest_score = :score,
+                        latest_analyzed_at = :updated_at,
+                        md5 = COALESCE(f.md5, :md5),
+                        sha1 = COALESCE(f.sha1, :sha1)
+                    FROM jobs j
+                    WHERE j.id = :job_id AND f.id = j.file_id
+                      AND (f.latest_analyzed_at IS NULL OR f.latest_analyzed_at <= :updated_at)
+                    """
+                ),
+                {
+                    "job_id": UUID(job_id),
+                    "verdict": summary.get("verdict"),
+                    "score": summary.get("score"),
+                    "updated_at": updated_at,
+                    "md5": file_info.get("md5"),
+                    "sha1": file_info.get("sha1"),
                 },
             )
             await session.commit()
@@ -169,3 +406,464 @@ async def update_job_result(job_id: str, result: dict[str, Any]) -> None:
             log.error("job_result_store_failed", job_id=job_id, error=str(e))
             # Don't raise - result store failure should not block status update
             await session.rollback()
+
+
+@traced("db.load_stage_checkpoints", _DB_SPAN)
+async def load_stage_checkpoints(job_id: str) -> dict[str, tuple[str, dict[str, Any]]]:
+    """Load checkpointed stage results for a job.
+
+    Args:
+        job_id: Job UUID as string.
+
+    Returns:
+        Mapping of stage name to (stage_version, serialized StageResult).
+        Empty if none exist or the lookup fails.
+    """
+    async with AsyncSession(_engine) as session:
+        try:
+            from sqlalchemy import text
+
+            stmt = text(
+                """
+                SELECT stage_name, stage_version, result
+                FROM job_checkpoints
+                WHERE job_id = :job_id
+                """
+            )
+
+            rows = await session.execute(stmt, {"job_id": UUID(job_id)})
+            checkpoints = {row.stage_name: (row.stage_version, row.result) for row in rows}
+
+            log.info("job_checkpoints_loaded", job_id=job_id, stages=list(checkpoints))
+            return checkpoints
+
+        except Exception as e:
+            log.error("job_checkpoints_load_failed", job_id=job_id, error=str(e))
+            # Don't raise - a missing checkpoint only costs a re-run
+            return {}
+
+
+@traced("db.save_stage_checkpoint", _DB_SPAN)
+async def save_stage_checkpoint(
+    job_id: str, stage: str, stage_version: str, result: dict[str, Any]
+) -> None:
+    """Checkpoint a completed stage result.
+
+    Args:
+        job_id: Job UUID as string.
+        stage: Stage name.
+        stage_version: Version of the stage implementation that produced the result.
+        result: Serialized StageResult.
+    """
+    async with AsyncSession(_engine) as session:
+        try:
+            import json
+
+            from sqlalchemy import text
+
+            stmt = text(
+                """
+                INSERT INTO job_checkpoints (job_id, stage_name, stage_version, result, created_at)
+                VALUES (:job_id, :stage, :stage_version, CAST(:result AS JSONB), :created_at)
+                ON CONFLICT (job_id, stage_name) DO UPDATE
+                SET stage_version = EXCLUDED.stage_version,
+                    result = EXCLUDED.result,
+                    created_at = EXCLUDED.created_at
+                """
+            )
+
+            await session.execute(
+                stmt,
+                {
+                    "job_id": UUID(job_id),
+                    "stage": stage,
+                    "stage_version": stage_version,
+                    "result": json.dumps(result),
+                    "created_at": datetime.now(timezone.utc),
+                },
+            )
+            await session.commit()
+
+            log.info("job_checkpoint_saved", job_id=job_id, stage=stage)
+
+        except Exception as e:
+            log.error("job_checkpoint_save_failed", job_id=job_id, stage=stage, error=str(e))
+            # Don't raise - checkpoint failure should not block analysis
+            await session.rollback()
+
+
+@traced("db.delete_stage_checkpoints", _DB_SPAN)
+async def delete_stage_checkpoints(job_id: str) -> None:
+    """Delete all checkpoints of a job once its result is stored.
+
+    Args:
+        job_id: Job UUID as string.
+    """
+    async with AsyncSession(_engine) as session:
+        try:
+            from sqlalchemy import text
+
+            stmt = text("DELETE FROM job_checkpoints WHERE job_id = :job_id")
+
+            await session.execute(stmt, {"job_id": UUID(job_id)})
+            await session.commit()
+
+            log.info("job_checkpoints_deleted", job_id=job_id)
+
+        except Exception as e:
+            log.error("job_checkpoints_delete_failed", job_id=job_id, error=str(e))
+            await session.rollback()
+
+
+@traced("db.get_completed_sha256s", _DB_SPAN)
+async def get_completed_sha256s(sha256s: list[str]) -> set[str]:
+    """Find which samples already have a completed analysis result.
+
+    Args:
+        sha256s: Sample SHA256 hashes to check.
+
+    Returns:
+        The subset of sha256s with at least one done job that stored a result.
+        Empty if the lookup fails.
+    """
+    if not sha256s:
+        return set()
+
+    async with AsyncSession(_engine) as session:
+        try:
+            from sqlalchemy import text
+
+            stmt = text(
+                """
+                SELECT DISTINCT f.sha256
+                FROM files f
+                JOIN jobs j ON j.file_id = f.id
+                WHERE f.sha256 = ANY(:sha256s)
+                  AND j.status = 'done'
+                  AND j.result IS NOT NULL
+                """
+            )
+
+            rows = await session.execute(stmt, {"sha256s": sha256s})
+            return {row.sha256 for row in rows}
+
+        except Exception as e:
+            log.error("completed_sha256_lookup_failed", count=len(sha256s), error=str(e))
+            return set()
+
+
+@traced("db.get_inline_reports", _DB_SPAN)
+async def get_inline_reports(
+    after_id: str | None, limit: int, min_bytes: int
+) -> list[tuple[str, dict[str, Any]]]:
+    """Page through done jobs whose large report is still stored inline.
+
+    Args:
+        after_id: Return jobs with an ID greater than this (keyset pagination).
+        limit: Maximum number of jobs to return.
+        min_bytes: Only return results whose JSON text is larger than this.
+
+    Returns:
+        (job_id, result) pairs ordered by job ID. Empty if the lookup fails.
+    """
+    async with AsyncSession(_engine) as session:
+        try:
+            import json
+
+            from sqlalchemy import text
+
+            stmt = text(
+                """
+                SELECT id, result::text AS result
+                FROM jobs
+                WHERE status = 'done'
+                  AND result IS NOT NULL
+                  AND result->'report_ref' IS NULL
+                  AND octet_length(result::text) > :min_bytes
+                  AND (CAST(:after_id AS uuid) IS NULL OR id > CAST(:after_id AS uuid))
+                ORDER BY id
+                LIMIT :limit
+                """
+            )
+
+            rows = await session.execute(
+                stmt,
+                {
+                    "after_id": UUID(after_id) if after_id else None,
+                    "limit": limit,
+                    "min_bytes": min_bytes,
+                },
+            )
+            return [(str(row.id), json.loads(row.result)) for row in rows]
+
+        except Exception as e:
+            log.error("inline_report_lookup_failed", after_id=after_id, error=str(e))
+            return []
+
+
+@traced("db.replace_inline_result", _DB_SPAN)
+async def replace_inline_result(job_id: str, result: dict[str, Any]) -> bool:
+    """Replace an inline report with its offloaded form.
+
+    The row is only updated if it does not already point at an offloaded
+    report, so concurrent backfills do not overwrite each other.
+
+    Args:
+        job_id: Job UUID as string.
+        result: Stored result with summary and report_ref.
+
+    Returns:
+        True if the row was updated.
+    """
+    async with AsyncSession(_engine) as session:
+        try:
+            import json
+
+            from sqlalchemy import text
+
+            stmt = text(
+                """
+                UPDATE jobs
+                SET result = :result
+                WHERE id = :job_id AND result->'report_ref' IS NULL
+                """
+            )
+
+            cursor = await session.execute(
+                stmt, {"job_id": UUID(job_id), "result": json.dumps(result)}
+            )
+            await session.commit()
+            return bool(cursor.rowcount)
+
+        except Exception as e:
+            log.error("inline_result_replace_failed", job_id=job_id, error=str(e))
+            await session.rollback()
+            return False
+
+
+# Result IOC list -> iocs.kind
+_IOC_KINDS = {"urls": "url", "domains": "domain", "ips": "ip"}
+
+# Longer values are not indexed (btree entries are limited to ~2.7 KB)
+_MAX_IOC_LENGTH = 2048
+
+
+def _ioc_rows(iocs: dict[str, Any]) -> list[tuple[str, str]]:
+    """Distinct (kind, value) pairs of a result's IOCs, sorted.
+
+    Sorting gives concurrent workers the same lock order on shared indicators.
+    """
+    rows: set[tuple[str, str]] = set()
+    for key, kind in _IOC_KINDS.items():
+        for value in iocs.get(key) or []:
+            value = str(value).strip()
+            if kind == "domain":
+                value = value.lower().rstrip(".")
+            if value and len(value) <= _MAX_IOC_LENGTH:
+                rows.add((kind, value))
+    return sorted(rows)
+
+
+@traced("db.index_job_iocs", _DB_SPAN)
+@_timed("index_job_iocs")
+async def index_job_iocs(job_id: str, file_id: str, iocs: dict[str, Any]) -> None:
+    """Write a job's URLs, domains and IPs into the IOC index.
+
+    Indicators are upserted into ``iocs`` and linked to the job in
+    ``job_iocs`` with set-based inserts (one statement per table). Links that
+    already exist (retried jobs) are left alone, and ``job_count`` only
+    counts new links.
+
+    Args:
+        job_id: Job UUID as string.
+        file_id: File UUID as string.
+        iocs: The result's iocs section (urls, domains, ips lists).
+    """
+    rows = _ioc_rows(iocs)
+    if not rows:
+        return
+
+    async with AsyncSession(_engine) as session:
+        try:
+            from sqlalchemy import text
+
+            now = datetime.now(timezone.utc)
+            params = {
+                "kinds": [kind for kind, _ in rows],
+                "values": [value for _, value in rows],
+                "now": now,
+            }
+
+            await session.execute(
+                text(
+                    """
+                    INSERT INTO iocs (kind, value, job_count, first_seen, last_seen)
+                    SELECT kind, value, 0, :now, :now
+                    FROM unnest(CAST(:kinds AS text[]), CAST(:values AS text[])) AS t(kind, value)
+                    ON CONFLICT (kind, value) DO NOTHING
+                    """
+                ),
+                params,
+            )
+
+            linked = await session.execute(
+                text(
+                    """
+                    INSERT INTO job_iocs (ioc_id, job_id, file_id, created_at)
+                    SELECT i.id, :job_id, :file_id, :now
+                    FROM unnest(CAST(:kinds AS text[]), CAST(:values AS text[])) AS t(kind, value)
+                    JOIN iocs i ON i.kind = t.kind AND i.value = t.value
+                    ON CONFLICT DO NOTHING
+                    RETURNING ioc_id
+                    """
+                ),
+                {**params, "job_id": UUID(job_id), "file_id": UUID(file_id)},
+            )
+            ioc_ids = sorted(row.ioc_id for row in linked)
+
+            if ioc_ids:
+                await session.execute(
+                    text(
+                        """
+                        UPDATE iocs
+                        SET job_count = job_count + 1, last_seen = :now
+                        WHERE id = ANY(CAST(:ids AS bigint[]))
+                        """
+                    ),
+                    {"ids": ioc_ids, "now": now},
+                )
+            await session.commit()
+
+            log.info("job_iocs_indexed", job_id=job_id, iocs=len(rows), new_links=len(ioc_ids))
+
+        except Exception as e:
+            log.error("job_iocs_index_failed", job_id=job_id, error=str(e))
+            # Don't raise - the report still holds the IOCs
+            await session.rollback()
+
+
+@traced("db.find_similar_samples", _DB_SPAN)
+async def find_similar_samples(
+    file_id: str, buckets: list[int], limit: int
+) -> list[tuple[str, str, str | None, bytes]]:
+    """Find indexed samples sharing at least one LSH bucket with a signature.
+
+    Candidates are read from the ``similarity_buckets`` primary key, most
+    shared bands first; their similarity is estimated by the caller.
+
+    Args:
+        file_id: File UUID as string, excluded from the candidates.
+        buckets: LSH bucket of each band of the signature.
+        limit: Maximum number of candidates.
+
+    Returns:
+        (file_id, sha256, latest_verdict, signature) of each candidate.
+        Empty if the lookup fails.
+    """
+    if not buckets:
+        return []
+
+    async with AsyncSession(_engine) as session:
+        try:
+            from sqlalchemy import text
+
+            stmt = text(
+                """
+                SELECT s.file_id, f.sha256, f.latest_verdict, s.signature
+                FROM (
+                    SELECT b.file_id, count(*) AS bands
+                    FROM unnest(CAST(:bands AS smallint[]), CAST(:buckets AS bigint[]))
+                        AS t(band, bucket)
+                    JOIN similarity_buckets b ON b.band = t.band AND b.bucket = t.bucket
+                    WHERE b.file_id <> :file_id
+                    GROUP BY b.file_id
+                    ORDER BY bands DESC
+                    LIMIT :limit
+                ) c
+                JOIN sample_similarity s ON s.file_id = c.file_id
+                JOIN files f ON f.id = c.file_id
+                """
+            )
+
+            rows = await session.execute(
+                stmt,
+                {
+                    "bands": list(range(len(buckets))),
+                    "buckets": buckets,
+                    "file_id": UUID(file_id),
+                    "limit": limit,
+                },
+            )
+            return [
+                (str(row.file_id), row.sha256, row.latest_verdict, bytes(row.signature))
+                for row in rows
+            ]
+
+        except Exception as e:
+            log.error("similar_samples_lookup_failed", file_id=file_id, error=str(e))
+            return []
+
+
+@traced("db.index_sample_similarity", _DB_SPAN)
+@_timed("index_sample_similarity")
+async def index_sample_similarity(
+    file_id: str, sha256: str, signature: bytes, features: int, buckets: list[int]
+) -> None:
+    """Add a sample's similarity digest to the near-duplicate index.
+
+    The digest only depends on the file's content, so a sample analyzed
+    again keeps its existing rows.
+
+    Args:
+        file_id: File UUID as string.
+        sha256: File SHA256.
+        signature: Encoded MinHash signature.
+        features: Number of distinct chunks behind the signature.
+        buckets: LSH bucket of each band of the signature.
+    """
+    async with AsyncSession(_engine) as session:
+        try:
+            from sqlalchemy import text
+
+            inserted = await session.execute(
+                text(
+                    """
+                    INSERT INTO sample_similarity
+                        (file_id, sha256, signature, feature_count, created_at)
+                    VALUES (:file_id, :sha256, :signature, :features, :now)
+                    ON CONFLICT (file_id) DO NOTHING
+                    """
+                ),
+                {
+                    "file_id": UUID(file_id),
+                    "sha256": sha256,
+                    "signature": signature,
+                    "features": features,
+                    "now": datetime.now(timezone.utc),
+                },
+            )
+            if inserted.rowcount:
+                await session.execute(
+                    text(
+                        """
+                        INSERT INTO similarity_buckets (band, bucket, file_id)
+                        SELECT band, bucket, :file_id
+                        FROM unnest(CAST(:bands AS smallint[]), CAST(:buckets AS bigint[]))
+                            AS t(band, bucket)
+                        ON CONFLICT DO NOTHING
+                        """
+                    ),
+                    {
+                        "file_id": UUID(file_id),
+                        "bands": list(range(len(buckets))),
+                        "buckets": buckets,
+                    },
+                )
+            await session.commit()
+
+            log.info("sample_similarity_indexed", file_id=file_id, new=bool(inserted.rowcount))
+
+        except Exception as e:
+            log.error("sample_similarity_index_failed", file_id=file_id, error=str(e))
+            # Don't raise - the sample is only missing from similarity lookups
+            await session.rollback()
@@ -0,0 +1,337 @@
+"""DLQ inspection and rate-limited bulk replay tool.
+
+Usage:
+    python -m malscan_worker.dlq inspect [--limit N]
+    python -m malscan_worker.dlq replay [--reason REASON ...] [--limit N]
+        [--batch-size N] [--rate MSGS_PER_SEC] [--dry-run] [--drop-completed]
+
+Messages are fetched with ``basic.get`` and held unacked while the tool runs,
+so each message is seen once; everything that is not replayed (or dropped) is
+returned to the DLQ with ``nack(requeue=True)`` on exit. Replays go to
+``settings.rabbitmq_queue`` through a channel with publisher confirms, and a
+DLQ message is only acked after its replay has been confirmed.
+"""
+
+import argparse
+import asyncio
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+import aio_pika
+import structlog
+
+from malscan_worker.config import get_settings
+from malscan_worker.db import get_completed_sha256s, update_job_status
+from malscan_worker.retry import (
+    DLQ_QUEUE,
+    FAILED_AT_HEADER,
+    FAILURE_ERROR_HEADER,
+    FAILURE_REASON_HEADER,
+    RETRY_COUNT_HEADER,
+)
+
+log = structlog.get_logger()
+settings = get_settings()
+
+# Headers describing previous failures, dropped when a message is replayed
+_FAILURE_HEADERS = (
+    "x-death",
+    RETRY_COUNT_HEADER,
+    FAILURE_REASON_HEADER,
+    FAILURE_ERROR_HEADER,
+    FAILED_AT_HEADER,
+)
+
+# Number of sample job IDs listed per failure group
+_SAMPLE_SIZE = 5
+
+
+def _header_str(value: Any) -> str | None:
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    return str(value) if value is not None else None
+
+
+def failure_reason(headers: dict[str, Any]) -> str:
+    """Failure category of a DLQ message.
+
+    Uses the reason stamped by the worker, falling back to the broker's
+    x-death reason for messages that were rejected without one.
+    """
+    reason = _header_str(headers.get(FAILURE_REASON_HEADER))
+    if reason:
+        return reason
+
+    x_death = headers.get("x-death")
+    if isinstance(x_death, list) and x_death and isinstance(x_death[0], dict):
+        return f"x-death:{_header_str(x_death[0].get('reason'))}"
+    return "unknown"
+
+
+def replay_headers(headers: dict[str, Any]) -> dict[str, Any]:
+    """Headers for a replayed message: failure history removed, replay stamped."""
+    cleaned = {k: v for k, v in headers.items() if k not in _FAILURE_HEADERS}
+    cleaned["x-replayed-at"] = datetime.now(timezone.utc).isoformat()
+    return cleaned
+
+
+@dataclass
+class DlqEntry:
+    """A message fetched from the DLQ."""
+
+    message: aio_pika.abc.AbstractIncomingMessage
+    job: dict[str, Any] = field(default_factory=dict)
+    reason: str = "unknown"
+
+    @classmethod
+    def from_message(cls, message: aio_pika.abc.AbstractIncomingMessage) -> "DlqEntry":
+        headers = dict(message.headers or {})
+        try:
+            job = json.loads(message.body.decode())
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return cls(message=message, job={}, reason="invalid_message")
+        if not isinstance(job, dict):
+            return cls(message=message, job={}, reason="invalid_message")
+        return cls(message=message, job=job, reason=failure_reason(headers))
+
+
+def summarize(entries: list[DlqEntry]) -> dict[str, dict[str, Any]]:
+    """Group DLQ entries by failure reason.
+
+    Returns:
+        Mapping of reason to count, sample job IDs, a sample error and the
+        failure time range, ordered by descending count.
+    """
+    groups: dict[str, dict[str, Any]] = {}
+    for entry in entries:
+        headers = dict(entry.message.headers or {})
+        group = groups.setdefault(
+            entry.reason,
+            {
+                "count": 0,
+                "sample_job_ids": [],
+                "sample_error": _header_str(headers.get(FAILURE_ERROR_HEADER)),
+                "first_failed_at": None,
+                "last_failed_at": None,
+            },
+        )
+        group["count"] += 1
+        job_id = entry.job.get("job_id")
+        if job_id and len(group["sample_job_ids"]) < _SAMPLE_SIZE:
+            group["sample_job_ids"].append(job_id)
+
+        failed_at = _header_str(headers.get(FAILED_AT_HEADER))
+        if failed_at:
+            if group["first_failed_at"] is None or failed_at < group["first_failed_at"]:
+                group["first_failed_at"] = failed_at
+            if group["last_failed_at"] is None or failed_at > group["last_failed_at"]:
+                group["last_failed_at"] = failed_at
+
+    return dict(sorted(groups.items(), key=lambda item: -item[1]["count"]))
+
+
+async def fetch_entries(queue: aio_pika.abc.AbstractQueue, limit: int) -> list[DlqEntry]:
+    """Fetch up to limit messages from the DLQ without acking them."""
+    entries: list[DlqEntry] = []
+    while len(entries) < limit:
+        message = await queue.get(no_ack=False, fail=False)
+        if message is None:
+            break
+        entries.append(DlqEntry.from_message(message))
+    return entries
+
+
+async def _release(entries: list[DlqEntry]) -> None:
+    """Return held messages to the DLQ."""
+    for entry in entries:
+        try:
+            await entry.message.nack(requeue=True)
+        except Exception as e:
+            log.warning("dlq_release_failed", job_id=entry.job.get("job_id"), error=str(e))
+
+
+async def replay_messages(
+    queue: aio_pika.abc.AbstractQueue,
+    exchange: aio_pika.abc.AbstractExchange,
+    reasons: list[str] | None = None,
+    limit: int = 1000,
+    batch_size: int = 50,
+    rate: float = 10.0,
+    dry_run: bool = False,
+    drop_completed: bool = False,
+) -> dict[str, int]:
+    """Replay DLQ messages back to the main queue.
+
+    Args:
+        queue: The DLQ.
+        exchange: Exchange to publish replays to (the default exchange).
+        reasons: Only replay messages with one of these failure reasons (all if empty).
+        limit: Maximum number of DLQ messages to scan.
+        batch_size: Messages published concurrently per batch.
+        rate: Maximum replays per second.
+        dry_run: Report what would be replayed without publishing.
+        drop_completed: Ack (remove) messages whose sample already has a
+            completed result instead of leaving them in the DLQ.
+
+    Returns:
+        Counters: scanned, replayed, filtered, skipped_completed, invalid, failed.
+    """
+    stats: Counter[str] = Counter()
+    held: list[DlqEntry] = []
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    try:
+        while stats["scanned"] < limit:
+            batch = await fetch_entries(queue, min(batch_size, limit - stats["scanned"]))
+            if not batch:
+                break
+            stats["scanned"] += len(batch)
+
+            candidates: list[DlqEntry] = []
+            for entry in batch:
+                if not entry.job:
+                    stats["invalid"] += 1
+                    held.append(entry)
+                elif reasons and entry.reason not in reasons:
+                    stats["filtered"] += 1
+                    held.append(entry)
+                else:
+                    candidates.append(entry)
+
+            completed = await get_completed_sha256s(
+                [e.job["sha256"] for e in candidates if e.job.get("sha256")]
+            )
+
+            to_publish: list[DlqEntry] = []
+            for entry in candidates:
+                if entry.job.get("sha256") in completed:
+                    stats["skipped_completed"] += 1
+                    if drop_completed and not dry_run:
+                        await entry.message.ack()
+                    else:
+                        held.append(entry)
+                else:
+                    to_publish.append(entry)
+
+            if dry_run:
+                stats["replayed"] += len(to_publish)
+                held.extend(to_publish)
+                continue
+
+            outcomes = await asyncio.gather(
+                *(
+                    exchange.publish(
+                        aio_pika.Message(
+                            body=entry.message.body,
+                            headers=replay_headers(dict(entry.message.headers or {})),
+                            content_type=entry.message.content_type,
+                            timestamp=entry.message.timestamp,
+                            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                        ),
+                        routing_key=settings.rabbitmq_queue,
+                    )
+                    for entry in to_publish
+                ),
+                return_exceptions=True,
+            )
+
+            for entry, outcome in zip(to_publish, outcomes, strict=True):
+                job_id = entry.job.get("job_id")
+                if isinstance(outcome, BaseException):
+                    log.error("dlq_replay_publish_failed", job_id=job_id, error=str(outcome))
+                    stats["failed"] += 1
+                    held.append(entry)
+                    continue
+                await entry.message.ack()
+                stats["replayed"] += 1
+                if job_id:
+                    await update_job_status(job_id, "queued")
+
+            log.info("dlq_replay_batch_done", **stats)
+
+            # Rate limit: never get ahead of rate replays per second
+            ahead = stats["replayed"] / rate - (loop.time() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+
+    finally:
+        await _release(held)
+
+    return dict(stats)
+
+
+async def _open_dlq(
+    connection: aio_pika.abc.AbstractRobustConnection,
+) -> tuple[aio_pika.abc.AbstractChannel, aio_pika.abc.AbstractQueue]:
+    channel = await connection.channel(publisher_confirms=True)
+    queue = await channel.declare_queue(DLQ_QUEUE, durable=True)
+    return channel, queue
+
+
+async def inspect(limit: int) -> dict[str, Any]:
+    """Summarize DLQ contents grouped by failure reason."""
+    connection = await aio_pika.connect_robust(settings.rabbitmq_url)
+    async with connection:
+        _, queue = await _open_dlq(connection)
+        entries = await fetch_entries(queue, limit)
+        try:
+            return {"scanned": len(entries), "reasons": summarize(entries)}
+        finally:
+            await _release(entries)
+
+
+async def replay(args: argparse.Namespace) -> dict[str, int]:
+    """Replay DLQ messages according to CLI arguments."""
+    connection = await aio_pika.connect_robust(settings.rabbitmq_url)
+    async with connection:
+        channel, queue = await _open_dlq(connection)
+        return await replay_messages(
+            queue,
+            channel.default_exchange,
+            reasons=args.reason,
+            limit=args.limit,
+            batch_size=args.batch_size,
+            rate=args.rate,
+            dry_run=args.dry_run,
+            drop_completed=args.drop_completed,
+        )
+
+
+def main() -> None:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Inspect and replay the MalScan DLQ")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    inspect_parser = subparsers.add_parser("inspect", help="Group DLQ messages by failure reason")
+    inspect_parser.add_argument("--limit", type=int, default=10000)
+
+    replay_parser = subparsers.add_parser("replay", help="Replay DLQ messages to the main queue")
+    replay_parser.add_argument(
+        "--reason",
+        action="append",
+        help="Only replay this failure reason (repeatable), e.g. stage:clamav",
+    )
+    replay_parser.add_argument("--limit", type=int, default=1000)
+    replay_parser.add_argument("--batch-size", type=int, default=50)
+    replay_parser.add_argument("--rate", type=float, default=10.0, help="Replays per second")
+    replay_parser.add_argument("--dry-run", action="store_true")
+    replay_parser.add_argument(
+        "--drop-completed",
+        action="store_true",
+        help="Remove messages whose sample already has a completed result",
+    )
+
+    args = parser.parse_args()
+    if args.command == "inspect":
+        result: dict[str, Any] = asyncio.run(inspect(args.limit))
+    else:
+        result = asyncio.run(replay(args))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
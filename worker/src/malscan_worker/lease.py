@@ -0,0 +1,111 @@
+"""Job leases and the expired-lease reaper.
+
+A worker starting a job takes a lease on its row (``lease_owner``,
+``lease_expires_at``) and renews it every ``job_lease_heartbeat_seconds``
+while the pipeline runs; finishing the job releases it. A worker that dies
+mid-pipeline (OOM kill, node loss) stops renewing, so its jobs' leases
+expire within ``job_lease_ttl_seconds``.
+
+The reaper runs in every worker and, every ``lease_reaper_interval_seconds``,
+releases expired jobs in batches found through the partial index on
+``lease_expires_at``: back to ``queued`` while RabbitMQ redelivers the
+unacked message, or ``failed`` after ``job_lease_max_attempts`` deliveries.
+"""
+
+import asyncio
+import os
+import socket
+
+import structlog
+
+from malscan_worker.config import get_settings
+from malscan_worker.db import acquire_job_lease, reap_expired_leases, renew_job_lease
+from malscan_worker.metrics import job_lease_lost, job_leases_reaped
+
+log = structlog.get_logger()
+settings = get_settings()
+
+WORKER_ID = settings.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseAttemptsExceededError(RuntimeError):
+    """A job was delivered more times than job_lease_max_attempts."""
+
+
+class JobLease:
+    """Lease on a running job, renewed by a heartbeat task."""
+
+    def __init__(self, job_id: str, owner: str = WORKER_ID) -> None:
+        self.job_id = job_id
+        self.owner = owner
+        self._heartbeat: asyncio.Task[None] | None = None
+
+    async def acquire(self) -> int | None:
+        """Take the lease and start the heartbeat.
+
+        Returns:
+            Delivery attempts of the job including this one, None if unknown.
+        """
+        attempts = await acquire_job_lease(self.job_id, self.owner)
+        self._heartbeat = asyncio.create_task(self._renew_until_cancelled())
+        return attempts
+
+    async def release(self) -> None:
+        """Stop the heartbeat.
+
+        The row's lease is cleared by the final status update; a job left
+        scanning is picked up by the reaper once the lease expires.
+        """
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+
+    async def _renew_until_cancelled(self) -> None:
+        while True:
+            await asyncio.sleep(settings.job_lease_heartbeat_seconds)
+            held = await renew_job_lease(self.job_id, self.owner)
+            if held is False:
+                job_lease_lost.inc()
+                log.warning("job_lease_lost", job_id=self.job_id, owner=self.owner)
+
+
+async def reap_once() -> int:
+    """Release every job whose lease has expired, one batch at a time.
+
+    Returns:
+        Number of jobs released.
+    """
+    total = 0
+    while True:
+        released = await reap_expired_leases(
+            settings.lease_reaper_batch_size, settings.job_lease_max_attempts
+        )
+        for job_id, status in released:
+            outcome = "failed" if status == "failed" else "retry"
+            job_leases_reaped.labels(outcome=outcome).inc()
+            log.warning("job_lease_expired", job_id=job_id, outcome=outcome)
+        total += len(released)
+        if len(released) < settings.lease_reaper_batch_size:
+            return total
+
+
+async def run_lease_reaper(shutdown_event: asyncio.Event) -> None:
+    """Reap expired leases until shutdown."""
+    log.info("lease_reaper_started", interval=settings.lease_reaper_interval_seconds)
+
+    while not shutdown_event.is_set():
+        try:
+            await reap_once()
+        except Exception as e:
+            log.warning("lease_reaper_failed", error=str(e))
+
+        try:
+            await asyncio.wait_for(
+                shutdown_event.wait(),
+                timeout=settings.lease_reaper_interval_seconds,
+            )
+        except asyncio.TimeoutError:
+            pass
+
+    log.info("lease_reaper_stopped")
@@ -8,7 +8,14 @@ import structlog
 
 from malscan_worker.config import get_settings
 from malscan_worker.consumer import start_consumer
+from malscan_worker.lease import run_lease_reaper
 from malscan_worker.metrics import start_metrics_server
+from malscan_worker.pipeline import STAGES
+from malscan_worker.queue_monitor import run_queue_monitor
+from malscan_worker.readiness import warm_up
+from malscan_worker.ruleset import run_ruleset_poller
+from malscan_worker.stages.yara_scan import YaraStage
+from malscan_worker.tracing import configure_tracing
 
 # Configure structlog
 structlog.configure(
@@ -44,6 +51,28 @@ async def main() -> None:
     metrics_runner = await start_metrics_server(port=settings.metrics_port)
     log.info("metrics_server_started", port=settings.metrics_port)
 
+    tracer_provider = configure_tracing("malscan-worker")
+
+    # Initialize stages and connection pools before taking jobs; /ready
+    # stays unready until this completes
+    await warm_up(STAGES)
+
+    # Start queue signal collector for autoscaling metrics
+    monitor_task = None
+    if settings.queue_monitor_enabled:
+        monitor_task = asyncio.create_task(run_queue_monitor(shutdown_event))
+
+    # Release jobs of workers that died mid-pipeline
+    reaper_task = None
+    if settings.lease_reaper_enabled:
+        reaper_task = asyncio.create_task(run_lease_reaper(shutdown_event))
+
+    # Switch to newly published YARA rulesets
+    ruleset_task = None
+    if settings.yara_ruleset_store != "none":
+        yara_stage = next(stage for stage in STAGES if isinstance(stage, YaraStage))
+        ruleset_task = asyncio.create_task(run_ruleset_poller(yara_stage, shutdown_event))
+
     try:
         # Start RabbitMQ consumer
         await start_consumer(shutdown_event)
@@ -52,6 +81,17 @@ async def main() -> None:
         raise
     finally:
         # Cleanup
+        if monitor_task is not None:
+            monitor_task.cancel()
+            await asyncio.gather(monitor_task, return_exceptions=True)
+        if reaper_task is not None:
+            reaper_task.cancel()
+            await asyncio.gather(reaper_task, return_exceptions=True)
+        if ruleset_task is not None:
+            ruleset_task.cancel()
+            await asyncio.gather(ruleset_task, return_exceptions=True)
+        if tracer_provider is not None:
+            tracer_provider.shutdown()
         await metrics_runner.cleanup()
         log.info("worker_shutdown_complete")
 
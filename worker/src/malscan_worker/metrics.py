@@ -1,5 +1,9 @@
 """Prometheus metrics server for worker."""
 
+from collections.abc import Mapping
+from contextvars import ContextVar
+from types import MappingProxyType
+
 from aiohttp import web
 from prometheus_client import (
     CONTENT_TYPE_LATEST,
@@ -23,9 +27,103 @@ stage_latency = Histogram(
     buckets=[0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300],
 )
 
+# Job latency decomposition, labelled by the current job's file-size bucket
+# and MIME family (see job_labels)
+JOB_LABELS = ["size_bucket", "mime_family"]
+
+job_queue_wait = Histogram(
+    "malscan_job_queue_wait_seconds",
+    "Time from publish to the start of the first processing attempt",
+    JOB_LABELS,
+    buckets=[0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600],
+)
+
+download_latency = Histogram(
+    "malscan_download_seconds",
+    "Sample download duration (MinIO or sample cache)",
+    JOB_LABELS,
+    buckets=[0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30],
+)
+
+download_throughput = Histogram(
+    "malscan_download_throughput_bytes_per_second",
+    "Sample download throughput",
+    JOB_LABELS,
+    buckets=[1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8, 1e9],
+)
+
+db_update_latency = Histogram(
+    "malscan_db_update_seconds",
+    "Duration of job row updates",
+    ["operation", *JOB_LABELS],  # update_job_status, update_job_stage, update_job_result
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5],
+)
+
+report_build_latency = Histogram(
+    "malscan_report_build_seconds",
+    "Duration of building the analysis result",
+    JOB_LABELS,
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5],
+)
+
+job_end_to_end = Histogram(
+    "malscan_job_end_to_end_seconds",
+    "Time from publish to the final outcome of a job, including retries",
+    ["status", *JOB_LABELS],  # done, failed
+    buckets=[1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600],
+)
+
+# Upper bounds (exclusive) of the file-size label buckets
+_SIZE_BUCKETS = [
+    (64 * 1024, "lt_64k"),
+    (1024 * 1024, "lt_1m"),
+    (10 * 1024 * 1024, "lt_10m"),
+]
+
+# Labels of the job being processed in the current task
+job_labels: ContextVar[Mapping[str, str]] = ContextVar(
+    "job_labels",
+    default=MappingProxyType({"size_bucket": "unknown", "mime_family": "unknown"}),
+)
+
+
+def size_bucket(size: int | None) -> str:
+    """File-size label for latency metrics."""
+    if size is None or size < 0:
+        return "unknown"
+    for bound, label in _SIZE_BUCKETS:
+        if size < bound:
+            return label
+    return "ge_10m"
+
+
 queue_depth = Gauge(
     "malscan_queue_depth",
     "Number of pending jobs in queue",
+    ["queue"],
+)
+
+queue_consumers = Gauge(
+    "malscan_queue_consumers",
+    "Number of consumers attached to queue",
+    ["queue"],
+)
+
+queue_oldest_message_age = Gauge(
+    "malscan_queue_oldest_message_age_seconds",
+    "Age of the oldest message waiting in queue",
+    ["queue"],
+)
+
+queue_drain_eta = Gauge(
+    "malscan_queue_drain_eta_seconds",
+    "Estimated time to drain the main queue at recent throughput",
+)
+
+stage_throughput_rate = Gauge(
+    "malscan_stage_throughput_per_second",
+    "Stage executions per second over the recent window (this worker)",
+    ["stage"],
 )
 
 worker_active_jobs = Gauge(
@@ -33,6 +131,148 @@ worker_active_jobs = Gauge(
     "Currently processing jobs",
 )
 
+job_leases_reaped = Counter(
+    "malscan_job_leases_reaped_total",
+    "Scanning jobs released by the reaper after their worker lease expired",
+    ["outcome"],  # retry, failed
+)
+
+job_lease_lost = Counter(
+    "malscan_job_lease_lost_total",
+    "Heartbeats that found the job's lease taken over or released",
+)
+
+# Startup
+worker_startup_seconds = Gauge(
+    "malscan_worker_startup_seconds",
+    "Duration of each startup step (warm-up components, broker connection, total)",
+    ["component"],
+)
+
+worker_warm_up_ok = Gauge(
+    "malscan_worker_warm_up_ok",
+    "Whether a component warmed up successfully (1) or failed (0)",
+    ["component"],
+)
+
+# External engine subprocesses
+engine_invocations = Counter(
+    "malscan_engine_invocations_total",
+    "External engine invocations by outcome",
+    ["engine", "outcome"],  # ok, signaled, timeout, cancelled, error
+)
+
+engine_batch_size = Histogram(
+    "malscan_engine_batch_size",
+    "Samples scanned per engine invocation by the micro-batcher",
+    ["engine"],
+    buckets=[1, 2, 4, 8, 16, 32, 64],
+)
+
+engine_batch_fallbacks = Counter(
+    "malscan_engine_batch_fallbacks_total",
+    "Failed batch invocations retried one sample per invocation",
+    ["engine"],
+)
+
+engine_cpu_seconds = Histogram(
+    "malscan_engine_cpu_seconds",
+    "CPU time (user + system) per engine invocation",
+    ["engine"],
+    buckets=[0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300],
+)
+
+engine_max_rss_bytes = Histogram(
+    "malscan_engine_max_rss_bytes",
+    "Peak resident set size per engine invocation",
+    ["engine"],
+    buckets=[16e6, 32e6, 64e6, 128e6, 256e6, 512e6, 1e9, 2e9, 4e9],
+)
+
+# YARA rule files (namespaces) and rules
+yara_rule_file_seconds = Histogram(
+    "malscan_yara_rule_file_seconds",
+    "Scan time of one sample with one YARA rule file",
+    ["namespace"],
+    buckets=[0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30],
+)
+
+yara_scan_seconds = Histogram(
+    "malscan_yara_scan_seconds",
+    "YARA scan time of one sample with its applicable rule files, by file type class",
+    ["file_class"],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60],
+)
+
+yara_rule_matches = Counter(
+    "malscan_yara_rule_matches_total",
+    "Samples matched by a YARA rule",
+    ["namespace", "rule"],
+)
+
+yara_rule_file_quarantined = Gauge(
+    "malscan_yara_rule_file_quarantined",
+    "Whether a YARA rule file is skipped for exceeding its time budget",
+    ["namespace"],
+)
+
+yara_ruleset_loads = Counter(
+    "malscan_yara_ruleset_loads_total",
+    "YARA ruleset loads by outcome (artifact, source, incompatible, failed)",
+    ["outcome"],
+)
+
+stage_profiles = Counter(
+    "malscan_stage_profiles_total",
+    "Profiled stage executions",
+    ["stage", "mode"],
+)
+
+# Adaptive concurrency
+worker_concurrency_limit = Gauge(
+    "malscan_worker_concurrency_limit",
+    "Current limit on concurrently processed jobs",
+)
+
+worker_concurrency_adjustments = Counter(
+    "malscan_worker_concurrency_adjustments_total",
+    "Concurrency limit changes by direction and reason",
+    ["direction", "reason"],  # up/down; headroom, latency, loop_lag, memory, cpu
+)
+
+worker_concurrency_signal = Gauge(
+    "malscan_worker_concurrency_signal",
+    "Last observed value of each concurrency controller signal",
+    ["signal"],  # latency_inflation, loop_lag, memory_fraction, cpu_fraction
+)
+
+# Sample cache
+sample_cache_requests = Counter(
+    "malscan_sample_cache_requests_total",
+    "Sample cache lookups by result",
+    ["result"],  # hit, miss
+)
+
+sample_cache_hit_ratio = Gauge(
+    "malscan_sample_cache_hit_ratio",
+    "Sample cache hit ratio since worker start",
+)
+
+sample_cache_bytes_saved = Counter(
+    "malscan_sample_cache_bytes_saved_total",
+    "Bytes served from the sample cache instead of MinIO",
+)
+
+sample_cache_size_bytes = Gauge(
+    "malscan_sample_cache_size_bytes",
+    "Current size of the sample cache",
+)
+
+sample_cache_evictions = Counter(
+    "malscan_sample_cache_evictions_total",
+    "Samples evicted from the sample cache",
+)
+
 
 async def metrics_handler(request: web.Request) -> web.Response:
     """Prometheus metrics endpoint."""
@@ -48,8 +288,12 @@ async def health_handler(request: web.Request) -> web.Response:
 
 
 async def ready_handler(request: web.Request) -> web.Response:
-    """Readiness check endpoint."""
-    return web.Response(text="ready")
+    """Readiness check endpoint: warmed up, connected to RabbitMQ, not saturated."""
+    # Imported here: readiness depends on the concurrency limiter, which uses this module
+    from malscan_worker.readiness import readiness_report
+
+    ready, report = readiness_report()
+    return web.json_response(report, status=200 if ready else 503)
 
 
 async def start_metrics_server(port: int = 9090) -> web.AppRunner:
@@ -59,6 +303,17 @@ async def start_metrics_server(port: int = 9090) -> web.AppRunner:
     app.router.add_get("/health", health_handler)
     app.router.add_get("/ready", ready_handler)
 
+    # Imported here: the profiler depends on storage, which depends on this module
+    from malscan_worker.profiling import top_handler, trigger_handler
+
+    app.router.add_post("/profiling/trigger", trigger_handler)
+    app.router.add_get("/profiling/top", top_handler)
+
+    from malscan_worker.rule_stats import release_handler, slow_handler
+
+    app.router.add_get("/yara/rules/slow", slow_handler)
+    app.router.add_post("/yara/rules/release", release_handler)
+
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, "0.0.0.0", port)
@@ -1,34 +1,71 @@
 """Pipeline orchestrator for running analysis stages."""
 
 import asyncio
+import base64
 import shutil
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
 import structlog
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
 
 from malscan_worker.config import get_settings
-from malscan_worker.db import update_job_result, update_job_stage, update_job_status
-from malscan_worker.metrics import stage_latency
-from malscan_worker.stages.base import StageContext, StageResult
+from malscan_worker.db import (
+    delete_stage_checkpoints,
+    index_job_iocs,
+    index_sample_similarity,
+    load_stage_checkpoints,
+    save_stage_checkpoint,
+    update_job_result,
+    update_job_stage,
+    update_job_status,
+)
+from malscan_worker.metrics import (
+    download_latency,
+    download_throughput,
+    job_labels,
+    report_build_latency,
+    size_bucket,
+    stage_latency,
+)
+from malscan_worker.profiling import stage_profiler
+from malscan_worker.reports import prepare_stored_result
+from malscan_worker.similarity import band_buckets, decode_signature
+from malscan_worker.stages.base import Stage, StageContext, StageResult
 from malscan_worker.stages.clamav import ClamAVStage
-from malscan_worker.stages.filetype import FileTypeStage
+from malscan_worker.stages.entropy import EntropyStage
+from malscan_worker.stages.filetype import FileTypeStage, mime_family
 from malscan_worker.stages.ioc_extract import IocExtractStage
 from malscan_worker.stages.sandbox import SandboxStage
+from malscan_worker.stages.similarity import SimilarityStage
 from malscan_worker.stages.yara_scan import YaraStage
 from malscan_worker.storage import download_file
+from malscan_worker.throughput import stage_throughput
+from malscan_worker.tracing import tracer
 
 log = structlog.get_logger()
 settings = get_settings()
 
 
+class PipelineError(RuntimeError):
+    """Pipeline failure attributed to a stage (or to the sample download)."""
+
+    def __init__(self, stage: str, message: str) -> None:
+        super().__init__(message)
+        self.stage = stage
+
+
 # Stage order
 STAGES = [
     FileTypeStage(),
+    EntropyStage(),
     ClamAVStage(),
     YaraStage(),
     IocExtractStage(),
+    SimilarityStage(),
     SandboxStage(),
 ]
 
@@ -98,14 +135,40 @@ def _build_analysis_result(
     iocs = {
         "urls": ioc_findings.get("urls", []),
         "domains": ioc_findings.get("domains", []),
-        "ips": ioc_findings.get("ip_addresses", []),
+        "ips": ioc_findings.get("ips", []),
         "hashes": {
-            "md5": ioc_findings.get("md5", ""),
-            "sha1": ioc_findings.get("sha1", ""),
+            "md5": ioc_findings.get("hashes", {}).get("md5", ""),
+            "sha1": ioc_findings.get("hashes", {}).get("sha1", ""),
             "sha256": ctx.sha256,
         },
     }
 
+    # Byte statistics; per-window entropies are not kept anywhere, only their
+    # downsampled profile and the high-entropy regions
+    entropy = stage_findings.get("entropy", {})
+    entropy_summary = {
+        key: entropy[key]
+        for key in (
+            "entropy",
+            "chi_square",
+            "unique_bytes",
+            "printable_ratio",
+            "null_ratio",
+            "byte_histogram",
+            "window_bytes",
+            "min_window_entropy",
+            "max_window_entropy",
+            "high_entropy_ratio",
+            "high_entropy_regions_total",
+            "high_entropy_regions",
+            "profile",
+        )
+        if key in entropy
+    }
+
+    # Near-duplicates (the signature itself is only kept in the index)
+    similarity = stage_findings.get("similarity", {})
+
     # Build timing info
     timings = {
         "total_ms": total_ms,
@@ -131,13 +194,132 @@ def _build_analysis_result(
                 "threat_name": clamav.get("threat_name"),
             },
             "yara_hits": yara_matches,
+            # Rules the sample was scanned with, for cache keys and auditing
+            "yara_ruleset": yara.get("ruleset_version"),
+            # Rule files skipped for exceeding their time budget
+            "yara_quarantined": yara.get("quarantined", []),
             "iocs": iocs,
+            "entropy": entropy_summary,
+            "similarity": {
+                "features": similarity.get("features", 0),
+                "similar": similarity.get("similar", []),
+            },
             "sandbox": stage_findings.get("sandbox", {}),
         },
         "timings": timings,
     }
 
 
+async def _index_similarity(file_id: str, sha256: str, findings: dict[str, Any]) -> None:
+    """Add the sample's similarity digest, if it has one, to the index."""
+    if not findings.get("signature"):
+        return
+    encoded = base64.b64decode(findings["signature"])
+    await index_sample_similarity(
+        file_id, sha256, encoded, findings["features"], band_buckets(decode_signature(encoded))
+    )
+
+
+def _annotate_job(span: trace.Span, result: StageResult) -> None:
+    """Copy sample attributes found by stages onto the job span and metric labels."""
+    mime_type = result.findings.get("mime_type")
+    if mime_type:
+        span.set_attribute("file.mime", mime_type)
+        job_labels.set({**job_labels.get(), "mime_family": mime_family(mime_type)})
+
+
+async def _execute_stage(stage: Stage, ctx: StageContext, index: int) -> StageResult:
+    """Run one stage with timeout, record metrics and checkpoint its result.
+
+    Stage exceptions and timeouts are turned into a failed StageResult.
+    """
+    job_id = ctx.job_id
+    file_id = ctx.file_id
+    stage_name = stage.name
+    stages_done = index  # 0-indexed, stages_done before this stage
+
+    with tracer.start_as_current_span(
+        f"stage.{stage_name}",
+        attributes={"stage.name": stage_name, "stage.version": stage.version},
+    ) as span:
+        log.info(
+            "stage_started",
+            job_id=job_id,
+            file_id=file_id,
+            stage=stage_name,
+            stage_number=index + 1,
+            stages_total=len(STAGES),
+        )
+
+        # Update job stage in database
+        await update_job_stage(job_id, stage_name, stages_done)
+
+        execution = stage.execute(ctx)
+        if stage_profiler.should_profile(stage_name):
+            execution = stage_profiler.profile(stage_name, job_id, execution)
+
+        try:
+            # Run stage with timeout
+            result = await asyncio.wait_for(
+                execution,
+                timeout=settings.stage_timeout_seconds,
+            )
+        except asyncio.TimeoutError:
+            result = StageResult(
+                stage_name=stage_name,
+                status="failed",
+                started_at=datetime.now(timezone.utc),
+                ended_at=datetime.now(timezone.utc),
+                duration_ms=settings.stage_timeout_seconds * 1000,
+                findings={},
+                artifacts=[],
+                error=f"Stage timeout after {settings.stage_timeout_seconds}s",
+            )
+        except Exception as e:
+            log.error(
+                "stage_error",
+                job_id=job_id,
+                file_id=file_id,
+                stage=stage_name,
+                error=str(e),
+            )
+            result = StageResult(
+                stage_name=stage_name,
+                status="failed",
+                started_at=datetime.now(timezone.utc),
+                ended_at=datetime.now(timezone.utc),
+                duration_ms=0,
+                findings={},
+                artifacts=[],
+                error=str(e),
+            )
+
+        # Record metrics
+        stage_latency.labels(stage=stage_name, status=result.status).observe(
+            result.duration_ms / 1000
+        )
+        stage_throughput.record(stage_name, result.duration_ms / 1000)
+
+        log.info(
+            "stage_completed",
+            job_id=job_id,
+            file_id=file_id,
+            stage=stage_name,
+            status=result.status,
+            duration_ms=result.duration_ms,
+        )
+
+        if settings.checkpoint_enabled and result.status != "failed":
+            await save_stage_checkpoint(job_id, stage_name, stage.version, result.to_dict())
+
+        span.set_attributes(
+            {"stage.status": result.status, "stage.duration_ms": result.duration_ms}
+        )
+        if result.status == "failed":
+            span.set_status(Status(StatusCode.ERROR, result.error))
+        return result
+
+
 async def run_pipeline(job_data: dict[str, Any]) -> dict[str, Any]:
     """
     Run the analysis pipeline.
@@ -149,7 +331,7 @@ async def run_pipeline(job_data: dict[str, Any]) -> dict[str, Any]:
         Complete analysis results.
 
     Raises:
-        RuntimeError: If any stage fails or file download fails.
+        PipelineError: If any stage fails or file download fails.
     """
     job_id = job_data["job_id"]
     file_id = job_data["file_id"]
@@ -166,15 +348,27 @@ async def run_pipeline(job_data: dict[str, Any]) -> dict[str, Any]:
     # Create work directory
     work_dir = Path(f"/tmp/{job_id}")
 
+    job_span = trace.get_current_span()
+
     try:
         # Download file from MinIO
         try:
-            file_path = await download_file(storage_key, work_dir)
+            download_start = time.perf_counter()
+            with tracer.start_as_current_span("storage.download") as span:
+                file_path = await download_file(storage_key, work_dir, job_data.get("sha256"))
+                file_size = file_path.stat().st_size
+                span.set_attribute("file.size", file_size)
+            download_seconds = time.perf_counter() - download_start
+            job_span.set_attribute("file.size", file_size)
+            job_labels.set({**job_labels.get(), "size_bucket": size_bucket(file_size)})
+            download_latency.labels(**job_labels.get()).observe(download_seconds)
+            if download_seconds > 0:
+                download_throughput.labels(**job_labels.get()).observe(file_size / download_seconds)
             log.info("file_downloaded", job_id=job_id, file_path=str(file_path))
         except Exception as e:
             log.error("file_download_failed", job_id=job_id, storage_key=storage_key, error=str(e))
             await update_job_status(job_id, "failed", error_message=f"Failed to download file: {e}")
-            raise RuntimeError(f"Failed to download file from MinIO: {e}") from e
+            raise PipelineError("download", f"Failed to download file from MinIO: {e}") from e
 
         # Create context
         ctx = StageContext(
@@ -187,6 +381,10 @@ async def run_pipeline(job_data: dict[str, Any]) -> dict[str, Any]:
             previous_results=[],
         )
 
+        # Checkpoints from a previous delivery of this job
+        checkpoints = await load_stage_checkpoints(job_id) if settings.checkpoint_enabled else {}
+        resuming = bool(checkpoints)
+
         results: list[StageResult] = []
         total_start = datetime.now(timezone.utc)
 
@@ -194,70 +392,28 @@ async def run_pipeline(job_data: dict[str, Any]) -> dict[str, Any]:
             stage_name = stage.name
             stages_done = i  # 0-indexed, stages_done before this stage
 
-            log.info(
-                "stage_started",
-                job_id=job_id,
-                file_id=file_id,
-                stage=stage_name,
-                stage_number=i + 1,
-                stages_total=len(STAGES),
-            )
-
-            # Update job stage in database
-            await update_job_stage(job_id, stage_name, stages_done)
-
-            try:
-                # Run stage with timeout
-                result = await asyncio.wait_for(
-                    stage.execute(ctx),
-                    timeout=settings.stage_timeout_seconds,
-                )
-            except asyncio.TimeoutError:
-                result = StageResult(
-                    stage_name=stage_name,
-                    status="failed",
-                    started_at=datetime.now(timezone.utc),
-                    ended_at=datetime.now(timezone.utc),
-                    duration_ms=settings.stage_timeout_seconds * 1000,
-                    findings={},
-                    artifacts=[],
-                    error=f"Stage timeout after {settings.stage_timeout_seconds}s",
-                )
-            except Exception as e:
-                log.error(
-                    "stage_error",
+            # Reuse the leading run of checkpoints written by the same stage version
+            checkpoint = checkpoints.get(stage_name) if resuming else None
+            if checkpoint is not None and checkpoint[0] == stage.version:
+                result = StageResult.from_dict(checkpoint[1])
+                results.append(result)
+                ctx.previous_results.append(result)
+                _annotate_job(job_span, result)
+                job_span.add_event("stage_restored_from_checkpoint", {"stage": stage_name})
+                log.info(
+                    "stage_restored_from_checkpoint",
                     job_id=job_id,
                     file_id=file_id,
                     stage=stage_name,
-                    error=str(e),
-                )
-                result = StageResult(
-                    stage_name=stage_name,
-                    status="failed",
-                    started_at=datetime.now(timezone.utc),
-                    ended_at=datetime.now(timezone.utc),
-                    duration_ms=0,
-                    findings={},
-                    artifacts=[],
-                    error=str(e),
+                    stage_version=stage.version,
                 )
+                continue
+            resuming = False
 
+            result = await _execute_stage(stage, ctx, i)
             results.append(result)
             ctx.previous_results.append(result)
-
-            # Record metrics
-            stage_latency.labels(stage=stage_name, status=result.status).observe(
-                result.duration_ms / 1000
-            )
-
-            log.info(
-                "stage_completed",
-                job_id=job_id,
-                file_id=file_id,
-                stage=stage_name,
-                status=result.status,
-                duration_ms=result.duration_ms,
-            )
+            _annotate_job(job_span, result)
 
             # Fail-fast: stop on failure
             if result.status == "failed":
@@ -276,7 +432,7 @@ async def run_pipeline(job_data: dict[str, Any]) -> dict[str, Any]:
                     current_stage=stage_name,
                     stages_done=stages_done,
                 )
-                raise RuntimeError(f"Stage {stage_name} failed: {result.error}")
+                raise PipelineError(stage_name, f"Stage {stage_name} failed: {result.error}")
 
         total_end = datetime.now(timezone.utc)
         total_ms = int((total_end - total_start).total_seconds() * 1000)
@@ -289,6 +445,7 @@ async def run_pipeline(job_data: dict[str, Any]) -> dict[str, Any]:
         )
 
         # Build complete result for storage
+        build_start = time.perf_counter()
         analysis_result = _build_analysis_result(
             job_id=job_id,
             file_id=file_id,
@@ -296,9 +453,21 @@ async def run_pipeline(job_data: dict[str, Any]) -> dict[str, Any]:
             results=results,
             total_ms=total_ms,
         )
-
-        # Store result in database
-        await update_job_result(job_id, analysis_result)
+        report_build_latency.labels(**job_labels.get()).observe(time.perf_counter() - build_start)
+
+        # Store result in database (large reports go to the artifacts bucket)
+        with tracer.start_as_current_span("report.store") as span:
+            stored_result = await prepare_stored_result(job_id, analysis_result)
+            span.set_attribute("report.offloaded", "report_ref" in stored_result)
+        await update_job_result(job_id, stored_result)
+        await index_job_iocs(job_id, file_id, analysis_result["results"]["iocs"])
+        await _index_similarity(
+            file_id,
+            ctx.sha256,
+            next((r.findings for r in results if r.stage_name == "similarity"), {}),
+        )
+        if settings.checkpoint_enabled:
+            await delete_stage_checkpoints(job_id)
 
         # Update job status to done
         await update_job_status(
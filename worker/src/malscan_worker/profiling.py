@@ -0,0 +1,258 @@
+"""On-demand CPU profiling of pipeline stages.
+
+A stage execution is profiled when one of these applies:
+
+- it was armed through ``POST /profiling/trigger`` on the metrics server
+  (optionally for one stage, for the next ``count`` executions),
+- ``profiling_every_n_jobs`` is set and this is every N-th execution of a
+  stage listed in ``profiling_stages`` (all stages if the list is empty).
+
+Two profilers are available (``profiling_mode``):
+
+- ``cprofile``: deterministic, stored as a ``.pstats`` file,
+- ``sampling``: a thread samples the event loop thread's stack every
+  ``profiling_sample_interval_seconds``; stored as collapsed stacks
+  (``frame;frame;frame count`` lines, flame graph input).
+
+Profiles are uploaded to ``{job_id}/profiles/{stage}.{ext}`` in the artifacts
+bucket and listed in the stage result's artifacts. Per-stage aggregates are
+served by ``GET /profiling/top``.
+
+Both profilers see the whole event loop thread, so work of other jobs running
+concurrently on the worker is included. At most one stage is profiled at a
+time. External engines run in subprocesses and are not profiled (their CPU
+time is in ``malscan_engine_cpu_seconds``). When nothing is armed and
+``profiling_every_n_jobs`` is 0, the only cost per stage is one attribute
+check.
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+from collections import Counter
+from collections.abc import Awaitable
+from types import FrameType
+from typing import Any
+
+import structlog
+from aiohttp import web
+
+from malscan_worker.config import get_settings
+from malscan_worker.metrics import stage_profiles
+from malscan_worker.stages.base import StageResult
+from malscan_worker.storage import upload_artifact
+
+log = structlog.get_logger()
+settings = get_settings()
+
+# Stack depth recorded by the sampling profiler
+_MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_filename}:{code.co_name}"
+
+
+class _StackSampler:
+    """Samples the stack of one thread from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stage-profiler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack: list[str] = []
+            while frame is not None and len(stack) < _MAX_STACK_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> bytes:
+        lines = [f"{stack} {count}\n" for stack, count in self.stacks.most_common()]
+        return "".join(lines).encode()
+
+
+class StageProfiler:
+    """Decides which stage executions to profile and keeps aggregates."""
+
+    def __init__(self) -> None:
+        self._armed: dict[str | None, int] = {}
+        self._executions: Counter[str] = Counter()
+        self._busy = False
+        self._pstats: dict[str, pstats.Stats] = {}
+        self._self_samples: dict[str, Counter[str]] = {}
+        self._total_samples: dict[str, Counter[str]] = {}
+        self._sample_counts: Counter[str] = Counter()
+        self.enabled = settings.profiling_every_n_jobs > 0
+
+    def arm(self, stage: str | None, count: int) -> None:
+        """Profile the next count executions of stage (any stage if None)."""
+        self._armed[stage] = self._armed.get(stage, 0) + count
+        self.enabled = True
+
+    def armed(self) -> dict[str, int]:
+        return {stage or "*": count for stage, count in self._armed.items()}
+
+    def should_profile(self, stage: str) -> bool:
+        """Whether to profile this execution of stage (consumes a trigger)."""
+        if not self.enabled or self._busy:
+            return False
+
+        for key in (stage, None):
+            if self._armed.get(key, 0) > 0:
+                self._armed[key] -= 1
+                if self._armed[key] == 0:
+                    del self._armed[key]
+                self.enabled = bool(self._armed) or settings.profiling_every_n_jobs > 0
+                return True
+
+        every = settings.profiling_every_n_jobs
+        if every > 0 and (not settings.profiling_stages or stage in settings.profiling_stages):
+            self._executions[stage] += 1
+            return self._executions[stage] % every == 0
+        return False
+
+    async def profile(
+        self, stage: str, job_id: str, execution: Awaitable[StageResult]
+    ) -> StageResult:
+        """Await a stage execution under the profiler and store the profile."""
+        mode = settings.profiling_mode
+        self._busy = True
+        try:
+            if mode == "sampling":
+                sampler = _StackSampler(
+                    threading.get_ident(), settings.profiling_sample_interval_seconds
+                )
+                sampler.start()
+                try:
+                    result = await execution
+                finally:
+                    sampler.stop()
+                data = sampler.collapsed()
+                self._aggregate_samples(stage, sampler.stacks)
+                ext = "collapsed"
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    result = await execution
+                finally:
+                    profiler.disable()
+                profiler.create_stats()
+                data = marshal.dumps(profiler.stats)  # type: ignore[attr-defined]
+                self._aggregate_pstats(stage, profiler)
+                ext = "pstats"
+        finally:
+            self._busy = False
+
+        stage_profiles.labels(stage=stage, mode=mode).inc()
+        key = f"{job_id}/profiles/{stage}.{ext}"
+        try:
+            await upload_artifact(key, data)
+            result.artifacts.append(key)
+            log.info("stage_profile_stored", job_id=job_id, stage=stage, mode=mode, key=key)
+        except Exception as e:
+            log.warning("stage_profile_upload_failed", job_id=job_id, stage=stage, error=str(e))
+        return result
+
+    def _aggregate_pstats(self, stage: str, profiler: cProfile.Profile) -> None:
+        if stage in self._pstats:
+            self._pstats[stage].add(profiler)
+        else:
+            self._pstats[stage] = pstats.Stats(profiler, stream=io.StringIO())
+
+    def _aggregate_samples(self, stage: str, stacks: Counter[str]) -> None:
+        self_samples = self._self_samples.setdefault(stage, Counter())
+        total_samples = self._total_samples.setdefault(stage, Counter())
+        for stack, count in stacks.items():
+            frames = stack.split(";")
+            self_samples[frames[-1]] += count
+            for frame in set(frames):
+                total_samples[frame] += count
+            self._sample_counts[stage] += count
+
+    def top(self, stage: str, limit: int = 20) -> dict[str, Any]:
+        """Aggregated top functions of a stage by own time."""
+        functions: list[dict[str, Any]] = []
+        if stage in self._pstats:
+            stats = self._pstats[stage].stats  # type: ignore[attr-defined]
+            ranked = sorted(stats.items(), key=lambda item: -item[1][2])[:limit]
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in ranked:
+                functions.append(
+                    {
+                        "function": f"{filename}:{line}({name})",
+                        "calls": calls,
+                        "tottime": round(tottime, 6),
+                        "cumtime": round(cumtime, 6),
+                    }
+                )
+            return {"stage": stage, "mode": "cprofile", "functions": functions}
+
+        total = self._sample_counts.get(stage, 0)
+        if total:
+            for frame, count in self._self_samples[stage].most_common(limit):
+                functions.append(
+                    {
+                        "function": frame,
+                        "self_fraction": round(count / total, 4),
+                        "total_fraction": round(self._total_samples[stage][frame] / total, 4),
+                    }
+                )
+        return {"stage": stage, "mode": "sampling", "samples": total, "functions": functions}
+
+    def stages(self) -> list[str]:
+        """Stages with aggregated profile data."""
+        return sorted(set(self._pstats) | set(self._sample_counts))
+
+
+# Process-wide profiler used by the pipeline
+stage_profiler = StageProfiler()
+
+
+async def trigger_handler(request: web.Request) -> web.Response:
+    """Arm profiling: POST /profiling/trigger?stage=yara&count=5."""
+    stage = request.query.get("stage") or None
+    try:
+        count = int(request.query.get("count", "1"))
+    except ValueError:
+        return web.json_response({"error": "count must be an integer"}, status=400)
+    if count < 1:
+        return web.json_response({"error": "count must be positive"}, status=400)
+
+    stage_profiler.arm(stage, count)
+    log.info("stage_profiling_armed", stage=stage, count=count)
+    return web.json_response({"armed": stage_profiler.armed()})
+
+
+async def top_handler(request: web.Request) -> web.Response:
+    """Aggregated top functions: GET /profiling/top?stage=yara&limit=20."""
+    try:
+        limit = int(request.query.get("limit", "20"))
+    except ValueError:
+        return web.json_response({"error": "limit must be an integer"}, status=400)
+
+    stage = request.query.get("stage")
+    stages = [stage] if stage else stage_profiler.stages()
+    return web.json_response(
+        {
+            "armed": stage_profiler.armed(),
+            "stages": [stage_profiler.top(name, limit) for name in stages],
+        }
+    )
@@ -0,0 +1,149 @@
+"""Periodic queue signal collector for autoscaling.
+
+Every ``queue_monitor_interval_seconds`` the collector reads depth and
+consumer count of the main queue and the DLQ (passive declares), the age of
+the oldest waiting message, and derives an estimated drain time from recent
+per-stage throughput. All values are exported on ``/metrics``.
+
+Oldest-message age comes from the RabbitMQ management API
+(``head_message_timestamp``) when ``rabbitmq_management_url`` is set.
+Without it the age is not reported, unless ``queue_age_probe=peek`` opts in
+to reading the head message's publish timestamp with ``basic.get`` followed
+by ``nack(requeue=True)``: that marks a real job as redelivered and briefly
+withholds it from consumers, on every replica and every interval.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from urllib.parse import quote, urlparse
+
+import aio_pika
+import aiohttp
+import structlog
+
+from malscan_worker.concurrency import job_limiter
+from malscan_worker.config import get_settings
+from malscan_worker.consumer import connect_with_retry
+from malscan_worker.metrics import (
+    queue_consumers,
+    queue_depth,
+    queue_drain_eta,
+    queue_oldest_message_age,
+    stage_throughput_rate,
+)
+from malscan_worker.retry import DLQ_QUEUE
+from malscan_worker.throughput import estimate_drain_seconds, stage_throughput
+
+log = structlog.get_logger()
+settings = get_settings()
+
+
+async def _management_head_age(session: aiohttp.ClientSession, queue: str) -> float | None:
+    """Oldest-message age from the management API, None if unavailable."""
+    vhost = urlparse(settings.rabbitmq_url).path.lstrip("/") or "/"
+    url = (
+        f"{settings.rabbitmq_management_url.rstrip('/')}"
+        f"/api/queues/{quote(vhost, safe='')}/{quote(queue, safe='')}"
+    )
+    async with session.get(url) as response:
+        response.raise_for_status()
+        data = await response.json()
+
+    head_timestamp = data.get("head_message_timestamp")
+    if head_timestamp is None:
+        return 0.0 if data.get("messages_ready", 0) == 0 else None
+    return max(0.0, datetime.now(timezone.utc).timestamp() - float(head_timestamp))
+
+
+async def _peek_head_age(queue: aio_pika.abc.AbstractQueue) -> float | None:
+    """Oldest-message age from the head message's timestamp property."""
+    message = await queue.get(no_ack=False, fail=False)
+    if message is None:
+        return 0.0
+    try:
+        if message.timestamp is None:
+            return None
+        published = message.timestamp
+        if published.tzinfo is None:
+            published = published.replace(tzinfo=timezone.utc)
+        return max(0.0, (datetime.now(timezone.utc) - published).total_seconds())
+    finally:
+        await message.nack(requeue=True)
+
+
+async def collect_once(
+    channel: aio_pika.abc.AbstractChannel,
+    session: aiohttp.ClientSession | None,
+) -> None:
+    """Collect one round of queue signals and update the gauges."""
+    main_depth = 0
+    main_consumers = 0
+
+    for name in (settings.rabbitmq_queue, DLQ_QUEUE):
+        queue = await channel.declare_queue(name, passive=True)
+        declared = queue.declaration_result
+        depth = declared.message_count or 0
+        consumers = declared.consumer_count or 0
+        queue_depth.labels(queue=name).set(depth)
+        queue_consumers.labels(queue=name).set(consumers)
+
+        if session is not None:
+            age = await _management_head_age(session, name)
+        elif settings.queue_age_probe == "peek":
+            age = await _peek_head_age(queue)
+        else:
+            age = None
+        if age is not None:
+            queue_oldest_message_age.labels(queue=name).set(age)
+
+        if name == settings.rabbitmq_queue:
+            main_depth, main_consumers = depth, consumers
+
+    for stage in stage_throughput.stages():
+        stage_throughput_rate.labels(stage=stage).set(stage_throughput.executions_per_second(stage))
+
+    # Assumes every consumer runs at this worker's concurrency limit
+    eta = estimate_drain_seconds(
+        main_depth, stage_throughput.job_seconds(), main_consumers * job_limiter.limit
+    )
+    if eta is not None:
+        queue_drain_eta.set(eta)
+
+    log.debug(
+        "queue_signals_collected",
+        depth=main_depth,
+        consumers=main_consumers,
+        drain_eta_seconds=eta,
+    )
+
+
+async def run_queue_monitor(shutdown_event: asyncio.Event) -> None:
+    """Collect queue signals until shutdown."""
+    connection = await connect_with_retry()
+    session = aiohttp.ClientSession() if settings.rabbitmq_management_url else None
+
+    try:
+        async with connection:
+            channel = await connection.channel()
+            log.info("queue_monitor_started", interval=settings.queue_monitor_interval_seconds)
+
+            while not shutdown_event.is_set():
+                try:
+                    await collect_once(channel, session)
+                except Exception as e:
+                    log.warning("queue_monitor_collect_failed", error=str(e))
+                    if channel.is_closed:
+                        channel = await connection.channel()
+
+                try:
+                    await asyncio.wait_for(
+                        shutdown_event.wait(),
+                        timeout=settings.queue_monitor_interval_seconds,
+                    )
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        if session is not None:
+            await session.close()
+
+    log.info("queue_monitor_stopped")
@@ -0,0 +1,114 @@
+"""Worker warm-up and readiness.
+
+Before consuming from RabbitMQ, ``warm_up`` initializes every stage's heavy
+state (``Stage.warm_up``: libmagic, compiled YARA rules, ClamAV database)
+and fills the database and MinIO connection pools, concurrently. Each
+component's duration is logged and exported as
+``malscan_worker_startup_seconds{component}``, along with the broker
+connection and the total time until the consumer starts; a failing component is
+logged and exported as ``malscan_worker_warm_up_ok{component} 0`` but does
+not stop the worker, whose jobs then fail (and retry) as before.
+
+``/ready`` reports 200 only once warm-up completed and the consumer's broker
+connection is open; with ``readiness_max_saturation`` set it also fails
+while the worker is saturated.
+"""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import aio_pika
+import structlog
+
+from malscan_worker import db, storage
+from malscan_worker.concurrency import job_limiter
+from malscan_worker.config import get_settings
+from malscan_worker.metrics import worker_startup_seconds, worker_warm_up_ok
+from malscan_worker.stages.base import Stage
+
+log = structlog.get_logger()
+settings = get_settings()
+
+
+@dataclass
+class WorkerState:
+    """Startup progress and broker connection of this worker."""
+
+    started_at: float = field(default_factory=time.perf_counter)
+    warmed_up: bool = False
+    warm_up_failures: list[str] = field(default_factory=list)
+    connection: aio_pika.abc.AbstractConnection | None = None
+
+
+worker_state = WorkerState()
+
+
+def record_startup(component: str, seconds: float) -> None:
+    """Export and log the duration of a startup step."""
+    worker_startup_seconds.labels(component=component).set(seconds)
+    log.info("worker_startup_step", component=component, duration_ms=int(seconds * 1000))
+
+
+async def _warm_up_component(name: str, warm_up: Callable[[], Awaitable[None]]) -> bool:
+    start = time.perf_counter()
+    try:
+        await warm_up()
+    except Exception as e:
+        log.error("worker_warm_up_failed", component=name, error=str(e))
+        ok = False
+    else:
+        ok = True
+    record_startup(name, time.perf_counter() - start)
+    worker_warm_up_ok.labels(component=name).set(1 if ok else 0)
+    return ok
+
+
+async def warm_up(stages: Sequence[Stage]) -> None:
+    """Warm up connection pools and stages, then mark the worker warmed up."""
+    components: dict[str, Callable[[], Awaitable[None]]] = {
+        "db": db.warm_up,
+        "storage": storage.warm_up,
+        **{f"stage.{stage.name}": stage.warm_up for stage in stages},
+    }
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(_warm_up_component(name, func) for name, func in components.items())
+    )
+    record_startup("warm_up", time.perf_counter() - start)
+
+    worker_state.warm_up_failures = [
+        name for name, ok in zip(components, results, strict=True) if not ok
+    ]
+    worker_state.warmed_up = True
+
+
+def saturation() -> float:
+    """In-flight jobs relative to the current concurrency limit."""
+    return job_limiter.in_flight / max(job_limiter.limit, 1)
+
+
+def readiness_report() -> tuple[bool, dict[str, Any]]:
+    """Whether the worker is ready, with the checks behind the answer."""
+    connection = worker_state.connection
+    broker_connected = connection is not None and not connection.is_closed
+    current = saturation()
+    saturated = (
+        settings.readiness_max_saturation is not None
+        and current >= settings.readiness_max_saturation
+    )
+
+    ready = worker_state.warmed_up and broker_connected and not saturated
+    return ready, {
+        "status": "ready" if ready else "not_ready",
+        "warmed_up": worker_state.warmed_up,
+        "warm_up_failures": worker_state.warm_up_failures,
+        "broker_connected": broker_connected,
+        "in_flight": job_limiter.in_flight,
+        "concurrency_limit": job_limiter.limit,
+        "saturation": round(current, 3),
+        "saturated": saturated,
+    }
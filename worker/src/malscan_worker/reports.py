@@ -0,0 +1,192 @@
+"""Report storage: inline JSONB or zstd-compressed object with a summary row.
+
+Every stored result carries a ``summary`` (verdict, score, key counts). Reports
+whose JSON encoding exceeds ``report_offload_threshold_bytes`` are written
+zstd-compressed to ``{job_id}/report.json.zst`` in the artifacts bucket and the
+row keeps only the summary and a ``report_ref`` pointing at the object; the API
+streams the object back for ``GET /reports/{job_id}``.
+
+Reports stored inline before offloading existed are moved with:
+
+    python -m malscan_worker.reports backfill [--batch-size N] [--limit N] [--dry-run]
+
+The backfill walks done jobs in ID order and only rewrites rows that still hold
+an inline report, so it can be interrupted and re-run. Postgres reclaims the
+space of the old rows on the next VACUUM; run ``VACUUM (FULL) jobs`` (or
+pg_repack) to shrink the table itself.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+from typing import Any
+
+import structlog
+import zstandard
+
+from malscan_worker.config import get_settings
+from malscan_worker.db import get_inline_reports, replace_inline_result
+from malscan_worker.storage import upload_artifact
+
+log = structlog.get_logger()
+settings = get_settings()
+
+REPORT_CONTENT_TYPE = "application/zstd"
+
+
+def report_key(job_id: str) -> str:
+    """Object key of an offloaded report."""
+    return f"{job_id}/report.json.zst"
+
+
+def build_summary(report: dict[str, Any]) -> dict[str, Any]:
+    """Small summary of a report kept in the jobs row."""
+    results = report.get("results", {})
+    iocs = results.get("iocs", {})
+    sandbox = results.get("sandbox", {})
+    av = results.get("av_result", {})
+    file_info = report.get("file", {})
+    hashes = iocs.get("hashes", {})
+    return {
+        "verdict": report.get("verdict"),
+        "score": report.get("score"),
+        "file": {
+            "sha256": file_info.get("sha256"),
+            "md5": hashes.get("md5") or None,
+            "sha1": hashes.get("sha1") or None,
+            "mime": file_info.get("mime"),
+            "size": file_info.get("size"),
+        },
+        "av": {"infected": av.get("infected", False), "threat_name": av.get("threat_name")},
+        "yara_ruleset": results.get("yara_ruleset"),
+        "counts": {
+            "yara_hits": len(results.get("yara_hits", [])),
+            "urls": len(iocs.get("urls", [])),
+            "domains": len(iocs.get("domains", [])),
+            "ips": len(iocs.get("ips", [])),
+            "sandbox_behaviors": len(sandbox.get("behaviors", [])),
+            "network_connections": len(sandbox.get("network_connections", [])),
+        },
+    }
+
+
+def encode_report(report: dict[str, Any]) -> bytes:
+    """Compact JSON encoding of a report."""
+    return json.dumps(report, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def compress_report(encoded: bytes) -> bytes:
+    """zstd-compress an encoded report (content size recorded in the frame)."""
+    return zstandard.ZstdCompressor(level=settings.report_zstd_level).compress(encoded)
+
+
+async def prepare_stored_result(job_id: str, report: dict[str, Any]) -> dict[str, Any]:
+    """Value to store in ``jobs.result`` for a report.
+
+    Small reports are stored inline with their summary added. Large ones are
+    uploaded to the artifacts bucket; if that fails the report is stored
+    inline so the job still completes.
+    """
+    summary = build_summary(report)
+    encoded = encode_report(report)
+    if (
+        not settings.report_offload_enabled
+        or len(encoded) <= settings.report_offload_threshold_bytes
+    ):
+        return {**report, "summary": summary}
+
+    compressed = compress_report(encoded)
+    key = report_key(job_id)
+    try:
+        await upload_artifact(key, compressed, REPORT_CONTENT_TYPE)
+    except Exception as e:
+        log.warning("report_offload_failed", job_id=job_id, size=len(encoded), error=str(e))
+        return {**report, "summary": summary}
+
+    log.info(
+        "report_offloaded",
+        job_id=job_id,
+        key=key,
+        size=len(encoded),
+        compressed_size=len(compressed),
+    )
+    return {
+        "job_id": report.get("job_id", job_id),
+        "summary": summary,
+        "report_ref": {
+            "bucket": settings.minio_bucket_artifacts,
+            "key": key,
+            "encoding": "zstd",
+            "size": len(encoded),
+            "compressed_size": len(compressed),
+            "sha256": hashlib.sha256(encoded).hexdigest(),
+        },
+    }
+
+
+async def backfill(batch_size: int, limit: int | None, dry_run: bool) -> dict[str, int]:
+    """Offload large inline reports of existing jobs.
+
+    Args:
+        batch_size: Jobs fetched per query.
+        limit: Stop after this many jobs have been examined (None for all).
+        dry_run: Only count the jobs and bytes that would be offloaded.
+
+    Returns:
+        Counts of examined and offloaded jobs and inline bytes moved.
+    """
+    stats = {"examined": 0, "offloaded": 0, "skipped": 0, "bytes_moved": 0}
+    after_id: str | None = None
+    threshold = settings.report_offload_threshold_bytes
+
+    while limit is None or stats["examined"] < limit:
+        page_size = batch_size if limit is None else min(batch_size, limit - stats["examined"])
+        rows = await get_inline_reports(after_id, page_size, threshold)
+        if not rows:
+            break
+
+        for job_id, result in rows:
+            after_id = job_id
+            stats["examined"] += 1
+            report = {k: v for k, v in result.items() if k != "summary"}
+            size = len(encode_report(report))
+            if size <= threshold:
+                stats["skipped"] += 1
+                continue
+            if dry_run:
+                stats["offloaded"] += 1
+                stats["bytes_moved"] += size
+                continue
+
+            stored = await prepare_stored_result(job_id, report)
+            if "report_ref" in stored and await replace_inline_result(job_id, stored):
+                stats["offloaded"] += 1
+                stats["bytes_moved"] += size
+            else:
+                stats["skipped"] += 1
+
+        log.info("report_backfill_progress", after_id=after_id, **stats)
+
+    return stats
+
+
+def main() -> None:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Manage MalScan report storage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = subparsers.add_parser(
+        "backfill", help="Move large inline reports to the artifacts bucket"
+    )
+    backfill_parser.add_argument("--batch-size", type=int, default=100)
+    backfill_parser.add_argument("--limit", type=int, default=None)
+    backfill_parser.add_argument("--dry-run", action="store_true")
+
+    args = parser.parse_args()
+    result = asyncio.run(backfill(args.batch_size, args.limit, args.dry_run))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Delayed retry and dead-letter topology with broker-side exponential backoff.
+
+Failed jobs are not requeued straight to the head of the main queue. Instead
+the worker republishes them to ``RETRY_EXCHANGE`` with a routing key selecting
+a delay tier. Each tier is a queue with ``x-message-ttl`` and no consumers;
+when the TTL expires the broker dead-letters the message back to the main
+queue, recording an ``x-death`` entry. The worker also stamps an explicit
+``x-retry-count`` header so retry accounting does not depend on how a given
+broker version treats client-published ``x-death`` headers.
+
+    main queue --(fail)--> malscan.retry --> <queue>.retry.10s  --(TTL)--+
+                                         --> <queue>.retry.60s  --(TTL)--+--> main queue
+                                         --> <queue>.retry.300s --(TTL)--+
+
+Jobs that exhaust their retries are published to ``DLQ_QUEUE`` with headers
+describing the failure, so the DLQ tool can group and replay them.
+"""
+
+from datetime import datetime, timezone
+
+import aio_pika
+import structlog
+
+from malscan_worker.config import get_settings
+
+log = structlog.get_logger()
+settings = get_settings()
+
+DLQ_QUEUE = "malscan-dlq"
+RETRY_EXCHANGE = "malscan.retry"
+RETRY_COUNT_HEADER = "x-retry-count"
+
+# Failure details stamped on messages sent to the DLQ
+FAILURE_REASON_HEADER = "x-failure-reason"
+FAILURE_ERROR_HEADER = "x-failure-error"
+FAILED_AT_HEADER = "x-failed-at"
+MAX_FAILURE_ERROR_LENGTH = 1000
+
+
+def retry_queue_name(delay_seconds: int) -> str:
+    """Name of the delay queue for a given tier."""
+    return f"{settings.rabbitmq_queue}.retry.{delay_seconds}s"
+
+
+def retry_delay(retry_count: int) -> int:
+    """Delay in seconds before the next attempt.
+
+    Args:
+        retry_count: Number of retries already performed (0 for the first failure).
+
+    Returns:
+        Delay of the matching tier; the last tier is reused once exhausted.
+    """
+    delays = settings.retry_delays_seconds
+    return delays[min(retry_count, len(delays) - 1)]
+
+
+async def declare_retry_topology(
+    channel: aio_pika.abc.AbstractChannel,
+) -> aio_pika.abc.AbstractExchange:
+    """Declare the retry exchange and its TTL delay queues.
+
+    Args:
+        channel: Channel to declare on.
+
+    Returns:
+        The retry exchange.
+    """
+    exchange = await channel.declare_exchange(
+        RETRY_EXCHANGE,
+        aio_pika.ExchangeType.DIRECT,
+        durable=True,
+    )
+
+    for delay in settings.retry_delays_seconds:
+        name = retry_queue_name(delay)
+        queue = await channel.declare_queue(
+            name,
+            durable=True,
+            arguments={
+                "x-message-ttl": delay * 1000,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": settings.rabbitmq_queue,
+            },
+        )
+        await queue.bind(exchange, routing_key=name)
+
+    log.info(
+        "retry_topology_declared",
+        exchange=RETRY_EXCHANGE,
+        delays=settings.retry_delays_seconds,
+    )
+    return exchange
+
+
+async def schedule_retry(
+    exchange: aio_pika.abc.AbstractExchange,
+    message: aio_pika.abc.AbstractIncomingMessage,
+    retry_count: int,
+) -> int:
+    """Republish a failed message to the delay tier for its retry count.
+
+    The caller must ack the original message only after this returns, so a
+    failed publish never loses the job.
+
+    Args:
+        exchange: Retry exchange from ``declare_retry_topology``.
+        message: The failed message.
+        retry_count: Number of retries already performed.
+
+    Returns:
+        The delay in seconds before the job is redelivered.
+    """
+    delay = retry_delay(retry_count)
+    headers = dict(message.headers or {})
+    headers[RETRY_COUNT_HEADER] = retry_count + 1
+
+    await exchange.publish(
+        aio_pika.Message(
+            body=message.body,
+            headers=headers,
+            content_type=message.content_type,
+            timestamp=message.timestamp,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+        ),
+        routing_key=retry_queue_name(delay),
+    )
+    return delay
+
+
+async def dead_letter(
+    exchange: aio_pika.abc.AbstractExchange,
+    message: aio_pika.abc.AbstractIncomingMessage,
+    reason: str,
+    error: str,
+) -> None:
+    """Publish a message that exhausted its retries to the DLQ.
+
+    As with ``schedule_retry``, the caller acks the original only after the
+    broker has confirmed this publish.
+
+    Args:
+        exchange: The default exchange.
+        message: The failed message.
+        reason: Short failure category used for grouping (e.g. ``stage:clamav``).
+        error: Full error message.
+    """
+    headers = dict(message.headers or {})
+    headers[FAILURE_REASON_HEADER] = reason
+    headers[FAILURE_ERROR_HEADER] = error[:MAX_FAILURE_ERROR_LENGTH]
+    headers[FAILED_AT_HEADER] = datetime.now(timezone.utc).isoformat()
+
+    await exchange.publish(
+        aio_pika.Message(
+            body=message.body,
+            headers=headers,
+            content_type=message.content_type,
+            timestamp=message.timestamp,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+        ),
+        routing_key=DLQ_QUEUE,
+    )
@@ -0,0 +1,350 @@
+"""YARA rule performance statistics and slow-rule quarantine.
+
+``YaraStage`` runs one yara process per rule file, so scan time (wall and
+CPU) is measured exactly per rule file, i.e. per namespace; matches are
+counted per rule. The yara CLI does not time individual rules (that needs a
+profiling build of libyara), so a slow namespace is narrowed down by
+splitting its file and profiling the parts with the ``profile`` command.
+
+Statistics are kept per worker since startup, exported as
+``malscan_yara_rule_file_seconds{namespace}`` and
+``malscan_yara_rule_matches_total{namespace,rule}``, and served ranked by
+``GET /yara/rules/slow`` on the metrics server.
+
+With ``yara_rule_budget_seconds`` set, a namespace whose p95 scan time over
+its recent scans exceeds the budget (or that timed out) is logged as over
+budget; with ``yara_slow_rule_action=quarantine`` it is also skipped for
+``yara_quarantine_seconds``, or until its rule file changes, and listed in
+the report's ``yara_quarantined``. ``POST /yara/rules/release`` lifts a
+quarantine early.
+
+Usage:
+    python -m malscan_worker.rule_stats slow --worker URL [--worker URL ...]
+        [--limit N] [--sort mean|p95|max|total]
+    python -m malscan_worker.rule_stats profile --samples DIR [--rules DIR] [--iterations N]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import structlog
+from aiohttp import ClientSession, web
+
+from malscan_worker.config import get_settings
+from malscan_worker.metrics import (
+    yara_rule_file_quarantined,
+    yara_rule_file_seconds,
+    yara_rule_matches,
+)
+
+log = structlog.get_logger()
+settings = get_settings()
+
+# Scans per namespace kept for the p95 and the budget check
+_RECENT_SCANS = 100
+
+SORT_KEYS = ("mean", "p95", "max", "total")
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of values (0.0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+@dataclass
+class NamespaceStats:
+    """Scans of one rule file."""
+
+    scans: int = 0
+    timeouts: int = 0
+    total_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    max_seconds: float = 0.0
+    recent: deque[float] = field(default_factory=lambda: deque(maxlen=_RECENT_SCANS))
+    matches: Counter[str] = field(default_factory=Counter)
+    over_budget: bool = False
+    # Quarantine end (time.monotonic()) and the rule file mtime it applies to
+    quarantined_until: float | None = None
+    quarantined_mtime: float | None = None
+
+    def summary(self) -> dict[str, Any]:
+        """JSON-serializable statistics, rule matches most frequent first."""
+        return {
+            "scans": self.scans,
+            "timeouts": self.timeouts,
+            "mean_ms": round(self.total_seconds / self.scans * 1000, 3) if self.scans else 0.0,
+            "p95_ms": round(percentile(list(self.recent), 0.95) * 1000, 3),
+            "max_ms": round(self.max_seconds * 1000, 3),
+            "total_ms": round(self.total_seconds * 1000, 3),
+            "cpu_ms": round(self.cpu_seconds * 1000, 3),
+            "over_budget": self.over_budget,
+            "quarantined": self.quarantined_until is not None,
+            "rules": [
+                {"rule": rule, "matches": count} for rule, count in self.matches.most_common()
+            ],
+        }
+
+
+class RuleStats:
+    """Per-namespace scan statistics and quarantine state of this worker."""
+
+    def __init__(self) -> None:
+        self._namespaces: dict[str, NamespaceStats] = {}
+
+    def record(
+        self,
+        namespace: str,
+        seconds: float,
+        cpu_seconds: float,
+        matched_rules: list[str],
+        mtime: float | None = None,
+        timed_out: bool = False,
+    ) -> None:
+        """Record one scan of a rule file and apply the time budget.
+
+        Args:
+            namespace: Rule file stem.
+            seconds: Wall time of the scan.
+            cpu_seconds: CPU time of the yara process.
+            matched_rules: Rules of the file that matched the sample.
+            mtime: Rule file mtime, ties a quarantine to this version of the file.
+            timed_out: Whether the scan was killed at the stage timeout.
+        """
+        stats = self._namespaces.setdefault(namespace, NamespaceStats())
+        stats.scans += 1
+        stats.timeouts += int(timed_out)
+        stats.total_seconds += seconds
+        stats.cpu_seconds += cpu_seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        stats.recent.append(seconds)
+        stats.matches.update(matched_rules)
+
+        yara_rule_file_seconds.labels(namespace=namespace).observe(seconds)
+        for rule in matched_rules:
+            yara_rule_matches.labels(namespace=namespace, rule=rule).inc()
+
+        self._check_budget(namespace, stats, mtime, timed_out)
+
+    def _check_budget(
+        self, namespace: str, stats: NamespaceStats, mtime: float | None, timed_out: bool
+    ) -> None:
+        budget = settings.yara_rule_budget_seconds
+        if budget is None:
+            return
+        p95 = percentile(list(stats.recent), 0.95)
+        over = timed_out or (len(stats.recent) >= settings.yara_rule_min_scans and p95 > budget)
+        if over and not stats.over_budget:
+            log.warning(
+                "yara_rule_file_over_budget",
+                namespace=namespace,
+                p95_ms=round(p95 * 1000, 3),
+                budget_ms=round(budget * 1000, 3),
+                timed_out=timed_out,
+            )
+        stats.over_budget = over
+
+        if over and settings.yara_slow_rule_action == "quarantine":
+            stats.quarantined_until = time.monotonic() + settings.yara_quarantine_seconds
+            stats.quarantined_mtime = mtime
+            yara_rule_file_quarantined.labels(namespace=namespace).set(1)
+            log.warning(
+                "yara_rule_file_quarantined",
+                namespace=namespace,
+                seconds=settings.yara_quarantine_seconds,
+            )
+
+    def is_quarantined(self, namespace: str, mtime: float | None = None) -> bool:
+        """Whether scans with a rule file are skipped.
+
+        A quarantine ends when it expires or when the rule file changed.
+        """
+        stats = self._namespaces.get(namespace)
+        if stats is None or stats.quarantined_until is None:
+            return False
+        changed = mtime is not None and mtime != stats.quarantined_mtime
+        if changed or time.monotonic() >= stats.quarantined_until:
+            self.release(namespace)
+            return False
+        return True
+
+    def release(self, namespace: str) -> bool:
+        """Lift a quarantine and restart the budget check from fresh scans.
+
+        Returns:
+            True if the namespace was quarantined.
+        """
+        stats = self._namespaces.get(namespace)
+        if stats is None or stats.quarantined_until is None:
+            return False
+        stats.quarantined_until = None
+        stats.quarantined_mtime = None
+        stats.over_budget = False
+        stats.recent.clear()
+        yara_rule_file_quarantined.labels(namespace=namespace).set(0)
+        log.info("yara_rule_file_released", namespace=namespace)
+        return True
+
+    def slowest(self, limit: int = 20, sort: str = "mean") -> list[dict[str, Any]]:
+        """Namespaces ranked by scan time, slowest first."""
+        ranked = [
+            {"namespace": namespace, **stats.summary()}
+            for namespace, stats in self._namespaces.items()
+        ]
+        ranked.sort(key=lambda item: item[f"{sort}_ms"], reverse=True)
+        return ranked[:limit]
+
+
+# Process-wide statistics used by YaraStage
+rule_stats = RuleStats()
+
+
+async def slow_handler(request: web.Request) -> web.Response:
+    """Slowest rule files: GET /yara/rules/slow?limit=20&sort=mean."""
+    try:
+        limit = int(request.query.get("limit", "20"))
+    except ValueError:
+        return web.json_response({"error": "limit must be an integer"}, status=400)
+    sort = request.query.get("sort", "mean")
+    if sort not in SORT_KEYS:
+        return web.json_response({"error": f"sort must be one of {SORT_KEYS}"}, status=400)
+
+    return web.json_response(
+        {
+            "budget_ms": (
+                settings.yara_rule_budget_seconds * 1000
+                if settings.yara_rule_budget_seconds is not None
+                else None
+            ),
+            "action": settings.yara_slow_rule_action,
+            "namespaces": rule_stats.slowest(limit, sort),
+        }
+    )
+
+
+async def release_handler(request: web.Request) -> web.Response:
+    """Lift a quarantine: POST /yara/rules/release?namespace=suspicious."""
+    namespace = request.query.get("namespace")
+    if not namespace:
+        return web.json_response({"error": "namespace is required"}, status=400)
+    return web.json_response({"namespace": namespace, "released": rule_stats.release(namespace)})
+
+
+def merge_reports(reports: list[dict[str, Any]], limit: int, sort: str) -> list[dict[str, Any]]:
+    """Combine the slow-rule reports of several workers.
+
+    Counts and totals are summed; the p95 of the merged namespace is the
+    highest p95 of any worker.
+    """
+    merged: dict[str, dict[str, Any]] = {}
+    for report in reports:
+        for item in report["namespaces"]:
+            current = merged.get(item["namespace"])
+            if current is None:
+                merged[item["namespace"]] = {**item, "rules": list(item["rules"])}
+                continue
+            for key in ("scans", "timeouts", "total_ms", "cpu_ms"):
+                current[key] += item[key]
+            for key in ("p95_ms", "max_ms"):
+                current[key] = max(current[key], item[key])
+            current["over_budget"] = current["over_budget"] or item["over_budget"]
+            current["quarantined"] = current["quarantined"] or item["quarantined"]
+            matches = Counter({rule["rule"]: rule["matches"] for rule in current["rules"]})
+            matches.update({rule["rule"]: rule["matches"] for rule in item["rules"]})
+            current["rules"] = [
+                {"rule": rule, "matches": count} for rule, count in matches.most_common()
+            ]
+
+    for item in merged.values():
+        item["mean_ms"] = round(item["total_ms"] / item["scans"], 3) if item["scans"] else 0.0
+    return sorted(merged.values(), key=lambda item: item[f"{sort}_ms"], reverse=True)[:limit]
+
+
+async def fetch_slow(workers: list[str], limit: int, sort: str) -> dict[str, Any]:
+    """Slow-rule reports of several workers, merged."""
+    reports = []
+    errors = {}
+    async with ClientSession() as session:
+        for worker in workers:
+            url = f"{worker.rstrip('/')}/yara/rules/slow"
+            try:
+                # All namespaces, so the merged ranking is not cut per worker
+                async with session.get(url, params={"limit": "100000"}) as response:
+                    response.raise_for_status()
+                    reports.append(await response.json())
+            except Exception as e:
+                errors[worker] = str(e)
+    return {
+        "workers": len(reports),
+        "errors": errors,
+        "namespaces": merge_reports(reports, limit, sort),
+    }
+
+
+async def profile(
+    rules_dir: Path, samples_dir: Path, iterations: int, limit: int, sort: str
+) -> dict[str, Any]:
+    """Scan a sample corpus with every rule file and rank the rule files."""
+    # Imported here: the stage records into this module's statistics
+    from malscan_worker.stages.yara_scan import parse_output, rule_files
+    from malscan_worker.subprocess_runner import run_engine
+
+    stats = RuleStats()
+    samples = [path for path in sorted(samples_dir.rglob("*")) if path.is_file()]
+    for rule_file in rule_files(rules_dir):
+        for sample in samples:
+            for _ in range(iterations):
+                proc = await run_engine(
+                    "yara",
+                    ["yara", "-s", "-m", str(rule_file), str(sample)],
+                    timeout=settings.stage_timeout_seconds,
+                )
+                matched = [m["rule"] for m in parse_output(proc.stdout, rule_file.stem)]
+                stats.record(rule_file.stem, proc.wall_seconds, proc.cpu_seconds, matched)
+    return {
+        "samples": len(samples),
+        "iterations": iterations,
+        "namespaces": stats.slowest(limit, sort),
+    }
+
+
+def main() -> None:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Rank slow YARA rule files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    slow_parser = subparsers.add_parser("slow", help="Merge the statistics of running workers")
+    slow_parser.add_argument(
+        "--worker", action="append", required=True, help="Worker metrics URL (repeatable)"
+    )
+    slow_parser.add_argument("--limit", type=int, default=20)
+    slow_parser.add_argument("--sort", choices=SORT_KEYS, default="mean")
+
+    profile_parser = subparsers.add_parser("profile", help="Scan a sample corpus offline")
+    profile_parser.add_argument("--samples", type=Path, required=True)
+    profile_parser.add_argument("--rules", type=Path, default=Path(settings.yara_rules_path))
+    profile_parser.add_argument("--iterations", type=int, default=3)
+    profile_parser.add_argument("--limit", type=int, default=20)
+    profile_parser.add_argument("--sort", choices=SORT_KEYS, default="mean")
+
+    args = parser.parse_args()
+    if args.command == "slow":
+        result = asyncio.run(fetch_slow(args.worker, args.limit, args.sort))
+    else:
+        result = asyncio.run(
+            profile(args.rules, args.samples, args.iterations, args.limit, args.sort)
+        )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
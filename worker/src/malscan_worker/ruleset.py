@@ -0,0 +1,341 @@
+"""Prebuilt YARA ruleset artifacts.
+
+The ``build`` command validates and compiles the rule files once, with
+``yarac``, into a versioned artifact: a gzipped tarball of the rule sources,
+the file-type manifest, the compiled rules and a ``ruleset.json`` describing
+them. The artifact and a ``latest.json`` pointer carrying its SHA256 are
+published to a ruleset store, ``rulesets/`` in the artifacts bucket or a
+local directory (``yara_ruleset_store``); the pointer is written last, so
+workers never see a partially published version.
+
+Versions are ``<UTC build time>-<content digest>``: the digest covers rule
+file names, sources and the manifest, so an unchanged rule set is not
+published again. Compiled rules only load in the yara version that built
+them, which is recorded and checked before a worker switches.
+
+Workers install the newest artifact at warm-up, checking its checksum, and
+poll the store every ``yara_ruleset_poll_seconds`` for newer versions. If
+no usable artifact exists they compile the sources in ``yara_rules_path``
+themselves. The loaded version is stamped into every report.
+
+Usage:
+    python -m malscan_worker.ruleset build [--rules DIR] [--store bucket|local]
+        [--dir DIR] [--force]
+    python -m malscan_worker.ruleset latest [--store bucket|local] [--dir DIR]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import shutil
+import tarfile
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Protocol
+
+import structlog
+
+from malscan_worker.config import get_settings
+from malscan_worker.metrics import yara_ruleset_loads
+from malscan_worker.subprocess_runner import run_engine
+
+if TYPE_CHECKING:
+    from malscan_worker.stages.yara_scan import YaraStage
+
+log = structlog.get_logger()
+settings = get_settings()
+
+BUCKET_PREFIX = "rulesets/"
+LATEST_NAME = "latest.json"
+METADATA_NAME = "ruleset.json"
+
+
+class RulesetStore(Protocol):
+    """Where ruleset artifacts are published and fetched from."""
+
+    def get(self, name: str) -> bytes | None:
+        """Object content, None if it does not exist."""
+        ...
+
+    def put(self, name: str, data: bytes) -> None:
+        """Write an object, replacing any previous content."""
+        ...
+
+
+class LocalRulesetStore:
+    """Ruleset store in a local (or shared volume) directory."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def get(self, name: str) -> bytes | None:
+        path = self.root / name
+        return path.read_bytes() if path.exists() else None
+
+    def put(self, name: str, data: bytes) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".{name}.tmp"
+        tmp.write_bytes(data)
+        tmp.replace(self.root / name)
+
+
+class BucketRulesetStore:
+    """Ruleset store under ``rulesets/`` in the artifacts bucket."""
+
+    def get(self, name: str) -> bytes | None:
+        from minio.error import S3Error
+
+        from malscan_worker.storage import _get_minio_client
+
+        try:
+            response = _get_minio_client().get_object(
+                settings.minio_bucket_artifacts, BUCKET_PREFIX + name
+            )
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                return None
+            raise
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def put(self, name: str, data: bytes) -> None:
+        from malscan_worker.storage import _upload_artifact_sync
+
+        content_type = "application/json" if name.endswith(".json") else "application/gzip"
+        _upload_artifact_sync(BUCKET_PREFIX + name, data, content_type)
+
+
+def ruleset_store(kind: str | None = None, root: Path | None = None) -> RulesetStore | None:
+    """Configured ruleset store, None when prebuilt rulesets are disabled."""
+    kind = kind or settings.yara_ruleset_store
+    if kind == "bucket":
+        return BucketRulesetStore()
+    if kind == "local":
+        return LocalRulesetStore(root or Path(settings.yara_ruleset_dir))
+    if kind != "none":
+        raise ValueError(f"Unknown yara_ruleset_store: {kind}")
+    return None
+
+
+@dataclass(frozen=True)
+class LoadedRuleset:
+    """Unpacked prebuilt ruleset a worker scans with."""
+
+    version: str
+    rules_path: Path
+    # Rule source -> (source mtime, compiled rules)
+    compiled: dict[Path, tuple[float, Path]]
+
+
+def source_digest(rules_path: Path, files: list[Path]) -> str:
+    """SHA256 over rule file names and sources and the file-type manifest."""
+    from malscan_worker.stages.yara_scan import MANIFEST_NAME
+
+    digest = hashlib.sha256()
+    manifest = rules_path / MANIFEST_NAME
+    for path in sorted(files) + ([manifest] if manifest.exists() else []):
+        content = path.read_bytes()
+        digest.update(f"{path.name}\0{len(content)}\0".encode())
+        digest.update(content)
+    return digest.hexdigest()
+
+
+async def yara_version() -> str:
+    """Version of the installed yara, which compiled rules are tied to."""
+    proc = await run_engine("yara", ["yara", "--version"], timeout=30)
+    if proc.returncode != 0:
+        raise RuntimeError(f"yara --version failed: {proc.stderr.decode(errors='replace')}")
+    return proc.stdout.decode().strip()
+
+
+def _pack(entries: dict[str, bytes], mtime: float) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, data in entries.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(mtime)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+async def build(rules_path: Path, store: RulesetStore, force: bool = False) -> dict[str, Any]:
+    """Validate, compile and publish the rule files in rules_path.
+
+    Args:
+        rules_path: Directory of rule files (and manifest.json).
+        store: Store the artifact is published to.
+        force: Publish even if the latest artifact has the same content.
+
+    Returns:
+        The latest.json pointer of the published (or unchanged) version.
+
+    Raises:
+        ValueError: If there are no rule files or the manifest is invalid.
+        RuntimeError: If a rule file does not compile.
+    """
+    from malscan_worker.stages.yara_scan import MANIFEST_NAME, load_manifest, rule_files
+
+    files = sorted(rule_files(rules_path))
+    if not files:
+        raise ValueError(f"No rule files in {rules_path}")
+    manifest = load_manifest(rules_path)
+    unknown = set(manifest) - {rule_file.name for rule_file in files}
+    if unknown:
+        raise ValueError(f"{MANIFEST_NAME} lists missing rule files: {sorted(unknown)}")
+
+    digest = source_digest(rules_path, files)
+    previous = await asyncio.to_thread(store.get, LATEST_NAME)
+    if previous is not None and not force:
+        latest = json.loads(previous)
+        if latest.get("digest") == digest:
+            log.info("yara_ruleset_unchanged", version=latest["version"])
+            return latest
+
+    engine_version = await yara_version()
+    entries: dict[str, bytes] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rule_file in files:
+            target = Path(tmp) / f"{rule_file.name}.yarc"
+            proc = await run_engine(
+                "yara",
+                ["yarac", str(rule_file), str(target)],
+                timeout=settings.stage_timeout_seconds,
+            )
+            if proc.returncode != 0 or proc.signaled:
+                raise RuntimeError(
+                    f"{rule_file.name} does not compile: "
+                    f"{proc.stderr.decode(errors='replace').strip()}"
+                )
+            entries[f"rules/{rule_file.name}"] = rule_file.read_bytes()
+            entries[f"compiled/{target.name}"] = target.read_bytes()
+
+    created_at = datetime.now(timezone.utc)
+    version = f"{created_at:%Y%m%dT%H%M%SZ}-{digest[:12]}"
+    if (rules_path / MANIFEST_NAME).exists():
+        entries[f"rules/{MANIFEST_NAME}"] = (rules_path / MANIFEST_NAME).read_bytes()
+    metadata = {
+        "version": version,
+        "digest": digest,
+        "yara_version": engine_version,
+        "created_at": created_at.isoformat(),
+        "rule_files": [rule_file.name for rule_file in files],
+    }
+    entries[METADATA_NAME] = json.dumps(metadata, indent=2).encode()
+
+    artifact = _pack(entries, created_at.timestamp())
+    latest = {**metadata, "artifact": f"{version}.tar.gz"}
+    latest["sha256"] = hashlib.sha256(artifact).hexdigest()
+    await asyncio.to_thread(store.put, latest["artifact"], artifact)
+    await asyncio.to_thread(store.put, LATEST_NAME, json.dumps(latest, indent=2).encode())
+    log.info("yara_ruleset_published", version=version, rule_files=len(files))
+    return latest
+
+
+async def fetch_latest(store: RulesetStore) -> dict[str, Any] | None:
+    """The latest.json pointer of the store, None if nothing was published."""
+    data = await asyncio.to_thread(store.get, LATEST_NAME)
+    return json.loads(data) if data is not None else None
+
+
+def _extract(artifact: bytes, latest: dict[str, Any], root: Path) -> LoadedRuleset:
+    if hashlib.sha256(artifact).hexdigest() != latest["sha256"]:
+        raise ValueError(f"Ruleset {latest['version']} does not match its checksum")
+
+    target = root / latest["version"]
+    if not target.exists():
+        root.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=root, prefix=".staging-"))
+        try:
+            with tarfile.open(fileobj=io.BytesIO(artifact), mode="r:gz") as tar:
+                tar.extractall(staging, filter="data")
+            staging.rename(target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    rules_path = target / "rules"
+    compiled = {}
+    for name in latest["rule_files"]:
+        rule_file = rules_path / name
+        compiled[rule_file] = (rule_file.stat().st_mtime, target / "compiled" / f"{name}.yarc")
+    return LoadedRuleset(latest["version"], rules_path, compiled)
+
+
+async def install(store: RulesetStore, latest: dict[str, Any], root: Path) -> LoadedRuleset:
+    """Download, verify and unpack a published ruleset under root.
+
+    Raises:
+        ValueError: If the artifact is missing or fails its checksum.
+    """
+    artifact = await asyncio.to_thread(store.get, latest["artifact"])
+    if artifact is None:
+        raise ValueError(f"Ruleset artifact {latest['artifact']} is missing")
+    return await asyncio.to_thread(_extract, artifact, latest, root)
+
+
+def prune(root: Path, keep: set[str]) -> None:
+    """Remove unpacked rulesets other than the versions in keep."""
+    if not root.exists():
+        return
+    for path in root.iterdir():
+        if path.is_dir() and path.name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+async def run_ruleset_poller(stage: "YaraStage", shutdown_event: asyncio.Event) -> None:
+    """Switch the YARA stage to newly published rulesets until shutdown."""
+    log.info("yara_ruleset_poller_started", interval=settings.yara_ruleset_poll_seconds)
+    while not shutdown_event.is_set():
+        try:
+            await asyncio.wait_for(
+                shutdown_event.wait(), timeout=settings.yara_ruleset_poll_seconds
+            )
+        except asyncio.TimeoutError:
+            pass
+        else:
+            break
+
+        try:
+            await stage.refresh_ruleset()
+        except Exception as e:
+            yara_ruleset_loads.labels(outcome="failed").inc()
+            log.warning("yara_ruleset_refresh_failed", error=str(e))
+
+    log.info("yara_ruleset_poller_stopped")
+
+
+def main() -> None:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Build and inspect prebuilt YARA rulesets")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Compile and publish the rule files")
+    build_parser.add_argument("--rules", type=Path, default=Path(settings.yara_rules_path))
+    build_parser.add_argument("--force", action="store_true", help="Publish unchanged rules")
+    latest_parser = subparsers.add_parser("latest", help="Show the latest published ruleset")
+    for sub in (build_parser, latest_parser):
+        sub.add_argument("--store", choices=["bucket", "local"], default="bucket")
+        sub.add_argument("--dir", type=Path, default=Path(settings.yara_ruleset_dir))
+
+    args = parser.parse_args()
+    store = ruleset_store(args.store, args.dir)
+    assert store is not None
+    started = time.perf_counter()
+    if args.command == "build":
+        result = asyncio.run(build(args.rules, store, args.force))
+        result = {**result, "build_seconds": round(time.perf_counter() - started, 2)}
+    else:
+        result = asyncio.run(fetch_latest(store))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Similarity digests of samples for near-duplicate search.
+
+A sample is cut into content-defined chunks, as in ssdeep's context
+triggered piecewise hashing: a chunk ends wherever a rolling hash of the
+last ``WINDOW`` bytes hits a trigger value, so inserting or changing bytes
+only changes the chunks around the edit. The digest is a MinHash signature
+of the set of chunk hashes; the fraction of equal signature components
+estimates the Jaccard similarity of two samples' chunk sets.
+
+Signatures are indexed by locality-sensitive hashing: ``BANDS`` bands of
+``ROWS`` components each, every band hashed to a bucket. Samples sharing a
+bucket are candidates, so lookups read a few index entries instead of
+comparing against every sample; pairs above a Jaccard similarity of about
+``(1 / BANDS) ** (1 / ROWS)`` (0.42) are found with high probability.
+"""
+
+import hashlib
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+
+WINDOW = 16
+# Chunk boundaries: on average one every 2**_TRIGGER_BITS bytes, at least
+# _MIN_CHUNK bytes apart (long runs of one byte value trigger everywhere)
+_TRIGGER_BITS = 6
+_MIN_CHUNK = 32
+
+_ROLL_BASE = np.uint32(0x01000193)
+_MIX = np.uint32(0x9E3779B1)
+
+
+def _permutation_params() -> tuple[np.ndarray, np.ndarray]:
+    # Derived from SHA-256 rather than a PRNG so signatures stay comparable
+    # across numpy versions
+    digest = b"".join(
+        hashlib.sha256(f"malscan-minhash-{i}".encode()).digest()[:16] for i in range(NUM_PERM)
+    )
+    params = np.frombuffer(digest, dtype="<u8").reshape(NUM_PERM, 2)
+    return params[:, 0] | np.uint64(1), params[:, 1].copy()
+
+
+_PERM_A, _PERM_B = _permutation_params()
+
+
+def chunk_hashes(data: bytes | memoryview) -> np.ndarray:
+    """Distinct CRC32 hashes of the sample's content-defined chunks."""
+    view = np.frombuffer(data, dtype=np.uint8)
+    if len(view) < WINDOW:
+        return np.array([zlib.crc32(data)] if len(view) else [], dtype=np.uint32)
+
+    # Polynomial hash of every WINDOW-byte window (wraps mod 2**32)
+    rolling = np.zeros(len(view) - WINDOW + 1, dtype=np.uint32)
+    for offset in range(WINDOW):
+        np.multiply(rolling, _ROLL_BASE, out=rolling)
+        np.add(rolling, view[offset : offset + len(rolling)], out=rolling)
+    np.multiply(rolling, _MIX, out=rolling)
+    np.right_shift(rolling, np.uint32(32 - _TRIGGER_BITS), out=rolling)
+    triggers = np.flatnonzero(rolling == 0)
+
+    # Measured from the last kept boundary, not in fixed blocks, so the
+    # boundaries do not depend on absolute offsets (inserted headers)
+    bounds = [0]
+    for end in (triggers + WINDOW).tolist():
+        if end - bounds[-1] >= _MIN_CHUNK:
+            bounds.append(end)
+    if bounds[-1] != len(view):
+        bounds.append(len(view))
+    memory = memoryview(data)
+    chunks = zip(bounds[:-1], bounds[1:], strict=True)
+    hashes = [zlib.crc32(memory[start:end]) for start, end in chunks]
+    return np.unique(np.array(hashes, dtype=np.uint32))
+
+
+def minhash(features: np.ndarray) -> np.ndarray | None:
+    """MinHash signature (NUM_PERM uint32) of a feature set, None if empty."""
+    if len(features) == 0:
+        return None
+    values = features.astype(np.uint64)
+    signature = np.empty(NUM_PERM, dtype=np.uint32)
+    # Multiply-shift hashing, one permutation at a time to bound memory
+    for i in range(NUM_PERM):
+        signature[i] = ((values * _PERM_A[i] + _PERM_B[i]) >> np.uint64(32)).min()
+    return signature
+
+
+def digest_file(path: Path) -> tuple[np.ndarray | None, int]:
+    """MinHash signature and chunk count of a sample file."""
+    features = chunk_hashes(path.read_bytes())
+    return minhash(features), len(features)
+
+
+def band_buckets(signature: np.ndarray) -> list[int]:
+    """LSH bucket of each band, as signed 64-bit integers."""
+    rows = signature.astype("<u4").reshape(BANDS, ROWS)
+    return [
+        int.from_bytes(
+            hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "little", signed=True
+        )
+        for band in rows
+    ]
+
+
+def encode_signature(signature: np.ndarray) -> bytes:
+    """Signature as stored in sample_similarity.signature."""
+    return signature.astype("<u4").tobytes()
+
+
+def decode_signature(data: bytes) -> np.ndarray:
+    """Inverse of encode_signature."""
+    return np.frombuffer(data, dtype="<u4")
+
+
+def estimate_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the chunk sets behind two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
@@ -33,6 +33,33 @@ class StageResult:
     artifacts: list[str]
     error: str | None = None
 
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize to a JSON-compatible dict (used for checkpoints)."""
+        return {
+            "stage_name": self.stage_name,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "ended_at": self.ended_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "findings": self.findings,
+            "artifacts": self.artifacts,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "StageResult":
+        """Deserialize a result produced by ``to_dict``."""
+        return cls(
+            stage_name=data["stage_name"],
+            status=data["status"],
+            started_at=datetime.fromisoformat(data["started_at"]),
+            ended_at=datetime.fromisoformat(data["ended_at"]),
+            duration_ms=data["duration_ms"],
+            findings=data["findings"],
+            artifacts=data["artifacts"],
+            error=data.get("error"),
+        )
+
 
 class Stage(ABC):
     """Abstract base class for analysis stages."""
@@ -43,6 +70,26 @@ class Stage(ABC):
         """Stage name identifier."""
         pass
 
+    @property
+    def version(self) -> str:
+        """Stage implementation version.
+
+        Bump when a change alters findings, so checkpoints written by an older
+        implementation are not reused on retry.
+        """
+        return "1"
+
+    async def warm_up(self) -> None:
+        """Load heavy state (libraries, rules, databases) before the first job.
+
+        Called once at worker startup; the default does nothing.
+
+        Raises:
+            Exception: If the stage cannot be prepared.
+        """
+        # Optional hook: stages without startup state keep this no-op
+        return None
+
     @abstractmethod
     async def execute(self, ctx: StageContext) -> StageResult:
         """
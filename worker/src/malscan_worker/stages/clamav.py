@@ -1,21 +1,114 @@
-"""ClamAV scanning stage using clamscan CLI."""
+"""ClamAV scanning stage using clamscan CLI.
 
-import asyncio
+Samples of concurrent jobs are scanned together, one clamscan invocation
+(and signature database load) per batch, see ``malscan_worker.batching``.
+"""
+
+import tempfile
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from pathlib import Path
 
+from malscan_worker.batching import EngineBatcher, batch_timeout
 from malscan_worker.config import get_settings
 from malscan_worker.stages.base import Stage, StageContext, StageResult
+from malscan_worker.subprocess_runner import run_engine
 
 settings = get_settings()
 
 
+@dataclass(frozen=True)
+class ClamScanResult:
+    """clamscan verdict for one file."""
+
+    infected: bool
+    threat_name: str | None = None
+    error: str | None = None
+
+
+def parse_output(stdout: bytes, paths: list[Path]) -> dict[Path, ClamScanResult]:
+    """Per-file verdicts in the output of ``clamscan --no-summary``.
+
+    Lines are "/path/to/file: OK", "/path/to/file: ThreatName FOUND" or
+    "/path/to/file: message ERROR"; files without a line are left out.
+    """
+    by_name = {str(path): path for path in paths}
+    results = {}
+    for line in stdout.decode(errors="replace").splitlines():
+        name, _, status = line.rpartition(": ")
+        path = by_name.get(name)
+        if path is None:
+            continue
+        status = status.strip()
+        if status.endswith("FOUND"):
+            results[path] = ClamScanResult(True, status.replace("FOUND", "").strip())
+        elif status.endswith("ERROR"):
+            results[path] = ClamScanResult(False, error=status.replace("ERROR", "").strip())
+        else:
+            results[path] = ClamScanResult(False)
+    return results
+
+
+async def scan_files(paths: list[Path]) -> dict[Path, ClamScanResult]:
+    """Scan files with one clamscan invocation.
+
+    Raises:
+        RuntimeError: If clamscan was killed or a batch's output is incomplete.
+    """
+    proc = await run_engine(
+        "clamav",
+        [settings.clamscan_path, "--no-summary", *(str(path) for path in paths)],
+        timeout=batch_timeout(len(paths)),
+    )
+    if proc.signaled:
+        raise RuntimeError(f"clamscan killed by signal {-proc.returncode}")
+    if len(paths) > 1 and proc.stdout_truncated:
+        raise RuntimeError("clamscan output truncated")
+
+    results = parse_output(proc.stdout, paths)
+    # Exit code: 0 = clean, 1 = infected, 2 = error
+    if proc.returncode == 2:
+        # Files of a batch with a verdict line were scanned despite the error
+        error = proc.stderr.decode(errors="replace").strip() or "ClamAV error"
+        for path in paths:
+            if len(paths) == 1 or path not in results:
+                results[path] = ClamScanResult(False, error=error)
+    elif len(paths) == 1 and paths[0] not in results:
+        # A lone file's verdict comes from the exit code
+        results[paths[0]] = ClamScanResult(proc.returncode == 1)
+    return results
+
+
 class ClamAVStage(Stage):
     """Scan file with ClamAV using clamscan CLI."""
 
+    def __init__(self) -> None:
+        self._batcher = EngineBatcher(
+            "clamav",
+            scan_files,
+            settings.clamav_batch_max_files,
+            settings.clamav_batch_window_seconds,
+        )
+
     @property
     def name(self) -> str:
         return "clamav"
 
+    async def warm_up(self) -> None:
+        # clamscan loads its signature database on every run; scanning an
+        # empty file checks the binary and database and pulls them into the
+        # page cache for the first job
+        with tempfile.NamedTemporaryFile(prefix="malscan-warm-up-") as empty:
+            proc = await run_engine(
+                self.name,
+                [settings.clamscan_path, "--no-summary", empty.name],
+                timeout=settings.stage_timeout_seconds,
+            )
+        if proc.returncode == 2 or proc.signaled:
+            raise RuntimeError(
+                f"clamscan failed during warm-up: {proc.stderr.decode(errors='replace')[:200]}"
+            )
+
     async def execute(self, ctx: StageContext) -> StageResult:
         started_at = datetime.now(timezone.utc)
 
@@ -23,36 +116,13 @@ class ClamAVStage(Stage):
             if ctx.file_path is None or not ctx.file_path.exists():
                 raise FileNotFoundError(f"File not found: {ctx.file_path}")
 
-            # Run clamscan
-            proc = await asyncio.create_subprocess_exec(
-                settings.clamscan_path,
-                "--no-summary",
-                str(ctx.file_path),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-
-            stdout, stderr = await proc.communicate()
-            output = stdout.decode().strip()
-
-            # Parse result
-            # Exit code: 0 = clean, 1 = infected, 2 = error
-            infected = proc.returncode == 1
-            threat_name = None
-
-            if infected and ":" in output:
-                # Format: "/path/to/file: ThreatName FOUND"
-                parts = output.split(":")
-                if len(parts) >= 2:
-                    threat_part = parts[-1].strip()
-                    if threat_part.endswith("FOUND"):
-                        threat_name = threat_part.replace("FOUND", "").strip()
+            # Run clamscan, together with the samples of concurrent jobs
+            scan = await self._batcher.submit(ctx.file_path)
 
             ended_at = datetime.now(timezone.utc)
             duration_ms = int((ended_at - started_at).total_seconds() * 1000)
 
-            # Error case (exit code 2)
-            if proc.returncode == 2:
+            if scan.error is not None:
                 return StageResult(
                     stage_name=self.name,
                     status="failed",
@@ -61,7 +131,7 @@ class ClamAVStage(Stage):
                     duration_ms=duration_ms,
                     findings={},
                     artifacts=[],
-                    error=stderr.decode().strip() or "ClamAV error",
+                    error=scan.error,
                 )
 
             return StageResult(
@@ -72,8 +142,8 @@ class ClamAVStage(Stage):
                 duration_ms=duration_ms,
                 findings={
                     "engine": "ClamAV",
-                    "infected": infected,
-                    "threat_name": threat_name,
+                    "infected": scan.infected,
+                    "threat_name": scan.threat_name,
                 },
                 artifacts=[],
                 error=None,
@@ -0,0 +1,218 @@
+"""Entropy and byte-statistics stage using NumPy over a memory-mapped sample.
+
+Computes the whole-file byte histogram and Shannon entropy, plus the entropy
+of sliding windows of ``entropy_window_bytes`` advancing by half a window.
+Windows at or above ``entropy_high_threshold`` bits per byte are merged into
+high-entropy regions, the usual sign of packed, compressed or encrypted
+content.
+
+The sample is read through ``mmap`` in chunks: each chunk's half-window
+histograms are counted with a single ``bincount``, and a window's histogram
+is the sum of its two halves, so every byte is counted once.
+"""
+
+import asyncio
+import mmap
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from malscan_worker.config import get_settings
+from malscan_worker.stages.base import Stage, StageContext, StageResult
+
+settings = get_settings()
+
+# Half windows counted per bincount call; small enough for the index buffer
+# (8 bytes per sample byte) to stay in cache
+_CHUNK_STEPS = 64
+
+# Printable ASCII plus tab, newline and carriage return
+_PRINTABLE = np.zeros(256, dtype=bool)
+_PRINTABLE[0x20:0x7F] = True
+_PRINTABLE[[0x09, 0x0A, 0x0D]] = True
+
+
+def _count_log_table(total: int) -> np.ndarray:
+    """c * log2(c) for every count c of a window of total bytes."""
+    counts = np.arange(total + 1, dtype=np.float64)
+    table = np.zeros(total + 1, dtype=np.float64)
+    np.multiply(counts[1:], np.log2(counts[1:]), out=table[1:])
+    return table
+
+
+def shannon_entropy(histogram: np.ndarray) -> float:
+    """Shannon entropy in bits per byte of a byte histogram."""
+    total = int(histogram.sum())
+    if total == 0:
+        return 0.0
+    counts = histogram[histogram > 0].astype(np.float64)
+    return float(np.log2(total) - (counts * np.log2(counts)).sum() / total)
+
+
+def window_entropy(data: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    """Byte histogram of data and the entropy of its sliding windows.
+
+    Args:
+        data: Sample bytes (uint8).
+        window: Window size in bytes (even); windows advance by window // 2.
+
+    Returns:
+        The 256-bin histogram of data and the entropy of every complete
+        window, window i starting at i * window // 2.
+    """
+    step = window // 2
+    steps = len(data) // step
+    histogram = np.zeros(256, dtype=np.int64)
+    entropies = np.empty(max(steps - 1, 0), dtype=np.float64)
+    table = _count_log_table(window)
+    offsets = np.arange(_CHUNK_STEPS, dtype=np.intp)[:, None] * 256
+    buffer = np.empty((_CHUNK_STEPS, step), dtype=np.intp)
+
+    previous: np.ndarray | None = None
+    done = 0
+    for first in range(0, steps, _CHUNK_STEPS):
+        count = min(_CHUNK_STEPS, steps - first)
+        chunk = data[first * step : (first + count) * step].reshape(count, step)
+        # Half-window histograms of the whole chunk in one pass
+        index = np.add(chunk, offsets[:count], out=buffer[:count])
+        halves = np.bincount(index.ravel(), minlength=count * 256).reshape(count, 256)
+        histogram += halves.sum(axis=0)
+
+        if previous is not None:
+            halves = np.concatenate((previous, halves))
+        windows = halves[:-1] + halves[1:]
+        entropies[done : done + len(windows)] = (
+            np.log2(window) - table[windows].sum(axis=1) / window
+        )
+        done += len(windows)
+        previous = halves[-1:]
+
+    tail = data[steps * step :]
+    if len(tail):
+        histogram += np.bincount(tail, minlength=256)
+    return histogram, entropies
+
+
+def high_entropy_regions(
+    entropies: np.ndarray, window: int, threshold: float
+) -> list[dict[str, Any]]:
+    """Byte ranges covered by consecutive windows at or above threshold."""
+    step = window // 2
+    high = np.concatenate(([False], entropies >= threshold, [False]))
+    edges = np.flatnonzero(np.diff(high.astype(np.int8)))
+    regions = []
+    for first, last in zip(edges[::2], edges[1::2], strict=True):
+        values = entropies[first:last]
+        regions.append(
+            {
+                "offset": int(first) * step,
+                "length": (int(last) - 1 - int(first)) * step + window,
+                "mean_entropy": round(float(values.mean()), 3),
+                "max_entropy": round(float(values.max()), 3),
+            }
+        )
+    return regions
+
+
+def entropy_profile(entropies: np.ndarray, points: int) -> list[float]:
+    """Window entropies averaged down to at most points values, in file order."""
+    if len(entropies) <= points:
+        return [round(float(value), 3) for value in entropies]
+    bounds = np.linspace(0, len(entropies), points + 1).astype(np.intp)
+    means = np.add.reduceat(entropies, bounds[:-1]) / np.diff(bounds)
+    return [round(float(value), 3) for value in means]
+
+
+def analyze_bytes(data: np.ndarray) -> dict[str, Any]:
+    """Entropy and byte statistics of a sample."""
+    window = settings.entropy_window_bytes
+    threshold = settings.entropy_high_threshold
+    histogram, entropies = window_entropy(data, window)
+    size = len(data)
+
+    regions = high_entropy_regions(entropies, window, threshold)
+    # Regions are separated by at least one low window, so they never overlap
+    covered = sum(region["length"] for region in regions)
+
+    expected = size / 256
+    return {
+        "size": size,
+        "entropy": round(shannon_entropy(histogram), 4),
+        "chi_square": round(float(((histogram - expected) ** 2).sum() / expected), 2)
+        if size
+        else 0.0,
+        "unique_bytes": int(np.count_nonzero(histogram)),
+        "printable_ratio": round(float(histogram[_PRINTABLE].sum()) / size, 4) if size else 0.0,
+        "null_ratio": round(float(histogram[0]) / size, 4) if size else 0.0,
+        "byte_histogram": histogram.tolist(),
+        "window_bytes": window,
+        "windows": len(entropies),
+        "min_window_entropy": round(float(entropies.min()), 3) if len(entropies) else None,
+        "max_window_entropy": round(float(entropies.max()), 3) if len(entropies) else None,
+        "high_entropy_ratio": round(covered / size, 4) if size else 0.0,
+        "high_entropy_regions_total": len(regions),
+        "high_entropy_regions": regions[: settings.entropy_max_regions],
+        "profile": entropy_profile(entropies, settings.entropy_profile_points),
+    }
+
+
+def analyze_file(path: Path) -> dict[str, Any]:
+    """Entropy and byte statistics of a sample file, read through mmap."""
+    with path.open("rb") as f:
+        if path.stat().st_size == 0:
+            return analyze_bytes(np.zeros(0, dtype=np.uint8))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = np.frombuffer(mapped, dtype=np.uint8)
+            try:
+                return analyze_bytes(view)
+            finally:
+                # The mapping cannot be closed while an array still exports it
+                del view
+
+
+class EntropyStage(Stage):
+    """Compute entropy, byte statistics and high-entropy regions."""
+
+    @property
+    def name(self) -> str:
+        return "entropy"
+
+    async def execute(self, ctx: StageContext) -> StageResult:
+        started_at = datetime.now(timezone.utc)
+
+        try:
+            if ctx.file_path is None or not ctx.file_path.exists():
+                raise FileNotFoundError(f"File not found: {ctx.file_path}")
+
+            findings = await asyncio.to_thread(analyze_file, ctx.file_path)
+
+            ended_at = datetime.now(timezone.utc)
+            duration_ms = int((ended_at - started_at).total_seconds() * 1000)
+
+            return StageResult(
+                stage_name=self.name,
+                status="ok",
+                started_at=started_at,
+                ended_at=ended_at,
+                duration_ms=duration_ms,
+                findings=findings,
+                artifacts=[],
+                error=None,
+            )
+
+        except Exception as e:
+            ended_at = datetime.now(timezone.utc)
+            duration_ms = int((ended_at - started_at).total_seconds() * 1000)
+
+            return StageResult(
+                stage_name=self.name,
+                status="failed",
+                started_at=started_at,
+                ended_at=ended_at,
+                duration_ms=duration_ms,
+                findings={},
+                artifacts=[],
+                error=str(e),
+            )
@@ -1,11 +1,62 @@
 """File type detection stage using python-magic."""
 
+import asyncio
 from datetime import datetime, timezone
 
 import magic
 
 from malscan_worker.stages.base import Stage, StageContext, StageResult
 
+# MIME family by exact type, then by prefix
+_MIME_FAMILIES = {
+    "application/x-dosexec": "pe",
+    "application/vnd.microsoft.portable-executable": "pe",
+    "application/x-msdownload": "pe",
+    "application/x-executable": "elf",
+    "application/x-sharedlib": "elf",
+    "application/x-pie-executable": "elf",
+    "application/x-mach-binary": "macho",
+    "application/pdf": "document",
+    "application/msword": "document",
+    "application/rtf": "document",
+    "application/zip": "archive",
+    "application/x-rar": "archive",
+    "application/x-7z-compressed": "archive",
+    "application/gzip": "archive",
+    "application/x-tar": "archive",
+    "application/java-archive": "archive",
+    "application/javascript": "script",
+    "application/x-shellscript": "script",
+    "text/x-python": "script",
+    "text/x-shellscript": "script",
+    "text/x-msdos-batch": "script",
+}
+_MIME_PREFIX_FAMILIES = [
+    ("application/vnd.openxmlformats-officedocument", "document"),
+    ("application/vnd.ms-", "document"),
+    ("application/vnd.oasis.opendocument", "document"),
+    ("image/", "image"),
+    ("text/", "text"),
+]
+
+# Every value mime_family returns
+FAMILIES = frozenset(
+    {*_MIME_FAMILIES.values(), *(family for _, family in _MIME_PREFIX_FAMILIES), "other", "unknown"}
+)
+
+
+def mime_family(mime_type: str | None) -> str:
+    """Coarse file class of a MIME type, used as a metrics label."""
+    if not mime_type:
+        return "unknown"
+    mime_type = mime_type.split(";", 1)[0].strip().lower()
+    if mime_type in _MIME_FAMILIES:
+        return _MIME_FAMILIES[mime_type]
+    for prefix, family in _MIME_PREFIX_FAMILIES:
+        if mime_type.startswith(prefix):
+            return family
+    return "other"
+
 
 class FileTypeStage(Stage):
     """Detect file type using magic bytes."""
@@ -14,6 +65,11 @@ class FileTypeStage(Stage):
     def name(self) -> str:
         return "file-type"
 
+    async def warm_up(self) -> None:
+        # Loads libmagic and its database for both lookups used by execute
+        await asyncio.to_thread(magic.from_buffer, b"MZ", mime=True)
+        await asyncio.to_thread(magic.from_buffer, b"MZ")
+
     async def execute(self, ctx: StageContext) -> StageResult:
         started_at = datetime.now(timezone.utc)
 
@@ -0,0 +1,89 @@
+"""Similarity digest stage for near-duplicate lookup."""
+
+import asyncio
+import base64
+from datetime import datetime, timezone
+
+from malscan_worker import similarity
+from malscan_worker.config import get_settings
+from malscan_worker.db import find_similar_samples
+from malscan_worker.stages.base import Stage, StageContext, StageResult
+
+settings = get_settings()
+
+
+class SimilarityStage(Stage):
+    """Compute the sample's similarity digest and find its nearest indexed samples.
+
+    The digest is added to the index by the pipeline once the job's result
+    is stored, so the lookup only returns previously analyzed samples.
+    """
+
+    @property
+    def name(self) -> str:
+        return "similarity"
+
+    async def execute(self, ctx: StageContext) -> StageResult:
+        started_at = datetime.now(timezone.utc)
+
+        try:
+            if ctx.file_path is None or not ctx.file_path.exists():
+                raise FileNotFoundError(f"File not found: {ctx.file_path}")
+
+            signature, features = await asyncio.to_thread(similarity.digest_file, ctx.file_path)
+
+            findings = {"signature": None, "features": features, "similar": []}
+            if signature is not None:
+                candidates = await find_similar_samples(
+                    ctx.file_id,
+                    similarity.band_buckets(signature),
+                    settings.similarity_max_candidates,
+                )
+                similar = []
+                for file_id, sha256, verdict, encoded in candidates:
+                    score = similarity.estimate_similarity(
+                        signature, similarity.decode_signature(encoded)
+                    )
+                    if score >= settings.similarity_min_score:
+                        similar.append(
+                            {
+                                "file_id": file_id,
+                                "sha256": sha256,
+                                "similarity": round(score, 3),
+                                "verdict": verdict,
+                            }
+                        )
+                similar.sort(key=lambda item: (-item["similarity"], item["sha256"]))
+                findings["signature"] = base64.b64encode(
+                    similarity.encode_signature(signature)
+                ).decode()
+                findings["similar"] = similar[: settings.similarity_top_k]
+
+            ended_at = datetime.now(timezone.utc)
+            duration_ms = int((ended_at - started_at).total_seconds() * 1000)
+
+            return StageResult(
+                stage_name=self.name,
+                status="ok",
+                started_at=started_at,
+                ended_at=ended_at,
+                duration_ms=duration_ms,
+                findings=findings,
+                artifacts=[],
+                error=None,
+            )
+
+        except Exception as e:
+            ended_at = datetime.now(timezone.utc)
+            duration_ms = int((ended_at - started_at).total_seconds() * 1000)
+
+            return StageResult(
+                stage_name=self.name,
+                status="failed",
+                started_at=started_at,
+                ended_at=ended_at,
+                duration_ms=duration_ms,
+                findings={},
+                artifacts=[],
+                error=str(e),
+            )
@@ -1,23 +1,433 @@
-"""YARA scanning stage using yara CLI."""
+"""YARA scanning stage using yara CLI.
+
+Rule files can be scoped to file types in ``manifest.json`` in the rules
+directory, mapping rule file names to the ``mime_family`` classes they
+apply to::
+
+    {"file_types": {"webshells.yar": ["script", "text"]}}
+
+Each sample is scanned with the rule files applicable to the class of the
+MIME type found by the file-type stage; unlisted rule files apply to every
+class, and samples of unknown class get every rule file.
+
+Rules come from the newest prebuilt ruleset artifact when a ruleset store is
+configured (see ``malscan_worker.ruleset``), otherwise from
+``yara_rules_path``, compiled at warm-up.
+
+Concurrent jobs scanning with the same rule file share one yara invocation
+(``--scan-list``), see ``malscan_worker.batching``.
+"""
 
 import asyncio
+import json
+import tempfile
+import time
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
-from typing import cast
+from typing import Any, cast
 
+import structlog
+
+from malscan_worker.batching import EngineBatcher, batch_timeout
 from malscan_worker.config import get_settings
+from malscan_worker.metrics import yara_ruleset_loads, yara_scan_seconds
+from malscan_worker.rule_stats import rule_stats
+from malscan_worker.ruleset import (
+    LoadedRuleset,
+    fetch_latest,
+    install,
+    prune,
+    ruleset_store,
+    source_digest,
+    yara_version,
+)
 from malscan_worker.stages.base import Stage, StageContext, StageResult
+from malscan_worker.stages.filetype import FAMILIES, mime_family
+from malscan_worker.subprocess_runner import EngineTimeoutError, run_engine
 
+log = structlog.get_logger()
 settings = get_settings()
 
+MANIFEST_NAME = "manifest.json"
+
+
+def rule_files(rules_path: Path) -> list[Path]:
+    """Rule sources in the rules directory."""
+    return list(rules_path.glob("*.yar")) + list(rules_path.glob("*.yara"))
+
+
+def load_manifest(rules_path: Path) -> dict[str, frozenset[str]]:
+    """File type classes declared per rule file name in the rules manifest.
+
+    Raises:
+        ValueError: If the manifest is malformed.
+    """
+    path = rules_path / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    data = json.loads(path.read_text())
+    scopes = data.get("file_types", {}) if isinstance(data, dict) else None
+    if not isinstance(scopes, dict) or not all(
+        isinstance(types, list) for types in scopes.values()
+    ):
+        raise ValueError(f"{MANIFEST_NAME}: file_types must map rule files to lists")
+    return {name: frozenset(types) for name, types in scopes.items()}
+
+
+def file_class(ctx: StageContext) -> str:
+    """mime_family of the sample, from the file-type stage result."""
+    for result in ctx.previous_results:
+        if result.stage_name == "file-type":
+            return mime_family(result.findings.get("mime_type"))
+    return "unknown"
+
+
+def parse_output(stdout: bytes, namespace: str) -> list[dict[str, Any]]:
+    """Matches in the output of ``yara -s -m`` for one rule file."""
+    matches: list[dict[str, Any]] = []
+    if not stdout:
+        return matches
+
+    # With -m: "rule_name [key=value,key2=value2] file_path"
+    # With -s: followed by "0xoffset:$string_id: matched_data"
+    lines = stdout.decode().strip().split("\n")
+    current_rule: dict[str, Any] | None = None
+
+    for line in lines:
+        if not line.startswith("0x"):
+            # Rule name line with metadata
+            # Format: "rule_name [meta1=val1,meta2=val2] /path/to/file"
+            meta_dict: dict[str, str] = {}
+            rule_name = ""
+
+            # Check if metadata is present (enclosed in [])
+            if "[" in line and "]" in line:
+                bracket_start = line.index("[")
+                bracket_end = line.index("]")
+                rule_name = line[:bracket_start].strip()
+                meta_str = line[bracket_start + 1 : bracket_end]
+
+                # Parse metadata key=value pairs
+                for meta_item in meta_str.split(","):
+                    if "=" in meta_item:
+                        key, value = meta_item.split("=", 1)
+                        # Remove quotes from value
+                        value = value.strip().strip('"')
+                        meta_dict[key.strip()] = value
+            else:
+                # No metadata, just rule name and file path
+                parts = line.split()
+                if parts:
+                    rule_name = parts[0]
+
+            if rule_name:
+                current_rule = {
+                    "rule": rule_name,
+                    "namespace": namespace,
+                    "description": meta_dict.get("description", ""),
+                    "severity": meta_dict.get("severity", "medium"),
+                    "author": meta_dict.get("author", ""),
+                    "tags": list[str](),
+                    "strings": list[str](),
+                }
+                matches.append(current_rule)
+        else:
+            # String match line
+            if current_rule:
+                # Parse "0xoffset:$name: data"
+                parts = line.split(":", 2)
+                if len(parts) >= 2:
+                    string_name = parts[1].strip()
+                    strings_list = cast(list[str], current_rule["strings"])
+                    if string_name not in strings_list:
+                        strings_list.append(string_name)
+    return matches
+
+
+def parse_batch_output(
+    stdout: bytes, namespace: str, paths: list[Path]
+) -> dict[Path, list[dict[str, Any]]]:
+    """Matches per file in the output of ``yara -s -m --scan-list`` for one rule file."""
+    # Longest first, so a path that is a suffix of another is not matched for it
+    names = sorted(((f" {path}", path) for path in paths), key=lambda item: -len(item[0]))
+    lines: dict[Path, list[str]] = {path: [] for path in paths}
+    current: Path | None = None
+    for line in stdout.decode().splitlines():
+        if not line.startswith("0x"):
+            # Rule lines end with the scanned file's path
+            current = next((path for name, path in names if line.endswith(name)), None)
+        if current is not None:
+            lines[current].append(line)
+    return {
+        path: parse_output("\n".join(file_lines).encode(), namespace)
+        for path, file_lines in lines.items()
+    }
+
+
+@dataclass(frozen=True)
+class RuleFileScan:
+    """Matches of one rule file in one sample."""
+
+    matches: list[dict[str, Any]]
+    # Share of the (batch) invocation's time
+    wall_seconds: float
+    cpu_seconds: float
+
 
 class YaraStage(Stage):
     """Scan file with YARA rules using yara CLI."""
 
+    def __init__(self) -> None:
+        # Prebuilt ruleset in use, None while scanning yara_rules_path
+        self._ruleset: LoadedRuleset | None = None
+        # Rule source -> (source mtime, compiled rules), filled by warm_up
+        self._compiled: dict[Path, tuple[float, Path]] = {}
+        # Version of the rules in yara_rules_path, per rule file mtimes
+        self._source_version: tuple[tuple[Any, ...], str] | None = None
+        # Rule file -> batcher of the scans with it
+        self._batchers: dict[Path, EngineBatcher[RuleFileScan]] = {}
+        # File type class -> applicable rule files, for one version of the
+        # rule file list and manifest
+        self._subsets: dict[str, list[Path]] = {}
+        self._subsets_key: tuple[Any, ...] | None = None
+
     @property
     def name(self) -> str:
         return "yara"
 
+    @property
+    def version(self) -> str:
+        # Checkpoints of a job retried after a ruleset change are not reused,
+        # whether the rules are prebuilt or compiled from yara_rules_path
+        return f"1+{self.ruleset_version(rule_files(self.rules_path))}"
+
+    @property
+    def rules_path(self) -> Path:
+        """Directory of the rule files scans use."""
+        if self._ruleset is not None:
+            return self._ruleset.rules_path
+        return Path(settings.yara_rules_path)
+
+    def ruleset_version(self, files: list[Path]) -> str:
+        """Version of the rules in use, stamped into reports."""
+        if self._ruleset is not None:
+            return self._ruleset.version
+        key = tuple((rule_file, rule_file.stat().st_mtime) for rule_file in sorted(files))
+        if self._source_version is None or self._source_version[0] != key:
+            digest = source_digest(Path(settings.yara_rules_path), files)
+            self._source_version = (key, f"source-{digest[:12]}")
+        return self._source_version[1]
+
+    async def refresh_ruleset(self) -> bool:
+        """Switch to the newest published ruleset if it is not loaded yet.
+
+        Returns:
+            Whether a new ruleset was loaded.
+
+        Raises:
+            Exception: If the store is unreachable or the artifact is invalid.
+        """
+        store = ruleset_store()
+        if store is None:
+            return False
+        latest = await fetch_latest(store)
+        if latest is None or (
+            self._ruleset is not None and self._ruleset.version == latest["version"]
+        ):
+            return False
+
+        engine_version = await yara_version()
+        if latest["yara_version"] != engine_version:
+            yara_ruleset_loads.labels(outcome="incompatible").inc()
+            log.warning(
+                "yara_ruleset_incompatible",
+                version=latest["version"],
+                built_with=latest["yara_version"],
+                yara_version=engine_version,
+            )
+            return False
+
+        root = Path(settings.yara_compiled_dir) / "rulesets"
+        previous = self._ruleset
+        self._ruleset = await install(store, latest, root)
+        # Scans still running keep reading the previous version's files
+        keep = {latest["version"]} | ({previous.version} if previous is not None else set())
+        await asyncio.to_thread(prune, root, keep)
+        yara_ruleset_loads.labels(outcome="artifact").inc()
+        log.info(
+            "yara_ruleset_loaded",
+            version=latest["version"],
+            previous=previous.version if previous is not None else None,
+        )
+        return True
+
+    async def warm_up(self) -> None:
+        """Load the newest prebuilt ruleset, or compile every rule file with yarac.
+
+        Either way scans skip rule parsing.
+        """
+        if settings.yara_ruleset_store != "none":
+            try:
+                if await self.refresh_ruleset():
+                    return
+            except Exception as e:
+                yara_ruleset_loads.labels(outcome="failed").inc()
+                log.warning("yara_ruleset_load_failed", error=str(e))
+            log.info("yara_ruleset_fallback_to_source", rules_path=settings.yara_rules_path)
+
+        rules_path = Path(settings.yara_rules_path)
+        if not rules_path.exists():
+            return
+
+        compiled_dir = Path(settings.yara_compiled_dir)
+        compiled_dir.mkdir(parents=True, exist_ok=True)
+        for rule_file in rule_files(rules_path):
+            mtime = rule_file.stat().st_mtime
+            target = compiled_dir / f"{rule_file.name}.yarc"
+            proc = await run_engine(
+                self.name,
+                ["yarac", str(rule_file), str(target)],
+                timeout=settings.stage_timeout_seconds,
+            )
+            if proc.returncode != 0 or proc.signaled:
+                # Scans fall back to the source, which reports the error per job
+                log.warning(
+                    "yara_rule_compile_failed",
+                    rule_file=rule_file.name,
+                    error=proc.stderr.decode(errors="replace")[:200],
+                )
+                continue
+            self._compiled[rule_file] = (mtime, target)
+
+        log.info("yara_rules_compiled", compiled=len(self._compiled))
+        yara_ruleset_loads.labels(outcome="source").inc()
+        self._applicable_rule_files(rules_path, rule_files(rules_path), "unknown")
+
+    def _read_manifest(self, rules_path: Path, files: list[Path]) -> dict[str, frozenset[str]]:
+        try:
+            manifest = load_manifest(rules_path)
+        except ValueError as e:
+            # Scanning with every rule file is slower but never misses a match
+            log.warning("yara_manifest_invalid", error=str(e))
+            return {}
+
+        names = {rule_file.name for rule_file in files}
+        for name, types in manifest.items():
+            if name not in names:
+                log.warning("yara_manifest_unknown_rule_file", rule_file=name)
+            if types - FAMILIES:
+                log.warning(
+                    "yara_manifest_unknown_file_types",
+                    rule_file=name,
+                    file_types=sorted(types - FAMILIES),
+                )
+        return manifest
+
+    def _applicable_rule_files(
+        self, rules_path: Path, files: list[Path], sample_class: str
+    ) -> list[Path]:
+        """Rule files that apply to a file type class, cached per class."""
+        manifest_path = rules_path / MANIFEST_NAME
+        key = (
+            tuple(sorted(files)),
+            manifest_path.stat().st_mtime if manifest_path.exists() else None,
+        )
+        if key != self._subsets_key:
+            manifest = self._read_manifest(rules_path, files)
+            self._subsets = {
+                family: [
+                    rule_file
+                    for rule_file in sorted(files)
+                    if family == "unknown"
+                    or rule_file.name not in manifest
+                    or family in manifest[rule_file.name]
+                ]
+                for family in FAMILIES
+            }
+            self._subsets_key = key
+            log.info(
+                "yara_rule_subsets",
+                rule_files={family: len(subset) for family, subset in self._subsets.items()},
+            )
+
+        if not settings.yara_scope_by_file_type:
+            return self._subsets["unknown"]
+        return self._subsets.get(sample_class, self._subsets["unknown"])
+
+    def _rules_arguments(self, rule_file: Path) -> list[str]:
+        """yara arguments loading a rule file, compiled if still up to date."""
+        loaded = self._ruleset.compiled if self._ruleset is not None else self._compiled
+        compiled = loaded.get(rule_file)
+        if compiled is not None and compiled[0] == rule_file.stat().st_mtime:
+            return ["-C", str(compiled[1])]
+        return [str(rule_file)]
+
+    async def _scan_rule_file(self, rule_file: Path, paths: list[Path]) -> dict[Path, RuleFileScan]:
+        """Scan files with one rule file in one yara invocation.
+
+        Raises:
+            EngineTimeoutError: If yara timed out.
+            RuntimeError: If yara was killed or truncated its output, or
+                failed scanning a batch.
+        """
+        rules = self._rules_arguments(rule_file)
+        namespace = rule_file.stem
+        if len(paths) == 1:
+            proc = await run_engine(
+                self.name,
+                [
+                    "yara",
+                    "-s",  # Print matching strings
+                    "-m",  # Print metadata
+                    *rules,
+                    str(paths[0]),
+                ],
+                timeout=settings.stage_timeout_seconds,
+            )
+            if proc.signaled:
+                raise RuntimeError(
+                    f"yara killed by signal {-proc.returncode} scanning {rule_file.name}"
+                )
+            # Matches past the output cap would be lost, leaving the verdict too clean
+            if proc.stdout_truncated:
+                raise RuntimeError(f"yara output truncated scanning {rule_file.name}")
+            matches = parse_output(proc.stdout, namespace) if proc.returncode == 0 else []
+            return {paths[0]: RuleFileScan(matches, proc.wall_seconds, proc.cpu_seconds)}
+
+        with tempfile.NamedTemporaryFile("w", prefix="malscan-yara-scan-list-") as scan_list:
+            scan_list.write("\n".join(str(path) for path in paths) + "\n")
+            scan_list.flush()
+            proc = await run_engine(
+                self.name,
+                ["yara", "-s", "-m", "--scan-list", *rules, scan_list.name],
+                timeout=batch_timeout(len(paths)),
+            )
+        # Errors are attributed to their files by scanning them one by one
+        if proc.returncode != 0 or proc.signaled or proc.stdout_truncated:
+            raise RuntimeError(
+                f"yara batch of {len(paths)} failed scanning {rule_file.name}: "
+                f"{proc.stderr.decode(errors='replace')[:200]}"
+            )
+        share = 1 / len(paths)
+        return {
+            path: RuleFileScan(file_matches, proc.wall_seconds * share, proc.cpu_seconds * share)
+            for path, file_matches in parse_batch_output(proc.stdout, namespace, paths).items()
+        }
+
+    def _batcher(self, rule_file: Path) -> EngineBatcher[RuleFileScan]:
+        batcher = self._batchers.get(rule_file)
+        if batcher is None:
+            batcher = EngineBatcher(
+                self.name,
+                partial(self._scan_rule_file, rule_file),
+                settings.yara_batch_max_files,
+                settings.yara_batch_window_seconds,
+            )
+            self._batchers[rule_file] = batcher
+        return batcher
+
     async def execute(self, ctx: StageContext) -> StageResult:
         started_at = datetime.now(timezone.utc)
 
@@ -25,7 +435,7 @@ class YaraStage(Stage):
             if ctx.file_path is None or not ctx.file_path.exists():
                 raise FileNotFoundError(f"File not found: {ctx.file_path}")
 
-            rules_path = Path(settings.yara_rules_path)
+            rules_path = self.rules_path
             if not rules_path.exists():
                 # No rules directory - skip
                 ended_at = datetime.now(timezone.utc)
@@ -42,8 +452,8 @@ class YaraStage(Stage):
                 )
 
             # Find all .yar files
-            rule_files = list(rules_path.glob("*.yar")) + list(rules_path.glob("*.yara"))
-            if not rule_files:
+            files = rule_files(rules_path)
+            if not files:
                 ended_at = datetime.now(timezone.utc)
                 duration_ms = int((ended_at - started_at).total_seconds() * 1000)
                 return StageResult(
@@ -57,77 +467,49 @@ class YaraStage(Stage):
                     error=None,
                 )
 
+            version = self.ruleset_version(files)
+            sample_class = file_class(ctx)
+            applicable = self._applicable_rule_files(rules_path, files, sample_class)
+            scan_start = time.perf_counter()
+
             matches = []
+            namespace_ms: dict[str, int] = {}
+            quarantined = []
 
-            # Run yara for each rule file
-            for rule_file in rule_files:
-                proc = await asyncio.create_subprocess_exec(
-                    "yara",
-                    "-s",  # Print matching strings
-                    "-m",  # Print metadata
-                    str(rule_file),
-                    str(ctx.file_path),
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
+            # Run yara for each rule file that applies to the sample's file type
+            for rule_file in applicable:
+                namespace = rule_file.stem
+                mtime = rule_file.stat().st_mtime
+                if rule_stats.is_quarantined(namespace, mtime):
+                    quarantined.append(namespace)
+                    continue
+
+                try:
+                    scan = await self._batcher(rule_file).submit(ctx.file_path)
+                except EngineTimeoutError as e:
+                    rule_stats.record(
+                        namespace,
+                        e.result.wall_seconds,
+                        e.result.cpu_seconds,
+                        [],
+                        mtime,
+                        timed_out=True,
+                    )
+                    raise
+
+                matches.extend(scan.matches)
+                namespace_ms[namespace] = int(scan.wall_seconds * 1000)
+                rule_stats.record(
+                    namespace,
+                    scan.wall_seconds,
+                    scan.cpu_seconds,
+                    [match["rule"] for match in scan.matches],
+                    mtime,
                 )
 
-                stdout, stderr = await proc.communicate()
-
-                if proc.returncode == 0 and stdout:
-                    # Parse output
-                    # With -m: "rule_name [key=value,key2=value2] file_path"
-                    # With -s: followed by "0xoffset:$string_id: matched_data"
-                    lines = stdout.decode().strip().split("\n")
-                    current_rule = None
-
-                    for line in lines:
-                        if not line.startswith("0x"):
-                            # Rule name line with metadata
-                            # Format: "rule_name [meta1=val1,meta2=val2] /path/to/file"
-                            meta_dict: dict[str, str] = {}
-                            rule_name = ""
-
-                            # Check if metadata is present (enclosed in [])
-                            if "[" in line and "]" in line:
-                                bracket_start = line.index("[")
-                                bracket_end = line.index("]")
-                                rule_name = line[:bracket_start].strip()
-                                meta_str = line[bracket_start + 1 : bracket_end]
-
-                                # Parse metadata key=value pairs
-                                for meta_item in meta_str.split(","):
-                                    if "=" in meta_item:
-                                        key, value = meta_item.split("=", 1)
-                                        # Remove quotes from value
-                                        value = value.strip().strip('"')
-                                        meta_dict[key.strip()] = value
-                            else:
-                                # No metadata, just rule name and file path
-                                parts = line.split()
-                                if parts:
-                                    rule_name = parts[0]
-
-                            if rule_name:
-                                current_rule = {
-                                    "rule": rule_name,
-                                    "namespace": rule_file.stem,
-                                    "description": meta_dict.get("description", ""),
-                                    "severity": meta_dict.get("severity", "medium"),
-                                    "author": meta_dict.get("author", ""),
-                                    "tags": list[str](),
-                                    "strings": list[str](),
-                                }
-                                matches.append(current_rule)
-                        else:
-                            # String match line
-                            if current_rule:
-                                # Parse "0xoffset:$name: data"
-                                parts = line.split(":", 2)
-                                if len(parts) >= 2:
-                                    string_name = parts[1].strip()
-                                    strings_list = cast(list[str], current_rule["strings"])
-                                    if string_name not in strings_list:
-                                        strings_list.append(string_name)
+            yara_scan_seconds.labels(file_class=sample_class).observe(
+                time.perf_counter() - scan_start
+            )
 
             ended_at = datetime.now(timezone.utc)
             duration_ms = int((ended_at - started_at).total_seconds() * 1000)
@@ -138,7 +520,15 @@ class YaraStage(Stage):
                 started_at=started_at,
                 ended_at=ended_at,
                 duration_ms=duration_ms,
-                findings={"matches": matches},
+                findings={
+                    "matches": matches,
+                    "ruleset_version": version,
+                    "file_class": sample_class,
+                    "rule_files_scanned": len(applicable) - len(quarantined),
+                    "rule_files_out_of_scope": len(files) - len(applicable),
+                    "namespace_ms": namespace_ms,
+                    "quarantined": quarantined,
+                },
                 artifacts=[],
                 error=None,
             )
@@ -1,13 +1,15 @@
-"""MinIO storage client for file download operations."""
+"""MinIO storage client for sample downloads and artifact uploads."""
 
 import asyncio
 import logging
 from concurrent.futures import ThreadPoolExecutor
-from functools import partial
+from functools import lru_cache, partial
+from io import BytesIO
 from pathlib import Path
 
 import structlog
 from minio import Minio
+from minio.error import S3Error
 from tenacity import (
     before_sleep_log,
     retry,
@@ -16,6 +18,7 @@ from tenacity import (
     wait_exponential,
 )
 
+from malscan_worker.cache import SHA256_PATTERN, get_sample_cache
 from malscan_worker.config import get_settings
 
 log = structlog.get_logger()
@@ -28,8 +31,9 @@ _executor = ThreadPoolExecutor(max_workers=4)
 _logger = logging.getLogger(__name__)
 
 
+@lru_cache
 def _get_minio_client() -> Minio:
-    """Create MinIO client instance."""
+    """MinIO client shared by all operations, so its connection pool is reused."""
     return Minio(
         settings.minio_endpoint,
         access_key=settings.minio_access_key,
@@ -87,12 +91,45 @@ def _download_file_sync(key: str, dest_dir: Path) -> Path:
     return dest_path
 
 
-async def download_file(key: str, dest_dir: Path) -> Path:
+def _fetch_sample_sync(key: str, dest_dir: Path, sha256: str | None) -> Path:
+    """Fetch a sample, consulting the local sample cache before MinIO.
+
+    Args:
+        key: Storage key (SHA256 hash).
+        dest_dir: Destination directory.
+        sha256: Expected SHA256 of the sample, used as the cache key.
+
+    Returns:
+        Path to the sample inside dest_dir.
+    """
+    cache = get_sample_cache()
+    if cache is None or not sha256 or not SHA256_PATTERN.match(sha256):
+        return _download_file_sync(key, dest_dir)
+
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    dest_path = dest_dir / f"{key}.bin"
+    if cache.fetch(sha256, dest_path):
+        return dest_path
+
+    dest_path = _download_file_sync(key, dest_dir)
+    try:
+        cache.store(sha256, dest_path)
+    except Exception as e:
+        # Caching is best effort - the job already has its file
+        log.warning("sample_cache_store_failed", sha256=sha256, error=str(e))
+    return dest_path
+
+
+async def download_file(key: str, dest_dir: Path, sha256: str | None = None) -> Path:
     """Download file from MinIO asynchronously.
 
+    If the sample cache is enabled and ``sha256`` is given, a cached copy is
+    hardlinked into ``dest_dir`` instead of downloading it again.
+
     Args:
         key: Storage key (typically SHA256 hash).
         dest_dir: Destination directory.
+        sha256: Expected SHA256 of the sample.
 
     Returns:
         Path to the downloaded file.
@@ -103,5 +140,94 @@ async def download_file(key: str, dest_dir: Path) -> Path:
     loop = asyncio.get_event_loop()
     return await loop.run_in_executor(
         _executor,
-        partial(_download_file_sync, key, dest_dir),
+        partial(_fetch_sample_sync, key, dest_dir, sha256),
+    )
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, min=1, max=8),
+    before_sleep=before_sleep_log(_logger, logging.WARNING),
+    retry=retry_if_exception_type(Exception),
+    reraise=True,
+)
+def _upload_artifact_sync(key: str, data: bytes, content_type: str) -> str:
+    """Synchronous artifact upload to MinIO with retry.
+
+    Args:
+        key: Object key in the artifacts bucket.
+        data: Object content.
+        content_type: MIME type of the object.
+
+    Returns:
+        The object key.
+    """
+    client = _get_minio_client()
+    bucket = settings.minio_bucket_artifacts
+
+    if not client.bucket_exists(bucket):
+        client.make_bucket(bucket)
+        log.info("bucket_created", bucket=bucket)
+
+    client.put_object(
+        bucket_name=bucket,
+        object_name=key,
+        data=BytesIO(data),
+        length=len(data),
+        content_type=content_type,
+    )
+
+    log.info("artifact_uploaded_to_minio", bucket=bucket, key=key, size=len(data))
+    return key
+
+
+async def upload_artifact(
+    key: str, data: bytes, content_type: str = "application/octet-stream"
+) -> str:
+    """Upload a job artifact to the artifacts bucket asynchronously.
+
+    Args:
+        key: Object key in the artifacts bucket.
+        data: Object content.
+        content_type: MIME type of the object.
+
+    Returns:
+        The object key.
+
+    Raises:
+        Exception: If upload fails after retries.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        _executor,
+        partial(_upload_artifact_sync, key, data, content_type),
     )
+
+
+def _check_buckets_sync() -> None:
+    """Open a connection to MinIO, check the uploads bucket and create the artifacts bucket."""
+    client = _get_minio_client()
+    if not client.bucket_exists(settings.minio_bucket_uploads):
+        raise RuntimeError(f"MinIO bucket {settings.minio_bucket_uploads} does not exist")
+
+    # Created on first upload otherwise; a fresh deployment has none yet
+    bucket = settings.minio_bucket_artifacts
+    if not client.bucket_exists(bucket):
+        try:
+            client.make_bucket(bucket)
+        except S3Error as e:
+            # Another worker created it first
+            if e.code not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+                raise
+        else:
+            log.info("bucket_created", bucket=bucket)
+
+
+async def warm_up() -> None:
+    """Establish the MinIO connection pool before the first job.
+
+    Raises:
+        Exception: If MinIO is unreachable or the uploads bucket is missing.
+    """
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(_executor, _check_buckets_sync)
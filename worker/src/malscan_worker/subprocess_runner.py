@@ -0,0 +1,304 @@
+"""Resource-capped subprocess runner for external analysis engines.
+
+Engines (clamscan, yara, ...) run in their own session/process group with
+rlimits on address space, CPU seconds and open files. Captured output is
+capped per stream; anything beyond the cap is read and discarded so the child
+never blocks on a full pipe. On timeout or cancellation of the awaiting task
+the whole process group is killed, so nothing keeps running after a stage has
+given up. The child is reaped with ``wait4`` to record its CPU time and peak
+RSS.
+
+The process is driven from a worker thread rather than asyncio's subprocess
+support because asyncio's child watcher reaps children with ``waitpid`` and
+discards their resource usage.
+
+rlimits are set by running the engine under util-linux ``prlimit``, which
+applies them to itself and then execs the engine, so the limits are in place
+before the engine starts. ``preexec_fn`` is not used: it is unsafe in a
+multithreaded process such as the worker. Without a ``prlimit`` binary the
+limits are applied with ``resource.prlimit`` right after the spawn.
+"""
+
+import asyncio
+import errno
+import os
+import resource
+import selectors
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
+import structlog
+
+from malscan_worker.config import get_settings
+from malscan_worker.metrics import (
+    engine_cpu_seconds,
+    engine_invocations,
+    engine_max_rss_bytes,
+)
+
+log = structlog.get_logger()
+settings = get_settings()
+
+# Poll interval for deadline and cancellation checks
+_POLL_SECONDS = 0.05
+
+_READ_CHUNK_SIZE = 64 * 1024
+
+_PRLIMIT = shutil.which("prlimit")
+_PRLIMIT_OPTIONS = {
+    resource.RLIMIT_AS: "--as",
+    resource.RLIMIT_CPU: "--cpu",
+    resource.RLIMIT_NOFILE: "--nofile",
+}
+
+
+@dataclass
+class ResourceLimits:
+    """rlimits applied to an engine process (None leaves a limit unchanged)."""
+
+    address_space_bytes: int | None = None
+    cpu_seconds: int | None = None
+    open_files: int | None = None
+
+    @classmethod
+    def from_settings(cls) -> "ResourceLimits":
+        return cls(
+            address_space_bytes=settings.engine_max_address_space_bytes,
+            cpu_seconds=settings.engine_max_cpu_seconds,
+            open_files=settings.engine_max_open_files,
+        )
+
+
+@dataclass
+class ProcessResult:
+    """Outcome of an engine invocation."""
+
+    returncode: int
+    stdout: bytes
+    stderr: bytes
+    stdout_truncated: bool
+    stderr_truncated: bool
+    cpu_seconds: float
+    max_rss_bytes: int
+    wall_seconds: float
+
+    @property
+    def signaled(self) -> bool:
+        """True if the process was terminated by a signal (e.g. an rlimit)."""
+        return self.returncode < 0
+
+
+class EngineTimeoutError(TimeoutError):
+    """Engine did not finish in time and its process group was killed."""
+
+    def __init__(self, engine: str, timeout: float, result: ProcessResult) -> None:
+        super().__init__(f"{engine} timed out after {timeout:g}s")
+        self.engine = engine
+        self.result = result
+
+
+def _clamped(limit: int, current_hard: int) -> tuple[int, int]:
+    if current_hard != resource.RLIM_INFINITY:
+        limit = min(limit, current_hard)
+    return limit, limit
+
+
+def _rlimits(limits: ResourceLimits) -> dict[int, tuple[int, int]]:
+    """(soft, hard) per resource for the child, within the worker's hard limits."""
+    rlimits = {}
+    if limits.address_space_bytes is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        rlimits[resource.RLIMIT_AS] = _clamped(limits.address_space_bytes, hard)
+    if limits.cpu_seconds is not None:
+        # SIGXCPU at the soft limit, SIGKILL one second later
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft, _ = _clamped(limits.cpu_seconds, hard)
+        hard = soft + 1 if hard == resource.RLIM_INFINITY else hard
+        rlimits[resource.RLIMIT_CPU] = (soft, hard)
+    if limits.open_files is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        rlimits[resource.RLIMIT_NOFILE] = _clamped(limits.open_files, hard)
+    return rlimits
+
+
+def _limited_command(args: list[str], rlimits: dict[int, tuple[int, int]]) -> list[str]:
+    """args run under prlimit with rlimits applied.
+
+    Raises:
+        FileNotFoundError: If the engine executable does not exist, as
+            Popen would raise without the prlimit wrapper.
+    """
+    if shutil.which(args[0]) is None:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), args[0])
+    options = [f"{_PRLIMIT_OPTIONS[res]}={soft}:{hard}" for res, (soft, hard) in rlimits.items()]
+    return [str(_PRLIMIT), *options, "--", *args]
+
+
+def _kill_group(pgid: int) -> None:
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _run_sync(
+    args: list[str],
+    limits: ResourceLimits,
+    timeout: float | None,
+    max_output_bytes: int,
+    cancelled: threading.Event,
+) -> tuple[ProcessResult, str]:
+    """Run a process to completion. Returns the result and how it ended."""
+    started = time.monotonic()
+    deadline = started + timeout if timeout is not None else None
+
+    rlimits = _rlimits(limits)
+    wrapped = bool(rlimits) and _PRLIMIT is not None
+    proc = subprocess.Popen(
+        _limited_command(args, rlimits) if wrapped else args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    pgid = proc.pid  # session leader: its pid is the process group id
+    if rlimits and not wrapped:
+        for res, value in rlimits.items():
+            try:
+                resource.prlimit(proc.pid, res, value)
+            except ProcessLookupError:
+                break  # already exited
+    outcome = "ok"
+
+    buffers = {"stdout": bytearray(), "stderr": bytearray()}
+    truncated = {"stdout": False, "stderr": False}
+
+    def stop(reason: str) -> None:
+        nonlocal outcome
+        if outcome == "ok":
+            outcome = reason
+            _kill_group(pgid)
+
+    def check_stop() -> None:
+        if cancelled.is_set():
+            stop("cancelled")
+        elif deadline is not None and time.monotonic() >= deadline:
+            stop("timeout")
+
+    assert proc.stdout is not None and proc.stderr is not None
+    with selectors.DefaultSelector() as selector:
+        selector.register(proc.stdout, selectors.EVENT_READ, "stdout")
+        selector.register(proc.stderr, selectors.EVENT_READ, "stderr")
+
+        while selector.get_map():
+            for key, _ in selector.select(timeout=_POLL_SECONDS):
+                chunk = os.read(key.fd, _READ_CHUNK_SIZE)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    continue
+                buffer = buffers[key.data]
+                room = max_output_bytes - len(buffer)
+                if len(chunk) > room:
+                    truncated[key.data] = True
+                buffer.extend(chunk[:room])
+            check_stop()
+
+    proc.stdout.close()
+    proc.stderr.close()
+
+    # Wait for exit without reaping, so the process group id cannot be reused
+    # before stray descendants are killed
+    while os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is None:
+        check_stop()
+        time.sleep(_POLL_SECONDS)
+    _kill_group(pgid)
+
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    result = ProcessResult(
+        returncode=proc.returncode,
+        stdout=bytes(buffers["stdout"]),
+        stderr=bytes(buffers["stderr"]),
+        stdout_truncated=truncated["stdout"],
+        stderr_truncated=truncated["stderr"],
+        cpu_seconds=rusage.ru_utime + rusage.ru_stime,
+        max_rss_bytes=rusage.ru_maxrss * 1024,  # Linux reports KiB
+        wall_seconds=time.monotonic() - started,
+    )
+    if outcome == "ok" and result.signaled:
+        outcome = "signaled"
+    return result, outcome
+
+
+async def run_engine(
+    engine: str,
+    args: list[str],
+    timeout: float | None = None,
+    limits: ResourceLimits | None = None,
+    max_output_bytes: int | None = None,
+) -> ProcessResult:
+    """Run an external engine with resource limits.
+
+    Args:
+        engine: Engine name used for metrics and logs (e.g. "clamav").
+        args: Command line.
+        timeout: Seconds before the process group is killed.
+        limits: rlimits for the process (defaults from settings).
+        max_output_bytes: Cap on captured stdout and stderr, each.
+
+    Returns:
+        The process result, also for non-zero exit codes and rlimit kills.
+
+    Raises:
+        EngineTimeoutError: If the engine ran past the timeout.
+        FileNotFoundError: If the executable does not exist.
+    """
+    limits = limits or ResourceLimits.from_settings()
+    if max_output_bytes is None:
+        max_output_bytes = settings.engine_max_output_bytes
+
+    cancelled = threading.Event()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+        None, _run_sync, args, limits, timeout, max_output_bytes, cancelled
+    )
+
+    try:
+        result, outcome = await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # Kill the process group and wait for the thread to reap it
+        cancelled.set()
+        await asyncio.gather(future, return_exceptions=True)
+        engine_invocations.labels(engine=engine, outcome="cancelled").inc()
+        raise
+    except Exception:
+        engine_invocations.labels(engine=engine, outcome="error").inc()
+        raise
+
+    engine_invocations.labels(engine=engine, outcome=outcome).inc()
+    engine_cpu_seconds.labels(engine=engine).observe(result.cpu_seconds)
+    engine_max_rss_bytes.labels(engine=engine).observe(result.max_rss_bytes)
+
+    log.debug(
+        "engine_finished",
+        engine=engine,
+        outcome=outcome,
+        returncode=result.returncode,
+        cpu_seconds=round(result.cpu_seconds, 3),
+        max_rss_bytes=result.max_rss_bytes,
+        wall_seconds=round(result.wall_seconds, 3),
+    )
+    if result.stdout_truncated or result.stderr_truncated:
+        log.warning("engine_output_truncated", engine=engine, max_bytes=max_output_bytes)
+    if outcome == "signaled":
+        log.warning("engine_killed_by_signal", engine=engine, signal=-result.returncode)
+
+    if outcome == "timeout":
+        assert timeout is not None
+        raise EngineTimeoutError(engine, timeout, result)
+    return result
@@ -0,0 +1,102 @@
+"""Sliding-window stage throughput statistics.
+
+The pipeline records every stage execution here; the queue monitor uses the
+recent per-stage durations to estimate how long the current backlog takes to
+drain.
+"""
+
+import time
+from collections import deque
+
+
+class StageThroughput:
+    """Recent stage durations over a sliding time window."""
+
+    def __init__(self, window_seconds: float = 300.0) -> None:
+        self.window_seconds = window_seconds
+        self._samples: dict[str, deque[tuple[float, float]]] = {}
+
+    def record(self, stage: str, seconds: float, now: float | None = None) -> None:
+        """Record a stage execution.
+
+        Args:
+            stage: Stage name.
+            seconds: Stage duration in seconds.
+            now: Monotonic timestamp of completion (defaults to now).
+        """
+        now = time.monotonic() if now is None else now
+        samples = self._samples.setdefault(stage, deque())
+        samples.append((now, seconds))
+        self._expire(samples, now)
+
+    def _expire(self, samples: deque[tuple[float, float]], now: float) -> None:
+        cutoff = now - self.window_seconds
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+
+    def stages(self) -> list[str]:
+        """Stages with samples inside the window."""
+        return [stage for stage, samples in self._samples.items() if samples]
+
+    def executions_per_second(self, stage: str, now: float | None = None) -> float:
+        """Completed executions of a stage per second over the window."""
+        now = time.monotonic() if now is None else now
+        samples = self._samples.get(stage)
+        if not samples:
+            return 0.0
+        self._expire(samples, now)
+        return len(samples) / self.window_seconds
+
+    def mean_seconds(
+        self, stage: str, now: float | None = None, window: float | None = None
+    ) -> float | None:
+        """Mean duration of a stage, or None without samples.
+
+        Args:
+            stage: Stage name.
+            now: Monotonic timestamp to evaluate at (defaults to now).
+            window: Only consider the most recent ``window`` seconds
+                (defaults to the full tracker window).
+        """
+        now = time.monotonic() if now is None else now
+        samples = self._samples.get(stage)
+        if not samples:
+            return None
+        self._expire(samples, now)
+        cutoff = now - window if window is not None else float("-inf")
+        recent = [seconds for ts, seconds in samples if ts >= cutoff]
+        if not recent:
+            return None
+        return sum(recent) / len(recent)
+
+    def job_seconds(self, now: float | None = None) -> float | None:
+        """Estimated time one consumer slot spends on a job.
+
+        Sum of the mean durations of every stage seen in the window, or None
+        if nothing has run recently.
+        """
+        means = [self.mean_seconds(stage, now) for stage in list(self._samples)]
+        known = [m for m in means if m is not None]
+        return sum(known) if known else None
+
+
+# Process-wide tracker fed by the pipeline
+stage_throughput = StageThroughput()
+
+
+def estimate_drain_seconds(depth: int, job_seconds: float | None, parallelism: int) -> float | None:
+    """Estimated time to drain a backlog.
+
+    Args:
+        depth: Messages waiting in the queue.
+        job_seconds: Time one consumer slot spends per job.
+        parallelism: Jobs processed concurrently across all consumers.
+
+    Returns:
+        Seconds until the backlog is drained, 0 if empty, None if unknown.
+    """
+    if depth == 0:
+        return 0.0
+    if not job_seconds or parallelism <= 0:
+        return None
+    return depth * job_seconds / parallelism
@@ -0,0 +1,121 @@
+"""OpenTelemetry tracing for the worker.
+
+The API injects W3C trace context into the job message headers; the worker
+continues that trace with a consumer span per delivery, a span covering the
+broker wait (publish to delivery), and child spans for the download, every
+stage and every database write.
+
+Tracing is off unless ``tracing_exporter`` is set (``file``, ``otlp`` or
+``console``, as in the API).
+"""
+
+import functools
+import json
+import threading
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from pathlib import Path
+from typing import Any, ParamSpec, TypeVar
+
+import structlog
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+from malscan_worker.config import get_settings
+
+log = structlog.get_logger()
+settings = get_settings()
+
+tracer = trace.get_tracer("malscan.worker")
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = [json.dumps(json.loads(span.to_json())) + "\n" for span in spans]
+        try:
+            with self._lock, self.path.open("a", encoding="utf-8") as f:
+                f.writelines(lines)
+        except OSError as e:
+            log.error("trace_export_failed", path=str(self.path), error=str(e))
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _build_exporter() -> SpanExporter | None:
+    if settings.tracing_exporter == "file":
+        return JsonLinesSpanExporter(settings.tracing_file_path)
+    if settings.tracing_exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=settings.otlp_endpoint)
+    if settings.tracing_exporter == "console":
+        return ConsoleSpanExporter()
+    return None
+
+
+def configure_tracing(service_name: str) -> TracerProvider | None:
+    """Install the global tracer provider.
+
+    Jobs follow the sampling decision made by the API; traces started in the
+    worker itself are sampled at ``tracing_sample_rate``.
+
+    Returns:
+        The provider (to flush on shutdown), or None if tracing is disabled.
+    """
+    exporter = _build_exporter()
+    if exporter is None:
+        return None
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_rate)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    log.info("tracing_configured", exporter=settings.tracing_exporter)
+    return provider
+
+
+def extract_trace_context(headers: Mapping[str, Any] | None) -> context.Context:
+    """Trace context carried in message headers."""
+    carrier = {
+        key: value.decode() if isinstance(value, bytes) else value
+        for key, value in (headers or {}).items()
+        if isinstance(value, str | bytes)
+    }
+    return propagate.extract(carrier)
+
+
+def traced(
+    name: str, attributes: dict[str, Any] | None = None
+) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    """Wrap an async function in a span."""
+
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with tracer.start_as_current_span(name, attributes=attributes):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,123 @@
+"""Unit tests for engine micro-batching."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from malscan_worker.batching import EngineBatcher
+from malscan_worker.stages.base import StageContext
+from malscan_worker.stages.clamav import ClamAVStage
+
+# clamscan stand-in that hangs on any sample named "hang"
+_HANGING_CLAMSCAN = """#!{python}
+import sys, time
+
+paths = [arg for arg in sys.argv[1:] if not arg.startswith("-")]
+if any(path.endswith("hang") for path in paths):
+    time.sleep(60)
+for path in paths:
+    print(path + ": OK")
+"""
+
+
+class _Engine:
+    """Fake engine recording its invocations; fails batches containing "bad"."""
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    async def scan(self, paths: list[Path]) -> dict[Path, str]:
+        self.calls.append([path.name for path in paths])
+        await asyncio.sleep(0.01)
+        if any(path.name == "bad" for path in paths):
+            raise RuntimeError("engine crashed")
+        return {path: f"result:{path.name}" for path in paths}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submits_share_one_invocation():
+    """Test that files submitted within the window are scanned together."""
+    engine = _Engine()
+    batcher = EngineBatcher("fake", engine.scan, max_files=8, window_seconds=0.05)
+
+    results = await asyncio.gather(*(batcher.submit(Path(name)) for name in "abc"))
+
+    assert results == ["result:a", "result:b", "result:c"]
+    assert engine.calls == [["a", "b", "c"]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_dispatched_without_waiting():
+    """Test that a batch reaching max_files does not wait for the window."""
+    engine = _Engine()
+    batcher = EngineBatcher("fake", engine.scan, max_files=2, window_seconds=60)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit(Path(name)) for name in "ab")), timeout=5
+    )
+
+    assert results == ["result:a", "result:b"]
+    assert engine.calls == [["a", "b"]]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_per_file():
+    """Test that a file breaking its batch only fails its own caller."""
+    engine = _Engine()
+    batcher = EngineBatcher("fake", engine.scan, max_files=8, window_seconds=0.01)
+
+    results = await asyncio.gather(
+        batcher.submit(Path("a")), batcher.submit(Path("bad")), return_exceptions=True
+    )
+
+    assert results[0] == "result:a"
+    assert isinstance(results[1], RuntimeError)
+    assert engine.calls[0] == ["a", "bad"]
+    assert sorted(engine.calls[1:]) == [["a"], ["bad"]]
+
+
+@pytest.mark.asyncio
+async def test_batching_disabled_scans_each_file():
+    """Test that max_files of 1 scans every file on its own."""
+    engine = _Engine()
+    batcher = EngineBatcher("fake", engine.scan, max_files=1, window_seconds=1)
+
+    await asyncio.gather(*(batcher.submit(Path(name)) for name in "ab"))
+
+    assert sorted(engine.calls) == [["a"], ["b"]]
+
+
+@pytest.mark.asyncio
+async def test_hanging_sample_only_fails_its_own_job(tmp_path: Path, mocker):
+    """Test that a batch hung by one sample times out before the other jobs' stages do."""
+    clamscan = tmp_path / "clamscan"
+    clamscan.write_text(_HANGING_CLAMSCAN.format(python=sys.executable))
+    clamscan.chmod(0o755)
+    mocker.patch("malscan_worker.stages.clamav.settings.clamscan_path", str(clamscan))
+    mocker.patch("malscan_worker.stages.clamav.settings.clamav_batch_max_files", 8)
+    mocker.patch("malscan_worker.stages.clamav.settings.clamav_batch_window_seconds", 0.05)
+    mocker.patch("malscan_worker.batching.settings.stage_timeout_seconds", 2)
+    mocker.patch("malscan_worker.batching.settings.engine_batch_timeout_share", 0.25)
+    stage = ClamAVStage()
+
+    async def job(name: str) -> str:
+        sample = tmp_path / name
+        sample.write_bytes(b"sample")
+        ctx = StageContext(
+            job_id=name,
+            file_id=name,
+            storage_key=name,
+            sha256="0" * 64,
+            original_filename=name,
+            file_path=sample,
+        )
+        # As run by the pipeline, under the stage timeout
+        result = await asyncio.wait_for(stage.execute(ctx), timeout=2)
+        return result.status
+
+    results = await asyncio.gather(job("a"), job("hang"), job("b"), return_exceptions=True)
+
+    assert results[0] == "ok"
+    assert results[2] == "ok"
+    assert isinstance(results[1], asyncio.TimeoutError) or results[1] == "failed"
@@ -0,0 +1,101 @@
+"""Unit tests for the node-local sample cache."""
+
+import hashlib
+import os
+
+from malscan_worker.cache import SampleCache
+
+
+def _write_sample(path, content: bytes) -> str:
+    path.write_bytes(content)
+    return hashlib.sha256(content).hexdigest()
+
+
+def test_cache_miss_then_hit(tmp_path):
+    """Test that a stored sample is served from the cache."""
+    cache = SampleCache(tmp_path / "cache", max_bytes=1024 * 1024)
+    work_dir = tmp_path / "job1"
+    work_dir.mkdir()
+    sha256 = _write_sample(work_dir / "sample.bin", b"sample content")
+
+    dest = tmp_path / "job2.bin"
+    assert cache.fetch(sha256, dest) is False
+
+    assert cache.store(sha256, work_dir / "sample.bin") is True
+    assert cache.fetch(sha256, dest) is True
+    assert dest.read_bytes() == b"sample content"
+
+
+def test_cache_rejects_hash_mismatch(tmp_path):
+    """Test that a sample whose content does not match its key is not cached."""
+    cache = SampleCache(tmp_path / "cache", max_bytes=1024 * 1024)
+    sample = tmp_path / "sample.bin"
+    sample.write_bytes(b"tampered")
+
+    assert cache.store("0" * 64, sample) is False
+    assert cache.fetch("0" * 64, tmp_path / "out.bin") is False
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test LRU eviction once the cache exceeds its size budget."""
+    cache = SampleCache(tmp_path / "cache", max_bytes=250)
+    hashes = []
+    for i in range(3):
+        sample = tmp_path / f"sample{i}.bin"
+        sha256 = _write_sample(sample, bytes([i]) * 100)
+        hashes.append(sha256)
+        # Drop the job's link so the cache holds the only reference
+        cache.store(sha256, sample)
+        sample.unlink()
+        obj = cache._object_path(sha256)
+        os.utime(obj, (1000 + i, 1000 + i))
+
+    cache.evict()
+
+    assert not cache._object_path(hashes[0]).exists()
+    assert cache._object_path(hashes[1]).exists()
+    assert cache._object_path(hashes[2]).exists()
+
+
+def test_cache_does_not_evict_samples_in_use(tmp_path):
+    """Test that samples still linked into a job directory survive eviction."""
+    cache = SampleCache(tmp_path / "cache", max_bytes=1024)
+    sample = tmp_path / "sample.bin"
+    sha256 = _write_sample(sample, b"x" * 100)
+    cache.store(sha256, sample)
+    assert cache.fetch(sha256, tmp_path / "job.bin") is True
+
+    cache.max_bytes = 50
+    cache.evict()
+
+    assert cache._object_path(sha256).exists()
+
+
+def test_store_leaves_job_file_writable(tmp_path):
+    """Test that making the cache object read-only does not affect the job's file."""
+    cache = SampleCache(tmp_path / "cache", max_bytes=1024 * 1024)
+    sample = tmp_path / "sample.bin"
+    sha256 = _write_sample(sample, b"sample content")
+
+    cache.store(sha256, sample)
+
+    assert sample.stat().st_mode & 0o200
+    assert not os.stat(cache._object_path(sha256)).st_mode & 0o222
+
+
+def test_store_keeps_running_size_without_walking(tmp_path, mocker):
+    """Test that inserts under budget update the size total without scanning objects."""
+    root = tmp_path / "cache"
+    first = SampleCache(root, max_bytes=1024 * 1024)
+    sample = tmp_path / "a.bin"
+    first.store(_write_sample(sample, b"a" * 100), sample)
+
+    cache = SampleCache(root, max_bytes=1024 * 1024)
+    assert cache._size == 100
+    scan = mocker.spy(cache, "_scan")
+    for i in range(3):
+        sample = tmp_path / f"sample{i}.bin"
+        cache.store(_write_sample(sample, bytes([i]) * 100), sample)
+
+    scan.assert_not_called()
+    assert cache._size == 400
@@ -0,0 +1,106 @@
+"""Unit tests for the adaptive concurrency controller."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from malscan_worker.concurrency import (
+    AdaptiveLimiter,
+    ConcurrencyController,
+    ResourceProbe,
+    Signals,
+)
+from malscan_worker.throughput import StageThroughput
+
+
+@pytest.mark.asyncio
+async def test_limiter_blocks_at_limit_and_follows_changes():
+    """Test that acquisitions wait for a slot and lowered limits drain first."""
+    limiter = AdaptiveLimiter(2, min_limit=1, max_limit=4)
+    await limiter.acquire()
+    await limiter.acquire()
+
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    # Lowering the limit keeps the waiter blocked after one release
+    await limiter.set_limit(1)
+    await limiter.release()
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    await limiter.release()
+    await asyncio.wait_for(waiter, timeout=1)
+    assert limiter.in_flight == 1
+    assert limiter.take_peak() == 2
+
+    assert await limiter.set_limit(10) == 4
+
+
+def _controller(limit: int = 4) -> ConcurrencyController:
+    return ConcurrencyController(
+        AdaptiveLimiter(limit, min_limit=1, max_limit=8),
+        AsyncMock(),
+        throughput=StageThroughput(),
+        probe=ResourceProbe(),
+    )
+
+
+def test_decide_additive_increase_and_multiplicative_decrease():
+    """Test AIMD decisions for headroom, idle capacity and pressure."""
+    controller = _controller(limit=4)
+
+    assert controller.decide(Signals(saturated=True), now=0) == (5, "headroom")
+    assert controller.decide(Signals(saturated=False), now=0) == (4, None)
+    assert controller.decide(Signals(cpu_fraction=0.99, saturated=True), now=0) == (2, "cpu")
+    assert controller.decide(Signals(latency_inflation=3.0), now=0) == (2, "latency")
+
+
+@pytest.mark.asyncio
+async def test_step_applies_limit_and_respects_cooldown(mocker):
+    """Test that decreases update QoS and are spaced by the cooldown."""
+    controller = _controller(limit=8)
+    mocker.patch.object(controller.probe, "memory_fraction", return_value=0.5)
+    mocker.patch.object(controller.probe, "cpu_fraction", return_value=0.99)
+
+    await controller.step(now=100)
+    assert controller.limiter.limit == 5
+    controller.apply_limit.assert_awaited_once_with(5)
+
+    # Still under CPU pressure, but inside the cooldown window
+    await controller.step(now=110)
+    assert controller.limiter.limit == 5
+
+    # Memory pressure is acted on immediately
+    controller.probe.memory_fraction.return_value = 0.95
+    await controller.step(now=115)
+    assert controller.limiter.limit == 3
+
+
+def test_latency_inflation_against_baseline():
+    """Test that slower recent stages raise the inflation ratio."""
+    throughput = StageThroughput(window_seconds=300)
+    controller = ConcurrencyController(AdaptiveLimiter(2), AsyncMock(), throughput=throughput)
+
+    throughput.record("clamav", 1.0, now=0)
+    assert controller.latency_inflation(now=0) == 1.0
+
+    throughput.record("clamav", 5.0, now=100)
+    assert controller.latency_inflation(now=100) > 2.0
+
+
+def test_resource_probe_reads_cgroup_v2(tmp_path):
+    """Test memory and CPU utilization from cgroup v2 files."""
+    (tmp_path / "memory.current").write_text("900\n")
+    (tmp_path / "memory.max").write_text("1000\n")
+    (tmp_path / "cpu.max").write_text("200000 100000\n")
+    (tmp_path / "cpu.stat").write_text("usage_usec 0\nuser_usec 0\n")
+
+    probe = ResourceProbe(cgroup_root=tmp_path)
+    assert probe.memory_fraction() == 0.9
+
+    assert probe.cpu_fraction(now=0) is None
+    (tmp_path / "cpu.stat").write_text("usage_usec 10000000\n")
+    # 10 CPU-seconds over 10 s with a 2-CPU quota
+    assert probe.cpu_fraction(now=10) == 0.5
@@ -0,0 +1,83 @@
+"""Unit tests for the DLQ inspection and replay tool."""
+
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from malscan_worker.dlq import DlqEntry, replay_messages, summarize
+from malscan_worker.retry import FAILURE_REASON_HEADER, RETRY_COUNT_HEADER
+
+
+def _dlq_message(job_id: str, sha256: str, reason: str | None) -> MagicMock:
+    message = MagicMock()
+    message.body = json.dumps({"job_id": job_id, "sha256": sha256}).encode()
+    message.headers = {RETRY_COUNT_HEADER: 3}
+    if reason:
+        message.headers[FAILURE_REASON_HEADER] = reason
+    message.content_type = "application/json"
+    message.timestamp = None
+    message.ack = AsyncMock()
+    message.nack = AsyncMock()
+    return message
+
+
+class FakeDlq:
+    """Queue stand-in serving messages through get()."""
+
+    def __init__(self, messages: list[MagicMock]) -> None:
+        self.messages = list(messages)
+
+    async def get(self, no_ack: bool = False, fail: bool = True) -> MagicMock | None:
+        return self.messages.pop(0) if self.messages else None
+
+
+def test_summarize_groups_by_reason():
+    """Test grouping DLQ messages by failure reason."""
+    entries = [
+        DlqEntry.from_message(_dlq_message("job-1", "a", "stage:clamav")),
+        DlqEntry.from_message(_dlq_message("job-2", "b", "stage:clamav")),
+        DlqEntry.from_message(_dlq_message("job-3", "c", None)),
+    ]
+
+    summary = summarize(entries)
+
+    assert list(summary) == ["stage:clamav", "unknown"]
+    assert summary["stage:clamav"]["count"] == 2
+    assert summary["stage:clamav"]["sample_job_ids"] == ["job-1", "job-2"]
+
+
+@pytest.mark.asyncio
+async def test_replay_filters_and_skips_completed(mocker):
+    """Test that replay honours reason filters and skips completed samples."""
+    mocker.patch(
+        "malscan_worker.dlq.get_completed_sha256s",
+        new_callable=AsyncMock,
+        return_value={"done-sha"},
+    )
+    mock_status = mocker.patch("malscan_worker.dlq.update_job_status", new_callable=AsyncMock)
+
+    replayable = _dlq_message("job-1", "new-sha", "stage:clamav")
+    completed = _dlq_message("job-2", "done-sha", "stage:clamav")
+    other_reason = _dlq_message("job-3", "other-sha", "stage:yara")
+    queue = FakeDlq([replayable, completed, other_reason])
+    exchange = MagicMock()
+    exchange.publish = AsyncMock()
+
+    stats = await replay_messages(
+        queue, exchange, reasons=["stage:clamav"], batch_size=2, rate=1000
+    )
+
+    assert stats["scanned"] == 3
+    assert stats["replayed"] == 1
+    assert stats["skipped_completed"] == 1
+    assert stats["filtered"] == 1
+
+    published = exchange.publish.await_args.args[0]
+    assert RETRY_COUNT_HEADER not in published.headers
+    assert FAILURE_REASON_HEADER not in published.headers
+    replayable.ack.assert_awaited_once()
+    mock_status.assert_awaited_once_with("job-1", "queued")
+
+    # Everything not replayed stays in the DLQ
+    completed.nack.assert_awaited_once_with(requeue=True)
+    other_reason.nack.assert_awaited_once_with(requeue=True)
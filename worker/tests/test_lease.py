@@ -0,0 +1,42 @@
+"""Tests for job leases and the expired-lease reaper."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from malscan_worker.lease import JobLease, reap_once
+
+
+@pytest.mark.asyncio
+async def test_reap_once_drains_full_batches(mocker):
+    """Test that the reaper keeps going while batches come back full."""
+    mocker.patch("malscan_worker.lease.settings.lease_reaper_batch_size", 2)
+    reap = mocker.patch(
+        "malscan_worker.lease.reap_expired_leases",
+        new_callable=AsyncMock,
+        side_effect=[[("a", "queued"), ("b", "failed")], [("c", "queued")]],
+    )
+
+    assert await reap_once() == 3
+    assert reap.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_lease_heartbeat_renews_until_released(mocker):
+    """Test that a held lease is renewed on each heartbeat and stops on release."""
+    mocker.patch("malscan_worker.lease.settings.job_lease_heartbeat_seconds", 0.01)
+    mocker.patch("malscan_worker.lease.acquire_job_lease", new_callable=AsyncMock, return_value=1)
+    renew = mocker.patch(
+        "malscan_worker.lease.renew_job_lease", new_callable=AsyncMock, return_value=True
+    )
+
+    lease = JobLease("job-1", owner="worker-a")
+    assert await lease.acquire() == 1
+    await asyncio.sleep(0.05)
+    await lease.release()
+    renewals = renew.await_count
+    await asyncio.sleep(0.03)
+
+    assert renewals >= 2
+    assert renew.await_count == renewals
+    renew.assert_awaited_with("job-1", "worker-a")
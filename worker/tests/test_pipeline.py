@@ -13,12 +13,14 @@ class MockStage(Stage):
     def __init__(self, name: str, should_fail: bool = False):
         self._name = name
         self.should_fail = should_fail
+        self.calls = 0
 
     @property
     def name(self) -> str:
         return self._name
 
     async def execute(self, ctx):
+        self.calls += 1
         now = datetime.now(timezone.utc)
         if self.should_fail:
             return StageResult(
@@ -61,6 +63,12 @@ async def test_run_pipeline_success(mocker, tmp_path):
     mocker.patch("malscan_worker.pipeline.update_job_status", new_callable=AsyncMock)
     mocker.patch("malscan_worker.pipeline.update_job_stage", new_callable=AsyncMock)
     mocker.patch("malscan_worker.pipeline.update_job_result", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.pipeline.index_job_iocs", new_callable=AsyncMock)
+    mocker.patch(
+        "malscan_worker.pipeline.load_stage_checkpoints", new_callable=AsyncMock, return_value={}
+    )
+    mocker.patch("malscan_worker.pipeline.save_stage_checkpoint", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.pipeline.delete_stage_checkpoints", new_callable=AsyncMock)
     mocker.patch("malscan_worker.pipeline.stage_latency")
 
     # Replace STAGES with mock stages
@@ -99,6 +107,12 @@ async def test_run_pipeline_stage_failure(mocker, tmp_path):
     mocker.patch("malscan_worker.pipeline.update_job_status", new_callable=AsyncMock)
     mocker.patch("malscan_worker.pipeline.update_job_stage", new_callable=AsyncMock)
     mocker.patch("malscan_worker.pipeline.update_job_result", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.pipeline.index_job_iocs", new_callable=AsyncMock)
+    mocker.patch(
+        "malscan_worker.pipeline.load_stage_checkpoints", new_callable=AsyncMock, return_value={}
+    )
+    mocker.patch("malscan_worker.pipeline.save_stage_checkpoint", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.pipeline.delete_stage_checkpoints", new_callable=AsyncMock)
     mocker.patch("malscan_worker.pipeline.stage_latency")
 
     # Mock STAGES (second stage fails)
@@ -116,3 +130,99 @@ async def test_run_pipeline_stage_failure(mocker, tmp_path):
     # Pipeline should raise RuntimeError on failure
     with pytest.raises(RuntimeError, match="Stage stage2 failed"):
         await run_pipeline(job_data)
+
+
+@pytest.mark.asyncio
+async def test_run_pipeline_resumes_from_checkpoint(mocker, tmp_path):
+    """Test that checkpointed stages are not re-executed on retry."""
+    from malscan_worker.pipeline import run_pipeline
+
+    test_file = tmp_path / "test.txt"
+    test_file.write_bytes(b"test content")
+
+    now = datetime.now(timezone.utc)
+    stage1_result = StageResult(
+        stage_name="stage1",
+        status="ok",
+        started_at=now,
+        ended_at=now,
+        duration_ms=10,
+        findings={"from": "checkpoint"},
+        artifacts=[],
+    )
+    # stage2 checkpoint was written by an older stage version and must be ignored
+    checkpoints = {
+        "stage1": ("1", stage1_result.to_dict()),
+        "stage2": ("0", stage1_result.to_dict()),
+    }
+
+    mocker.patch(
+        "malscan_worker.pipeline.download_file",
+        new_callable=AsyncMock,
+        return_value=test_file,
+    )
+    mocker.patch("malscan_worker.pipeline.update_job_status", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.pipeline.update_job_stage", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.pipeline.update_job_result", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.pipeline.index_job_iocs", new_callable=AsyncMock)
+    mocker.patch(
+        "malscan_worker.pipeline.load_stage_checkpoints",
+        new_callable=AsyncMock,
+        return_value=checkpoints,
+    )
+    mock_save = mocker.patch(
+        "malscan_worker.pipeline.save_stage_checkpoint", new_callable=AsyncMock
+    )
+    mock_delete = mocker.patch(
+        "malscan_worker.pipeline.delete_stage_checkpoints", new_callable=AsyncMock
+    )
+    mocker.patch("malscan_worker.pipeline.stage_latency")
+
+    mock_stages = [MockStage("stage1"), MockStage("stage2")]
+    mocker.patch("malscan_worker.pipeline.STAGES", mock_stages)
+
+    job_data = {
+        "job_id": "test-job-id",
+        "file_id": "test-file-id",
+        "storage_key": "test-key",
+        "sha256": "test-sha256",
+        "original_filename": "test.txt",
+    }
+
+    result = await run_pipeline(job_data)
+
+    assert mock_stages[0].calls == 0
+    assert mock_stages[1].calls == 1
+    assert result["stages"][0]["findings"] == {"from": "checkpoint"}
+    mock_save.assert_awaited_once()
+    mock_delete.assert_awaited_once_with("test-job-id")
+
+
+def test_build_analysis_result_includes_ioc_stage_findings(stage_context):
+    """Test that IPs found by the IOC stage end up in the result."""
+    from malscan_worker.db import _ioc_rows
+    from malscan_worker.pipeline import _build_analysis_result
+
+    now = datetime.now(timezone.utc)
+    ioc_result = StageResult(
+        stage_name="ioc-extract",
+        status="ok",
+        started_at=now,
+        ended_at=now,
+        duration_ms=1,
+        findings={
+            "urls": ["https://malicious.com/path"],
+            "domains": ["Evil.Example."],
+            "ips": ["1.2.3.4"],
+        },
+        artifacts=[],
+    )
+
+    result = _build_analysis_result("job-1", "file-1", stage_context, [ioc_result], 1)
+
+    assert result["results"]["iocs"]["ips"] == ["1.2.3.4"]
+    assert _ioc_rows(result["results"]["iocs"]) == [
+        ("domain", "evil.example"),
+        ("ip", "1.2.3.4"),
+        ("url", "https://malicious.com/path"),
+    ]
@@ -0,0 +1,65 @@
+"""Unit tests for on-demand stage profiling."""
+
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+from malscan_worker.profiling import StageProfiler
+from malscan_worker.stages.base import StageResult
+
+
+async def _busy_stage() -> StageResult:
+    sum(i * i for i in range(20000))
+    now = datetime.now(timezone.utc)
+    return StageResult(
+        stage_name="yara",
+        status="ok",
+        started_at=now,
+        ended_at=now,
+        duration_ms=1,
+        findings={},
+        artifacts=[],
+    )
+
+
+def test_should_profile_consumes_triggers():
+    """Test that armed triggers are consumed and profiling is off otherwise."""
+    profiler = StageProfiler()
+    assert not profiler.should_profile("yara")
+
+    profiler.arm("yara", 1)
+    profiler.arm(None, 1)
+    assert profiler.should_profile("yara")
+    assert profiler.armed() == {"*": 1}
+    assert profiler.should_profile("clamav")
+    assert not profiler.should_profile("yara")
+    assert not profiler.enabled
+
+
+def test_should_profile_every_n_jobs(mocker):
+    """Test periodic profiling of selected stages."""
+    mocker.patch("malscan_worker.profiling.settings.profiling_every_n_jobs", 2)
+    mocker.patch("malscan_worker.profiling.settings.profiling_stages", ["yara"])
+    profiler = StageProfiler()
+
+    assert [profiler.should_profile("yara") for _ in range(4)] == [False, True, False, True]
+    assert not profiler.should_profile("clamav")
+
+
+@pytest.mark.asyncio
+async def test_profile_stores_artifact_and_aggregates(mocker):
+    """Test that a profiled execution is uploaded and shows up in top()."""
+    mock_upload = mocker.patch("malscan_worker.profiling.upload_artifact", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.profiling.settings.profiling_mode", "cprofile")
+    profiler = StageProfiler()
+
+    result = await profiler.profile("yara", "job-1", _busy_stage())
+
+    key = "job-1/profiles/yara.pstats"
+    assert result.artifacts == [key]
+    assert mock_upload.await_args.args[0] == key
+
+    top = profiler.top("yara", limit=5)
+    assert top["mode"] == "cprofile"
+    assert any("<genexpr>" in f["function"] for f in top["functions"])
+    assert profiler.stages() == ["yara"]
@@ -0,0 +1,79 @@
+"""Tests for worker warm-up and readiness."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from malscan_worker import readiness, storage
+from malscan_worker.readiness import WorkerState, readiness_report, warm_up
+
+
+@pytest.fixture
+def state(mocker) -> WorkerState:
+    """Fresh worker state."""
+    fresh = WorkerState()
+    mocker.patch("malscan_worker.readiness.worker_state", fresh)
+    return fresh
+
+
+@pytest.mark.asyncio
+async def test_warm_up_records_failed_components(mocker, state: WorkerState):
+    """Test that a failing component is reported without stopping warm-up."""
+    mocker.patch("malscan_worker.readiness.db.warm_up", new_callable=AsyncMock)
+    mocker.patch(
+        "malscan_worker.readiness.storage.warm_up",
+        new_callable=AsyncMock,
+        side_effect=RuntimeError("bucket missing"),
+    )
+    stage = MagicMock()
+    stage.name = "yara"
+    stage.warm_up = AsyncMock()
+
+    await warm_up([stage])
+
+    stage.warm_up.assert_awaited_once()
+    assert state.warmed_up
+    assert state.warm_up_failures == ["storage"]
+
+
+@pytest.mark.asyncio
+async def test_storage_warm_up_creates_artifacts_bucket(mocker):
+    """Test that only the uploads bucket must exist; the artifacts bucket is created."""
+    client = MagicMock()
+    client.bucket_exists.side_effect = lambda bucket: bucket == "uploads"
+    mocker.patch("malscan_worker.storage._get_minio_client", return_value=client)
+    mocker.patch("malscan_worker.storage.settings.minio_bucket_uploads", "uploads")
+    mocker.patch("malscan_worker.storage.settings.minio_bucket_artifacts", "artifacts")
+
+    await storage.warm_up()
+    client.make_bucket.assert_called_once_with("artifacts")
+
+    client.bucket_exists.side_effect = lambda bucket: False
+    with pytest.raises(RuntimeError, match="uploads"):
+        await storage.warm_up()
+
+
+def test_readiness_requires_warm_up_and_broker(mocker, state: WorkerState):
+    """Test that /ready fails until warmed up and while the broker is down."""
+    assert readiness_report()[0] is False
+
+    state.warmed_up = True
+    state.connection = MagicMock(is_closed=True)
+    ready, report = readiness_report()
+    assert ready is False
+    assert report["broker_connected"] is False
+
+    state.connection.is_closed = False
+    assert readiness_report()[0] is True
+
+
+def test_readiness_fails_when_saturated(mocker, state: WorkerState):
+    """Test the optional saturation threshold."""
+    state.warmed_up = True
+    state.connection = MagicMock(is_closed=False)
+    mocker.patch.object(readiness, "saturation", return_value=1.0)
+
+    assert readiness_report()[0] is True
+    mocker.patch("malscan_worker.readiness.settings.readiness_max_saturation", 0.9)
+    ready, report = readiness_report()
+    assert ready is False
+    assert report["saturated"] is True
@@ -0,0 +1,79 @@
+"""Unit tests for report offloading."""
+
+from unittest.mock import AsyncMock
+
+import pytest
+import zstandard
+from malscan_worker.reports import build_summary, encode_report, prepare_stored_result
+
+
+def _report(yara_hits: int) -> dict:
+    return {
+        "job_id": "job-1",
+        "file": {"sha256": "abc", "mime": "application/x-dosexec", "size": 4096},
+        "verdict": "suspicious",
+        "score": 60,
+        "results": {
+            "av_result": {"engine": "ClamAV", "infected": False, "threat_name": None},
+            "yara_hits": [{"rule": f"rule_{i}", "strings": ["$a"]} for i in range(yara_hits)],
+            "iocs": {"urls": ["http://x.test"], "domains": [], "ips": ["10.0.0.1"]},
+            "sandbox": {"behaviors": [], "network_connections": []},
+        },
+    }
+
+
+def test_build_summary_counts():
+    """Test that the summary keeps the verdict and key counts."""
+    summary = build_summary(_report(3))
+
+    assert summary["verdict"] == "suspicious"
+    assert summary["score"] == 60
+    assert summary["counts"]["yara_hits"] == 3
+    assert summary["counts"]["urls"] == 1
+    assert summary["counts"]["ips"] == 1
+
+
+@pytest.mark.asyncio
+async def test_small_report_stays_inline(mocker):
+    """Test that reports under the threshold are stored inline with a summary."""
+    mock_upload = mocker.patch("malscan_worker.reports.upload_artifact", new_callable=AsyncMock)
+
+    stored = await prepare_stored_result("job-1", _report(1))
+
+    mock_upload.assert_not_awaited()
+    assert stored["verdict"] == "suspicious"
+    assert stored["summary"]["counts"]["yara_hits"] == 1
+    assert "report_ref" not in stored
+
+
+@pytest.mark.asyncio
+async def test_large_report_is_offloaded(mocker):
+    """Test that large reports are uploaded compressed and replaced by a pointer."""
+    mocker.patch("malscan_worker.reports.settings.report_offload_threshold_bytes", 1024)
+    mock_upload = mocker.patch("malscan_worker.reports.upload_artifact", new_callable=AsyncMock)
+    report = _report(500)
+
+    stored = await prepare_stored_result("job-1", report)
+
+    key, data, _ = mock_upload.await_args.args
+    assert key == "job-1/report.json.zst"
+    assert zstandard.ZstdDecompressor().decompress(data) == encode_report(report)
+    assert set(stored) == {"job_id", "summary", "report_ref"}
+    assert stored["report_ref"]["key"] == key
+    assert stored["report_ref"]["compressed_size"] < stored["report_ref"]["size"]
+
+
+@pytest.mark.asyncio
+async def test_offload_failure_falls_back_to_inline(mocker):
+    """Test that an upload failure keeps the report inline."""
+    mocker.patch("malscan_worker.reports.settings.report_offload_threshold_bytes", 1024)
+    mocker.patch(
+        "malscan_worker.reports.upload_artifact",
+        new_callable=AsyncMock,
+        side_effect=RuntimeError("minio down"),
+    )
+
+    stored = await prepare_stored_result("job-1", _report(500))
+
+    assert "report_ref" not in stored
+    assert len(stored["results"]["yara_hits"]) == 500
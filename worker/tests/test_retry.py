@@ -0,0 +1,296 @@
+"""Tests for the delayed retry topology against an in-memory broker stand-in."""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any
+from unittest.mock import AsyncMock
+
+import aio_pika
+import malscan_worker.consumer as consumer
+import pytest
+import pytest_asyncio
+from malscan_worker.config import Settings
+from malscan_worker.consumer import DLQ_QUEUE, MAX_MESSAGE_RETRIES, process_message
+from malscan_worker.lease import reap_once
+from malscan_worker.retry import (
+    FAILURE_REASON_HEADER,
+    RETRY_EXCHANGE,
+    declare_retry_topology,
+    retry_queue_name,
+)
+from pydantic import ValidationError
+
+MAIN_QUEUE = "malscan.jobs"
+
+
+@dataclass
+class FakeIncomingMessage:
+    """Incoming message delivered by FakeBroker."""
+
+    broker: "FakeBroker"
+    queue: str
+    body: bytes
+    headers: dict[str, Any]
+    content_type: str | None = "application/json"
+    timestamp: Any = None
+    outcome: str | None = None
+
+    async def ack(self) -> None:
+        self.outcome = "ack"
+
+    async def reject(self, requeue: bool = False) -> None:
+        self.outcome = "requeue" if requeue else "reject"
+        if requeue:
+            self.broker.enqueue(self.queue, self.body, self.headers)
+        else:
+            self.broker.dead_letter(self.queue, self.body, self.headers, reason="rejected")
+
+
+@dataclass
+class FakeQueue:
+    """Queue with optional TTL and dead-letter configuration."""
+
+    broker: "FakeBroker"
+    name: str
+    arguments: dict[str, Any]
+    messages: list[tuple[float, bytes, dict[str, Any]]] = field(default_factory=list)
+
+    async def bind(self, exchange: "FakeExchange", routing_key: str) -> None:
+        exchange.bindings[routing_key] = self.name
+
+
+@dataclass
+class FakeExchange:
+    """Direct exchange routing by binding key (the default exchange routes by queue name)."""
+
+    broker: "FakeBroker"
+    name: str
+    bindings: dict[str, str] = field(default_factory=dict)
+
+    async def publish(self, message: aio_pika.Message, routing_key: str) -> None:
+        queue = routing_key if self.name == "" else self.bindings[routing_key]
+        self.broker.enqueue(queue, message.body, dict(message.headers))
+
+
+class FakeBroker:
+    """Minimal RabbitMQ stand-in with a simulated clock.
+
+    Implements per-queue message TTL and dead-lettering with x-death
+    accounting (one entry per queue/reason, count incremented on repeats).
+    """
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.queues: dict[str, FakeQueue] = {}
+        self.exchanges: dict[str, FakeExchange] = {}
+        self.default_exchange = FakeExchange(self, "")
+
+    # Channel API used by declare_retry_topology
+    async def declare_exchange(self, name: str, *args: Any, **kwargs: Any) -> FakeExchange:
+        self.exchanges.setdefault(name, FakeExchange(self, name))
+        return self.exchanges[name]
+
+    async def declare_queue(
+        self, name: str, durable: bool = True, arguments: dict[str, Any] | None = None
+    ) -> FakeQueue:
+        self.queues.setdefault(name, FakeQueue(self, name, arguments or {}))
+        return self.queues[name]
+
+    def enqueue(self, queue: str, body: bytes, headers: dict[str, Any]) -> None:
+        q = self.queues[queue]
+        ttl = q.arguments.get("x-message-ttl")
+        expires_at = self.now + ttl / 1000 if ttl is not None else float("inf")
+        q.messages.append((expires_at, body, headers))
+
+    def dead_letter(self, queue: str, body: bytes, headers: dict[str, Any], reason: str) -> None:
+        q = self.queues[queue]
+        target = q.arguments.get("x-dead-letter-routing-key")
+        if target is None:
+            return
+        headers = dict(headers)
+        x_death = [dict(entry) for entry in headers.get("x-death", [])]
+        for entry in x_death:
+            if entry["queue"] == queue and entry["reason"] == reason:
+                entry["count"] += 1
+                x_death.remove(entry)
+                x_death.insert(0, entry)
+                break
+        else:
+            x_death.insert(0, {"queue": queue, "reason": reason, "count": 1})
+        headers["x-death"] = x_death
+        self.enqueue(target, body, headers)
+
+    def advance(self, seconds: float) -> None:
+        """Advance the clock and expire messages past their TTL."""
+        self.now += seconds
+        for q in list(self.queues.values()):
+            expired = [m for m in q.messages if m[0] <= self.now]
+            q.messages = [m for m in q.messages if m[0] > self.now]
+            for _, body, headers in expired:
+                self.dead_letter(q.name, body, headers, reason="expired")
+
+    def get(self, queue: str) -> FakeIncomingMessage | None:
+        q = self.queues[queue]
+        if not q.messages:
+            return None
+        _, body, headers = q.messages.pop(0)
+        return FakeIncomingMessage(self, queue, body, headers)
+
+    def peek(self, queue: str) -> dict[str, Any]:
+        return self.queues[queue].messages[0][2]
+
+    def depth(self, queue: str) -> int:
+        return len(self.queues[queue].messages)
+
+
+@pytest_asyncio.fixture
+async def broker(mocker) -> FakeBroker:
+    """Broker stand-in with the worker's queue topology declared."""
+    mocker.patch("malscan_worker.retry.settings.rabbitmq_queue", MAIN_QUEUE)
+    mocker.patch("malscan_worker.retry.settings.retry_delays_seconds", [10, 60, 300])
+
+    fake = FakeBroker()
+    await fake.declare_queue(DLQ_QUEUE)
+    await fake.declare_queue(
+        MAIN_QUEUE,
+        arguments={"x-dead-letter-exchange": "", "x-dead-letter-routing-key": DLQ_QUEUE},
+    )
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_retry_topology_declares_delay_tiers(broker: FakeBroker):
+    """Test that each delay tier dead-letters back to the main queue."""
+    exchange = await declare_retry_topology(broker)
+
+    assert exchange.name == RETRY_EXCHANGE
+    for delay in (10, 60, 300):
+        queue = broker.queues[retry_queue_name(delay)]
+        assert queue.arguments["x-message-ttl"] == delay * 1000
+        assert queue.arguments["x-dead-letter-routing-key"] == MAIN_QUEUE
+
+
+@pytest.mark.asyncio
+async def test_failed_job_backs_off_then_goes_to_dlq(mocker, broker: FakeBroker):
+    """Test delay tiers, retry accounting and final routing to the DLQ."""
+    mocker.patch(
+        "malscan_worker.consumer.run_pipeline",
+        new_callable=AsyncMock,
+        side_effect=RuntimeError("engine unavailable"),
+    )
+    mock_status = mocker.patch("malscan_worker.consumer.update_job_status", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.lease.acquire_job_lease", new_callable=AsyncMock, return_value=1)
+    retry_count_seen = mocker.spy(consumer, "_get_retry_count")
+
+    exchange = await declare_retry_topology(broker)
+    broker.enqueue(MAIN_QUEUE, json.dumps({"job_id": "job-1"}).encode(), {})
+
+    for attempt, delay in enumerate((10, 60, 300)):
+        message = broker.get(MAIN_QUEUE)
+        assert message is not None
+        await process_message(message, exchange, broker.default_exchange)
+
+        assert message.outcome == "ack"
+        assert retry_count_seen.spy_return == attempt
+        assert broker.depth(retry_queue_name(delay)) == 1
+
+        # Not redelivered before the tier delay has elapsed
+        broker.advance(delay - 1)
+        assert broker.depth(MAIN_QUEUE) == 0
+        broker.advance(1)
+        assert broker.depth(MAIN_QUEUE) == 1
+
+    # Final attempt exhausts the retry budget and is dead-lettered
+    message = broker.get(MAIN_QUEUE)
+    await process_message(message, exchange, broker.default_exchange)
+
+    assert retry_count_seen.spy_return == MAX_MESSAGE_RETRIES
+    assert message.outcome == "ack"
+    assert broker.depth(DLQ_QUEUE) == 1
+    assert broker.peek(DLQ_QUEUE)[FAILURE_REASON_HEADER] == "RuntimeError"
+    mock_status.assert_any_await("job-1", "queued", error_message="engine unavailable")
+    mock_status.assert_awaited_with(
+        "job-1", "failed", error_message="Max retries exceeded: engine unavailable"
+    )
+
+
+@pytest.mark.asyncio
+async def test_retried_job_is_not_reaped(mocker, broker: FakeBroker):
+    """Test that a job waiting in a retry tier holds no lease for the reaper to expire."""
+    job = {"status": "queued", "lease_expires_at": None}
+
+    async def acquire(job_id: str, owner: str) -> int:
+        job.update(status="scanning", lease_expires_at=0.0)
+        return 1
+
+    async def set_status(job_id: str, status: str, **kwargs: Any) -> None:
+        job["status"] = status
+        if status != "scanning":
+            job["lease_expires_at"] = None
+
+    async def reap(batch_size: int, max_attempts: int) -> list[tuple[str, str]]:
+        # Every lease counts as expired: the worker could have died right away
+        if job["status"] == "scanning" and job["lease_expires_at"] is not None:
+            job.update(status="queued", lease_expires_at=None)
+            return [("job-1", "queued")]
+        return []
+
+    mocker.patch(
+        "malscan_worker.consumer.run_pipeline",
+        new_callable=AsyncMock,
+        side_effect=RuntimeError("engine unavailable"),
+    )
+    mocker.patch("malscan_worker.consumer.update_job_status", side_effect=set_status)
+    mocker.patch("malscan_worker.lease.acquire_job_lease", side_effect=acquire)
+    mocker.patch("malscan_worker.lease.reap_expired_leases", side_effect=reap)
+
+    exchange = await declare_retry_topology(broker)
+    broker.enqueue(MAIN_QUEUE, json.dumps({"job_id": "job-1"}).encode(), {})
+    await process_message(broker.get(MAIN_QUEUE), exchange, broker.default_exchange)
+
+    assert broker.depth(retry_queue_name(10)) == 1
+    assert job == {"status": "queued", "lease_expires_at": None}
+    assert await reap_once() == 0
+
+
+@pytest.mark.asyncio
+async def test_successful_job_is_acked_without_retry(mocker, broker: FakeBroker):
+    """Test that a successful job is acked and nothing is scheduled."""
+    mocker.patch("malscan_worker.consumer.run_pipeline", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.consumer.update_job_status", new_callable=AsyncMock)
+
+    exchange = await declare_retry_topology(broker)
+    broker.enqueue(MAIN_QUEUE, json.dumps({"job_id": None}).encode(), {})
+
+    message = broker.get(MAIN_QUEUE)
+    await process_message(message, exchange, broker.default_exchange)
+
+    assert message.outcome == "ack"
+    assert all(broker.depth(retry_queue_name(d)) == 0 for d in (10, 60, 300))
+
+
+@pytest.mark.asyncio
+async def test_job_over_lease_attempts_goes_to_dlq(mocker, broker: FakeBroker):
+    """Test that a job redelivered past its attempt budget is not run again."""
+    pipeline = mocker.patch("malscan_worker.consumer.run_pipeline", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.consumer.update_job_status", new_callable=AsyncMock)
+    mocker.patch("malscan_worker.consumer.settings.job_lease_max_attempts", 4)
+    mocker.patch("malscan_worker.lease.acquire_job_lease", new_callable=AsyncMock, return_value=5)
+
+    exchange = await declare_retry_topology(broker)
+    broker.enqueue(MAIN_QUEUE, json.dumps({"job_id": "job-1"}).encode(), {})
+
+    message = broker.get(MAIN_QUEUE)
+    await process_message(message, exchange, broker.default_exchange)
+
+    pipeline.assert_not_awaited()
+    assert message.outcome == "ack"
+    assert broker.peek(DLQ_QUEUE)[FAILURE_REASON_HEADER] == "LeaseAttemptsExceededError"
+
+
+def test_retry_delays_must_not_be_empty():
+    """Test that a configuration without delay tiers is rejected at startup."""
+    with pytest.raises(ValidationError):
+        Settings(retry_delays_seconds=[])
+    with pytest.raises(ValidationError):
+        Settings(retry_delays_seconds=[10, 0])
@@ -0,0 +1,126 @@
+"""Unit tests for YARA rule statistics and quarantine."""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from malscan_worker.rule_stats import RuleStats, merge_reports, percentile
+from malscan_worker.stages.base import StageContext
+from malscan_worker.stages.yara_scan import YaraStage
+
+
+def test_percentile():
+    """Test the nearest-rank percentile."""
+    assert percentile([], 0.95) == 0.0
+    assert percentile([3.0, 1.0, 2.0], 0.5) == 2.0
+    assert percentile([float(i) for i in range(1, 101)], 0.95) == 95.0
+
+
+def test_slowest_ranks_namespaces_and_counts_rule_matches():
+    """Test that namespaces are ranked by mean scan time with per-rule match counts."""
+    stats = RuleStats()
+    stats.record("fast", 0.01, 0.01, ["a"])
+    stats.record("slow", 0.5, 0.4, ["b", "c"])
+    stats.record("slow", 0.3, 0.3, ["b"])
+
+    ranked = stats.slowest()
+
+    assert [item["namespace"] for item in ranked] == ["slow", "fast"]
+    assert ranked[0]["scans"] == 2
+    assert ranked[0]["mean_ms"] == 400.0
+    assert ranked[0]["rules"] == [{"rule": "b", "matches": 2}, {"rule": "c", "matches": 1}]
+
+
+def test_over_budget_only_reported_by_default(mocker):
+    """Test that the report action flags a namespace without skipping it."""
+    mocker.patch("malscan_worker.rule_stats.settings.yara_rule_budget_seconds", 0.1)
+    mocker.patch("malscan_worker.rule_stats.settings.yara_rule_min_scans", 3)
+    stats = RuleStats()
+    for _ in range(3):
+        stats.record("slow", 0.2, 0.2, [])
+
+    assert stats.slowest()[0]["over_budget"] is True
+    assert not stats.is_quarantined("slow")
+
+
+def test_quarantine_until_rule_file_changes(mocker):
+    """Test that a quarantined namespace is skipped until its rule file is edited."""
+    mocker.patch("malscan_worker.rule_stats.settings.yara_rule_budget_seconds", 0.1)
+    mocker.patch("malscan_worker.rule_stats.settings.yara_slow_rule_action", "quarantine")
+    mocker.patch("malscan_worker.rule_stats.settings.yara_rule_min_scans", 3)
+    stats = RuleStats()
+    stats.record("slow", 0.2, 0.2, [], mtime=1.0)
+    stats.record("slow", 0.2, 0.2, [], mtime=1.0)
+    assert not stats.is_quarantined("slow", 1.0)
+
+    stats.record("slow", 0.2, 0.2, [], mtime=1.0)
+    assert stats.is_quarantined("slow", 1.0)
+    assert not stats.is_quarantined("slow", 2.0)
+    assert not stats.is_quarantined("slow", 1.0)
+
+
+def test_timeout_quarantines_immediately(mocker):
+    """Test that a timed-out scan quarantines without waiting for min_scans."""
+    mocker.patch("malscan_worker.rule_stats.settings.yara_rule_budget_seconds", 1.0)
+    mocker.patch("malscan_worker.rule_stats.settings.yara_slow_rule_action", "quarantine")
+    stats = RuleStats()
+    stats.record("hang", 300.0, 300.0, [], timed_out=True)
+
+    assert stats.is_quarantined("hang")
+    assert stats.release("hang")
+    assert not stats.is_quarantined("hang")
+
+
+def test_merge_reports_sums_counts_across_workers():
+    """Test that worker reports are merged per namespace."""
+    first = RuleStats()
+    first.record("ns", 0.1, 0.1, ["a"])
+    second = RuleStats()
+    second.record("ns", 0.3, 0.3, ["a", "b"])
+    second.record("other", 0.05, 0.05, [])
+
+    merged = merge_reports(
+        [{"namespaces": first.slowest()}, {"namespaces": second.slowest()}], 10, "mean"
+    )
+
+    assert [item["namespace"] for item in merged] == ["ns", "other"]
+    assert merged[0]["scans"] == 2
+    assert merged[0]["mean_ms"] == 200.0
+    assert merged[0]["max_ms"] == 300.0
+    assert merged[0]["rules"] == [{"rule": "a", "matches": 2}, {"rule": "b", "matches": 1}]
+
+
+@pytest.mark.asyncio
+async def test_yara_stage_skips_quarantined_rule_file(
+    stage_context: StageContext, tmp_path: Path, mocker
+):
+    """Test that quarantined rule files are not scanned and are listed in the findings."""
+    rules = tmp_path / "rules"
+    rules.mkdir()
+    (rules / "good.yar").write_text("rule good { condition: true }")
+    (rules / "slow.yar").write_text("rule slow { condition: true }")
+    mocker.patch("malscan_worker.stages.yara_scan.settings.yara_rules_path", str(rules))
+    stats = RuleStats()
+    mocker.patch("malscan_worker.stages.yara_scan.rule_stats", stats)
+    mocker.patch.object(stats, "is_quarantined", side_effect=lambda ns, mtime: ns == "slow")
+    run_engine = mocker.patch(
+        "malscan_worker.stages.yara_scan.run_engine",
+        return_value=SimpleNamespace(
+            returncode=0,
+            signaled=False,
+            stdout=f'good [severity="high"] {stage_context.file_path}\n'.encode(),
+            stdout_truncated=False,
+            stderr=b"",
+            wall_seconds=0.02,
+            cpu_seconds=0.01,
+        ),
+    )
+
+    result = await YaraStage().execute(stage_context)
+
+    assert result.status == "ok"
+    assert run_engine.call_count == 1
+    assert [match["rule"] for match in result.findings["matches"]] == ["good"]
+    assert result.findings["quarantined"] == ["slow"]
+    assert result.findings["namespace_ms"] == {"good": 20}
+    assert stats.slowest()[0]["rules"] == [{"rule": "good", "matches": 1}]
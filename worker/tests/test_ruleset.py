@@ -0,0 +1,145 @@
+"""Unit tests for prebuilt YARA ruleset artifacts."""
+
+import json
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from malscan_worker.ruleset import LATEST_NAME, LocalRulesetStore, build, fetch_latest, install
+from malscan_worker.stages.base import StageContext
+from malscan_worker.stages.yara_scan import YaraStage
+
+
+async def _fake_engine(engine: str, args: list[str], timeout: float) -> SimpleNamespace:
+    """yarac writes a placeholder compiled file, yara reports version 4.5.0 and no matches."""
+    if args[0] == "yarac":
+        Path(args[2]).write_bytes(b"compiled:" + Path(args[1]).read_bytes())
+    version = args[1:] == ["--version"]
+    return SimpleNamespace(
+        returncode=1 if args[0] == "yara" and not version else 0,
+        signaled=False,
+        stdout=b"4.5.0\n" if version else b"",
+        stdout_truncated=False,
+        stderr=b"",
+        wall_seconds=0.0,
+        cpu_seconds=0.0,
+    )
+
+
+@pytest.fixture
+def rules(tmp_path: Path) -> Path:
+    rules = tmp_path / "rules"
+    rules.mkdir()
+    (rules / "a.yar").write_text("rule a { condition: true }")
+    (rules / "b.yar").write_text("rule b { condition: false }")
+    (rules / "manifest.json").write_text('{"file_types": {"b.yar": ["pe"]}}')
+    return rules
+
+
+@pytest.mark.asyncio
+async def test_build_publishes_checksummed_artifact(rules: Path, tmp_path: Path, mocker):
+    """Test that build compiles every rule file and unchanged rules are not republished."""
+    mocker.patch("malscan_worker.ruleset.run_engine", side_effect=_fake_engine)
+    store = LocalRulesetStore(tmp_path / "store")
+
+    latest = await build(rules, store)
+
+    assert latest["rule_files"] == ["a.yar", "b.yar"]
+    assert latest["yara_version"] == "4.5.0"
+    assert (tmp_path / "store" / latest["artifact"]).exists()
+    assert await fetch_latest(store) == latest
+    assert (await build(rules, store))["version"] == latest["version"]
+
+    (rules / "a.yar").write_text("rule a2 { condition: true }")
+    assert (await build(rules, store))["version"] != latest["version"]
+
+
+@pytest.mark.asyncio
+async def test_build_rejects_rules_that_do_not_compile(rules: Path, tmp_path: Path, mocker):
+    """Test that nothing is published when a rule file fails to compile."""
+    mocker.patch(
+        "malscan_worker.ruleset.run_engine",
+        return_value=SimpleNamespace(
+            returncode=1, signaled=False, stdout=b"4.5.0", stderr=b"a.yar(1): syntax error"
+        ),
+    )
+    store = LocalRulesetStore(tmp_path / "store")
+
+    with pytest.raises(RuntimeError, match="syntax error"):
+        await build(rules, store)
+    assert await fetch_latest(store) is None
+
+
+@pytest.mark.asyncio
+async def test_install_verifies_checksum(rules: Path, tmp_path: Path, mocker):
+    """Test that an artifact not matching the checksum of latest.json is refused."""
+    mocker.patch("malscan_worker.ruleset.run_engine", side_effect=_fake_engine)
+    store = LocalRulesetStore(tmp_path / "store")
+    latest = await build(rules, store)
+
+    loaded = await install(store, latest, tmp_path / "installed")
+    assert loaded.version == latest["version"]
+    assert (loaded.rules_path / "manifest.json").exists()
+    assert sorted(path.name for path in loaded.compiled) == ["a.yar", "b.yar"]
+
+    store.put(LATEST_NAME, json.dumps({**latest, "version": "v2", "sha256": "0" * 64}).encode())
+    with pytest.raises(ValueError, match="checksum"):
+        await install(store, await fetch_latest(store), tmp_path / "installed")
+
+
+@pytest.mark.asyncio
+async def test_yara_stage_scans_with_prebuilt_ruleset(
+    rules: Path, stage_context: StageContext, tmp_path: Path, mocker
+):
+    """Test that the stage loads the published ruleset and stamps its version."""
+    mocker.patch("malscan_worker.ruleset.run_engine", side_effect=_fake_engine)
+    run_engine = mocker.patch(
+        "malscan_worker.stages.yara_scan.run_engine", side_effect=_fake_engine
+    )
+    store_dir = tmp_path / "store"
+    latest = await build(rules, LocalRulesetStore(store_dir))
+    settings = "malscan_worker.stages.yara_scan.settings"
+    mocker.patch(f"{settings}.yara_ruleset_store", "local")
+    mocker.patch(f"{settings}.yara_ruleset_dir", str(store_dir))
+    mocker.patch(f"{settings}.yara_compiled_dir", str(tmp_path / "compiled"))
+    mocker.patch(f"{settings}.yara_rules_path", str(tmp_path / "missing"))
+
+    stage = YaraStage()
+    await stage.warm_up()
+    result = await stage.execute(stage_context)
+
+    assert result.status == "ok"
+    assert result.findings["ruleset_version"] == latest["version"]
+    assert stage.version == f"1+{latest['version']}"
+    scanned = [call.args[1] for call in run_engine.call_args_list if call.args[1][0] == "yara"]
+    assert scanned and all(args[3] == "-C" for args in scanned)
+    assert not await stage.refresh_ruleset()
+
+
+@pytest.mark.asyncio
+async def test_yara_stage_falls_back_to_source_rules(
+    rules: Path, stage_context: StageContext, tmp_path: Path, mocker
+):
+    """Test that the stage compiles yara_rules_path when no ruleset was published."""
+    run_engine = mocker.patch(
+        "malscan_worker.stages.yara_scan.run_engine", side_effect=_fake_engine
+    )
+    settings = "malscan_worker.stages.yara_scan.settings"
+    mocker.patch(f"{settings}.yara_ruleset_store", "local")
+    mocker.patch(f"{settings}.yara_ruleset_dir", str(tmp_path / "empty"))
+    mocker.patch(f"{settings}.yara_compiled_dir", str(tmp_path / "compiled"))
+    mocker.patch(f"{settings}.yara_rules_path", str(rules))
+
+    stage = YaraStage()
+    await stage.warm_up()
+    result = await stage.execute(stage_context)
+
+    assert result.status == "ok"
+    assert result.findings["ruleset_version"].startswith("source-")
+    assert stage.version == f"1+{result.findings['ruleset_version']}"
+
+    (rules / "a.yar").write_text("rule a2 { condition: true }")
+    os.utime(rules / "a.yar", (0, 0))
+    assert stage.version != f"1+{result.findings['ruleset_version']}"
+    assert any(call.args[1][0] == "yarac" for call in run_engine.call_args_list)
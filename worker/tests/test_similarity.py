@@ -0,0 +1,114 @@
+"""Unit tests for similarity digests and the similarity stage."""
+
+import random
+from unittest.mock import AsyncMock
+
+import pytest
+from malscan_worker import similarity
+from malscan_worker.stages.base import StageContext
+from malscan_worker.stages.similarity import SimilarityStage
+
+
+def _sample(seed: int, size: int = 64 * 1024) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def _variant(data: bytes) -> bytes:
+    # Repacked variant: a few bytes inserted, a region rewritten, data appended
+    middle = len(data) // 2
+    return data[:1000] + b"\x90" * 7 + data[1000:middle] + bytes(512) + data[middle + 512 :] + b"X"
+
+
+def test_variant_is_more_similar_than_unrelated_sample():
+    """Test that an edited copy keeps most chunks while other samples share none."""
+    original = similarity.minhash(similarity.chunk_hashes(_sample(1)))
+    variant = similarity.minhash(similarity.chunk_hashes(_variant(_sample(1))))
+    unrelated = similarity.minhash(similarity.chunk_hashes(_sample(2)))
+
+    assert similarity.estimate_similarity(original, original) == 1.0
+    assert similarity.estimate_similarity(original, variant) > 0.6
+    assert similarity.estimate_similarity(original, unrelated) < 0.1
+
+
+@pytest.mark.parametrize("prefix", [1, 7, 100])
+def test_prepended_header_keeps_chunks(prefix: int):
+    """Test that shifting a sample by a short header leaves its chunking intact."""
+    data = _sample(3, 1024 * 1024)
+    shifted = random.Random(prefix).randbytes(prefix) + data
+
+    chunks = set(similarity.chunk_hashes(data).tolist())
+    shifted_chunks = set(similarity.chunk_hashes(shifted).tolist())
+    assert len(chunks & shifted_chunks) / len(chunks | shifted_chunks) > 0.99
+    assert (
+        similarity.estimate_similarity(
+            similarity.minhash(similarity.chunk_hashes(data)),
+            similarity.minhash(similarity.chunk_hashes(shifted)),
+        )
+        > 0.95
+    )
+
+
+def test_variant_shares_lsh_buckets():
+    """Test that near-duplicates land in a shared bucket and unrelated samples do not."""
+    original = similarity.band_buckets(similarity.minhash(similarity.chunk_hashes(_sample(1))))
+    variant = similarity.band_buckets(
+        similarity.minhash(similarity.chunk_hashes(_variant(_sample(1))))
+    )
+    unrelated = similarity.band_buckets(similarity.minhash(similarity.chunk_hashes(_sample(2))))
+
+    assert len(original) == similarity.BANDS
+    assert any(a == b for a, b in zip(original, variant, strict=True))
+    assert not any(a == b for a, b in zip(original, unrelated, strict=True))
+
+
+def test_signature_encoding_roundtrip():
+    """Test that stored signatures decode to the same components."""
+    signature = similarity.minhash(similarity.chunk_hashes(_sample(3)))
+    encoded = similarity.encode_signature(signature)
+
+    assert len(encoded) == similarity.NUM_PERM * 4
+    assert (similarity.decode_signature(encoded) == signature).all()
+
+
+def test_small_and_empty_inputs():
+    """Test digests of inputs shorter than the rolling window."""
+    assert len(similarity.chunk_hashes(b"")) == 0
+    assert similarity.minhash(similarity.chunk_hashes(b"")) is None
+    assert len(similarity.chunk_hashes(b"MZ")) == 1
+
+
+@pytest.mark.asyncio
+async def test_similarity_stage_ranks_candidates(stage_context: StageContext, mocker):
+    """Test that candidates are ranked by similarity and filtered by min_score."""
+    data = _sample(1)
+    stage_context.file_path.write_bytes(_variant(data))
+    close = similarity.encode_signature(similarity.minhash(similarity.chunk_hashes(data)))
+    far = similarity.encode_signature(similarity.minhash(similarity.chunk_hashes(_sample(2))))
+    lookup = mocker.patch(
+        "malscan_worker.stages.similarity.find_similar_samples",
+        new_callable=AsyncMock,
+        return_value=[("file-far", "b" * 64, "clean", far), ("file-close", "a" * 64, None, close)],
+    )
+
+    result = await SimilarityStage().execute(stage_context)
+
+    assert result.status == "ok"
+    assert result.findings["features"] > 0
+    assert result.findings["signature"]
+    assert [item["file_id"] for item in result.findings["similar"]] == ["file-close"]
+    assert lookup.await_args.args[0] == stage_context.file_id
+
+
+@pytest.mark.asyncio
+async def test_similarity_stage_empty_file(stage_context: StageContext, mocker):
+    """Test that an empty sample has no signature and is not looked up."""
+    stage_context.file_path.write_bytes(b"")
+    lookup = mocker.patch(
+        "malscan_worker.stages.similarity.find_similar_samples", new_callable=AsyncMock
+    )
+
+    result = await SimilarityStage().execute(stage_context)
+
+    assert result.status == "ok"
+    assert result.findings == {"signature": None, "features": 0, "similar": []}
+    lookup.assert_not_awaited()
@@ -1,11 +1,20 @@
 """Unit tests for pipeline stages."""
 
+import os
+import random
 from pathlib import Path
+from types import SimpleNamespace
 
+import numpy as np
 import pytest
+from malscan_worker.config import Settings
+from malscan_worker.stages import clamav
 from malscan_worker.stages.base import StageContext
-from malscan_worker.stages.filetype import FileTypeStage
+from malscan_worker.stages.entropy import EntropyStage, window_entropy
+from malscan_worker.stages.filetype import FileTypeStage, mime_family
 from malscan_worker.stages.ioc_extract import IocExtractStage
+from malscan_worker.stages.yara_scan import YaraStage, parse_batch_output
+from pydantic import ValidationError
 
 
 @pytest.mark.asyncio
@@ -77,3 +86,209 @@ async def test_ioc_extract_stage_hashes(stage_context: StageContext):
     assert "sha1" in hashes
     assert "sha256" in hashes
     assert len(hashes["sha256"]) == 64
+
+
+def test_mime_family():
+    """Test coarse MIME classification used for metric labels."""
+    assert mime_family("application/x-dosexec") == "pe"
+    assert mime_family("text/plain; charset=us-ascii") == "text"
+    assert (
+        mime_family("application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        == "document"
+    )
+    assert mime_family("application/octet-stream") == "other"
+    assert mime_family(None) == "unknown"
+
+
+@pytest.mark.asyncio
+async def test_yara_stage_uses_compiled_rules_until_source_changes(tmp_path: Path, mocker):
+    """Test that scans load rules compiled at warm-up while the source is unchanged."""
+    rules = tmp_path / "rules"
+    rules.mkdir()
+    rule_file = rules / "test.yar"
+    rule_file.write_text("rule test { condition: true }")
+    mocker.patch("malscan_worker.stages.yara_scan.settings.yara_rules_path", str(rules))
+    mocker.patch(
+        "malscan_worker.stages.yara_scan.settings.yara_compiled_dir", str(tmp_path / "compiled")
+    )
+    mocker.patch(
+        "malscan_worker.stages.yara_scan.run_engine",
+        return_value=SimpleNamespace(returncode=0, signaled=False, stderr=b""),
+    )
+
+    stage = YaraStage()
+    await stage.warm_up()
+
+    compiled = tmp_path / "compiled" / "test.yar.yarc"
+    assert stage._rules_arguments(rule_file) == ["-C", str(compiled)]
+
+    rule_file.write_text("rule test2 { condition: false }")
+    os.utime(rule_file, (0, 0))
+    assert stage._rules_arguments(rule_file) == [str(rule_file)]
+
+
+@pytest.mark.asyncio
+async def test_yara_stage_scopes_rule_files_to_file_type(
+    stage_context: StageContext, tmp_path: Path, mocker
+):
+    """Test that rule files scoped by the manifest only scan samples of their file types."""
+    rules = tmp_path / "rules"
+    rules.mkdir()
+    (rules / "any.yar").write_text("rule any { condition: true }")
+    (rules / "pe.yar").write_text("rule pe { condition: true }")
+    manifest = rules / "manifest.json"
+    manifest.write_text('{"file_types": {"pe.yar": ["pe"]}}')
+    mocker.patch("malscan_worker.stages.yara_scan.settings.yara_rules_path", str(rules))
+    run_engine = mocker.patch(
+        "malscan_worker.stages.yara_scan.run_engine",
+        return_value=SimpleNamespace(
+            returncode=1,
+            signaled=False,
+            stdout=b"",
+            stdout_truncated=False,
+            stderr=b"",
+            wall_seconds=0.0,
+            cpu_seconds=0.0,
+        ),
+    )
+    file_type = SimpleNamespace(stage_name="file-type", findings={"mime_type": "text/plain"})
+    stage = YaraStage()
+
+    stage_context.previous_results = [file_type]
+    result = await stage.execute(stage_context)
+    assert result.status == "ok"
+    assert run_engine.call_count == 1
+    assert result.findings["file_class"] == "text"
+    assert result.findings["rule_files_out_of_scope"] == 1
+
+    # Without a file-type result every rule file applies
+    stage_context.previous_results = []
+    result = await stage.execute(stage_context)
+    assert run_engine.call_count == 3
+    assert result.findings["file_class"] == "unknown"
+
+    # Subsets are rebuilt when the manifest changes
+    manifest.write_text('{"file_types": {"pe.yar": ["pe", "text"]}}')
+    os.utime(manifest, (0, 0))
+    stage_context.previous_results = [file_type]
+    result = await stage.execute(stage_context)
+    assert run_engine.call_count == 5
+    assert result.findings["rule_files_out_of_scope"] == 0
+
+
+@pytest.mark.asyncio
+async def test_yara_stage_fails_on_truncated_output(
+    stage_context: StageContext, tmp_path: Path, mocker
+):
+    """Test that a scan whose output hit the cap fails instead of dropping matches."""
+    rules = tmp_path / "rules"
+    rules.mkdir()
+    (rules / "test.yar").write_text("rule test { condition: true }")
+    mocker.patch("malscan_worker.stages.yara_scan.settings.yara_rules_path", str(rules))
+    mocker.patch(
+        "malscan_worker.stages.yara_scan.run_engine",
+        return_value=SimpleNamespace(
+            returncode=0,
+            signaled=False,
+            stdout=f"test {stage_context.file_path}\n".encode(),
+            stdout_truncated=True,
+            stderr=b"",
+            wall_seconds=0.0,
+            cpu_seconds=0.0,
+        ),
+    )
+
+    result = await YaraStage().execute(stage_context)
+
+    assert result.status == "failed"
+    assert "truncated" in result.error
+
+
+def test_clamav_parse_output_demultiplexes_batch():
+    """Test that clamscan output of a batch is split into per-file verdicts."""
+    paths = [Path("/work/a.bin"), Path("/work/b.bin"), Path("/work/c.bin"), Path("/work/d.bin")]
+    stdout = (
+        b"/work/a.bin: OK\n"
+        b"/work/b.bin: Win.Test.EICAR_HDB-1 FOUND\n"
+        b"/work/c.bin: Can't open file or directory ERROR\n"
+    )
+
+    results = clamav.parse_output(stdout, paths)
+
+    assert results[paths[0]] == clamav.ClamScanResult(False)
+    assert results[paths[1]] == clamav.ClamScanResult(True, "Win.Test.EICAR_HDB-1")
+    assert results[paths[2]].error == "Can't open file or directory"
+    assert paths[3] not in results
+
+
+def test_yara_parse_batch_output_demultiplexes_matches():
+    """Test that yara --scan-list output is split into per-file matches."""
+    paths = [Path("/work/job-1/a.bin"), Path("/work/job-2/a.bin"), Path("/work/b.bin")]
+    stdout = (
+        b'eicar [severity="high"] /work/job-1/a.bin\n'
+        b"0x0:$eicar: X5O\n"
+        b"net [] /work/job-1/a.bin\n"
+        b"net [] /work/b.bin\n"
+        b"0x10:$url: http://\n"
+    )
+
+    results = parse_batch_output(stdout, "ns", paths)
+
+    assert [match["rule"] for match in results[paths[0]]] == ["eicar", "net"]
+    assert results[paths[0]][0]["strings"] == ["$eicar"]
+    assert results[paths[1]] == []
+    assert results[paths[2]][0]["strings"] == ["$url"]
+
+
+@pytest.mark.asyncio
+async def test_entropy_stage_finds_high_entropy_region(stage_context: StageContext):
+    """Test that a random block between low-entropy data is reported as a region."""
+    low = b"A" * 32768
+    stage_context.file_path.write_bytes(low + random.Random(0).randbytes(65536) + low)
+
+    result = await EntropyStage().execute(stage_context)
+
+    assert result.status == "ok"
+    findings = result.findings
+    assert sum(findings["byte_histogram"]) == 131072
+    assert findings["max_window_entropy"] > 7.9
+    assert findings["min_window_entropy"] == 0.0
+    assert findings["high_entropy_regions_total"] == 1
+    region = findings["high_entropy_regions"][0]
+    # Windows straddling the edges of the random block may also be high
+    assert region["offset"] <= 32768
+    assert region["offset"] + region["length"] >= 32768 + 65536
+    assert 0.45 < findings["high_entropy_ratio"] < 0.6
+
+
+@pytest.mark.asyncio
+async def test_entropy_stage_empty_file(stage_context: StageContext):
+    """Test that an empty sample has zero entropy and no windows."""
+    stage_context.file_path.write_bytes(b"")
+
+    result = await EntropyStage().execute(stage_context)
+
+    assert result.status == "ok"
+    assert result.findings["entropy"] == 0.0
+    assert result.findings["windows"] == 0
+    assert result.findings["high_entropy_regions"] == []
+
+
+def test_window_entropy_matches_direct_computation():
+    """Test that windows summed from half-window histograms match a direct count."""
+    data = np.frombuffer(random.Random(1).randbytes(300_000), dtype=np.uint8) % 37
+    histogram, entropies = window_entropy(data, 4096)
+
+    assert histogram.tolist() == np.bincount(data, minlength=256).tolist()
+    assert len(entropies) == len(data) // 2048 - 1
+    for index in (0, 70, len(entropies) - 1):
+        counts = np.bincount(data[index * 2048 : index * 2048 + 4096], minlength=256)
+        p = counts[counts > 0] / 4096
+        assert entropies[index] == pytest.approx(-(p * np.log2(p)).sum())
+
+
+@pytest.mark.parametrize("window", [0, 1, 4095])
+def test_entropy_window_must_be_even(window: int):
+    """Test that window sizes window_entropy cannot split in halves are rejected."""
+    with pytest.raises(ValidationError):
+        Settings(entropy_window_bytes=window)
@@ -0,0 +1,127 @@
+"""Tests for the resource-capped engine subprocess runner."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from malscan_worker.subprocess_runner import (
+    EngineTimeoutError,
+    ResourceLimits,
+    run_engine,
+)
+
+NO_LIMITS = ResourceLimits()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+@pytest.mark.asyncio
+async def test_run_engine_captures_output_and_rusage():
+    """Test exit code, output and resource usage of a normal run."""
+    result = await run_engine(
+        "test",
+        [sys.executable, "-c", "import sys; print('hello'); sys.exit(3)"],
+        timeout=30,
+        limits=NO_LIMITS,
+    )
+
+    assert result.returncode == 3
+    assert result.stdout.strip() == b"hello"
+    assert result.cpu_seconds > 0
+    assert result.max_rss_bytes > 0
+    assert not result.signaled
+
+
+@pytest.mark.asyncio
+async def test_run_engine_caps_output():
+    """Test that output beyond the cap is discarded without blocking the child."""
+    result = await run_engine(
+        "test",
+        [sys.executable, "-c", "import sys; sys.stdout.write('x' * 1_000_000)"],
+        timeout=30,
+        limits=NO_LIMITS,
+        max_output_bytes=1000,
+    )
+
+    assert result.returncode == 0
+    assert len(result.stdout) == 1000
+    assert result.stdout_truncated
+
+
+@pytest.mark.asyncio
+async def test_run_engine_kills_process_group_on_timeout(tmp_path):
+    """Test that a timeout kills the engine and the children it spawned."""
+    pid_file = tmp_path / "child.pid"
+    script = (
+        "import subprocess, sys, time\n"
+        "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+        f"open({str(pid_file)!r}, 'w').write(str(child.pid))\n"
+        "time.sleep(60)\n"
+    )
+
+    with pytest.raises(EngineTimeoutError):
+        await run_engine("test", [sys.executable, "-c", script], timeout=1, limits=NO_LIMITS)
+
+    child_pid = int(pid_file.read_text())
+    for _ in range(50):
+        if not _pid_alive(child_pid):
+            break
+        await asyncio.sleep(0.05)
+    assert not _pid_alive(child_pid)
+
+
+@pytest.mark.asyncio
+async def test_run_engine_kills_on_cancellation():
+    """Test that cancelling the awaiting task kills the engine."""
+    task = asyncio.create_task(
+        run_engine("test", [sys.executable, "-c", "import time; time.sleep(60)"], timeout=None)
+    )
+    await asyncio.sleep(0.5)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(task, timeout=5)
+
+
+@pytest.mark.asyncio
+async def test_run_engine_applies_cpu_limit():
+    """Test that the CPU rlimit terminates a busy engine with a signal."""
+    result = await run_engine(
+        "test",
+        [sys.executable, "-c", "while True: pass"],
+        timeout=30,
+        limits=ResourceLimits(cpu_seconds=1),
+    )
+
+    assert result.signaled
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("prlimit", [True, False])
+async def test_run_engine_applies_open_files_limit(mocker, prlimit: bool):
+    """Test that rlimits reach the engine, with or without the prlimit binary."""
+    if not prlimit:
+        mocker.patch("malscan_worker.subprocess_runner._PRLIMIT", None)
+    script = "import resource; print(resource.getrlimit(resource.RLIMIT_NOFILE))"
+    result = await run_engine(
+        "test",
+        [sys.executable, "-c", script],
+        timeout=30,
+        limits=ResourceLimits(open_files=64),
+    )
+
+    assert result.stdout.strip() == b"(64, 64)"
+
+
+@pytest.mark.asyncio
+async def test_run_engine_reports_missing_executable():
+    """Test that a missing engine raises FileNotFoundError naming the executable."""
+    with pytest.raises(FileNotFoundError, match="no-such-engine"):
+        await run_engine("test", ["/usr/bin/no-such-engine"], limits=ResourceLimits(open_files=64))
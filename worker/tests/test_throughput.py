@@ -0,0 +1,28 @@
+"""Unit tests for stage throughput tracking and drain estimates."""
+
+from malscan_worker.throughput import StageThroughput, estimate_drain_seconds
+
+
+def test_stage_throughput_window():
+    """Test rates and means over the sliding window."""
+    tracker = StageThroughput(window_seconds=60)
+    tracker.record("clamav", 2.0, now=0)
+    tracker.record("clamav", 4.0, now=30)
+    tracker.record("yara", 1.0, now=30)
+
+    assert tracker.mean_seconds("clamav", now=30) == 3.0
+    assert tracker.job_seconds(now=30) == 4.0
+    assert tracker.executions_per_second("clamav", now=30) == 2 / 60
+
+    # First clamav sample falls out of the window
+    assert tracker.mean_seconds("clamav", now=70) == 4.0
+    assert tracker.mean_seconds("clamav", now=100) is None
+    assert tracker.job_seconds(now=100) is None
+
+
+def test_estimate_drain_seconds():
+    """Test drain estimates for empty, unknown and busy queues."""
+    assert estimate_drain_seconds(0, None, 0) == 0.0
+    assert estimate_drain_seconds(10, None, 2) is None
+    assert estimate_drain_seconds(10, 3.0, 0) is None
+    assert estimate_drain_seconds(10, 3.0, 2) == 15.0